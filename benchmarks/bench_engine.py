@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+End to end benchmark of the task execution path (@container/@binary/@task ->
+PerMedBB.launch -> command_runner) against a fake container engine
+(fake_engine/singularity) that simulates the startup latency, output volume
+and exit code of the executions.
+
+Every scenario runs in a fresh interpreter (so that the memory peaks are not
+mixed) with the fake engine first in the PATH:
+
+- overhead: python overhead per call (task call minus the bare engine call).
+- sequential: throughput of N sequential tasks with startup latency.
+- batched: throughput of the same N tasks within a batching block (a
+  single container startup).
+- concurrent: throughput of N tasks on the local runtime with J cores.
+- output_buffered / output_streamed: memory peak with large outputs
+  (default and PERMEDCOE_STREAM_OUTPUT=file modes).
+- failures: per call time of tasks whose binary fails.
+
+The engine backend is selected with --engine (the fake engine is also
+installed as apptainer, podman and docker).
+
+With --baseline, the results are compared against a previous --json output
+and the script fails if any metric got worse than the given threshold.
+
+Usage:
+    python3 benchmarks/bench_engine.py [-n CALLS] [--latency 0.05] [--jobs 4]
+                                       [--output-mb 64] [--engine singularity]
+                                       [--json FILE]
+                                       [--baseline FILE] [--threshold 0.2]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import contextlib
+import tempfile
+import subprocess
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+FAKE_ENGINE_DIR = os.path.join(HERE, "fake_engine")
+SRC = os.path.abspath(os.path.join(HERE, "..", "src"))
+SCENARIOS = (
+    "overhead",
+    "sequential",
+    "batched",
+    "concurrent",
+    "output_buffered",
+    "output_streamed",
+    "failures",
+)
+FAILURE_EXIT_CODE = 3
+# Compared metrics: (higher is better, smallest meaningful value)
+METRICS = {
+    "overhead_us": (False, 100.0),
+    "per_call_us": (False, 100.0),
+    "tasks_per_s": (True, 0.0),
+    "peak_rss_delta_mb": (False, 8.0),
+}
+
+
+def run_scenario(scenario, arguments):
+    """Run a scenario in a new interpreter with the fake engine.
+
+    Args:
+        scenario (str): Scenario name.
+        arguments (Namespace): Benchmark arguments.
+    Returns:
+        dict: Scenario results.
+    """
+    env = dict(os.environ)
+    env["PATH"] = os.pathsep.join([FAKE_ENGINE_DIR, env.get("PATH", "")])
+    env["PERMEDCOE_ENGINE"] = arguments.engine
+    env["PYTHONPATH"] = os.pathsep.join(
+        [SRC] + [p for p in [env.get("PYTHONPATH")] if p]
+    )
+    with tempfile.NamedTemporaryFile(suffix=".json") as result_fd:
+        proc = subprocess.run(
+            [
+                sys.executable,
+                os.path.abspath(__file__),
+                "--scenario",
+                scenario,
+                "--result",
+                result_fd.name,
+                "-n",
+                str(arguments.calls),
+                "--latency",
+                str(arguments.latency),
+                "--jobs",
+                str(arguments.jobs),
+                "--output-mb",
+                str(arguments.output_mb),
+                "--engine",
+                arguments.engine,
+            ],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            env=env,
+        )
+        if proc.returncode != 0:
+            # The task errors are expected in some scenarios: only shown here
+            sys.stderr.write(proc.stderr.decode(errors="replace"))
+            raise RuntimeError(f"Scenario {scenario} failed")
+        return json.load(result_fd)
+
+
+def scenario_main(arguments):
+    """Scenario process: run the scenario and write its results.
+
+    Args:
+        arguments (Namespace): Benchmark arguments.
+    """
+    scenario = arguments.scenario
+    calls = arguments.calls
+    os.environ["FAKE_ENGINE_LATENCY"] = "0"
+    os.environ["FAKE_ENGINE_OUTPUT"] = "0"
+    os.environ["FAKE_ENGINE_EXIT"] = "0"
+    if scenario in ("sequential", "batched", "concurrent"):
+        os.environ["FAKE_ENGINE_LATENCY"] = str(arguments.latency)
+    elif scenario.startswith("output"):
+        calls = 1
+        os.environ["FAKE_ENGINE_OUTPUT"] = str(arguments.output_mb * 1024 * 1024)
+        if scenario == "output_streamed":
+            os.environ["PERMEDCOE_STREAM_OUTPUT"] = "file"
+    elif scenario == "failures":
+        os.environ["FAKE_ENGINE_EXIT"] = str(FAILURE_EXIT_CODE)
+    if scenario == "concurrent":
+        os.environ["PERMEDCOE_LOCAL_RUNTIME"] = str(arguments.jobs)
+
+    # Imported here since the environment must be set before
+    from permedcoe import container
+    from permedcoe import binary
+    from permedcoe import task
+    from permedcoe import compss_barrier
+    from permedcoe import batching
+    from permedcoe import FILE_OUT
+    from permedcoe import TaskExecutionException
+
+    workdir = tempfile.mkdtemp()
+    image = os.path.join(workdir, "image.sif")
+    open(image, "w").close()
+
+    @container(engine="SINGULARITY", image=image)
+    @binary(binary="fake_binary")
+    @task(result=FILE_OUT)
+    def fake_task(result=None, mode="--mode fast"):
+        pass
+
+    results = {"calls": calls}
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    failures = 0
+    block = batching() if scenario == "batched" else contextlib.nullcontext()
+    start = time.perf_counter()
+    with block:
+        for index in range(calls):
+            try:
+                fake_task(result=os.path.join(workdir, f"result_{index}.txt"))
+            except TaskExecutionException as error:
+                if error.exit_code != FAILURE_EXIT_CODE:
+                    raise
+                failures += 1
+    compss_barrier()
+    elapsed = time.perf_counter() - start
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    results["wall_s"] = elapsed
+    results["per_call_us"] = elapsed / calls * 1e6
+    if scenario in ("sequential", "batched", "concurrent"):
+        results["tasks_per_s"] = calls / elapsed
+        if arguments.latency and scenario != "batched":
+            parallel = arguments.jobs if scenario == "concurrent" else 1
+            results["ideal_tasks_per_s"] = parallel / arguments.latency
+    elif scenario == "overhead":
+        # Bare engine calls to discount the process creation
+        cmd = [arguments.engine, "exec", image, "fake_binary"]
+        start = time.perf_counter()
+        for _ in range(calls):
+            subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        engine = (time.perf_counter() - start) / calls * 1e6
+        results["engine_us"] = engine
+        results["overhead_us"] = results["per_call_us"] - engine
+    elif scenario.startswith("output"):
+        results["output_mb"] = arguments.output_mb
+        results["peak_rss_delta_mb"] = (rss_after - rss_before) / 1024  # KB
+    elif scenario == "failures":
+        results["failures"] = failures
+    with open(arguments.result, "w") as result_fd:
+        json.dump(results, result_fd)
+
+
+def compare(results, baseline, threshold):
+    """Compare the results with a baseline.
+
+    Args:
+        results (dict): Current results.
+        baseline (dict): Previous results.
+        threshold (float): Allowed relative degradation.
+    Returns:
+        bool: True if any metric got worse than the threshold.
+    """
+    failed = False
+    for scenario, values in results["scenarios"].items():
+        reference = baseline["scenarios"].get(scenario, {})
+        for metric, (higher_is_better, floor) in METRICS.items():
+            if metric not in values or not reference.get(metric):
+                continue
+            # The values below the floor are noise (e.g. a few KB of memory)
+            current = max(values[metric], floor, 1e-9)
+            previous = max(reference[metric], floor, 1e-9)
+            ratio = previous / current if higher_is_better else current / previous
+            status = "OK"
+            if ratio > 1 + threshold:
+                status = "REGRESSION"
+                failed = True
+            print(f"{scenario}.{metric}: {ratio:.2f}x baseline cost [{status}]")
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-n", "--calls", type=int, default=50)
+    parser.add_argument(
+        "--latency", type=float, default=0.05, help="Engine startup latency (s)"
+    )
+    parser.add_argument("--jobs", type=int, default=4, help="Concurrent tasks")
+    parser.add_argument("--output-mb", type=int, default=64, help="Output size")
+    parser.add_argument(
+        "--engine",
+        choices=("singularity", "apptainer", "podman", "docker"),
+        default="singularity",
+        help="Container engine backend",
+    )
+    parser.add_argument(
+        "--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS)
+    )
+    parser.add_argument("--json", type=str, help="Write the results as json")
+    parser.add_argument("--baseline", type=str, help="Compare with a json result")
+    parser.add_argument(
+        "--threshold", type=float, default=0.2, help="Allowed relative slowdown"
+    )
+    # Internal: run a single scenario
+    parser.add_argument("--scenario", choices=SCENARIOS, help=argparse.SUPPRESS)
+    parser.add_argument("--result", type=str, help=argparse.SUPPRESS)
+    arguments = parser.parse_args()
+
+    if arguments.scenario:
+        scenario_main(arguments)
+        return 0
+
+    results = {
+        "benchmark": "engine",
+        "calls": arguments.calls,
+        "latency": arguments.latency,
+        "jobs": arguments.jobs,
+        "output_mb": arguments.output_mb,
+        "engine": arguments.engine,
+        "scenarios": {},
+    }
+    for scenario in arguments.scenarios:
+        result = run_scenario(scenario, arguments)
+        results["scenarios"][scenario] = result
+        shown = ", ".join(
+            f"{key}={value:.2f}" if isinstance(value, float) else f"{key}={value}"
+            for key, value in result.items()
+        )
+        print(f"{scenario}: {shown}")
+    if arguments.json:
+        with open(arguments.json, "w") as json_fd:
+            json.dump(results, json_fd, indent=4)
+
+    failed = False
+    if arguments.baseline:
+        with open(arguments.baseline, "r") as baseline_fd:
+            baseline = json.load(baseline_fd)
+        failed = compare(results, baseline, arguments.threshold)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Import time benchmark of the permedcoe modules (python -X importtime).
+
+Every module is imported in a fresh interpreter several times and the
+minimum cumulative time is reported, together with the slowest imports
+and the modules that must not be loaded (e.g. yaml or argparse when
+importing permedcoe). With --baseline, the results are compared against a
+previous --json output and the script fails if any module got slower than
+the given threshold or loads a forbidden module.
+
+Usage:
+    python3 benchmarks/bench_import_time.py [-n RUNS] [--json FILE]
+                                            [--baseline FILE] [--threshold 0.2]
+"""
+
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+# Module to import: modules that it must not load
+MODULES = {
+    "permedcoe": ["yaml", "argparse", "pycompss", "multiprocessing", "inspect"],
+    "permedcoe.core.decorators": ["yaml", "argparse", "multiprocessing", "inspect"],
+    "permedcoe.core.functions": ["yaml", "urllib.request", "zipfile"],
+}
+TOP = 5  # slowest imports shown per module
+
+
+def import_time(module):
+    """Import the module in a new interpreter with -X importtime.
+
+    Args:
+        module (str): Module to import.
+    Returns:
+        dict: Modules loaded by the import: (self us, cumulative us).
+    """
+    env = dict(os.environ)
+    src = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+    env["PYTHONPATH"] = os.pathsep.join(
+        [os.path.abspath(src)] + [p for p in [env.get("PYTHONPATH")] if p]
+    )
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        env=env,
+        check=True,
+    )
+    times = {}
+    lines = []
+    for line in proc.stderr.decode().splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        depth = len(name) - len(name.lstrip())
+        lines.append((name.strip(), depth, int(self_us), int(cumulative_us)))
+    # The modules imported by a module are listed right before it (deeper)
+    for index, (name, depth, _, _) in enumerate(lines):
+        if name == module:
+            start = index
+            while start > 0 and lines[start - 1][1] > depth:
+                start -= 1
+            for child, _, self_us, cumulative_us in lines[start : index + 1]:
+                times[child] = (self_us, cumulative_us)
+    return times
+
+
+def measure(module, forbidden, runs):
+    """Measure the import time of a module.
+
+    Args:
+        module (str): Module to import.
+        forbidden (list[str]): Modules that must not be loaded.
+        runs (int): Number of fresh imports.
+    Returns:
+        dict: Results of the module.
+    """
+    best = None
+    for _ in range(runs):
+        times = import_time(module)
+        if best is None or times[module][1] < best[module][1]:
+            best = times
+    slowest = sorted(best.items(), key=lambda item: item[1][0], reverse=True)
+    return {
+        "cumulative_us": best[module][1],
+        "modules": len(best),
+        "slowest": [[name, self_us] for name, (self_us, _) in slowest[:TOP]],
+        "forbidden_loaded": [name for name in forbidden if name in best],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-n", "--runs", type=int, default=5)
+    parser.add_argument("--json", type=str, help="Write the results as json")
+    parser.add_argument("--baseline", type=str, help="Compare with a json result")
+    parser.add_argument(
+        "--threshold", type=float, default=0.2, help="Allowed relative slowdown"
+    )
+    arguments = parser.parse_args()
+
+    results = {"benchmark": "import_time", "runs": arguments.runs, "modules": {}}
+    for module, forbidden in MODULES.items():
+        result = measure(module, forbidden, arguments.runs)
+        results["modules"][module] = result
+        print(
+            f"{module}: {result['cumulative_us'] / 1000:.2f} ms "
+            f"({result['modules']} modules)"
+        )
+        for name, self_us in result["slowest"]:
+            print(f"    {self_us / 1000:8.2f} ms  {name}")
+        if result["forbidden_loaded"]:
+            print(f"    FORBIDDEN: {', '.join(result['forbidden_loaded'])}")
+    if arguments.json:
+        with open(arguments.json, "w") as json_fd:
+            json.dump(results, json_fd, indent=4)
+
+    failed = any(r["forbidden_loaded"] for r in results["modules"].values())
+    if arguments.baseline:
+        with open(arguments.baseline, "r") as baseline_fd:
+            baseline = json.load(baseline_fd)
+        for module, result in results["modules"].items():
+            reference = baseline["modules"].get(module)
+            if not reference:
+                continue
+            ratio = result["cumulative_us"] / max(1, reference["cumulative_us"])
+            status = "OK"
+            if ratio > 1 + arguments.threshold:
+                status = "REGRESSION"
+                failed = True
+            print(f"{module}: {ratio:.2f}x baseline [{status}]")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
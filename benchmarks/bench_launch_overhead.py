@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark of the per-call python overhead of a @task invocation
+(from the decorated function call up to the command to be launched).
+The process execution is replaced by a no-op to measure only permedcoe.
+
+Usage:
+    python3 benchmarks/bench_launch_overhead.py [-n CALLS] [--json FILE]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+
+import permedcoe.core.building_block as building_block
+from permedcoe import container
+from permedcoe import binary
+from permedcoe import task
+from permedcoe import FILE_IN
+from permedcoe import FILE_OUT
+from permedcoe import DIRECTORY_IN
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-n", "--calls", type=int, default=100000)
+    parser.add_argument("--json", type=str, help="Write the results as json")
+    arguments = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    image = os.path.join(workdir, "image.sif")
+    input_file = os.path.join(workdir, "input.txt")
+    input_dir = os.path.join(workdir, "dataset")
+    for path in (image, input_file):
+        open(path, "w").close()
+    os.mkdir(input_dir)
+
+    @container(engine="SINGULARITY", image=image)
+    @binary(binary="my_binary.sh")
+    @task(model=FILE_IN, dataset=DIRECTORY_IN, result=FILE_OUT)
+    def sample_task(
+        model=None, dataset=None, result=None, verbose="-v", mode="--mode fast"
+    ):
+        pass
+
+    commands = []
+    building_block.command_runner = lambda cmd, **kwargs: commands.append(cmd)
+    output_file = os.path.join(workdir, "result.txt")
+
+    start = time.perf_counter()
+    for _ in range(arguments.calls):
+        sample_task(model=input_file, dataset=input_dir, result=output_file)
+    elapsed = time.perf_counter() - start
+
+    results = {
+        "benchmark": "launch_overhead",
+        "calls": arguments.calls,
+        "total_s": elapsed,
+        "per_call_us": elapsed / arguments.calls * 1e6,
+        "command": commands[-1],
+    }
+    print(f"Calls: {arguments.calls}")
+    print(f"Per call overhead: {results['per_call_us']:.2f} us")
+    print(f"Command: {' '.join(commands[-1])}")
+    if arguments.json:
+        with open(arguments.json, "w") as json_fd:
+            json.dump(results, json_fd, indent=4)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the building block argument parsing (the time spent before
+the building block function is invoked and its containers are launched).
+
+A definition.json with several modes is generated, and a building block is
+invoked with:
+
+- argparse: the arguments information given as a function (the argparse
+  parser is built in every launch).
+- compiled: the definition.json path with the parser cache warm (the
+  compiled parser is read from the cache).
+- compiled_cold: the definition.json path with an empty parser cache (first
+  launch: the parser is built, compiled and cached).
+
+Two measurements are reported per variant: the time per parse within a
+single process (e.g. batch mode) and the time from the interpreter start up
+to the invocation of the building block function in a fresh interpreter.
+
+Usage:
+    python3 benchmarks/bench_parser.py [-n PARSES] [-r LAUNCHES] [--modes 3]
+                                       [--parameters 8] [--json FILE]
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SRC = os.path.abspath(os.path.join(HERE, "..", "src"))
+VARIANTS = ("argparse", "compiled", "compiled_cold")
+FORMATS = ("str", "int", "float", "file")
+
+# Launched in a fresh interpreter: prints the seconds until the invocation
+LAUNCHER = """
+import time
+start = time.perf_counter()
+import sys
+from permedcoe import invoker
+from permedcoe.utils.arguments import load_parameters_from_json
+
+def invoke(arguments, config):
+    print(time.perf_counter() - start)
+
+variant, definition = sys.argv[1], sys.argv[2]
+if variant == "argparse":
+    info = lambda: load_parameters_from_json(definition)
+else:
+    info = definition
+invoker(invoke, info, argv=sys.argv[3:])
+"""
+
+
+def write_definition(folder, modes, parameters):
+    """Generate a building block definition.
+
+    Args:
+        folder (str): Destination folder.
+        modes (int): Number of modes.
+        parameters (int): Number of parameters per mode.
+    Returns:
+        str: Definition file path.
+        list[str]: Arguments of an invocation of the first mode.
+    """
+    definition = {
+        "short_description": "Benchmark building block.",
+        "long_description": "Benchmark building block.",
+        "use_description": "short",
+        "parameters": {},
+    }
+    argv = ["mode_0"] if modes > 1 else []
+    sample = os.path.join(folder, "sample.txt")
+    open(sample, "w").close()
+    values = {"str": "value", "int": "4", "float": "0.5", "file": sample}
+    for mode in range(modes):
+        params = []
+        for index in range(parameters):
+            p_format = FORMATS[index % len(FORMATS)]
+            params.append(
+                {
+                    "type": "input" if index < parameters - 1 else "output",
+                    "name": f"param_{index}",
+                    "format": p_format,
+                    "description": f"Parameter {index}",
+                }
+            )
+            if mode == 0:
+                argv += [f"--param_{index}", values[p_format]]
+        definition["parameters"][f"mode_{mode}"] = params
+    path = os.path.join(folder, "definition.json")
+    with open(path, "w") as definition_fd:
+        json.dump(definition, definition_fd)
+    return path, argv
+
+
+def in_process(variant, path, argv, parses):
+    """Time per parse within this process.
+
+    Args:
+        variant (str): Variant (see VARIANTS).
+        path (str): Definition file.
+        argv (list[str]): Arguments to parse.
+        parses (int): Number of parses.
+    Returns:
+        float: Microseconds per parse.
+    """
+    # Imported here since the PYTHONPATH is set by main
+    from permedcoe.utils import parser_cache
+    from permedcoe.utils.arguments import load_parameters_from_json
+    from permedcoe.utils.arguments import single_bb_sysarg_parser
+
+    devnull = open(os.devnull, "w")
+    stdout, sys.stdout = sys.stdout, devnull  # the checks print the arguments
+    try:
+        start = time.perf_counter()
+        for _ in range(parses):
+            if variant == "argparse":
+                single_bb_sysarg_parser(load_parameters_from_json(path), argv)
+            else:
+                if variant == "compiled_cold":
+                    parser_cache.__COMPILED__.clear()
+                    shutil.rmtree(os.environ["PERMEDCOE_PARSER_CACHE"], True)
+                parser_cache.parse_definition_arguments(path, argv)
+        elapsed = time.perf_counter() - start
+    finally:
+        sys.stdout = stdout
+        devnull.close()
+    return elapsed / parses * 1e6
+
+
+def launch(variant, path, argv, launches):
+    """Time until the invocation in fresh interpreters.
+
+    Args:
+        variant (str): Variant (see VARIANTS).
+        path (str): Definition file.
+        argv (list[str]): Building block arguments.
+        launches (int): Number of launches.
+    Returns:
+        float: Median milliseconds until the invocation.
+    """
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        [SRC] + [p for p in [env.get("PYTHONPATH")] if p]
+    )
+    times = []
+    for _ in range(launches):
+        if variant == "compiled_cold":
+            shutil.rmtree(env["PERMEDCOE_PARSER_CACHE"], True)
+        proc = subprocess.run(
+            [sys.executable, "-c", LAUNCHER, variant, path] + argv,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            env=env,
+            check=True,
+        )
+        # The checks print the arguments before the invocation
+        times.append(float(proc.stdout.decode().strip().splitlines()[-1]) * 1e3)
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-n", "--parses", type=int, default=2000)
+    parser.add_argument("-r", "--launches", type=int, default=20)
+    parser.add_argument("--modes", type=int, default=3)
+    parser.add_argument("--parameters", type=int, default=8)
+    parser.add_argument("--json", type=str, help="Write the results as json")
+    arguments = parser.parse_args()
+
+    sys.path.insert(0, SRC)
+    workdir = tempfile.mkdtemp()
+    os.environ["PERMEDCOE_PARSER_CACHE"] = os.path.join(workdir, "cache")
+    path, argv = write_definition(workdir, arguments.modes, arguments.parameters)
+
+    results = {
+        "benchmark": "parser",
+        "modes": arguments.modes,
+        "parameters": arguments.parameters,
+        "variants": {},
+    }
+    for variant in VARIANTS:
+        parse_us = in_process(variant, path, argv, arguments.parses)
+        launch_ms = launch(variant, path, argv, arguments.launches)
+        results["variants"][variant] = {
+            "per_parse_us": parse_us,
+            "until_invocation_ms": launch_ms,
+        }
+        print(
+            f"{variant}: {parse_us:.1f} us per parse, "
+            f"{launch_ms:.2f} ms from start up to the invocation"
+        )
+    reference = results["variants"]["argparse"]
+    compiled = results["variants"]["compiled"]
+    speedup = reference["per_parse_us"] / compiled["per_parse_us"]
+    saved = reference["until_invocation_ms"] - compiled["until_invocation_ms"]
+    print(
+        f"Warm cache: {speedup:.1f}x faster per parse, "
+        f"{saved:.2f} ms less per launch"
+    )
+    shutil.rmtree(workdir, True)
+    if arguments.json:
+        with open(arguments.json, "w") as json_fd:
+            json.dump(results, json_fd, indent=4)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the building block invocation latency as launched by the
+workflow managers (one process per invocation):
+
+- execute: "permedcoe execute building_block" in a fresh interpreter.
+- client: "permedcoe-client" with a building block server (permedcoe serve)
+  running.
+
+A generated building block (with a definition.json and an invoke function
+that does nothing) is used, so that only the start up is measured.
+
+Usage:
+    python3 benchmarks/bench_server.py [-r INVOCATIONS] [-j JOBS] [--json FILE]
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SRC = os.path.abspath(os.path.join(HERE, "..", "src"))
+BB_NAME = "bench_server_BB"
+BB_FILES = {
+    "__init__.py": f"from {BB_NAME} import definitions, main\ninvoke = main.invoke\n",
+    "definitions.py": (
+        "import os\n\nASSETS_PATH = os.path.dirname(os.path.abspath(__file__))\n"
+    ),
+    "main.py": "def invoke(arguments, config):\n    pass\n",
+    "definition.json": json.dumps(
+        {
+            "short_description": "Benchmark building block.",
+            "long_description": "Benchmark building block.",
+            "use_description": "short",
+            "parameters": {
+                "default": [
+                    {
+                        "type": "input",
+                        "name": "value",
+                        "format": "str",
+                        "description": "Value",
+                    }
+                ]
+            },
+        }
+    ),
+}
+COMMANDS = {
+    "execute": [sys.executable, "-m", "permedcoe", "execute", "building_block"],
+    "client": [sys.executable, "-m", "permedcoe.client"],
+}
+
+
+def write_building_block(folder):
+    """Generate the benchmark building block.
+
+    Args:
+        folder (str): Folder where to create the building block package.
+    """
+    package = os.path.join(folder, BB_NAME)
+    os.mkdir(package)
+    for name, content in BB_FILES.items():
+        with open(os.path.join(package, name), "w") as bb_fd:
+            bb_fd.write(content)
+
+
+def run(command, env, invocations, jobs):
+    """Time the invocations of the building block.
+
+    Args:
+        command (list[str]): Command to invoke the building block.
+        env (dict): Environment.
+        invocations (int): Number of invocations.
+        jobs (int): Concurrent invocations.
+    Returns:
+        list[float]: Latency of every invocation (ms).
+        float: Invocations per second.
+    """
+    argv = command + [BB_NAME, "--value", "1"]
+    latencies = []
+    running = []
+    start = time.perf_counter()
+    for _ in range(invocations):
+        if len(running) == jobs:
+            launched, process = running.pop(0)
+            if process.wait() != 0:
+                raise RuntimeError(f"Invocation failed: {' '.join(argv)}")
+            latencies.append((time.perf_counter() - launched) * 1e3)
+        process = subprocess.Popen(argv, env=env, stdout=subprocess.DEVNULL)
+        running.append((time.perf_counter(), process))
+    for launched, process in running:
+        if process.wait() != 0:
+            raise RuntimeError(f"Invocation failed: {' '.join(argv)}")
+        latencies.append((time.perf_counter() - launched) * 1e3)
+    return latencies, invocations / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-r", "--invocations", type=int, default=50)
+    parser.add_argument("-j", "--jobs", type=int, default=1)
+    parser.add_argument("--json", type=str, help="Write the results as json")
+    arguments = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    write_building_block(workdir)
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        [SRC, workdir] + [p for p in [env.get("PYTHONPATH")] if p]
+    )
+    env["PERMEDCOE_SERVER"] = os.path.join(workdir, "server.sock")
+    env["PERMEDCOE_PARSER_CACHE"] = os.path.join(workdir, "cache")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "permedcoe", "serve", BB_NAME]
+        + ["--jobs", str(arguments.jobs)],
+        env=env,
+    )
+    results = {
+        "benchmark": "server",
+        "invocations": arguments.invocations,
+        "jobs": arguments.jobs,
+        "variants": {},
+    }
+    try:
+        while not os.path.exists(env["PERMEDCOE_SERVER"]):
+            if server.poll() is not None:
+                raise RuntimeError("The building block server did not start")
+            time.sleep(0.05)
+        for variant, command in COMMANDS.items():
+            latencies, throughput = run(
+                command, env, arguments.invocations, arguments.jobs
+            )
+            results["variants"][variant] = {
+                "median_ms": statistics.median(latencies),
+                "max_ms": max(latencies),
+                "invocations_per_s": throughput,
+            }
+            print(
+                f"{variant}: {statistics.median(latencies):.1f} ms median latency, "
+                f"{throughput:.1f} invocations/s"
+            )
+    finally:
+        server.terminate()
+        server.wait()
+        shutil.rmtree(workdir, True)
+    execute = results["variants"]["execute"]["median_ms"]
+    client = results["variants"]["client"]["median_ms"]
+    print(f"The server saves {execute - client:.1f} ms per invocation")
+    if arguments.json:
+        with open(arguments.json, "w") as json_fd:
+            json.dump(results, json_fd, indent=4)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -25,7 +25,6 @@ setup(
         "Operating System :: MacOS",
         "Topic :: Scientific/Engineering :: Bio-Informatics",
         "Programming Language :: Python :: 3",
-        "Programming Language :: Python :: 3.6",
         "Programming Language :: Python :: 3.7",
         "Programming Language :: Python :: 3.8",
         "Programming Language :: Python :: 3.9",
@@ -38,10 +37,10 @@ setup(
     keywords="PerMedCoE",
     package_dir={"": "src"},
     packages=find_packages(where="src"),
-    python_requires=">=3.6, <4",
+    python_requires=">=3.7, <4",
     install_requires=["pyyaml"],
     extras_require={
-        "dev": ["check-manifest"],
+        "dev": ["check-manifest", "pytest"],
     },
     # If there are data files included in your packages that need to be
     # installed, specify them here.
@@ -61,6 +60,7 @@ setup(
     entry_points={
         "console_scripts": [
             "permedcoe=permedcoe.__main__:main",
+            "permedcoe-client=permedcoe.client:main",
         ],
     },
     project_urls={
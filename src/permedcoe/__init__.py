@@ -2,59 +2,116 @@
 # ####### PUBLIC API ####### #
 # ########################## #
 
-# Decorator selector
-try:
-    # Running with PyCOMPSs will take these imports
-    from pycompss.api.container import container
-    from pycompss.api.constraint import constraint
-    from pycompss.api.binary import binary
-    from pycompss.api.task import task
-    from pycompss.api.mpi import mpi
-    from pycompss.api.julia import julia
-    from pycompss.api.parameter import FILE_IN
-    from pycompss.api.parameter import FILE_OUT
-    from pycompss.api.parameter import FILE_INOUT
-    from pycompss.api.parameter import DIRECTORY_IN
-    from pycompss.api.parameter import DIRECTORY_OUT
-    from pycompss.api.parameter import DIRECTORY_INOUT
-    from pycompss.api.parameter import Type
-    from pycompss.api.parameter import StdIOStream
-    from pycompss.api.parameter import STDIN
-    from pycompss.api.parameter import STDOUT
-    from pycompss.api.parameter import STDERR
-
-    TMPDIR = "pycompss_sandbox"
-    from pycompss.util.context import CONTEXT as __CONTEXT__
-
-    if not __CONTEXT__.in_pycompss():
-        # Not running within PyCOMPSs context
-        raise ImportError
-except ImportError:
-    # Without PyCOMPSs it will take the core
-    from permedcoe.core.decorators import container
-    from permedcoe.core.decorators import constraint
-    from permedcoe.core.decorators import binary
-    from permedcoe.core.decorators import julia
-    from permedcoe.core.decorators import task
-    from permedcoe.core.decorators import mpi
-    from permedcoe.core.decorators import FILE_IN
-    from permedcoe.core.decorators import FILE_OUT
-    from permedcoe.core.decorators import FILE_INOUT
-    from permedcoe.core.decorators import DIRECTORY_IN
-    from permedcoe.core.decorators import DIRECTORY_OUT
-    from permedcoe.core.decorators import DIRECTORY_INOUT
-    from permedcoe.core.decorators import Type
-    from permedcoe.core.decorators import StdIOStream
-    from permedcoe.core.decorators import STDIN
-    from permedcoe.core.decorators import STDOUT
-    from permedcoe.core.decorators import STDERR
-
-    TMPDIR = "None"
-
-# Public functions
-from permedcoe.base import get_environment
-from permedcoe.base import set_debug
-from permedcoe.base import invoker
-
-# Arguments definition - explicit arguments
-from permedcoe.utils.user_arguments import Arguments
+# The public API is loaded lazily (on first use), so that importing permedcoe
+# does not pay for the decorator backend selection (PyCOMPSs or core) nor
+# for the modules that are not used (e.g. argparse and yaml).
+
+# Decorator selector (names provided by PyCOMPSs or by the core)
+__BACKEND_NAMES__ = (
+    "container",
+    "constraint",
+    "binary",
+    "task",
+    "mpi",
+    "julia",
+    "FILE_IN",
+    "FILE_OUT",
+    "FILE_INOUT",
+    "DIRECTORY_IN",
+    "DIRECTORY_OUT",
+    "DIRECTORY_INOUT",
+    "Type",
+    "StdIOStream",
+    "STDIN",
+    "STDOUT",
+    "STDERR",
+    "compss_wait_on",
+    "compss_wait_on_file",
+    "compss_wait_on_directory",
+    "compss_barrier",
+    "TMPDIR",
+)
+
+# Public functions and classes (name: module)
+__LAZY_NAMES__ = {
+    "get_environment": "permedcoe.base",
+    "set_debug": "permedcoe.base",
+    "invoker": "permedcoe.base",
+    "batch_invoker": "permedcoe.base",
+    "pipeline": "permedcoe.core.pipeline",
+    "batching": "permedcoe.core.batch",
+    # Arguments definition - explicit arguments
+    "Arguments": "permedcoe.utils.user_arguments",
+    # Task failures (exit code and stderr tail)
+    "TaskExecutionException": "permedcoe.utils.exceptions",
+}
+
+__all__ = list(__BACKEND_NAMES__) + list(__LAZY_NAMES__)
+
+
+def __load_backend__():
+    """Resolve the decorator backend: PyCOMPSs if running within its
+    context, the core otherwise.
+
+    Returns:
+        dict: Backend names and their objects.
+    """
+    try:
+        # Running with PyCOMPSs will take these imports
+        from pycompss.util.context import CONTEXT
+
+        if not CONTEXT.in_pycompss():
+            # Not running within PyCOMPSs context
+            raise ImportError
+        import pycompss.api.container as __container__
+        import pycompss.api.constraint as __constraint__
+        import pycompss.api.binary as __binary__
+        import pycompss.api.task as __task__
+        import pycompss.api.mpi as __mpi__
+        import pycompss.api.julia as __julia__
+        import pycompss.api.parameter as __parameters__
+        import pycompss.api.api as __sync__
+
+        modules = (__container__, __constraint__, __binary__, __task__)
+        modules += (__mpi__, __julia__, __parameters__, __sync__)
+        tmpdir = "pycompss_sandbox"
+    except ImportError:
+        # Without PyCOMPSs it will take the core
+        import permedcoe.core.decorators as __decorators__
+        import permedcoe.core.runtime as __runtime__
+
+        modules = (__decorators__, __runtime__)
+        tmpdir = "None"
+    backend = {"TMPDIR": tmpdir}
+    for name in __BACKEND_NAMES__[:-1]:
+        for module in modules:
+            if hasattr(module, name):
+                backend[name] = getattr(module, name)
+                break
+    return backend
+
+
+def __getattr__(name):
+    """Load the requested public name on first use (PEP 562).
+
+    Args:
+        name (str): Attribute name.
+    Returns:
+        The requested object.
+    Raises:
+        AttributeError: If the name is not part of the public API.
+    """
+    if name in __BACKEND_NAMES__:
+        globals().update(__load_backend__())
+    elif name in __LAZY_NAMES__:
+        import importlib
+
+        globals()[name] = getattr(importlib.import_module(__LAZY_NAMES__[name]), name)
+    if name not in globals():
+        # Not public or not provided by the backend (e.g. an old PyCOMPSs)
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return globals()[name]
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
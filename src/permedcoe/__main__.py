@@ -1,5 +1,8 @@
 #!/usr/bin/python3
 
+import sys
+
+from permedcoe.utils.exceptions import TaskExecutionException
 from permedcoe.utils.arguments import parse_sys_argv as __parse_sys_argv__
 from permedcoe.core.functions import (
     execute_building_block as __execute_building_block__,
@@ -8,6 +11,11 @@ from permedcoe.core.functions import execute_application as __execute_applicatio
 from permedcoe.core.functions import create_template as __create_template__
 from permedcoe.core.functions import deploy_bb as __deploy_bb__
 from permedcoe.core.functions import deploy_workflow as __deploy_workflow__
+from permedcoe.core.functions import stage_images as __stage_images__
+from permedcoe.core.functions import serve as __serve__
+from permedcoe.core.functions import submit_bb as __submit_bb__
+from permedcoe.core.functions import submission_status as __submission_status__
+from permedcoe.core.functions import collect_submission as __collect_submission__
 
 
 def main():
@@ -26,18 +34,52 @@ def main():
         if arguments.execute in ["application", "app"]:
             if debug:
                 print("Executing Application")
-            __execute_application__(arguments)
+            try:
+                __execute_application__(arguments)
+            except TaskExecutionException as error:
+                # Exit with the status of the application
+                sys.exit(error.exit_status())
     if arguments.action in ["submit", "s"]:
-        if debug:
-            print("Submit Application")
-        raise NotImplementedError
+        if arguments.submit in ["building_block", "bb"]:
+            if debug:
+                print("Submitting Building Block")
+            __submit_bb__(
+                arguments.debug,
+                arguments.log_level,
+                arguments.name,
+                arguments.batch,
+                arguments.parameters,
+                arguments.pack,
+                arguments.jobs,
+                arguments.throttle,
+                arguments.workdir,
+                arguments.sbatch,
+                arguments.dry_run,
+            )
+        elif arguments.submit == "status":
+            if debug:
+                print("Checking submission status")
+            __submission_status__(
+                arguments.debug, arguments.log_level, arguments.workdir
+            )
+        else:
+            if debug:
+                print("Collecting submission results")
+            __collect_submission__(
+                arguments.debug,
+                arguments.log_level,
+                arguments.workdir,
+                arguments.summary,
+            )
     if arguments.action in ["template", "t"]:
         if arguments.template in ["building_block", "bb"]:
             app_type = None
+            from_app = None
             if debug:
                 print("Creating building block template")
         else:
             app_type = arguments.type
+            from_app = arguments.from_app
             if debug:
                 print("Creating application template")
         __create_template__(
@@ -46,16 +88,48 @@ def main():
             arguments.template,
             arguments.name,
             app_type,
+            from_app,
         )
     if arguments.action in ["deploy", "d"]:
         if arguments.deploy in ["building_block", "bb"]:
             if debug:
                 print("Deploying Building Block")
-            __deploy_bb__(arguments.debug, arguments.log_level, arguments.name)
+            __deploy_bb__(
+                arguments.debug, arguments.log_level, arguments.name, arguments.jobs
+            )
         else:
             if debug:
                 print("Deploying Workflow")
-            __deploy_workflow__(arguments.debug, arguments.log_level, arguments.name)
+            __deploy_workflow__(
+                arguments.debug,
+                arguments.log_level,
+                arguments.name,
+                arguments.jobs,
+                arguments.checksum,
+            )
+    if arguments.action in ["images", "i"]:
+        if arguments.images == "stage":
+            if debug:
+                print("Staging container images")
+            __stage_images__(
+                arguments.debug,
+                arguments.log_level,
+                arguments.names,
+                arguments.cache,
+                arguments.digest,
+                arguments.warm,
+            )
+    if arguments.action == "serve":
+        if debug:
+            print("Serving Building Blocks")
+        __serve__(
+            arguments.debug,
+            arguments.log_level,
+            arguments.names,
+            arguments.socket,
+            arguments.jobs,
+            arguments.idle_timeout,
+        )
 
 
 if __name__ == "__main__":
@@ -1,11 +1,25 @@
 import os
+import sys as __sys__
+import time as __time__
 
 from permedcoe.utils.arguments import single_bb_sysarg_parser as __bb_parser__
+from permedcoe.utils.arguments import build_bb_parser as __bb_parser_builder__
+from permedcoe.utils.arguments import parse_bb_arguments as __bb_parse_arguments__
 from permedcoe.utils.arguments import load_parameters_from_json as __bb_param_loader__
+from permedcoe.utils.parser_cache import (
+    get_compiled_definition as __bb_compiled_definition__,
+)
+from permedcoe.utils.batch import row_to_argv as __row_to_argv__
 from permedcoe.utils.preproc import preprocessing as __preprocessing__
 from permedcoe.utils.log import init_logging as __init_logging__
 from permedcoe.utils.environ import get_environment as __get_environment__
 from permedcoe.utils.exceptions import PerMedCoEException as __PerMedCoEException__
+from permedcoe.utils.exceptions import (
+    TaskExecutionException as __TaskExecutionException__,
+)
+from permedcoe.core.trace import enable_trace as __enable_trace__
+from permedcoe.core.trace import trace_record as __trace_record__
+from permedcoe.core.trace import trace_span as __trace_span__
 import permedcoe.core.environment as __cmd_flags__
 from permedcoe.core.constants import BB_ASSETS_PATH
 
@@ -31,7 +45,7 @@ def set_debug(level=False):
 
 
 def invoker(
-    function, arguments_info=None, require_tmpdir=False, assets_path=None
+    function, arguments_info=None, require_tmpdir=False, assets_path=None, argv=None
 ) -> None:
     """Parse the input parameters (from sys.argv) and then invoke the
     given BB function.
@@ -42,9 +56,190 @@ def invoker(
                                              Can be json with parameters.
         require_tmpdir (boolean): If the --tmpdir is required.
         assets_path (string): Path where the assets are. If None, it will try to find it.
+        argv (list[str]): Parameters to parse instead of sys.argv.
     Returns:
         None
     """
+    start = __time__.time_ns()
+    if isinstance(arguments_info, str):
+        # Compiled (and cached) parser of the definition file
+        compiled = __bb_compiled_definition__(arguments_info)
+        bb_arguments = compiled.arguments()
+        old_school_args = False
+        arguments = compiled.parse_arguments(argv)
+    else:
+        bb_arguments, old_school_args = __load_bb_arguments__(arguments_info)
+        arguments = __bb_parser__(bb_arguments, argv)
+    if getattr(arguments, "trace", None):
+        __enable_trace__(arguments.trace)
+    # The tracer is only known after parsing
+    __trace_record__("parse_arguments", start, __time__.time_ns())
+    if arguments.debug:
+        print(f"Building Block arguments:\n{bb_arguments}")
+    try:
+        __invoke__(function, arguments, old_school_args, require_tmpdir, assets_path)
+    except __TaskExecutionException__ as error:
+        # Exit with the status of the failed execution
+        print(f"ERROR: {error}", file=__sys__.stderr, flush=True)
+        __sys__.exit(error.exit_status())
+
+
+def batch_invoker(
+    function,
+    rows,
+    arguments_info=None,
+    require_tmpdir=False,
+    assets_path=None,
+    shared_argv=None,
+    jobs=1,
+) -> list:
+    """Invoke the given BB function once per row.
+
+    The BB definition and argument parser are built (or compiled) only once.
+    All rows are parsed and checked before running the valid ones on a pool of
+    jobs processes. A failed row does not abort the rest.
+
+    Args:
+        function (function): Building block function to invoke.
+        rows (list[dict]): Parameters (name: value) of each invocation.
+        arguments_info (function or string): Building block arguments information.
+                                             Can be json with parameters.
+        require_tmpdir (boolean): If the --tmpdir is required.
+        assets_path (string): Path where the assets are. If None, it will try to find it.
+        shared_argv (list[str]): Parameters common to all rows.
+        jobs (int): Maximum number of concurrent invocations.
+    Returns:
+        list[dict]: Status and timing of each row.
+    """
+    compiled = None
+    if isinstance(arguments_info, str):
+        # Compiled (and cached) parser of the definition file
+        compiled = __bb_compiled_definition__(arguments_info)
+        bb_arguments, old_school_args = compiled.arguments(), False
+    else:
+        bb_arguments, old_school_args = __load_bb_arguments__(arguments_info)
+        parser = __bb_parser_builder__(bb_arguments)
+    results = []
+    pending = []
+    for index, row in enumerate(rows):
+        result = {"row": index, "status": "invalid", "exit_code": None, "time": 0.0}
+        argv = __row_to_argv__(row, bb_arguments, shared_argv)
+        result["argv"] = argv
+        try:
+            if compiled:
+                arguments = compiled.parse_arguments(argv)
+            else:
+                arguments = __bb_parse_arguments__(parser, bb_arguments, argv)
+        except SystemExit as exit_status:
+            result["exit_code"] = __exit_code__(exit_status.code)
+            result["error"] = "Wrong arguments"
+        except __PerMedCoEException__ as exception:
+            result["exit_code"] = 1
+            result["error"] = str(exception)
+        else:
+            pending.append((result, arguments))
+        results.append(result)
+    invocations = [
+        (function, arguments, old_school_args, require_tmpdir, assets_path)
+        for _, arguments in pending
+    ]
+    if jobs > 1 and len(invocations) > 1:
+        outcomes = __invoke_rows_pool__(invocations, jobs)
+    else:
+        outcomes = [__invoke_row__(invocation) for invocation in invocations]
+    for (result, _), outcome in zip(pending, outcomes):
+        result.update(outcome)
+    return results
+
+
+def __invoke_rows_pool__(invocations, jobs):
+    """Invoke the batch rows on a pool of processes.
+
+    The outcome of every row is recorded even if a row raises or crashes its
+    worker process (which breaks the pool). Only jobs rows are handed to the
+    pool at once, so the rows in flight when the pool breaks are known: they
+    are failed (never run again, since they may have had side effects) and
+    the rest of the rows continue on a new pool.
+
+    Args:
+        invocations (list[tuple]): __invoke__ parameters of every row.
+        jobs (int): Maximum number of concurrent invocations.
+    Returns:
+        list[dict]: Outcome of every row (see __invoke_row__).
+    """
+    # Imported here since it loads multiprocessing
+    from concurrent.futures import FIRST_COMPLETED as __FIRST_COMPLETED__
+    from concurrent.futures import wait as __wait__
+    from concurrent.futures import ProcessPoolExecutor as __ProcessPoolExecutor__
+    from concurrent.futures.process import BrokenProcessPool as __BrokenPool__
+
+    outcomes = [None] * len(invocations)
+    next_row = 0
+    while next_row < len(invocations):
+        running = {}
+        broken = False
+        with __ProcessPoolExecutor__(max_workers=jobs) as pool:
+            while not broken and (running or next_row < len(invocations)):
+                try:
+                    while next_row < len(invocations) and len(running) < jobs:
+                        future = pool.submit(__invoke_row__, invocations[next_row])
+                        running[future] = next_row
+                        next_row += 1
+                except __BrokenPool__:
+                    broken = True
+                    break
+                done, _ = __wait__(running, return_when=__FIRST_COMPLETED__)
+                for future in done:
+                    index = running.pop(future)
+                    try:
+                        outcomes[index] = future.result()
+                    except __BrokenPool__:
+                        outcomes[index] = __failed_row__("Worker process crashed")
+                        broken = True
+                    except Exception as exception:  # noqa: report any failure per row
+                        outcomes[index] = __failed_row__(str(exception))
+        for index in running.values():
+            # In flight when the pool broke
+            outcomes[index] = __failed_row__("Worker process crashed")
+    return outcomes
+
+
+def __failed_row__(error):
+    """Outcome of a row that could not be invoked.
+
+    Args:
+        error (str): Failure description.
+    Returns:
+        dict: Row status, exit code and elapsed time.
+    """
+    return {"status": "failed", "exit_code": 1, "error": error, "time": 0.0}
+
+
+def __exit_code__(code):
+    """Exit status of a SystemExit code (as the interpreter does: None is
+    success and any other non-integer, such as a message, is 1).
+
+    Args:
+        code: SystemExit code.
+    Returns:
+        int: Exit status.
+    """
+    if code is None:
+        return 0
+    if isinstance(code, int):
+        return code
+    return 1
+
+
+def __load_bb_arguments__(arguments_info):
+    """Load the building block arguments information.
+
+    Args:
+        arguments_info (function or string): Building block arguments information.
+    Returns:
+        Arguments: The building block arguments (None if old-school).
+        boolean: If the building block uses old-school inputs and outputs.
+    """
     if arguments_info:
         # Grab the BB arguments info to tune the argument parser
         if isinstance(arguments_info, str):
@@ -58,9 +253,53 @@ def invoker(
         # If set to none, use old-school inputs and outputs parameters
         bb_arguments = None
         old_school_args = True
-    arguments = __bb_parser__(bb_arguments)
-    if arguments.debug:
-        print(f"Building Block arguments:\n{bb_arguments}")
+    return bb_arguments, old_school_args
+
+
+def __invoke_row__(invocation):
+    """Invoke a single batch row keeping the environment isolated.
+
+    Args:
+        invocation (tuple): __invoke__ parameters.
+    Returns:
+        dict: Row status, exit code and elapsed time.
+    """
+    outcome = {"status": "success", "exit_code": 0}
+    environment = dict(os.environ)
+    start = __time__.time()
+    try:
+        __invoke__(*invocation)
+    except SystemExit as exit_status:
+        if exit_status.code:
+            outcome["status"] = "failed"
+            outcome["exit_code"] = __exit_code__(exit_status.code)
+            if isinstance(exit_status.code, str):
+                outcome["error"] = exit_status.code
+    except __TaskExecutionException__ as exception:
+        outcome["status"] = "failed"
+        outcome["exit_code"] = exception.exit_status()
+        outcome["error"] = str(exception)
+    except Exception as exception:  # noqa: report any failure per row
+        outcome["status"] = "failed"
+        outcome["exit_code"] = 1
+        outcome["error"] = str(exception)
+    finally:
+        os.environ.clear()
+        os.environ.update(environment)
+    outcome["time"] = __time__.time() - start
+    return outcome
+
+
+def __invoke__(function, arguments, old_school_args, require_tmpdir, assets_path):
+    """Invoke the given BB function with already parsed arguments.
+
+    Args:
+        function (function): Building block function to invoke.
+        arguments (Namespace): Parsed building block arguments.
+        old_school_args (boolean): Use old-school inputs and outputs.
+        require_tmpdir (boolean): If the --tmpdir is required.
+        assets_path (string): Path where the assets are.
+    """
     if require_tmpdir:
         if not hasattr(arguments, "tmpdir"):
             raise __PerMedCoEException__("ERROR: --tmpdir flag must be defined")
@@ -70,21 +309,26 @@ def invoker(
             raise __PerMedCoEException__(
                 "ERROR: --tmpdir flag is required and directory must exist"
             )
+    if getattr(arguments, "trace", None):
+        __enable_trace__(arguments.trace)
     # Set execution related conditions
     __cmd_flags__.DEBUG = arguments.debug
     __cmd_flags__.DISABLE_CONTAINER = arguments.disable_container
+    __cmd_flags__.REUSE_INSTANCES = arguments.reuse_instances
     set_debug(arguments.debug)
     # Export assets path if provided
     if isinstance(assets_path, str):
         os.environ[BB_ASSETS_PATH] = assets_path
     # Preprocess
-    cfg = __preprocessing__(arguments)
-    if old_school_args:
-        # Grab input and output
-        in_path = arguments.input
-        out_path = arguments.output
-        # Building block invocation
-        function(in_path, out_path, cfg)
-    else:
-        # Building block invocation
-        function(arguments, cfg)
+    with __trace_span__("preprocessing"):
+        cfg = __preprocessing__(arguments)
+    with __trace_span__(f"bb:{getattr(function, '__name__', 'invoke')}"):
+        if old_school_args:
+            # Grab input and output
+            in_path = arguments.input
+            out_path = arguments.output
+            # Building block invocation
+            function(in_path, out_path, cfg)
+        else:
+            # Building block invocation
+            function(arguments, cfg)
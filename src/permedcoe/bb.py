@@ -25,9 +25,6 @@ def get_container_path():
     )
 
 
-CONTAINER_PATH = get_container_path()
-
-
 def get_computing_units():
     """Retrieve the computing units required for the tasks.
 
@@ -40,4 +37,17 @@ def get_computing_units():
     return 1
 
 
-COMPUTING_UNITS = get_computing_units()
+# Values resolved on first use (PEP 562), so that importing this module does
+# not require PERMEDCOE_IMAGES nor access the filesystem
+__LAZY_VALUES__ = {
+    "CONTAINER_PATH": get_container_path,
+    "COMPUTING_UNITS": get_computing_units,
+}
+
+
+def __getattr__(name):
+    if name in __LAZY_VALUES__:
+        value = __LAZY_VALUES__[name]()
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
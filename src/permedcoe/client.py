@@ -0,0 +1,219 @@
+"""
+This file provides the thin client of the building block server
+(permedcoe serve): it stands in for "permedcoe execute building_block" and
+sends the invocation (arguments, working directory and environment) to the
+server through its Unix socket, forwarding back the output and the exit code.
+
+If there is no server listening, the building block is executed in this
+process (as "permedcoe execute building_block" would do).
+
+The messages are frames with a header (channel and payload size) followed
+by the payload:
+
+- REQUEST (client to server): json with argv, cwd and env.
+- STDOUT and STDERR (server to client): output of the execution.
+- EXIT (server to client): exit code of the execution (last frame).
+
+This module only imports the standard modules required by the client, so
+that it starts as fast as possible.
+"""
+
+import os
+import sys
+import json
+import socket
+import struct
+
+from permedcoe.core.constants import PERMEDCOE_SERVER
+
+HEADER = struct.Struct("!BI")  # channel, payload size
+REQUEST = 0
+STDOUT = 1
+STDERR = 2
+EXIT = 3
+EXECUTE_BB = ["execute", "building_block"]
+USAGE = """usage: permedcoe-client name [parameters ...]
+
+Execute a building block through the building block server (permedcoe serve)
+listening on PERMEDCOE_SERVER (or the default socket). It is executed in this
+process if there is no server listening.
+
+positional arguments:
+  name        Building Block to execute
+  parameters  Building Block parameters
+"""
+
+
+def default_socket():
+    """Default server socket (PERMEDCOE_SERVER or a per user socket in the
+    temporary folder).
+
+    Returns:
+        str: Socket path.
+    """
+    path = os.environ.get(PERMEDCOE_SERVER)
+    if not path:
+        folder = os.environ.get("TMPDIR") or "/tmp"
+        path = os.path.join(folder, f"permedcoe-{os.getuid()}.sock")
+    return path
+
+
+def encode_frame(channel, payload):
+    """Encode a frame.
+
+    Args:
+        channel (int): Frame channel (REQUEST, STDOUT, STDERR or EXIT).
+        payload (bytes): Frame payload.
+    Returns:
+        bytes: Frame header and payload.
+    """
+    return HEADER.pack(channel, len(payload)) + payload
+
+
+def send_frame(connection, channel, payload):
+    """Send a frame.
+
+    Args:
+        connection (socket): Connected socket.
+        channel (int): Frame channel (REQUEST, STDOUT, STDERR or EXIT).
+        payload (bytes): Frame payload.
+    """
+    connection.sendall(encode_frame(channel, payload))
+
+
+def decode_frame(buffer):
+    """Decode the first frame of the given buffer.
+
+    Args:
+        buffer (bytes): Received data.
+    Returns:
+        tuple: Channel, payload and remaining data (None if the buffer does
+               not contain a whole frame).
+    """
+    if len(buffer) < HEADER.size:
+        return None
+    channel, size = HEADER.unpack_from(buffer)
+    end = HEADER.size + size
+    if len(buffer) < end:
+        return None
+    return channel, buffer[HEADER.size : end], buffer[end:]
+
+
+def receive_frame(connection):
+    """Receive a frame.
+
+    Args:
+        connection (socket): Connected socket.
+    Returns:
+        tuple: Channel and payload (None if the connection is closed).
+    """
+    header = __receive__(connection, HEADER.size)
+    if header is None:
+        return None
+    channel, size = HEADER.unpack(header)
+    payload = __receive__(connection, size)
+    if payload is None:
+        return None
+    return channel, payload
+
+
+def __receive__(connection, size):
+    """Receive exactly the given amount of bytes.
+
+    Args:
+        connection (socket): Connected socket.
+        size (int): Bytes to receive.
+    Returns:
+        bytes: Received data (None if the connection is closed before).
+    """
+    data = b""
+    while len(data) < size:
+        chunk = connection.recv(size - len(data))
+        if not chunk:
+            return None
+        data += chunk
+    return data
+
+
+def connect(socket_path=None):
+    """Connect to the server.
+
+    Args:
+        socket_path (str, optional): Server socket (default_socket if not
+                                     given).
+    Returns:
+        socket: Connected socket (None if there is no server listening).
+    """
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        connection.connect(socket_path or default_socket())
+    except OSError:
+        connection.close()
+        return None
+    return connection
+
+
+def execute(connection, argv, cwd=None, env=None, stdout=None, stderr=None):
+    """Execute a building block in the server (closing the connection).
+
+    Args:
+        connection (socket): Socket connected to the server (see connect).
+        argv (list[str]): Building block name and parameters.
+        cwd (str, optional): Working directory (the current one if not given).
+        env (dict, optional): Environment (the current one if not given).
+        stdout (file, optional): Binary stream where to write the output
+                                 (sys.stdout if not given).
+        stderr (file, optional): Binary stream where to write the error
+                                 output (sys.stderr if not given).
+    Returns:
+        int: Exit code of the execution.
+    """
+    stdout = stdout or sys.stdout.buffer
+    stderr = stderr or sys.stderr.buffer
+    request = {
+        "argv": EXECUTE_BB + list(argv),
+        "cwd": cwd or os.getcwd(),
+        "env": dict(os.environ) if env is None else env,
+    }
+    with connection:
+        try:
+            send_frame(connection, REQUEST, json.dumps(request).encode())
+            streams = {STDOUT: stdout, STDERR: stderr}
+            while True:
+                frame = receive_frame(connection)
+                if frame is None:
+                    break
+                channel, payload = frame
+                if channel == EXIT:
+                    return int(payload)
+                if channel in streams:
+                    streams[channel].write(payload)
+                    streams[channel].flush()
+        except OSError:
+            pass
+    stderr.write(b"ERROR: The building block server closed the connection\n")
+    stderr.flush()
+    return 1
+
+
+def main():
+    """
+    Main entry point for the "permedcoe-client" executable.
+    """
+    argv = sys.argv[1:]
+    if not argv or argv[0] in ("-h", "--help"):
+        print(USAGE, end="")
+        sys.exit(0 if argv else 1)
+    connection = connect()
+    if connection is None:
+        # No server listening: execute it in this process
+        from permedcoe.__main__ import main as __permedcoe_main__
+
+        sys.argv = [sys.argv[0]] + EXECUTE_BB + argv
+        __permedcoe_main__()
+        sys.exit(0)
+    sys.exit(execute(connection, argv))
+
+
+if __name__ == "__main__":
+    main()
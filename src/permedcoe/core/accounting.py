@@ -0,0 +1,236 @@
+"""
+This file provides the resource accounting of the tasks. It is enabled with
+the PERMEDCOE_USAGE_REPORT environment variable (report file path), and
+keeps a record per task with the resource usage of its process tree (wall
+time, user and system CPU time, max RSS, block I/O and context switches).
+
+At exit, every process merges its records into the report, which contains
+the aggregate per building block (CPU-hours, peak memory, cores used...) to
+size the computing_units and memory requests:
+
+- FILE.json: {"tasks": [records], "building_blocks": {name: aggregate}}
+- FILE.csv: one aggregate row per building block.
+"""
+
+import os
+import csv
+import json
+import fcntl
+import logging
+import operator
+import threading
+
+from permedcoe.core.constants import PERMEDCOE_USAGE_REPORT
+from permedcoe.utils.process_exit import register_process_exit
+
+# Aggregate fields per building block and how they are combined
+AGGREGATES = {
+    "tasks": operator.add,
+    "failed": operator.add,
+    "wall_seconds": operator.add,
+    "cpu_seconds": operator.add,
+    "cpu_hours": operator.add,
+    "peak_rss_mb": max,
+    "max_cores_used": max,
+    "max_computing_units": max,
+    "read_blocks": operator.add,
+    "written_blocks": operator.add,
+    "voluntary_switches": operator.add,
+    "involuntary_switches": operator.add,
+}
+CSV_EXTENSION = ".csv"
+
+__REPORTS__ = {}
+__REPORTS_LOCK__ = threading.Lock()
+
+
+class UsageReport(object):
+    """Resource usage records of the tasks (written at exit)."""
+
+    def __init__(self, path):
+        """Constructor
+
+        Args:
+            path (str): Report file (.json or .csv).
+        """
+        self.path = path
+        self.lock = threading.Lock()
+        self.records = []
+        self.pid = None
+
+    def add(self, record):
+        """Add a task record.
+
+        Args:
+            record (dict): Task record (see task_record).
+        """
+        with self.lock:
+            if register_process_exit(self, self.flush):
+                # First record in this process (records are not inherited)
+                self.records = []
+            self.records.append(record)
+
+    def flush(self):
+        """Merge the records into the report file."""
+        with self.lock:
+            if self.pid != os.getpid() or not self.records:
+                return
+            records, self.records = self.records, []
+        folder = os.path.dirname(self.path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        with open(self.path, "a+") as report_fd:
+            # Other processes may be flushing into the same file
+            fcntl.flock(report_fd, fcntl.LOCK_EX)
+            report_fd.seek(0)
+            content = report_fd.read()
+            report_fd.seek(0)
+            report_fd.truncate()
+            if self.path.lower().endswith(CSV_EXTENSION):
+                self.__write_csv__(report_fd, content, records)
+            else:
+                self.__write_json__(report_fd, content, records)
+
+    def __write_json__(self, report_fd, content, records):
+        """Write the records and aggregates as json.
+
+        Args:
+            report_fd (file): Report file.
+            content (str): Previous report content.
+            records (list[dict]): New task records.
+        """
+        tasks = json.loads(content)["tasks"] if content.strip() else []
+        tasks += records
+        report = {"tasks": tasks, "building_blocks": aggregate(tasks)}
+        json.dump(report, report_fd, indent=4)
+
+    def __write_csv__(self, report_fd, content, records):
+        """Write the aggregates as csv (one row per building block).
+
+        Args:
+            report_fd (file): Report file.
+            content (str): Previous report content.
+            records (list[dict]): New task records.
+        """
+        totals = aggregate(records)
+        for row in csv.DictReader(content.splitlines()):
+            name = row.pop("building_block")
+            previous = {
+                key: int(value) if value.isdigit() else float(value)
+                for key, value in row.items()
+            }
+            totals[name] = __combine__(totals.get(name), previous)
+        writer = csv.DictWriter(report_fd, ["building_block"] + list(AGGREGATES))
+        writer.writeheader()
+        for name, values in sorted(totals.items()):
+            writer.writerow(dict(values, building_block=name))
+
+
+def task_record(task, building_block, usage, computing_units=1):
+    """Build the record of a task execution.
+
+    Args:
+        task (str): Task name.
+        building_block (str): Building block name.
+        usage (dict): Resource usage of the process tree (see wait_usage).
+        computing_units (int): Requested computing units.
+    Returns:
+        dict: Task record.
+    """
+    record = {
+        "task": task,
+        "building_block": building_block,
+        "pid": os.getpid(),
+        "computing_units": computing_units,
+    }
+    record.update(usage)
+    return record
+
+
+def aggregate(records):
+    """Aggregate the task records per building block.
+
+    Args:
+        records (list[dict]): Task records.
+    Returns:
+        dict: Aggregate (see AGGREGATES) per building block name.
+    """
+    totals = {}
+    for record in records:
+        name = record["building_block"]
+        cpu = record["utime"] + record["stime"]
+        wall = record["wall"] or 0.0
+        values = {
+            "tasks": 1,
+            "failed": 1 if record["exit_code"] else 0,
+            "wall_seconds": wall,
+            "cpu_seconds": cpu,
+            "cpu_hours": cpu / 3600,
+            "peak_rss_mb": record["maxrss"] / 1024,  # maxrss is in KB
+            "max_cores_used": cpu / wall if wall > 0 else 0.0,
+            "max_computing_units": record["computing_units"],
+            "read_blocks": record["inblock"],
+            "written_blocks": record["oublock"],
+            "voluntary_switches": record["nvcsw"],
+            "involuntary_switches": record["nivcsw"],
+        }
+        totals[name] = __combine__(totals.get(name), values)
+    return totals
+
+
+def __combine__(current, values):
+    """Combine two aggregates of the same building block.
+
+    Args:
+        current (dict): Current aggregate (None if there is not).
+        values (dict): Aggregate to add.
+    Returns:
+        dict: Combined aggregate.
+    """
+    if current is None:
+        return dict(values)
+    return {key: merge(current[key], values[key]) for key, merge in AGGREGATES.items()}
+
+
+def flush_usage_reports():
+    """Merge the task records of this process into their report files."""
+    with __REPORTS_LOCK__:
+        reports = list(__REPORTS__.values())
+    for report in reports:
+        report.flush()
+
+
+def get_usage_report():
+    """Retrieve the usage report if enabled (PERMEDCOE_USAGE_REPORT).
+
+    Returns:
+        UsageReport: The usage report or None if it is not enabled.
+    """
+    path = os.environ.get(PERMEDCOE_USAGE_REPORT)
+    if not path:
+        return None
+    path = os.path.abspath(path)
+    with __REPORTS_LOCK__:
+        if path not in __REPORTS__:
+            __REPORTS__[path] = UsageReport(path)
+        return __REPORTS__[path]
+
+
+def log_usage(record):
+    """Show the task record in the log.
+
+    Args:
+        record (dict): Task record.
+    """
+    logging.info(
+        "Task %s usage: wall %.2fs, cpu %.2fs (user %.2fs, sys %.2fs), "
+        "max rss %d KB, blocks in/out %d/%d",
+        record["task"],
+        record["wall"] or 0.0,
+        record["utime"] + record["stime"],
+        record["utime"],
+        record["stime"],
+        record["maxrss"],
+        record["inblock"],
+        record["oublock"],
+    )
@@ -0,0 +1,232 @@
+"""
+This file provides the micro-batching of the task invocations: the calls to
+the same @task function (with the same container image) within a batching
+block are collected and launched N at a time as a single container
+execution, so that the container startup is paid once per batch instead of
+once per call. This is intended for tasks that run in milliseconds (e.g.
+format conversions or per-gene scoring).
+
+The calls of a batch are run back to back (or in parallel lanes) by a
+generated shell script within the container, and their exit code and
+outputs are reported per call.
+"""
+
+import logging
+from contextlib import contextmanager
+
+from permedcoe.core.decorators import capture_tasks
+from permedcoe.core.pipeline import FusedPipeline
+from permedcoe.core.pipeline import __quote__
+from permedcoe.core.runtime import get_local_runtime
+from permedcoe.utils.exceptions import PerMedCoEException
+
+
+@contextmanager
+def batching(size=None, parallel=1, timeout=None, retries=None, backoff=None):
+    """Collect the @task invocations of the block into batches.
+
+    A batch is launched when it reaches the given size and at the end of
+    the block (the pending calls are discarded if the block raises). The
+    options that are not given are taken from the @task and @constraint
+    options of the calls (see TaskBatch).
+
+    Args:
+        size (int, optional): Calls per batch (all the calls if not given).
+        parallel (int, optional): Calls of a batch that run concurrently.
+        timeout (float, optional): Seconds before killing a batch.
+        retries (int, optional): Attempts after a batch failure.
+        backoff (float, optional): Seconds before the first retry (doubled
+                                   after each one).
+    Yields:
+        BatchCollector: The collector (with the futures of the batches if
+                        the local runtime is enabled).
+
+    Raises:
+        TaskExecutionException: If a call of a synchronous batch fails (the
+                                first failed call, with the exit code of
+                                every call of the batch in results) or the
+                                batch times out.
+    """
+    collector = BatchCollector(size, parallel, timeout, retries, backoff)
+    with capture_tasks(collector):
+        yield collector
+    collector.flush()
+
+
+class BatchCollector(object):
+    """Pending task invocations grouped by task, engine and image."""
+
+    def __init__(self, size=None, parallel=1, timeout=None, retries=None, backoff=None):
+        """Constructor
+
+        Args:
+            size (int, optional): Calls per batch (no limit if not given).
+            parallel (int, optional): Calls of a batch that run concurrently.
+            timeout (float, optional): Seconds before killing a batch.
+            retries (int, optional): Attempts after a batch failure.
+            backoff (float, optional): Seconds before the first retry.
+        """
+        if size is not None and int(size) < 1:
+            raise PerMedCoEException(f"The batch size must be positive: {size}")
+        self.size = int(size) if size else None
+        self.parallel = max(1, int(parallel))
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.pending = {}
+        self.futures = []
+
+    def append(self, prepared):
+        """Add a task invocation (launching its batch if it is complete).
+
+        Args:
+            prepared (PreparedTask): Task invocation.
+        """
+        key = (
+            prepared.name,
+            prepared.run_in_container,
+            prepared.engine.name,
+            prepared.image,
+        )
+        calls = self.pending.setdefault(key, [])
+        calls.append(prepared)
+        if self.size and len(calls) >= self.size:
+            self.__launch__(self.pending.pop(key))
+
+    def flush(self):
+        """Launch all the pending batches."""
+        while self.pending:
+            key = next(iter(self.pending))
+            self.__launch__(self.pending.pop(key))
+
+    def __launch__(self, calls):
+        """Launch a batch (asynchronously if the local runtime is enabled).
+
+        Args:
+            calls (list[PreparedTask]): Invocations of the batch.
+        """
+        batch = TaskBatch(
+            calls, self.parallel, self.timeout, self.retries, self.backoff
+        )
+        runtime = get_local_runtime()
+        if runtime:
+            future = runtime.submit(
+                batch.launch, (), batch.computing_units, batch.accesses
+            )
+            self.futures.append(future)
+        else:
+            batch.launch()
+
+
+class TaskBatch(FusedPipeline):
+    """Invocations of the same task launched as a single container
+    execution."""
+
+    kind = "batch"
+    label = "Call"
+
+    def __init__(self, calls, parallel=1, timeout=None, retries=None, backoff=None):
+        """Constructor
+
+        The options that are not given are taken from the calls options: the
+        timeout of the slowest lane (see __stages_timeout__), and the maximum
+        retries and backoff.
+
+        Args:
+            calls (list[PreparedTask]): Invocations of the same task.
+            parallel (int, optional): Calls that run concurrently.
+            timeout (float, optional): Seconds before killing the batch.
+            retries (int, optional): Attempts after a failure.
+            backoff (float, optional): Seconds before the first retry.
+        """
+        names = {call.name for call in calls}
+        if len(names) > 1:
+            raise PerMedCoEException(
+                f"Cannot batch invocations of different tasks: {sorted(names)}"
+            )
+        # Needed to compute the timeout of the lanes
+        self.parallel = max(1, min(int(parallel), len(calls)))
+        super().__init__(calls, timeout, retries, backoff)
+        self.name = f"{calls[0].name}[{len(calls)}]"
+        # The cores of the calls that run at the same time
+        units = max(call.computing_units for call in calls)
+        self.computing_units = units * self.parallel
+
+    def __stages_timeout__(self):
+        """Timeout from the calls options: every lane runs its calls back to
+        back, so the longest lane (only if every call has a timeout).
+
+        Returns:
+            float: Seconds before killing the batch (None if unbounded).
+        """
+        timeouts = [call.options.get("timeout") for call in self.stages]
+        if None in timeouts:
+            return None
+        return max(
+            sum(float(timeout) for timeout in timeouts[lane :: self.parallel])
+            for lane in range(self.parallel)
+        )
+
+    def __find_intermediates__(self):
+        """The calls are independent: there are no intermediate files.
+
+        Returns:
+            set[str]: Empty set.
+        """
+        return set()
+
+    def __driver__(self, workdir, fifos):
+        """Generate the driver script.
+
+        The calls are distributed into as many lanes as parallel calls, and
+        every lane runs its calls back to back and writes their exit codes
+        into status_<call>. A failed call does not stop the rest.
+
+        Args:
+            workdir (str): Batch working directory.
+            fifos (dict): Not used (there are no intermediates).
+        Returns:
+            str: Driver script content.
+        """
+        lines = [
+            "#!/bin/sh",
+            "# Task batch driver generated by permedcoe",
+            f"W={__quote__(workdir)}",
+        ]
+        for lane in range(self.parallel):
+            lines.append("(")
+            for index in range(lane, len(self.stages), self.parallel):
+                command = self.__command__(index, self.stages[index], fifos)
+                lines += [
+                    f"  # {self.label} {index}",
+                    f"  {command}",
+                    f'  echo $? >"$W/status_{index}"',
+                ]
+            lines.append(") &")
+        indexes = " ".join(str(index) for index in range(len(self.stages)))
+        lines += [
+            "wait",
+            "failed=0",
+            f"for i in {indexes}; do",
+            '    [ "$(cat "$W/status_$i" 2>/dev/null)" = 0 ] || failed=1',
+            "done",
+            "exit $failed",
+        ]
+        return "\n".join(lines) + "\n"
+
+    def __cause__(self, failed):
+        """Select the call failure to raise.
+
+        Args:
+            failed (list[TaskExecutionException]): Failures of the calls.
+        Returns:
+            TaskExecutionException: The first failed call.
+        """
+        if len(failed) > 1:
+            logging.error(
+                "%d of %d calls of the batch %s failed",
+                len(failed),
+                len(self.stages),
+                self.name,
+            )
+        return failed[0]
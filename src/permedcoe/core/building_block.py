@@ -1,12 +1,19 @@
 """
 This file provides the PerMedBB class which implements the functionalities
-to interact with the container infrastructure (Singularity).
+to interact with the container infrastructure (through the engine backends
+of permedcoe.core.engines).
 """
 
 import os
 import logging
-import re
+from functools import lru_cache
 from permedcoe.utils.executor import command_runner
+from permedcoe.core.constants import PERMEDCOE_REUSE_INSTANCES
+from permedcoe.core.engines import get_engine
+from permedcoe.core.launch_plan import CommandPrefix
+from permedcoe.core.mpi import MpiLauncher
+from permedcoe.core.trace import trace_span
+import permedcoe.core.environment as cmd_flags
 
 
 class PerMedBB(object):
@@ -23,6 +30,10 @@ class PerMedBB(object):
         user_mount_paths,
         env_vars,
         flags,
+        streams=None,
+        resources=None,
+        engine=None,
+        plan=None,
     ):
         """Constructor
 
@@ -31,91 +42,124 @@ class PerMedBB(object):
             mpi_runner (str): MPI runner. (default=None)
             exe_path (str): Executable path.
             computing_nodes (int): Number of compute nodes needed.
-            computing_units (int): Number of compute units needed (cores).
-            mount_paths (list[str]): List of folders to be mounted.
+            computing_units (int): Number of compute units needed (cores or
+                                   MPI processes).
+            mount_paths (list[tuple(str, bool)]): Folders to be mounted and
+                                                  if they are read-only.
             user_mount_paths (list[str]): User defined mount paths.
             env_vars (dict{name: value}): Environment variables to delegate.
-            flags (dict{name: value}): Flags for the container engine.
+            flags (list[str]): Binary arguments (already split).
+            streams (dict{stream: (path, mode)}): Files to redirect the
+                                                  STDIN, STDOUT and STDERR.
+            resources (Resources): Cores, threads and memory to enforce.
+            engine (Engine): Container engine backend (the default engine
+                             if not given).
+            plan (LaunchPlan): Task launch plan that keeps the static part of
+                               the command (built for this call if not given).
         """
+        self.engine = engine if engine else get_engine()
         self.img_path = img_path
         self.exe_path = exe_path
         self.flags = flags
+        self.streams = streams if streams else {}
+        self.resources = resources
         self.computing_nodes = computing_nodes
         self.computing_units = computing_units
 
-        self.sing_command_comp = {}
-        self.sing_command_comp["base"] = "singularity --silent"
-        self.sing_command_comp["action"] = "exec"
-        self.sing_command_comp["action_flags"] = (
-            "--contain --cleanenv --pwd " + os.getcwd()
-        )  # noqa: E503
-        self.sing_command_comp["sif"] = img_path
+        exe = executable_argv(exe_path)
+        launcher = []
+        self.hybrid = False
         if mpi_runner:
-            # MPI execution within the container
-            self.sing_command_comp["exe"] = [
-                mpi_runner,
-                "-np",
-                self.computing_units,
-                exe_path,
-            ]
+            # Depends on the environment (e.g. the SLURM allocation)
+            mpi_launcher = MpiLauncher(mpi_runner, computing_nodes, computing_units)
+            if mpi_launcher.hybrid and not self.engine.native:
+                # The host MPI runner launches a container per rank
+                self.hybrid = True
+                launcher = list(mpi_launcher.argv())
+            else:
+                exe = mpi_launcher.argv() + exe
+        self.thread_env = {}
+        if resources:
+            # Threads per process of the requested cores
+            self.thread_env = resources.thread_env(env_vars)
+        envs = tuple(str(var) for var in env_vars)
+        envs += tuple(f"{name}={value}" for name, value in self.thread_env.items())
+        stdin = "STDIN" in self.streams
+        if plan:
+            prefix = plan.prefix(self.engine, img_path, exe, envs, stdin, self.hybrid)
         else:
-            # Single binary execution
-            self.sing_command_comp["exe"] = exe_path
-        self.sing_command_comp["mounts"] = ""
-        mount_paths = sorted(mount_paths, key=len)
-        for path in mount_paths:
-            self.add_bind(path, path)
+            prefix = CommandPrefix(
+                self.engine, img_path, exe, envs, os.getcwd(), stdin, self.hybrid
+            )
+        # The prefix lists are shared: they are replaced (never modified)
+        self.env_vars = prefix.env_vars
+        self.sing_command_comp = {
+            "launcher": launcher,
+            "base": prefix.base,
+            "action": prefix.action,
+            "action_flags": prefix.action_flags,
+            "envs": prefix.envs,
+            "sif": prefix.sif,
+            "exe": prefix.exe,
+            "flags": flags,
+        }
+        # Per call mounts
+        self.binds = []
+        for path, read_only in mount_paths:
+            self.binds.append(f"{path}:{path}:ro" if read_only else f"{path}:{path}")
         if user_mount_paths:
-            user_mounts = user_mount_paths.split(",")
-            for mount in user_mounts:
-                s, t = mount.split(":")
-                self.add_bind(s, t)
-        self.sing_command_comp["envs"] = ""
-        for var in env_vars:
-            self.add_env(var)
-        self.sing_command_comp["flags"] = flags
+            self.binds += user_mount_paths.split(",")
+        self.sing_command_comp["mounts"] = self.engine.mount_flags(self.binds)
 
     def add_env(self, env_var):
         """Small helper function to add an environment variable to
-        singularity command line.
+        the container command line.
 
         Args:
             env_var (str): Environment variable.
         """
-        if self.sing_command_comp["envs"] == "":
-            self.sing_command_comp["envs"] = f"--env {env_var}"
-        else:
-            self.sing_command_comp["envs"] = (
-                self.sing_command_comp["envs"] + f",{env_var}"
-            )
+        self.env_vars = self.env_vars + [str(env_var)]
+        self.sing_command_comp["envs"] = self.engine.env_flags(self.env_vars)
 
-    def add_bind(self, s, t):
-        """Small helper function to add a bind point to singularity command line.
+    def add_bind(self, s, t, read_only=False):
+        """Small helper function to add a bind point to the container command line.
 
         Args:
             s (str): Source folder
             t (str): Destination folder
+            read_only (bool, optional): Mount as read-only. Defaults to False.
         """
-        if self.sing_command_comp["mounts"] == "":
-            self.sing_command_comp["mounts"] = f"-B {s}:{t}"
+        if read_only:
+            self.binds = self.binds + [f"{s}:{t}:ro"]
         else:
-            self.sing_command_comp["mounts"] = (
-                self.sing_command_comp["mounts"] + f",{s}:{t}"
-            )
+            self.binds = self.binds + [f"{s}:{t}"]
+        self.sing_command_comp["mounts"] = self.engine.mount_flags(self.binds)
 
-    def launch(self, shell=False, run_in_container=True):
-        """Executes the binary into the singularity container.
+    def launch(self, shell=False, run_in_container=True, usage=None, timeout=None):
+        """Executes the binary into the container.
 
         Args:
             shell (bool, optional): Action shell. Defaults to False.
             run_in_container (bool, optional): Launch execution in container.
+            usage (dict, optional): Filled with the resource usage of the
+                                    execution (see wait_usage).
+            timeout (float, optional): Seconds before killing the execution.
+
+        Raises:
+            TaskExecutionException: If the execution fails or times out.
         """
-        command = ""
+        instance_key = None
+        scc = self.sing_command_comp
+        if run_in_container and self.engine.native:
+            # The native engine runs the binary as without container
+            run_in_container = False
         if run_in_container:
             order = [
+                "launcher",
                 "base",
                 "action",
                 "action_flags",
+                "limits",
                 "mounts",
                 "envs",
                 "sif",
@@ -123,19 +167,143 @@ class PerMedBB(object):
                 "flags",
             ]
             if shell:
-                self.sing_command_comp["action"] = "shell"
+                scc["action"] = self.engine.action(shell=True)
+            elif (
+                reuse_instances()
+                and self.engine.instances
+                and not self.hybrid
+                and not (self.resources and self.resources.memory)
+            ):
+                # Run within a persistent instance (mounts are set when the
+                # instance starts, whereas the exec does not inherit its
+                # environment, so the envs are given on every exec). The
+                # memory limit is set per container, so it is not shared.
+                from permedcoe.core.instances import INSTANCES
+
+                instance_key = (
+                    self.engine.name,
+                    self.img_path,
+                    tuple(scc["mounts"]),
+                    tuple(scc["envs"]),
+                )
+                with trace_span("instance_acquire"):
+                    instance = INSTANCES.acquire(
+                        instance_key,
+                        scc["base"],
+                        self.engine.instance_flags() + scc["mounts"] + scc["envs"],
+                        scc["sif"][0],
+                    )
+                order = ["base", "action", "instance", "envs", "uri", "exe", "flags"]
+                scc["instance"] = self.engine.instance_exec_flags(os.getcwd())
+                scc["uri"] = [instance]
         else:
-            order = ["exe", "flags"]
-        scc = self.sing_command_comp
-        for c in order:
-            if isinstance(scc[c], list):
-                for elem_scc in scc[c]:
-                    if isinstance(elem_scc, list):
-                        command = command + " " + " ".join(elem_scc)
-                    else:
-                        command = command + " " + str(elem_scc)
-            else:
-                command = command + " " + scc[c]
-        logging.info("Launching the command: %s", command)
-        cmd = re.sub(" +", " ", command.strip()).split(" ")
-        command_runner(cmd)
+            order = ["launcher", "exe", "flags"]
+        log_name = os.path.basename(scc["exe"][0]) if scc["exe"] else None
+        # The stream files are given to the process (no copies in python)
+        redirections = {}
+        env = None
+        if not run_in_container and self.env_vars:
+            # The task environment and threads (already in env_vars)
+            env = dict(os.environ)
+            env.update(str(var).split("=", 1) for var in self.env_vars if "=" in var)
+        try:
+            for stream, (path, mode) in self.streams.items():
+                redirections[stream.lower()] = open(path, mode)
+            prefix = []
+            scc["limits"] = []
+            if self.resources:
+                with trace_span("bind_resources"):
+                    self.resources.acquire()
+                    self.resources.report()
+                    prefix = self.__resources_argv__(run_in_container)
+            cmd = list(prefix)
+            for c in order:
+                cmd += scc[c]
+            logging.info("Launching the command: %s", " ".join(cmd))
+            command_runner(
+                cmd,
+                log_name=log_name,
+                env=env,
+                usage=usage,
+                timeout=timeout,
+                **redirections,
+            )
+        finally:
+            for stream_fd in redirections.values():
+                stream_fd.close()
+            if self.resources:
+                self.resources.release()
+            if instance_key:
+                from permedcoe.core.instances import INSTANCES
+
+                INSTANCES.release(instance_key)
+
+    def __resources_argv__(self, run_in_container):
+        """Set the engine resource options (scc["limits"]) and build the
+        command prefix that enforces the reserved resources.
+
+        Args:
+            run_in_container (bool): Launch execution in container.
+        Returns:
+            list[str]: Command prefix.
+        """
+        resources = self.resources
+        if not run_in_container:
+            return resources.affinity_argv() + resources.limits_argv()
+        memory = resources.memory
+        if self.hybrid:
+            # A container per rank
+            memory = resources.memory_per_process()
+        self.sing_command_comp["limits"] = self.engine.resource_flags(
+            resources.cpus, memory
+        )
+        if self.engine.cpuset:
+            return []
+        if self.engine.limits_memory():
+            return resources.affinity_argv()
+        # The container processes inherit the limits of the engine command
+        return resources.affinity_argv() + resources.limits_argv()
+
+
+def executable_argv(exe_path, mpi_runner=None, computing_units=1):
+    """Build the executable part of the command.
+
+    Args:
+        exe_path (str): Executable path (may include arguments, e.g. julia).
+        mpi_runner (str): MPI runner. (default=None)
+        computing_units (int): Number of compute units needed (cores).
+    Returns:
+        tuple[str]: Executable arguments.
+    """
+    exe = __split_executable__(exe_path)
+    if mpi_runner:
+        # MPI execution in a single node (the runner options depend on the
+        # environment, see permedcoe.core.mpi)
+        return MpiLauncher(mpi_runner, 1, computing_units).argv() + exe
+    # Single binary execution
+    return exe
+
+
+@lru_cache(maxsize=None)
+def __split_executable__(exe_path):
+    """Split (once per executable) the executable path.
+
+    Args:
+        exe_path (str): Executable path (may include arguments, e.g. julia).
+    Returns:
+        tuple[str]: Executable arguments.
+    """
+    return tuple(str(exe_path).split())
+
+
+def reuse_instances():
+    """Check if the persistent container instances reuse is enabled
+    (--reuse_instances flag or PERMEDCOE_REUSE_INSTANCES environment variable).
+
+    Returns:
+        bool: True if enabled. False otherwise.
+    """
+    if cmd_flags.REUSE_INSTANCES:
+        return True
+    value = os.environ.get(PERMEDCOE_REUSE_INSTANCES, "")
+    return value.lower() in ("1", "true", "yes")
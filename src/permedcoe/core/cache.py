@@ -0,0 +1,377 @@
+"""
+This file provides the TaskCache class which implements a content-addressed
+cache of @task executions. It is enabled with the PERMEDCOE_CACHE_DIR
+environment variable.
+
+The key of a task execution is the hash of the container image identity,
+the binary, the flags, the environment variables and the contents of every
+input file and directory and of the building block assets. The outputs are
+stored (reflink, hardlink or copy) and, on a hit, restored as independent
+files (reflink or copy) instead of launching the container, so that writing
+into a restored output never modifies the cache. The cache size is bounded
+by PERMEDCOE_CACHE_QUOTA (bytes) using LRU eviction.
+"""
+
+import os
+import json
+import time
+import fcntl
+import shutil
+import hashlib
+import logging
+import threading
+
+from permedcoe.core.constants import PERMEDCOE_CACHE_DIR
+from permedcoe.core.constants import PERMEDCOE_CACHE_QUOTA
+from permedcoe.core.constants import PERMEDCOE_CACHE_LINK
+
+CACHE_VERSION = "2"
+OBJECTS_FOLDER = "objects"
+META_FILE = "meta.json"
+STATS_FILE = "stats.json"
+LOCK_FILE = ".lock"
+READ_SIZE = 1024 * 1024
+FICLONE = 0x40049409  # Linux ioctl to clone (reflink) a file
+LINK_REFLINK = "reflink"
+LINK_HARDLINK = "hardlink"
+LINK_COPY = "copy"
+
+__CACHES__ = {}
+__CACHES_LOCK__ = threading.Lock()
+
+
+class TaskCache(object):
+    """Content-addressed cache of task executions."""
+
+    def __init__(self, path, quota=0, link=LINK_REFLINK):
+        """Constructor
+
+        Args:
+            path (str): Cache directory.
+            quota (int): Maximum cache size in bytes (0 means unlimited).
+            link (str): How to store and restore outputs (reflink | hardlink | copy).
+        """
+        self.path = os.path.abspath(path)
+        self.objects = os.path.join(self.path, OBJECTS_FOLDER)
+        self.quota = quota
+        self.link = link
+        self.digests = {}  # (path, size, mtime, inode): digest
+        os.makedirs(self.objects, exist_ok=True)
+
+    def key(self, image, binary, flags, inputs, env_vars=None, assets=None):
+        """Compute the key of a task execution.
+
+        Args:
+            image (str): Container image path (None if not using container).
+            binary (str): Binary to execute.
+            flags (list): Binary flags.
+            inputs (list[str]): Input files and directories.
+            env_vars (list[str]): Environment variables (NAME=value).
+            assets (str): Building block assets folder (e.g. its scripts).
+        Returns:
+            str: Execution key.
+        """
+        hasher = hashlib.sha256()
+        hasher.update(CACHE_VERSION.encode())
+        if image and os.path.isfile(image):
+            stat = os.stat(image)
+            image_id = f"{os.path.abspath(image)}:{stat.st_size}:{stat.st_mtime_ns}"
+        else:
+            image_id = str(image)
+        for component in (image_id, str(binary)):
+            hasher.update(component.encode() + b"\0")
+        hasher.update(json.dumps([str(flag) for flag in flags]).encode())
+        hasher.update(json.dumps([str(env) for env in env_vars or []]).encode())
+        for path in sorted(set(inputs)):
+            hasher.update(path.encode() + b"\0")
+            hasher.update(self.__digest__(path).encode())
+        if assets:
+            hasher.update(self.__digest__(os.path.abspath(assets)).encode())
+        return hasher.hexdigest()
+
+    def restore(self, key, outputs):
+        """Restore the outputs of the given key if cached.
+
+        The restored outputs never share their data with the cache objects
+        (hardlinks are restored as copies), and the existing output
+        directories are replaced (not merged).
+
+        Args:
+            key (str): Execution key.
+            outputs (list[str]): Output files and directories.
+        Returns:
+            bool: True if hit (outputs restored). False otherwise.
+        """
+        entry = os.path.join(self.objects, key)
+        meta_file = os.path.join(entry, META_FILE)
+        link = LINK_REFLINK if self.link == LINK_HARDLINK else self.link
+        try:
+            with open(meta_file, "r") as meta_fd:
+                meta = json.load(meta_fd)
+            if meta["outputs"] != outputs:
+                raise ValueError("Different outputs")
+            if meta["files"] != __identities__(entry, len(outputs)):
+                # e.g. a hardlinked output modified in place after storing it
+                logging.warning("Removing modified task cache entry: %s", key)
+                shutil.rmtree(entry, ignore_errors=True)
+                raise ValueError("Modified entry")
+            for index, output in enumerate(outputs):
+                if os.path.isdir(output) and not os.path.islink(output):
+                    shutil.rmtree(output)
+                __transfer__(os.path.join(entry, str(index)), output, link)
+        except (OSError, ValueError, KeyError):
+            self.__account__("misses")
+            return False
+        # Update the LRU order
+        os.utime(meta_file)
+        self.__account__("hits")
+        logging.info("Task cache hit: %s", key)
+        return True
+
+    def store(self, key, outputs):
+        """Store the outputs of the given key.
+
+        Args:
+            key (str): Execution key.
+            outputs (list[str]): Output files and directories.
+        """
+        entry = os.path.join(self.objects, key)
+        if os.path.exists(entry):
+            return
+        tmp_entry = os.path.join(
+            self.objects, f".tmp-{os.getpid()}-{threading.get_ident()}"
+        )
+        try:
+            os.makedirs(tmp_entry)
+            for index, output in enumerate(outputs):
+                if not os.path.exists(output):
+                    logging.warning("Not caching %s: missing output %s", key, output)
+                    shutil.rmtree(tmp_entry)
+                    return
+                __transfer__(output, os.path.join(tmp_entry, str(index)), self.link)
+            size = __size__(tmp_entry)
+            meta = {
+                "outputs": outputs,
+                "size": size,
+                "created": time.time(),
+                "files": __identities__(tmp_entry, len(outputs)),
+            }
+            with open(os.path.join(tmp_entry, META_FILE), "w") as meta_fd:
+                json.dump(meta, meta_fd)
+            os.rename(tmp_entry, entry)
+        except OSError as error:
+            logging.warning("Could not store %s in the task cache: %s", key, error)
+            shutil.rmtree(tmp_entry, ignore_errors=True)
+            return
+        logging.info("Task cache store: %s (%d bytes)", key, size)
+        self.evict()
+
+    def evict(self):
+        """Remove the least recently used entries until the quota is met."""
+        if self.quota <= 0:
+            return
+        with self.__lock__():
+            entries = []
+            total = 0
+            for name in os.listdir(self.objects):
+                meta_file = os.path.join(self.objects, name, META_FILE)
+                try:
+                    with open(meta_file, "r") as meta_fd:
+                        size = json.load(meta_fd)["size"]
+                    entries.append((os.stat(meta_file).st_mtime, name, size))
+                except (OSError, ValueError, KeyError):
+                    continue
+                total += size
+            entries.sort()
+            evicted = 0
+            while total > self.quota and entries:
+                _, name, size = entries.pop(0)
+                shutil.rmtree(os.path.join(self.objects, name), ignore_errors=True)
+                total -= size
+                evicted += 1
+            if evicted:
+                logging.info("Task cache evicted %d entries", evicted)
+                self.__update_stats__("evictions", evicted)
+
+    def stats(self):
+        """Retrieve the cache statistics.
+
+        Returns:
+            dict: Hits, misses and evictions.
+        """
+        try:
+            with open(os.path.join(self.path, STATS_FILE), "r") as stats_fd:
+                return json.load(stats_fd)
+        except (OSError, ValueError):
+            return {"hits": 0, "misses": 0, "evictions": 0}
+
+    def __account__(self, counter):
+        """Increase a statistics counter.
+
+        Args:
+            counter (str): Counter name (hits | misses).
+        """
+        with self.__lock__():
+            self.__update_stats__(counter, 1)
+
+    def __update_stats__(self, counter, amount):
+        """Increase a statistics counter (must be called with the lock).
+
+        Args:
+            counter (str): Counter name.
+            amount (int): Amount to add.
+        """
+        stats = self.stats()
+        stats[counter] = stats.get(counter, 0) + amount
+        tmp_file = os.path.join(self.path, f".{STATS_FILE}.{os.getpid()}")
+        with open(tmp_file, "w") as stats_fd:
+            json.dump(stats, stats_fd)
+        os.replace(tmp_file, os.path.join(self.path, STATS_FILE))
+
+    def __lock__(self):
+        """Inter-process lock of the cache directory.
+
+        Returns:
+            CacheLock: Context manager.
+        """
+        return CacheLock(os.path.join(self.path, LOCK_FILE))
+
+    def __digest__(self, path):
+        """Content digest of a file or directory (memoized by file identity).
+
+        Args:
+            path (str): File or directory path.
+        Returns:
+            str: Hexadecimal digest.
+        """
+        if os.path.isdir(path):
+            hasher = hashlib.sha256()
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    file_path = os.path.join(root, name)
+                    hasher.update(os.path.relpath(file_path, path).encode() + b"\0")
+                    hasher.update(self.__digest__(file_path).encode())
+            return hasher.hexdigest()
+        if not os.path.isfile(path):
+            return "missing"
+        stat = os.stat(path)
+        identity = (path, stat.st_size, stat.st_mtime_ns, stat.st_ino)
+        if identity not in self.digests:
+            hasher = hashlib.sha256()
+            with open(path, "rb") as file_fd:
+                for block in iter(lambda: file_fd.read(READ_SIZE), b""):
+                    hasher.update(block)
+            self.digests[identity] = hasher.hexdigest()
+        return self.digests[identity]
+
+
+class CacheLock(object):
+    """Inter-process file lock (context manager)."""
+
+    def __init__(self, path):
+        self.path = path
+        self.fd = None
+
+    def __enter__(self):
+        self.fd = open(self.path, "a")
+        fcntl.flock(self.fd, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *args):
+        fcntl.flock(self.fd, fcntl.LOCK_UN)
+        self.fd.close()
+
+
+def __transfer__(source, destination, link):
+    """Transfer a file or directory (reflink, hardlink or copy).
+
+    Args:
+        source (str): Source file or directory.
+        destination (str): Destination file or directory.
+        link (str): Preferred transfer (reflink | hardlink | copy).
+    """
+    if os.path.isdir(source):
+        os.makedirs(destination, exist_ok=True)
+        for name in os.listdir(source):
+            __transfer__(
+                os.path.join(source, name), os.path.join(destination, name), link
+            )
+        return
+    if os.path.lexists(destination):
+        os.remove(destination)
+    if link == LINK_HARDLINK:
+        try:
+            os.link(source, destination)
+            return
+        except OSError:
+            pass
+    elif link == LINK_REFLINK:
+        try:
+            with open(source, "rb") as source_fd, open(destination, "wb") as dest_fd:
+                fcntl.ioctl(dest_fd.fileno(), FICLONE, source_fd.fileno())
+            shutil.copystat(source, destination)
+            return
+        except OSError:
+            pass
+    shutil.copy2(source, destination)
+
+
+def __identities__(entry, count):
+    """Identity (size and modification time) of every file of an entry.
+
+    Args:
+        entry (str): Cache entry folder.
+        count (int): Number of outputs.
+    Returns:
+        dict: Relative file path as key and [size, mtime] as value.
+    """
+    identities = {}
+    for index in range(count):
+        path = os.path.join(entry, str(index))
+        files = [path]
+        if os.path.isdir(path):
+            files = [
+                os.path.join(root, name)
+                for root, _, names in os.walk(path)
+                for name in names
+            ]
+        for file_path in files:
+            stat = os.stat(file_path)
+            relative = os.path.relpath(file_path, entry)
+            identities[relative] = [stat.st_size, stat.st_mtime_ns]
+    return identities
+
+
+def __size__(path):
+    """Total size in bytes of a file or directory.
+
+    Args:
+        path (str): File or directory path.
+    Returns:
+        int: Size in bytes.
+    """
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            total += os.path.getsize(os.path.join(root, name))
+    return total
+
+
+def get_task_cache():
+    """Retrieve the task cache if enabled (PERMEDCOE_CACHE_DIR).
+
+    Returns:
+        TaskCache: The task cache or None if it is not enabled.
+    """
+    path = os.environ.get(PERMEDCOE_CACHE_DIR)
+    if not path:
+        return None
+    with __CACHES_LOCK__:
+        if path not in __CACHES__:
+            quota = int(os.environ.get(PERMEDCOE_CACHE_QUOTA, "0"))
+            link = os.environ.get(PERMEDCOE_CACHE_LINK, LINK_REFLINK).lower()
+            __CACHES__[path] = TaskCache(path, quota, link)
+        return __CACHES__[path]
@@ -4,7 +4,36 @@ PERMEDCOE_TMPDIR = "PERMEDCOE_TMPDIR"
 PERMEDCOE_PROCESSES = "PERMEDCOE_PROCESSES"
 PERMEDCOE_GPUS = "PERMEDCOE_GPUS"
 PERMEDCOE_MEMORY = "PERMEDCOE_MEMORY"
+PERMEDCOE_MEMORY_CGROUPS = "PERMEDCOE_MEMORY_CGROUPS"
 PERMEDCOE_MOUNT_POINTS = "PERMEDCOE_MOUNT_POINTS"
+PERMEDCOE_REUSE_INSTANCES = "PERMEDCOE_REUSE_INSTANCES"
+PERMEDCOE_STREAM_OUTPUT = "PERMEDCOE_STREAM_OUTPUT"
+PERMEDCOE_LOG_DIR = "PERMEDCOE_LOG_DIR"
+PERMEDCOE_LOG_MAX_BYTES = "PERMEDCOE_LOG_MAX_BYTES"
+PERMEDCOE_LOG_BACKUPS = "PERMEDCOE_LOG_BACKUPS"
+PERMEDCOE_LOCAL_RUNTIME = "PERMEDCOE_LOCAL_RUNTIME"
+PERMEDCOE_CACHE_DIR = "PERMEDCOE_CACHE_DIR"
+PERMEDCOE_CACHE_QUOTA = "PERMEDCOE_CACHE_QUOTA"
+PERMEDCOE_CACHE_LINK = "PERMEDCOE_CACHE_LINK"
+PERMEDCOE_MOUNT_MERGE_DEPTH = "PERMEDCOE_MOUNT_MERGE_DEPTH"
+PERMEDCOE_IMAGE_CACHE = "PERMEDCOE_IMAGE_CACHE"
+PERMEDCOE_IMAGE_VALIDATE = "PERMEDCOE_IMAGE_VALIDATE"
+PERMEDCOE_IMAGE_WARM = "PERMEDCOE_IMAGE_WARM"
+PERMEDCOE_BIND = "PERMEDCOE_BIND"
+PERMEDCOE_BIND_DIR = "PERMEDCOE_BIND_DIR"
+PERMEDCOE_BINDING_REPORT = "PERMEDCOE_BINDING_REPORT"
+PERMEDCOE_TRACE = "PERMEDCOE_TRACE"
+PERMEDCOE_USAGE_REPORT = "PERMEDCOE_USAGE_REPORT"
+PERMEDCOE_ENGINE = "PERMEDCOE_ENGINE"
+PERMEDCOE_ENGINE_FLAGS = "PERMEDCOE_ENGINE_FLAGS"
+PERMEDCOE_IMAGE_REGISTRY = "PERMEDCOE_IMAGE_REGISTRY"
+PERMEDCOE_PARSER_CACHE = "PERMEDCOE_PARSER_CACHE"
+PERMEDCOE_SERVER = "PERMEDCOE_SERVER"
+PERMEDCOE_MPI_MODE = "PERMEDCOE_MPI_MODE"
+PERMEDCOE_MPI_HOSTS = "PERMEDCOE_MPI_HOSTS"
+PERMEDCOE_MPI_PPN = "PERMEDCOE_MPI_PPN"
+PERMEDCOE_MPI_BIND = "PERMEDCOE_MPI_BIND"
+PERMEDCOE_MPI_FLAGS = "PERMEDCOE_MPI_FLAGS"
 BB_ASSETS_PATH = "BB_ASSETS_PATH"
 
 # Global variables:
@@ -4,14 +4,31 @@ which wrap the container, binary and execution actions.
 """
 
 import os
-import inspect
+import sys
+import math
+import time
 import logging
-from collections import OrderedDict
+import threading
+from contextlib import contextmanager
 
 from permedcoe.core.building_block import PerMedBB
+from permedcoe.core.launch_plan import LaunchPlan
+from permedcoe.core.mounts import plan_mounts
+from permedcoe.core.runtime import get_local_runtime
+from permedcoe.core.cache import get_task_cache
+from permedcoe.core.images import stage_image
+from permedcoe.core.engines import get_engine
+from permedcoe.core.engines import NativeEngine
+from permedcoe.core.resources import get_resources
+from permedcoe.core.mpi import resolve_int
+from permedcoe.core.trace import trace_span
+from permedcoe.core.accounting import get_usage_report
+from permedcoe.core.accounting import task_record
+from permedcoe.core.accounting import log_usage
 import permedcoe.core.environment as cmd_flags
 from permedcoe.utils.exceptions import ContainerImageException
 from permedcoe.utils.exceptions import PerMedCoEException
+from permedcoe.utils.exceptions import TaskExecutionException
 
 
 # Environment variable names
@@ -23,6 +40,16 @@ from permedcoe.core.constants import PERMEDCOE_MOUNT_POINTS
 from permedcoe.core.constants import SEPARATOR
 from permedcoe.core.constants import BB_ASSETS_PATH
 
+# Execution options accepted by @task and @constraint
+TASK_OPTIONS = ("timeout", "retries", "backoff")
+DEFAULT_BACKOFF = 1  # seconds before the first retry (doubled after each one)
+
+# Invocations captured instead of launched (per thread, see capture_tasks)
+__CAPTURE__ = threading.local()
+
+# Attribute of the decorated functions with the decorators parameters
+METADATA_ATTRIBUTE = "__permedcoe__"
+
 
 # ################################################################# #
 # ########################## DECORATORS ########################### #
@@ -53,7 +80,7 @@ class Container(object):
             kwargs["image"] = self.kwargs["image"]
             return f(*args, **kwargs)
 
-        return wrapped_f
+        return keep_metadata(wrapped_f, f, "container", self.kwargs)
 
 
 class Constraint(object):
@@ -70,10 +97,14 @@ class Constraint(object):
         def wrapped_f(*args, **kwargs):
             # args and kwargs are the function invocation parameters
             # Delegate the needed info to the task through the **kwargs.
-            kwargs["computing_units"] = self.kwargs["computing_units"]
+            if "computing_units" in self.kwargs:
+                kwargs["computing_units"] = self.kwargs["computing_units"]
+            options = {k: v for k, v in self.kwargs.items() if k in TASK_OPTIONS}
+            if options:
+                kwargs["task_options"] = options
             return f(*args, **kwargs)
 
-        return wrapped_f
+        return keep_metadata(wrapped_f, f, "constraint", self.kwargs)
 
 
 class Mpi(object):
@@ -94,16 +125,15 @@ class Mpi(object):
             # Delegate the needed info to the task through the **kwargs.
             kwargs["runner"] = self.kwargs["runner"]
             kwargs["binary"] = self.kwargs["binary"]
-            kwargs["computing_nodes"] = self.kwargs[
-                "computing_nodes"
-            ]  # noqa TODO: ignored since it requires node names
+            # The nodes are taken from the allocation (see permedcoe.core.mpi)
+            kwargs["computing_nodes"] = self.kwargs.get("computing_nodes", 1)
             if "environment" in self.kwargs:
                 kwargs["environment"] = self.kwargs["environment"]
             else:
                 kwargs["environment"] = []
             return f(*args, **kwargs)
 
-        return wrapped_f
+        return keep_metadata(wrapped_f, f, "mpi", self.kwargs)
 
 
 class Binary(object):
@@ -129,7 +159,7 @@ class Binary(object):
                 kwargs["environment"] = []
             return f(*args, **kwargs)
 
-        return wrapped_f
+        return keep_metadata(wrapped_f, f, "binary", self.kwargs)
 
 
 class Julia(object):
@@ -160,7 +190,7 @@ class Julia(object):
                 kwargs["environment"] = []
             return f(*args, **kwargs)
 
-        return wrapped_f
+        return keep_metadata(wrapped_f, f, "julia", self.kwargs)
 
 
 class Task(object):
@@ -176,72 +206,172 @@ class Task(object):
     def __init__(self, *args, **kwargs):
         self.args = args
         self.kwargs = kwargs
-        self.engine = None
-        self.image = None
-        self.runner = None
-        self.binary = None
-        self.computing_nodes = 1
-        self.computing_units = 1
-        self.env_vars = None
 
     def __call__(self, f):
+        # Precompute the invocation independent information
+        path_parameters = {
+            k
+            for k, v in self.kwargs.items()
+            if (v.get(Type) if isinstance(v, dict) else v) in DIRECTIONS
+        }
+        self.plan = LaunchPlan(f, path_parameters)
+        self.options = {k: v for k, v in self.kwargs.items() if k in TASK_OPTIONS}
+
         def wrapped_f(*args, **kwargs):
             # To dummy task:
             # return f(*args, **kwargs)
             # Instead, takes all learnt from previous decorators, and acts:
             # Deploys the container and executes the binary
+            captured = getattr(__CAPTURE__, "tasks", None)
+            if captured is not None:
+                # Launched by the caller (e.g. fused into a pipeline)
+                captured.append(self.__prepare__(f, kwargs))
+                return None
+            runtime = get_local_runtime()
+            if runtime:
+                # Asynchronous execution (returns a future)
+                return runtime.submit(
+                    self.__launch__,
+                    (f, kwargs),
+                    resolve_int(kwargs.get("computing_units"), 1),
+                    self.__find_accesses__(kwargs),
+                )
+            return self.__launch__(f, kwargs)
+
+        return keep_metadata(wrapped_f, f, "task", self.kwargs)
+
+    def __launch__(self, f, kwargs):
+        """Deploys the container and executes the binary (traced).
 
-            run_in_container = True
-            if "engine" not in kwargs or cmd_flags.DISABLE_CONTAINER:
-                # The @container has not been defined, so
-                # disable running in container
-                run_in_container = False
-
-            # Pop the info from upper decorators:
-            if run_in_container:
-                self.engine = kwargs.pop("engine")
-                self.image = kwargs.pop("image")
-            else:
-                self.engine = None
-                self.image = None
-            self.runner = kwargs.pop("runner", None)
-            self.binary = kwargs.pop("binary")
-            if self.binary == "julia":
-                # Could be using the @julia decorator
-                if "project" in kwargs:
-                    self.binary += " --project=" + str(kwargs.pop("project"))
-                if "script" in kwargs:
-                    self.binary += " " + str(kwargs.pop("script"))
-            self.computing_nodes = kwargs.pop("computing_nodes", 1)
-            self.computing_units = kwargs.pop("computing_units", 1)
-            self.env_vars = kwargs.pop("environment")
-            logging.debug(SEPARATOR)
-            if run_in_container:
-                logging.debug("Container engine          : %s", self.engine)
-                logging.debug("Container image           : %s", self.image)
-            logging.debug("Container runner          : %s", self.runner)
-            logging.debug("Container binary          : %s", self.binary)
-            logging.debug("Container computing_nodes : %s", self.computing_nodes)
-            logging.debug("Container computing_units : %s", self.computing_units)
-            logging.debug("Container env vars        : %s", self.env_vars)
-            logging.debug(SEPARATOR)
+        Args:
+            f (function): Decorated function.
+            kwargs (dict): Invocation parameters (including the information
+                           from the upper decorators).
+        """
+        with trace_span(f"task:{f.__name__}") as span:
+            usage = {}
+            try:
+                self.__execute__(f, kwargs, usage)
+            finally:
+                if usage:
+                    self.__account__(f, usage, span)
 
-            # Parameters provided by the user:
-            defaults = self.__get_defaults__(f)
-            flags = OrderedDict(defaults, **kwargs)
-            flags_list = list(flags.values())
-            logging.debug("Provided flags: %s", str(kwargs))
-            # To increase debugging:
-            # logging.debug("Default flags: %s", str(defaults))
-            logging.debug("User flags: %s", str(flags_list))
-            logging.debug(SEPARATOR)
+    def __execute__(self, f, kwargs, usage=None):
+        """Deploys the container and executes the binary.
 
-            # Checks:
-            #  - Container image
-            if not os.path.isfile(self.image):
-                raise ContainerImageException(self.image)
+        Args:
+            f (function): Decorated function.
+            kwargs (dict): Invocation parameters (including the information
+                           from the upper decorators).
+            usage (dict, optional): Filled with the resource usage of the
+                                    execution and the computing units.
+        """
+        prepared = self.__prepare__(f, kwargs)
+
+        # Look into the cache:
+        cache = get_task_cache()
+        if cache:
+            inputs = [path for path, read, _ in prepared.accesses if read]
+            outputs = [path for path, _, write in prepared.accesses if write]
+            with trace_span("cache_lookup"):
+                cache_key = cache.key(
+                    prepared.image,
+                    prepared.binary,
+                    prepared.flags,
+                    inputs,
+                    prepared.env_vars,
+                    os.environ.get(BB_ASSETS_PATH),
+                )
+                hit = cache.restore(cache_key, outputs)
+            if hit:
+                return
+
+        # Act:
+        BB = prepared.building_block()
+        if usage is not None:
+            usage["computing_units"] = prepared.computing_units
+        self.__retry__(BB, prepared.run_in_container, usage, prepared.options)
+        if cache:
+            with trace_span("cache_store"):
+                cache.store(cache_key, outputs)
+
+    def __prepare__(self, f, kwargs):
+        """Resolve everything needed to launch the invocation.
 
-            # Look for mount paths:
+        Args:
+            f (function): Decorated function.
+            kwargs (dict): Invocation parameters (including the information
+                           from the upper decorators).
+        Returns:
+            PreparedTask: The invocation ready to be launched.
+        """
+        run_in_container = True
+        if "engine" not in kwargs or cmd_flags.DISABLE_CONTAINER:
+            # The @container has not been defined, so
+            # disable running in container
+            run_in_container = False
+
+        # Pop the info from upper decorators:
+        if run_in_container:
+            engine = get_engine(kwargs.pop("engine"))
+            image = kwargs.pop("image")
+            if engine.native:
+                # The native engine runs the binary without container
+                run_in_container = False
+                image = None
+        else:
+            engine = NativeEngine()
+            image = None
+        runner = kwargs.pop("runner", None)
+        binary = kwargs.pop("binary")
+        if binary == "julia":
+            # Could be using the @julia decorator
+            if "project" in kwargs:
+                binary += " --project=" + str(kwargs.pop("project"))
+            if "script" in kwargs:
+                binary += " " + str(kwargs.pop("script"))
+        computing_nodes = resolve_int(kwargs.pop("computing_nodes", 1), 1)
+        # Resolved once (e.g. "${SLURM_CPUS_PER_TASK}")
+        requested_units = kwargs.pop("computing_units", None)
+        computing_units = resolve_int(requested_units, 1)
+        # Only the explicit @constraint computing units are enforced (the
+        # share of the local node if the MPI processes span multiple nodes)
+        local_units = None
+        if requested_units not in (None, ""):
+            local_units = math.ceil(computing_units / computing_nodes)
+        resources = get_resources(local_units, (local_units or 1) if runner else 1)
+        env_vars = kwargs.pop("environment")
+        # The @constraint options override the @task ones
+        options = dict(self.options, **kwargs.pop("task_options", {}))
+        logging.debug(SEPARATOR)
+        if run_in_container:
+            logging.debug("Container engine          : %s", engine.name)
+            logging.debug("Container image           : %s", image)
+        logging.debug("Container runner          : %s", runner)
+        logging.debug("Container binary          : %s", binary)
+        logging.debug("Container computing_nodes : %s", computing_nodes)
+        logging.debug("Container computing_units : %s", computing_units)
+        logging.debug("Container env vars        : %s", env_vars)
+        logging.debug("Execution options         : %s", options)
+        logging.debug(SEPARATOR)
+
+        # Parameters provided by the user:
+        flags = self.plan.flags(kwargs)
+        # Stream parameters are redirected instead of passed as flags
+        streams = self.__pop_streams__(flags)
+        logging.debug("Provided flags: %s", str(kwargs))
+        # To increase debugging:
+        # logging.debug("Default flags: %s", str(self.plan.defaults))
+        logging.debug("User flags: %s", str(list(flags.values())))
+        logging.debug(SEPARATOR)
+
+        # Checks:
+        #  - Container image
+        if run_in_container and engine.image_files and not os.path.isfile(image):
+            raise ContainerImageException(image)
+
+        # Look for mount paths:
+        with trace_span("mounts"):
             mount_paths, update_paths, user_mount_paths = self.__find_mount_paths__(
                 kwargs
             )
@@ -250,117 +380,360 @@ class Task(object):
                 # There are paths that need to be fixed in flags list
                 for k, v in update_paths.items():
                     flags[k] = v
-                flags_list = list(flags.values())
-
-            if run_in_container:
-                logging.debug("Mount paths:")
-                for path in mount_paths:
-                    logging.debug("- %s", path)
-                logging.debug(SEPARATOR)
-
-            # Act:
-            BB = PerMedBB(
-                self.image,
-                self.runner,
-                self.binary,
-                self.computing_nodes,
-                self.computing_units,
-                mount_paths,
-                user_mount_paths,
-                self.env_vars,
-                flags_list,
-            )
-            BB.launch(run_in_container=run_in_container)
+            flags_list = self.plan.argv(flags)
+
+        if run_in_container:
+            logging.debug("Mount paths:")
+            for path, read_only in mount_paths:
+                logging.debug("- %s%s", path, " (ro)" if read_only else "")
+            logging.debug(SEPARATOR)
+
+        return PreparedTask(
+            f.__name__,
+            run_in_container,
+            image,
+            engine,
+            runner,
+            binary,
+            computing_nodes,
+            computing_units,
+            mount_paths,
+            user_mount_paths,
+            env_vars,
+            flags_list,
+            streams,
+            resources,
+            options,
+            self.__find_accesses__(kwargs),
+            self.__find_accesses__(kwargs, (FILE_IN, FILE_OUT)),
+            self.plan,
+        )
+
+    def __retry__(self, BB, run_in_container, usage, options):
+        """Launch the building block retrying it if it fails.
+
+        Args:
+            BB (PerMedBB): Building block to launch.
+            run_in_container (bool): Launch execution in container.
+            usage (dict): Filled with the resource usage of the last attempt.
+            options (dict): Execution options (timeout, retries and backoff).
+
+        Raises:
+            TaskExecutionException: If the last attempt fails or times out.
+        """
+        retries = int(options.get("retries", 0))
+        delay = float(options.get("backoff", DEFAULT_BACKOFF))
+        for attempt in range(retries + 1):
+            try:
+                BB.launch(
+                    run_in_container=run_in_container,
+                    usage=usage,
+                    timeout=options.get("timeout"),
+                )
+                return
+            except TaskExecutionException as error:
+                if attempt == retries:
+                    raise
+                logging.warning(
+                    "%s. Retrying in %s seconds (%d/%d)",
+                    str(error),
+                    str(delay),
+                    attempt + 1,
+                    retries,
+                )
+                time.sleep(delay)
+                delay *= 2
+
+    def __account__(self, f, usage, span=None):
+        """Record the resource usage of a task execution.
 
-        return wrapped_f
+        Args:
+            f (function): Decorated function.
+            usage (dict): Resource usage and computing units of the execution.
+            span (dict, optional): Trace span arguments to extend.
+        """
+        if "utime" not in usage:
+            # The binary was not launched (e.g. cache hit)
+            return
+        computing_units = usage.pop("computing_units", 1)
+        building_block = str(f.__module__).split(".")[0]
+        if building_block == "__main__":
+            # Defined in the script: use its name
+            script = os.path.basename(sys.argv[0]) if sys.argv else ""
+            building_block = os.path.splitext(script)[0] or building_block
+        record = task_record(f.__name__, building_block, usage, computing_units)
+        log_usage(record)
+        if span is not None:
+            span.update(usage)
+        report = get_usage_report()
+        if report:
+            report.add(record)
+
+    def __find_accesses__(self, kwargs, types=None):
+        """Looks for the paths accessed by the invocation parameters.
+
+        Args:
+            kwargs (dict): Keyword dictionary (invocation parameters)
+            types (tuple, optional): Parameter types to consider (all the
+                                     file and directory types by default).
+
+        Returns:
+            list: Tuples (absolute path, read, write).
+        """
+        types = DIRECTIONS if types is None else types
+        accesses = []
+        for k, v in self.kwargs.items():
+            if isinstance(v, dict):
+                v = v.get(Type)
+            if v not in types or kwargs.get(k) is None:
+                continue
+            read, write = DIRECTIONS[v]
+            values = kwargs[k] if isinstance(kwargs[k], list) else [kwargs[k]]
+            for value in values:
+                accesses.append((os.path.abspath(str(value)), read, write))
+        return accesses
 
     def __find_mount_paths__(self, kwargs):
         """Looks for mount paths into the give input/output files/directories.
 
+        The requested paths are given to the mount planner, which merges them
+        into a minimal set of bind points (read-only when possible).
+
         Args:
             kwargs (dict): Keyword dictionary (invocation parameters)
 
         Returns:
-            list: List with the paths to be mounted.
+            list: List with the paths to be mounted (path, read_only).
             dict: Dictionary with the flags to be updated
                   (from relative to absolute).
         """
-        mount_paths = []
+        requests = []
         update_paths = {}
         # Look into the invocation parameters
         for k, v in self.kwargs.items():
-            path = ""
-            if v == FILE_IN or v == FILE_OUT:
-                # Remove file name and keep only the folder
-                if isinstance(kwargs[k], list):
-                    for element in kwargs[k]:
-                        path, name = os.path.split(os.path.abspath(element))
-                        update_paths[k] = os.path.join(path, name)
+            if k in TASK_OPTIONS:
+                continue
+            if isinstance(v, dict):
+                if v.get(StdIOStream) in STREAMS:
+                    # Streams are opened in the host (not mounted)
+                    continue
+                v = v.get(Type)
+            if v not in DIRECTIONS:
+                raise PerMedCoEException("Unexpected task tag found.")
+            if kwargs.get(k) is None:
+                continue
+            _, write = DIRECTIONS[v]
+            is_list = isinstance(kwargs[k], list)
+            paths = []
+            for element in kwargs[k] if is_list else [kwargs[k]]:
+                # Relative path to absolute
+                path = os.path.abspath(str(element))
+                if v in (FILE_IN, FILE_OUT, FILE_INOUT):
+                    # Remove file name and keep only the folder
+                    requests.append((os.path.dirname(path), write))
                 else:
-                    path, name = os.path.split(os.path.abspath(kwargs[k]))
-                    update_paths[k] = os.path.join(path, name)
-            elif v == DIRECTORY_IN or v == DIRECTORY_INOUT or v == DIRECTORY_OUT:
-                if isinstance(kwargs[k], list):
-                    for element in kwargs[k]:
-                        if os.path.exists(element):
-                            path = os.path.abspath(element)
-                        elif v == DIRECTORY_OUT:
-                            os.mkdir(element)
-                            path = os.path.abspath(element)
+                    if not os.path.exists(path):
+                        if v == DIRECTORY_OUT:
+                            os.mkdir(path)
                         else:
                             raise PerMedCoEException(
                                 f"Input directory does not exist: {element}"
                             )
-                else:
-                    if os.path.exists(kwargs[k]):
-                        path = os.path.abspath(kwargs[k])
-                    elif v == DIRECTORY_OUT:
-                        os.mkdir(kwargs[k])
-                        path = os.path.abspath(kwargs[k])
-                    else:
-                        raise PerMedCoEException(
-                            f"Input directory does not exist: {element}"
-                        )
-            else:
-                raise PerMedCoEException("Unexpected task tag found.")
-            # Relative path to absolute
-            mount_paths.append(path)
+                    requests.append((path, write))
+                paths.append(path)
+            update_paths[k] = paths if is_list else paths[0]
         # Look into the environment
         if PERMEDCOE_TMPDIR in os.environ:
-            mount_paths.append(os.environ[PERMEDCOE_TMPDIR])
+            requests.append((os.environ[PERMEDCOE_TMPDIR], True))
         user_mount_paths = None
         if PERMEDCOE_MOUNT_POINTS in os.environ:
             user_mount_paths = os.environ[PERMEDCOE_MOUNT_POINTS]
         # Look into the building block
         if BB_ASSETS_PATH in os.environ:
             bb_assets_path = os.environ[BB_ASSETS_PATH]
-            mount_paths.append(bb_assets_path)
-        # Remove duplicated
-        if mount_paths:
-            mount_paths = list(set(mount_paths))
+            requests.append((bb_assets_path, True))
+        mount_paths = plan_mounts(requests)
         return mount_paths, update_paths, user_mount_paths
 
-    @staticmethod
-    def __get_defaults__(func):
-        """Retrieve the default parameters of the given function
+    def __pop_streams__(self, flags):
+        """Remove the stream parameters from the given flags.
 
         Args:
-            func (function): Function to be inspected.
+            flags (dict): Invocation parameters.
 
         Returns:
-            OrderedDict: Contains the parameter name as key and its
-                         default value as its value.
+            dict: Stream (STDIN | STDOUT | STDERR) as key and a tuple
+                  with the file path and its open mode as value.
         """
-        signature = inspect.signature(func)
-        return OrderedDict(
-            {
-                k: v.default
-                for k, v in signature.parameters.items()
-                if v.default is not inspect.Parameter.empty
-            }
+        streams = {}
+        for k, v in self.kwargs.items():
+            if isinstance(v, dict) and v.get(StdIOStream) in STREAMS:
+                stream = v[StdIOStream]
+                if stream in streams:
+                    raise PerMedCoEException(f"Duplicated {stream} parameter: {k}")
+                path = flags.pop(k, None)
+                if path is None:
+                    raise PerMedCoEException(f"Undefined {stream} parameter: {k}")
+                if stream == STDIN:
+                    mode = "rb"
+                elif v.get(Type) == FILE_INOUT:
+                    mode = "ab"
+                else:
+                    mode = "wb"
+                streams[stream] = (os.path.abspath(str(path)), mode)
+        return streams
+
+
+class PreparedTask(object):
+    """Task invocation with everything resolved to launch it."""
+
+    def __init__(
+        self,
+        name,
+        run_in_container,
+        image,
+        engine,
+        runner,
+        binary,
+        computing_nodes,
+        computing_units,
+        mount_paths,
+        user_mount_paths,
+        env_vars,
+        flags,
+        streams,
+        resources,
+        options,
+        accesses,
+        files,
+        plan=None,
+    ):
+        """Constructor
+
+        Args:
+            name (str): Task name.
+            run_in_container (bool): Launch execution in container.
+            image (str): Container image (None if not in container).
+            engine (Engine): Container engine backend.
+            runner (str): MPI runner (None if not MPI).
+            binary (str): Binary (may include arguments).
+            computing_nodes (int): Number of compute nodes needed.
+            computing_units (int): Number of compute units needed (cores).
+            mount_paths (list[tuple(str, bool)]): Planned mounts.
+            user_mount_paths (str): User defined mount paths.
+            env_vars (list[str]): Environment variables (NAME=value).
+            flags (list[str]): Binary arguments.
+            streams (dict): Stream redirections (see __pop_streams__).
+            resources (Resources): Resources to enforce (None if not).
+            options (dict): Execution options (timeout, retries and backoff).
+            accesses (list): Tuples (path, read, write) of all the parameters.
+            files (list): Tuples (path, read, write) of the FILE_IN and
+                          FILE_OUT parameters.
+            plan (LaunchPlan): Task launch plan (None if not available).
+        """
+        self.name = name
+        self.run_in_container = run_in_container
+        self.image = image
+        self.engine = engine
+        self.runner = runner
+        self.binary = binary
+        self.computing_nodes = computing_nodes
+        self.computing_units = computing_units
+        self.mount_paths = mount_paths
+        self.user_mount_paths = user_mount_paths
+        self.env_vars = env_vars
+        self.flags = flags
+        self.streams = streams
+        self.resources = resources
+        self.options = options
+        self.accesses = accesses
+        self.files = files
+        self.plan = plan
+
+    def building_block(self):
+        """Build the building block to launch (using the node-local copy of
+        the image if enabled).
+
+        Returns:
+            PerMedBB: The building block.
+        """
+        image = self.image
+        if self.run_in_container and self.engine.image_files:
+            with trace_span("stage_image"):
+                image = stage_image(image)
+        return PerMedBB(
+            image,
+            self.runner,
+            self.binary,
+            self.computing_nodes,
+            self.computing_units,
+            self.mount_paths,
+            self.user_mount_paths,
+            self.env_vars,
+            self.flags,
+            self.streams,
+            self.resources,
+            self.engine,
+            self.plan,
         )
 
 
+def keep_metadata(wrapped, f, decorator, parameters):
+    """Keep the decorator parameters in the decorated function, so that they
+    can be inspected without invoking it (see get_task_metadata).
+
+    Args:
+        wrapped (function): Decorated function.
+        f (function): Function given to the decorator.
+        decorator (str): Decorator name (e.g. constraint).
+        parameters (dict): Decorator parameters.
+    Returns:
+        function: The decorated function.
+    """
+    default = {"name": f.__name__, "module": f.__module__}
+    metadata = dict(getattr(f, METADATA_ATTRIBUTE, default))
+    metadata[decorator] = dict(parameters)
+    setattr(wrapped, METADATA_ATTRIBUTE, metadata)
+    return wrapped
+
+
+def get_task_metadata(function):
+    """Retrieve the decorators parameters of a task.
+
+    Args:
+        function (function): Function to inspect.
+    Returns:
+        dict: Task name, module and parameters of every decorator by
+              decorator name (e.g. {"name": "my_task", "module": "my_bb.main",
+              "task": {...}, "constraint": {...}}). None if the function is
+              not a @task.
+    """
+    metadata = getattr(function, METADATA_ATTRIBUTE, None)
+    if not isinstance(metadata, dict) or "task" not in metadata:
+        return None
+    return metadata
+
+
+@contextmanager
+def capture_tasks(collector=None):
+    """Capture the @task invocations of this thread instead of launching
+    them.
+
+    Args:
+        collector (object, optional): Receives every invocation through its
+                                      append method (a new list if not given).
+    Yields:
+        list[PreparedTask]: The captured invocations (in call order), or the
+                            given collector.
+    """
+    previous = getattr(__CAPTURE__, "tasks", None)
+    __CAPTURE__.tasks = [] if collector is None else collector
+    try:
+        yield __CAPTURE__.tasks
+    finally:
+        __CAPTURE__.tasks = previous
+
+
 # Naming convention with lowercase
 task = Task
 binary = Binary
@@ -378,6 +751,16 @@ DIRECTORY_OUT = "DIRECTORY_OUT"
 DIRECTORY_INOUT = "DIRECTORY_INOUT"
 Type = "type"
 StdIOStream = "StdIOStream"
-STDIN = None
-STDOUT = None
-STDERR = None
+STDIN = "STDIN"
+STDOUT = "STDOUT"
+STDERR = "STDERR"
+STREAMS = (STDIN, STDOUT, STDERR)
+# Parameter direction: (read, write)
+DIRECTIONS = {
+    FILE_IN: (True, False),
+    FILE_OUT: (False, True),
+    FILE_INOUT: (True, True),
+    DIRECTORY_IN: (True, False),
+    DIRECTORY_OUT: (False, True),
+    DIRECTORY_INOUT: (True, True),
+}
@@ -0,0 +1,387 @@
+"""
+This file provides the container engine backends, which build the command
+line of the task executions with the launch options of every engine:
+
+- apptainer / singularity: exec of the image file (.sif) with a contained
+  and clean environment (apptainer also shares the namespace among the
+  containers of the same process with --sharens).
+- podman / docker: run of the image (named after the image file, with the
+  optional PERMEDCOE_IMAGE_REGISTRY prefix) removed at exit and without
+  network.
+- native: the binary is executed without container.
+
+Apptainer and singularity also support the hybrid MPI mode (see
+permedcoe.core.mpi), where the host MPI runner launches one container per
+rank.
+
+The engine is taken from the PERMEDCOE_ENGINE environment variable if
+defined (which allows to choose the lowest overhead engine of every cluster
+without changing the building blocks), or from @container(engine=...).
+The "auto" engine selects the first engine found in the PATH. The launch
+options of the engine can be replaced with PERMEDCOE_ENGINE_FLAGS.
+
+The memory of the apptainer and singularity containers is only limited with
+their --memory option if PERMEDCOE_MEMORY_CGROUPS is enabled, since it
+requires cgroups v2 delegation (which is not available in many HPC nodes).
+"""
+
+import os
+import abc
+import shlex
+import shutil
+from functools import lru_cache
+
+from permedcoe.core.constants import PERMEDCOE_ENGINE
+from permedcoe.core.constants import PERMEDCOE_ENGINE_FLAGS
+from permedcoe.core.constants import PERMEDCOE_IMAGE_REGISTRY
+from permedcoe.core.constants import PERMEDCOE_MEMORY_CGROUPS
+from permedcoe.utils.exceptions import PerMedCoEException
+
+DEFAULT_ENGINE = "singularity"
+AUTO_ENGINE = "auto"
+# Engines checked by the auto selection (in order of preference)
+AUTO_ORDER = ("apptainer", "singularity", "podman", "docker")
+IMAGE_EXTENSION = ".sif"
+ENABLED_VALUES = ("1", "true", "yes")
+
+
+class Engine(abc.ABC):
+    """Container engine backend (base class: every backend must implement the
+    abstract methods, otherwise it can not be instantiated)."""
+
+    name = None
+    executable = None
+    native = False  # runs without container
+    image_files = True  # the images are files (validated and staged)
+    instances = False  # supports persistent instances
+    cpuset = False  # binds the cores itself (the container is not a child)
+    fast_flags = ()  # launch options to reduce the startup overhead
+
+    def __init__(self, flags=None):
+        """Constructor
+
+        Args:
+            flags (list[str], optional): Launch options that replace the
+                                         engine fast_flags.
+        """
+        self.flags = list(self.fast_flags if flags is None else flags)
+
+    def available(self):
+        """Check if the engine executable is in the PATH.
+
+        Returns:
+            bool: True if available. False otherwise.
+        """
+        return self.native or shutil.which(self.executable) is not None
+
+    def base(self):
+        """Engine base command.
+
+        Returns:
+            list[str]: Base command.
+        """
+        return [self.executable]
+
+    @abc.abstractmethod
+    def action(self, shell=False):
+        """Engine action to run a command within the container.
+
+        Args:
+            shell (bool, optional): Interactive shell.
+        Returns:
+            list[str]: Action.
+        """
+
+    @abc.abstractmethod
+    def exec_flags(self, workdir, stdin=False):
+        """Options of the action.
+
+        Args:
+            workdir (str): Working directory within the container.
+            stdin (bool, optional): The standard input is redirected.
+        Returns:
+            list[str]: Action options.
+        """
+
+    def rank_exec_flags(self, workdir, stdin=False):
+        """Options of the action when every MPI rank is launched in its own
+        container by the host MPI runner (hybrid mode).
+
+        Args:
+            workdir (str): Working directory within the container.
+            stdin (bool, optional): The standard input is redirected.
+        Returns:
+            list[str]: Action options.
+
+        Raises:
+            PerMedCoEException: If the engine does not support it.
+        """
+        raise PerMedCoEException(
+            f"The {self.name} engine does not support the hybrid MPI mode"
+        )
+
+    def resource_flags(self, cpus, memory):
+        """Options that enforce the cores (only if cpuset) and the memory
+        of the container (only if limits_memory).
+
+        Args:
+            cpus (list[int]): Cores to bind (empty to not bind).
+            memory (int): Memory limit in bytes (None to not limit).
+        Returns:
+            list[str]: Resource options.
+        """
+        return []
+
+    def limits_memory(self):
+        """Check if the resource options limit the memory of the container
+        (otherwise its processes inherit the limits of the command).
+
+        Returns:
+            bool: True if the engine limits the memory. False otherwise.
+        """
+        return False
+
+    def instance_flags(self):
+        """Options to start a persistent instance (besides mounts and
+        environment variables).
+
+        Returns:
+            list[str]: Instance start options.
+        """
+        return []
+
+    def instance_exec_flags(self, workdir):
+        """Options of the action within a persistent instance (besides the
+        environment variables, which are not inherited from the instance).
+
+        Args:
+            workdir (str): Working directory within the container.
+        Returns:
+            list[str]: Action options.
+        """
+        return self.exec_flags(workdir)
+
+    @abc.abstractmethod
+    def mount_flags(self, binds):
+        """Bind mount options.
+
+        Args:
+            binds (list[str]): Mounts (source:target or source:target:ro).
+        Returns:
+            list[str]: Mount options.
+        """
+
+    @abc.abstractmethod
+    def env_flags(self, env_vars):
+        """Environment variables options.
+
+        Args:
+            env_vars (list[str]): Environment variables (NAME=value).
+        Returns:
+            list[str]: Environment options.
+        """
+
+    def image(self, image):
+        """Image reference to use in the command line.
+
+        Args:
+            image (str): Container image from @container.
+        Returns:
+            str: Image reference.
+        """
+        return image
+
+
+class SingularityEngine(Engine):
+    """Singularity engine (exec of .sif images)."""
+
+    name = "singularity"
+    executable = "singularity"
+    instances = True
+
+    def base(self):
+        return [self.executable, "--silent"]
+
+    def action(self, shell=False):
+        return ["shell"] if shell else ["exec"]
+
+    def exec_flags(self, workdir, stdin=False):
+        return self.instance_flags() + self.flags + ["--pwd", workdir]
+
+    def rank_exec_flags(self, workdir, stdin=False):
+        # The ranks need the environment of the runner (e.g. PMI_RANK) and
+        # the host /dev/shm (shared memory among the ranks of a node)
+        return self.flags + ["--pwd", workdir]
+
+    def resource_flags(self, cpus, memory):
+        # The cores are bound with the affinity inherited from the command
+        if memory and self.limits_memory():
+            return ["--memory", str(memory)]
+        return []
+
+    def limits_memory(self):
+        # Requires cgroups v2 delegation: only if explicitly enabled
+        enabled = os.environ.get(PERMEDCOE_MEMORY_CGROUPS, "").lower()
+        return enabled in ENABLED_VALUES
+
+    def instance_flags(self):
+        return ["--contain", "--cleanenv"]
+
+    def instance_exec_flags(self, workdir):
+        # The instance is already contained
+        return ["--cleanenv"] + self.flags + ["--pwd", workdir]
+
+    def mount_flags(self, binds):
+        return ["-B", ",".join(binds)] if binds else []
+
+    def env_flags(self, env_vars):
+        return ["--env", ",".join(env_vars)] if env_vars else []
+
+
+class ApptainerEngine(SingularityEngine):
+    """Apptainer engine (exec of .sif images sharing the namespace)."""
+
+    name = "apptainer"
+    executable = "apptainer"
+    fast_flags = ("--sharens",)
+
+
+class PodmanEngine(Engine):
+    """Podman engine (run of OCI images)."""
+
+    name = "podman"
+    executable = "podman"
+    image_files = False
+    cpuset = True
+    fast_flags = ("--network=none",)
+
+    def action(self, shell=False):
+        return ["run", "-it"] if shell else ["run"]
+
+    def exec_flags(self, workdir, stdin=False):
+        flags = ["--rm"] + self.flags + ["-w", workdir]
+        if stdin:
+            flags.append("-i")
+        return flags
+
+    def resource_flags(self, cpus, memory):
+        flags = []
+        if cpus:
+            flags += ["--cpuset-cpus", ",".join(str(cpu) for cpu in cpus)]
+        if memory:
+            flags += ["--memory", str(memory)]
+        return flags
+
+    def limits_memory(self):
+        # The cgroups are managed by the engine service
+        return True
+
+    def mount_flags(self, binds):
+        return [flag for bind in binds for flag in ("-v", bind)]
+
+    def env_flags(self, env_vars):
+        return [flag for var in env_vars for flag in ("-e", var)]
+
+    def image(self, image):
+        if os.sep not in str(image) and not str(image).endswith(IMAGE_EXTENSION):
+            # Already an image reference
+            return image
+        # Named after the image file (e.g. /images/MaBoSS.sif -> maboss)
+        name = os.path.splitext(os.path.basename(str(image)))[0].lower()
+        return os.environ.get(PERMEDCOE_IMAGE_REGISTRY, "") + name
+
+
+class DockerEngine(PodmanEngine):
+    """Docker engine (run of OCI images as the current user)."""
+
+    name = "docker"
+    executable = "docker"
+
+    def exec_flags(self, workdir, stdin=False):
+        # The outputs must belong to the user (not to root)
+        user = ["--user", f"{os.getuid()}:{os.getgid()}"]
+        return super().exec_flags(workdir, stdin) + user
+
+
+class NativeEngine(Engine):
+    """No container: the binary is executed directly."""
+
+    name = "native"
+    native = True
+    image_files = False
+
+    def base(self):
+        return []
+
+    def action(self, shell=False):
+        return []
+
+    def exec_flags(self, workdir, stdin=False):
+        return []
+
+    def rank_exec_flags(self, workdir, stdin=False):
+        return []
+
+    def mount_flags(self, binds):
+        # The paths are used directly
+        return []
+
+    def env_flags(self, env_vars):
+        # Given in the process environment
+        return []
+
+
+ENGINES = {
+    engine.name: engine
+    for engine in (
+        ApptainerEngine,
+        SingularityEngine,
+        PodmanEngine,
+        DockerEngine,
+        NativeEngine,
+    )
+}
+
+
+def get_engine(name=None):
+    """Retrieve the engine backend to use.
+
+    Args:
+        name (str, optional): Engine requested by @container (e.g.
+                              SINGULARITY). PERMEDCOE_ENGINE takes precedence.
+    Returns:
+        Engine: The engine backend.
+
+    Raises:
+        PerMedCoEException: If the engine is unknown or there is no engine
+                            available with "auto".
+    """
+    name = os.environ.get(PERMEDCOE_ENGINE) or name or DEFAULT_ENGINE
+    return __get_engine__(name.lower(), os.environ.get(PERMEDCOE_ENGINE_FLAGS))
+
+
+@lru_cache(maxsize=None)
+def __get_engine__(name, flags):
+    """Build (once per name and flags) the engine backend.
+
+    Args:
+        name (str): Engine name (lowercase).
+        flags (str): Launch options that replace the engine ones (None to
+                     use the engine ones).
+    Returns:
+        Engine: The engine backend.
+    """
+    flags = shlex.split(flags) if flags is not None else None
+    if name == AUTO_ENGINE:
+        for candidate in AUTO_ORDER:
+            engine = ENGINES[candidate](flags)
+            if engine.available():
+                return engine
+        raise PerMedCoEException(
+            f"No container engine found in the PATH: {', '.join(AUTO_ORDER)}"
+        )
+    if name not in ENGINES:
+        raise PerMedCoEException(
+            f"Unknown container engine {name} (supported: {', '.join(ENGINES)})"
+        )
+    return ENGINES[name](flags)
@@ -5,3 +5,4 @@
 
 DEBUG = False
 DISABLE_CONTAINER = False
+REUSE_INSTANCES = False
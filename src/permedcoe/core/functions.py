@@ -1,15 +1,14 @@
 import os
 import importlib
 import logging
-import pathlib
 import shutil
 import subprocess
 import sys
-import urllib.request
-from urllib.error import HTTPError
-import zipfile
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 from permedcoe.base import invoker
+from permedcoe.base import batch_invoker
 from permedcoe.bb import get_container_path
 from permedcoe.utils.log import init_logging
 from permedcoe.utils.executor import command_runner
@@ -17,6 +16,13 @@ from permedcoe.utils.artifact import adapt_name
 from permedcoe.utils.artifact import rename_folder
 from permedcoe.utils.artifact import show_todo
 from permedcoe.utils.exceptions import PerMedCoEException
+from permedcoe.utils.batch import load_batch_rows
+from permedcoe.utils.batch import write_batch_summary
+from permedcoe.utils.batch import SUMMARY_SUFFIX
+from permedcoe.core.constants import SEPARATOR
+from permedcoe.core.constants import PERMEDCOE_IMAGE_CACHE
+from permedcoe.core.images import get_image_stager
+from permedcoe.core.images import VALIDATE_DIGEST
 
 
 BUILDING_BLOCK_LABELS = ("building_block", "bb")
@@ -41,9 +47,17 @@ def execute_building_block(arguments):
         assets_path = bb_module.definitions.ASSETS_PATH
     except AttributeError:
         raise PerMedCoEException(
-            f"ERROR: The Building Block {bb_name} does not contain ASSETS_PATH defined in definitions.py file"
+            f"ERROR: The Building Block {building_block} does not contain ASSETS_PATH defined in definitions.py file"
         )
-    if os.path.isfile(params_json_file):
+    if getattr(arguments, "batch", None):
+        if os.path.isfile(params_json_file):
+            arguments_info = params_json_file
+        else:
+            arguments_info = getattr(bb_module, "arguments_info", None)
+        __execute_building_block_batch__(
+            arguments, invoke_function, arguments_info, assets_path
+        )
+    elif os.path.isfile(params_json_file):
         __set_bb_sysargv__(building_block)
         invoker(
             function=invoke_function,
@@ -60,6 +74,52 @@ def execute_building_block(arguments):
             invoker(function=invoke_function)
 
 
+def __execute_building_block_batch__(
+    arguments, invoke_function, arguments_info, assets_path
+):
+    """Execute the requested building block once per row of the batch file.
+
+    Args:
+        arguments (Namespace): System arguments.
+        invoke_function (function): Building block invoke function.
+        arguments_info (function or string): Building block arguments information.
+        assets_path (str): Building block assets path.
+    """
+    rows = load_batch_rows(arguments.batch)
+    summary_file = arguments.summary
+    if not summary_file:
+        summary_file = os.path.splitext(arguments.batch)[0] + SUMMARY_SUFFIX
+    logging.info("Batch file: %s (%d rows)", str(arguments.batch), len(rows))
+    results = batch_invoker(
+        function=invoke_function,
+        rows=rows,
+        arguments_info=arguments_info,
+        assets_path=assets_path,
+        shared_argv=arguments.parameters,
+        jobs=max(1, arguments.jobs),
+    )
+    __report_batch__(summary_file, results)
+
+
+def __report_batch__(summary_file, results):
+    """Write the batch summary and show the failed rows.
+
+    Args:
+        summary_file (str): Batch summary file.
+        results (list[dict]): Per-row results.
+    """
+    write_batch_summary(summary_file, results)
+    failed = [result for result in results if result["status"] != "success"]
+    print(SEPARATOR)
+    print(f"Batch finished: {len(results) - len(failed)}/{len(results)} rows succeeded")
+    for result in failed:
+        print(f"- Row {result['row']}: {result['status']} ({result['exit_code']})")
+    print(f"Summary: {summary_file}")
+    print(SEPARATOR)
+    if failed:
+        sys.exit(1)
+
+
 def __set_bb_sysargv__(name):
     """Removes the unnecessary parameters from sys.argv so that
     the building block invocation does not fail.
@@ -111,7 +171,7 @@ def execute_application(arguments):
     command_runner(command)
 
 
-def create_template(debug, log_level, artifact, name, app_type=None):
+def create_template(debug, log_level, artifact, name, app_type=None, from_app=None):
     """Creates a building block or application template.
 
     Args:
@@ -120,6 +180,8 @@ def create_template(debug, log_level, artifact, name, app_type=None):
         artifact (str): Artifact (building block or application)
         name (str): Artifact name
         type (str): Specific type of application (ignored for building blocks)
+        from_app (str): Application whose building blocks resources are used
+                        to generate the NextFlow and SnakeMake workflows.
 
     Raises:
         Exception: Unsupported artifact
@@ -127,12 +189,12 @@ def create_template(debug, log_level, artifact, name, app_type=None):
     # Init logging
     init_logging(debug, log_level)
     # Prepare destination
-    current_path = pathlib.Path().absolute()
+    current_path = os.getcwd()
     if os.path.exists(os.path.join(current_path, name)):
         print(f"Can not create template. A folder with name {name} already exists.")
         exit(1)
     # Prepare source
-    egg_path = pathlib.Path(__file__).parent.parent.absolute()
+    egg_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     source_path = os.path.join(egg_path, "templates")
     # Choose what to extract to this folder
     if artifact in BUILDING_BLOCK_LABELS:
@@ -158,6 +220,9 @@ def create_template(debug, log_level, artifact, name, app_type=None):
     # Adapt name into the files
     logging.debug("Adapting name: %s to the artifact", str(name))
     adapt_name(name, destination_path)
+    # Generate the workflows from the application building blocks
+    if from_app and artifact in APPLICATION_LABELS:
+        __generate_workflows__(from_app, destination_path)
     # Adapt folder name if needed
     if artifact in BUILDING_BLOCK_LABELS:
         # Rename folder
@@ -168,13 +233,41 @@ def create_template(debug, log_level, artifact, name, app_type=None):
     show_todo(destination_path)
 
 
-def deploy_bb(debug, log_level, name):
+def __generate_workflows__(from_app, destination_path):
+    """Replace the NextFlow and SnakeMake workflows of an application
+    template with the ones generated from the given application.
+
+    Args:
+        from_app (str): Application (python file).
+        destination_path (str): Application template path.
+    """
+    # Imported here since it is only needed to generate workflows
+    from permedcoe.core.workflows import generate_workflow
+
+    workflows = [
+        (os.path.join(destination_path, "NextFlow.nf"), "nextflow"),
+        (os.path.join(destination_path, "NextFlow", "NextFlow.nf"), "nextflow"),
+        (os.path.join(destination_path, "Snakefile"), "snakemake"),
+        (os.path.join(destination_path, "SnakeMake", "Snakefile"), "snakemake"),
+    ]
+    workflows = [(path, manager) for path, manager in workflows if os.path.isfile(path)]
+    if not workflows:
+        logging.warning("Only NextFlow and SnakeMake workflows are generated")
+    for path, workflow_manager in workflows:
+        logging.debug("Generating %s from %s", path, from_app)
+        content = generate_workflow(from_app, workflow_manager)
+        with open(path, "w") as workflow_fd:
+            workflow_fd.write(content)
+
+
+def deploy_bb(debug, log_level, name, jobs=1):
     """Deploys the requested building block.
 
     Args:
         debug (bool): Force debug mode.
         log_level (str): Log level.
         name (str): Building block name.
+        jobs (int): Number of concurrent checks and downloads.
 
     Raises:
         Exception: Not found building block.
@@ -182,26 +275,106 @@ def deploy_bb(debug, log_level, name):
     # Init logging
     init_logging(debug, log_level)
     logging.debug("Checking Building Block: %s", str(name))
-    __deploy_bb__(name)
+    __deploy_bbs__([name], jobs)
 
 
-def __deploy_bb__(name):
-    """Deploys the requested building block.
+def __deploy_bbs__(names, jobs=1):
+    """Deploys the requested building blocks and their containers.
+
+    The full set of building blocks and containers is resolved first, so
+    that the containers shared among building blocks are downloaded once.
+    The checks and downloads run concurrently (up to jobs), whereas the
+    installations run one after the other, since concurrent pip installations
+    into the same environment race on the shared dependencies and metadata.
 
     Args:
-        name (str): Building block name.
+        names (list[str]): Building block names.
+        jobs (int): Number of concurrent checks and downloads.
 
-    Raises:
-        Exception: Not found building block.
+    Returns:
+        Boolean: True if all building blocks were deployed. False otherwise.
     """
-    url = f"https://github.com/PerMedCoE/BuildingBlocks/tree/main/{name}"
-    bb_exists = __check_url__(url)
+    names = list(dict.fromkeys(names))  # remove duplicates keeping the order
+    report = []
     container_folder = get_container_path()
-    if bb_exists:
-        __install_bb__(name)
-        __deploy_container__(name, container_folder)
-    else:
-        print("ERROR: Building Block %s not found.", str(name))
+    # Check that the building blocks exist
+    urls = [f"https://github.com/PerMedCoE/BuildingBlocks/tree/main/{n}" for n in names]
+    found = __run_concurrently__(__check_url__, urls, jobs, report, "check", names)
+    missing = [name for name, exists in zip(names, found) if not exists]
+    for name in missing:
+        print(f"ERROR: Building Block {name} not found.")
+    names = [name for name in names if name not in missing]
+    # Install the building blocks (pip is not safe to run concurrently)
+    installed = __run_concurrently__(__install_bb__, names, 1, report, "install", names)
+    names = [name for name, success in zip(names, installed) if success]
+    # Resolve the containers required by all building blocks
+    containers = []
+    importlib.invalidate_caches()
+    for name in names:
+        for container in __get_containers__(name):
+            if container not in containers:
+                containers.append(container)
+    pending = []
+    for container in containers:
+        container_file = os.path.join(container_folder, f"{container}.sif")
+        if os.path.isfile(container_file):
+            logging.debug("Container %s already exists", container)
+            report.append((container, "pull", "skipped", 0.0))
+        else:
+            pending.append(container)
+    pulled = __run_concurrently__(
+        lambda c: __download_container__(c, container_folder),
+        pending,
+        jobs,
+        report,
+        "pull",
+        pending,
+    )
+    __show_deploy_report__(report)
+    return not missing and all(installed) and all(pulled)
+
+
+def __run_concurrently__(function, items, jobs, report, action, labels):
+    """Run the function for every item (up to jobs at the same time).
+
+    Args:
+        function (function): Function to run (True or None if success).
+        items (list): Function parameters.
+        jobs (int): Number of concurrent executions.
+        report (list): Where to append the (label, action, status, time).
+        action (str): Action name for the report.
+        labels (list[str]): Report label of each item.
+
+    Returns:
+        list[Boolean]: If each item succeeded.
+    """
+
+    def run(item):
+        start = time.time()
+        try:
+            success = function(item) is not False
+        except (SystemExit, Exception) as error:  # noqa: reported per item
+            logging.error("Failed to %s %s: %s", action, str(item), str(error))
+            success = False
+        return success, time.time() - start
+
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+        results = list(executor.map(run, items))
+    for label, (success, elapsed) in zip(labels, results):
+        report.append((label, action, "ok" if success else "failed", elapsed))
+    return [success for success, _ in results]
+
+
+def __show_deploy_report__(report):
+    """Shows the time spent in each deployment item.
+
+    Args:
+        report (list): Tuples (item, action, status, time).
+    """
+    print(SEPARATOR)
+    for item, action, status, elapsed in report:
+        print(f"{action:<8} {status:<8} {elapsed:8.2f} s  {item}")
+    print(SEPARATOR)
 
 
 def __install_bb__(name):
@@ -221,12 +394,14 @@ def __install_bb__(name):
     command_runner(cmd)
 
 
-def __deploy_container__(name, container_folder):
-    """Donwload and deploy the building block associated container.
+def __get_containers__(name):
+    """Retrieve the containers required by the given building block.
 
     Args:
         name (str): Building block name.
-        container_folder (str): Container destination folder.
+
+    Returns:
+        list[str]: Container names (lower case and without extension).
     """
     bb_module = importlib.import_module(name + "_BB")
     container_name = bb_module.definitions.CONTAINER_NAME
@@ -236,54 +411,61 @@ def __deploy_container__(name, container_folder):
             "More than one container required for this Building Block: %s",
             container_name,
         )
-        for container in container_name:
-            __download_container__(container, container_folder)
+        containers = container_name
     elif isinstance(container_name, str):
         # Single container required
         logging.debug(
             "One container required for this Building Block: %s", container_name
         )
-        __download_container__(container_name, container_folder)
+        containers = [container_name]
     else:
         raise PerMedCoEException(
             f"ERROR: Container name must be string or list of strings. Not: {container_name}"
         )
+    containers = [container.lower() for container in containers]
+    return [
+        os.path.splitext(c)[0] if c.endswith(".sif") else c for c in containers
+    ]
 
 
 def __download_container__(name, container_folder):
     """Donwload the building block associated container.
 
     Args:
-        name (str): Building block name.
+        name (str): Container name (lower case and without extension).
         container_folder (str): Container destination folder.
     """
-    name = name.lower()
-    if name.endswith(".sif"):
-        container_name = name
-        name = os.path.splitext(name)[0]
-    else:
-        container_name = f"f{name}.sif"
-    container_file = os.path.join(container_folder, container_name)
+    container_file = os.path.join(container_folder, f"{name}.sif")
     if os.path.exists(container_file) and os.path.isfile(container_file):
         logging.debug("Container %s already exists", name)
     else:
         logging.debug("Downloading %s container", name)
+        # Pull into a temporary file so that an interrupted download
+        # is not taken as an existing container
+        tmp_file = f"{container_file}.tmp-{os.getpid()}"
         cmd = [
             "apptainer",
             "pull",
-            container_file,
+            tmp_file,
             f"docker://ghcr.io/permedcoe/{name}:latest",
         ]
-        command_runner(cmd)
+        try:
+            command_runner(cmd)
+            os.replace(tmp_file, container_file)
+        finally:
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
 
 
-def deploy_workflow(debug, log_level, name):
+def deploy_workflow(debug, log_level, name, jobs=1, checksum=None):
     """Deploys the requested workflow.
 
     Args:
         debug (bool): Force debug mode.
         log_level (str): Log level.
         name (str): Workflow name.
+        jobs (int): Number of concurrent checks and downloads.
+        checksum (str): Expected sha256 digest of the workflow zip file.
 
     Raises:
         Exception: Not found workflow.
@@ -291,78 +473,208 @@ def deploy_workflow(debug, log_level, name):
     # Init logging
     init_logging(debug, log_level)
     logging.debug("Checking Workflow: %s", str(name))
-    url = f"https://github.com/PerMedCoE/{name}/"
-    workflow_exists = __check_url__(url)
-    if workflow_exists:
-        logging.debug("Found Workflow: %s", str(url))
-        zip_file = f"https://github.com/PerMedCoE/{name}/archive/refs/heads/main.zip"
-        # Check if exists a file called main.zip in this folder before continuing
-        logging.debug("Checking if associated zip file exists: %s", str(zip_file))
-        zip_exists = __check_url__(zip_file)
-        if zip_exists:
-            logging.debug("Found zip file: %s", str(zip_file))
-            # Download zip file in the current folder
-            current_folder = os.getcwd()
-            target_file = os.path.join(current_folder, "main.zip")
-            if os.path.exists(target_file):
-                print(f"ERROR: A file named {target_file} already exists.")
-                print(
-                    "       Please, try again in another folder or remove the existing 'main.zip' file."
-                )
-            else:
-                # file with the same name does not exist in the current folder
-                logging.debug("Downloading zip file: %s", str(zip_file))
-                con = urllib.request.urlopen(zip_file)
-                with con as dl_zip_file:
-                    with open(target_file, "wb") as out_file:
-                        out_file.write(dl_zip_file.read())
-                logging.debug("Downloaded into: %s", str(target_file))
-                # Unzip the downloaded file
-                logging.debug("Unzipping file: %s", str(target_file))
-                with zipfile.ZipFile(target_file, "r") as zip_ref:
-                    zip_ref.extractall(current_folder)
-                extracted_folder = os.path.join(current_folder, f"{name}-main")
-                logging.debug(
-                    "Unzipped file into the folder: %s", str(extracted_folder)
-                )
-                # Rename folder
-                target_folder = os.path.join(current_folder, str(name))
-                logging.debug(
-                    "Renaming folder: %s to %s",
-                    str(extracted_folder),
-                    str(target_folder),
-                )
-                if os.path.exists(target_folder):
-                    print(f"ERROR: A folder named {target_folder} already exists.")
-                    print(
-                        "       Please, try again in another folder or remove the existing folder."
-                    )
-                else:
-                    shutil.move(extracted_folder, target_folder)
-                    logging.debug("Final folder: %s", str(target_folder))
-                # Clean main.zip (downloaded file)
-                logging.debug("Cleaning downloaded file: %s", str(target_file))
-                os.remove(target_file)
-                print("SUCCESS: Workflow deployed.")
-                # Now install the workflow associated building blocks
-                logging.debug("Installing workflow building blocks.")
-                bb_installed = __install_workflow_building_blocks__(target_folder)
-                if bb_installed:
-                    print(
-                        f"SUCCESS: Building Blocks for {name} successfully installed."
-                    )
-                    # Finally, give next steps information
-                    __show_instructions__(target_folder, str(name))
-                else:
-                    print("ERROR: Could not install the necessary Building Blocks")
-        else:
-            print(f"ERROR: Could not found workflow {name} zip file.")
-    else:
+    zip_file = f"https://github.com/PerMedCoE/{name}/archive/refs/heads/main.zip"
+    current_folder = os.getcwd()
+    target_folder = os.path.join(current_folder, str(name))
+    if os.path.exists(target_folder):
+        print(f"ERROR: A folder named {target_folder} already exists.")
+        print(
+            "       Please, try again in another folder or remove the existing folder."
+        )
+        return
+    # Imported here since they are only needed to deploy
+    from urllib.error import HTTPError
+    from permedcoe.utils.download import download_file
+    from permedcoe.utils.download import extract_zip
+
+    # The download is streamed into <name>-main.zip.part, which is resumed
+    # if the deployment is interrupted and launched again in this folder
+    target_file = os.path.join(current_folder, f"{name}-main.zip")
+    logging.debug("Downloading zip file: %s", str(zip_file))
+    try:
+        download_file(zip_file, target_file, checksum)
+    except HTTPError:
         print(f"ERROR: Workflow {name} not found.")
+        return
+    logging.debug("Downloaded into: %s", str(target_file))
+    # Unzip the downloaded file straight into the target folder
+    logging.debug("Unzipping file: %s into %s", str(target_file), str(target_folder))
+    extract_zip(target_file, target_folder, strip_prefix=f"{name}-main/")
+    logging.debug("Final folder: %s", str(target_folder))
+    # Clean the downloaded file
+    logging.debug("Cleaning downloaded file: %s", str(target_file))
+    os.remove(target_file)
+    print("SUCCESS: Workflow deployed.")
+    # Now install the workflow associated building blocks
+    logging.debug("Installing workflow building blocks.")
+    bb_installed = __install_workflow_building_blocks__(target_folder, jobs)
+    if bb_installed:
+        print(f"SUCCESS: Building Blocks for {name} successfully installed.")
+        # Finally, give next steps information
+        __show_instructions__(target_folder, str(name))
+    else:
+        print("ERROR: Could not install the necessary Building Blocks")
+
+
+def stage_images(debug, log_level, names, cache=None, digest=False, warm=False):
+    """Stages the requested container images into the node-local image cache.
+
+    Args:
+        debug (bool): Force debug mode.
+        log_level (str): Log level.
+        names (list[str]): Images to stage (names in PERMEDCOE_IMAGES or
+                           paths). All images in PERMEDCOE_IMAGES if empty.
+        cache (str): Image cache folder (default: PERMEDCOE_IMAGE_CACHE).
+        digest (bool): Validate the staged images with their digest.
+        warm (bool): Pre-read the staged images into the page cache.
+
+    Raises:
+        Exception: Image cache not defined or image not found.
+    """
+    # Init logging
+    init_logging(debug, log_level)
+    stager = get_image_stager(cache)
+    if not stager:
+        raise PerMedCoEException(
+            f"Please define {PERMEDCOE_IMAGE_CACHE} environment variable or --cache."
+        )
+    if digest:
+        stager.validate = VALIDATE_DIGEST
+    stager.warm = stager.warm or warm
+    container_folder = get_container_path()
+    if not names:
+        names = sorted(n for n in os.listdir(container_folder) if n.endswith(".sif"))
+    for name in names:
+        image = name if os.path.isfile(name) else os.path.join(container_folder, name)
+        if not os.path.isfile(image):
+            raise PerMedCoEException(f"Container image not found: {name}")
+        start = time.time()
+        local = stager.stage(image)
+        print(f"{image} -> {local} ({time.time() - start:.2f} s)")
+
+
+def serve(debug, log_level, names, socket_path=None, jobs=None, idle_timeout=None):
+    """Runs the building block server until stopped.
+
+    Args:
+        debug (bool): Force debug mode.
+        log_level (str): Log level.
+        names (list[str]): Building blocks to import at start up.
+        socket_path (str): Socket to listen on (default: PERMEDCOE_SERVER).
+        jobs (int): Maximum number of concurrent invocations.
+        idle_timeout (float): Seconds without invocations before stopping.
+    """
+    # Imported here since it is only needed by the server (and it imports
+    # the command line entry point)
+    from permedcoe.core.server import serve as __serve__
+
+    # Init logging
+    init_logging(debug, log_level)
+    __serve__(socket_path, jobs, idle_timeout, names)
+
+
+def submit_bb(
+    debug,
+    log_level,
+    name,
+    batch,
+    parameters=None,
+    pack=1,
+    jobs=1,
+    throttle=None,
+    workdir=None,
+    sbatch_flags=None,
+    dry_run=False,
+):
+    """Submits a building block batch as a SLURM job array.
+
+    Args:
+        debug (bool): Force debug mode.
+        log_level (str): Log level.
+        name (str): Building block name.
+        batch (str): Batch file (jsonl or csv).
+        parameters (list[str]): Building block parameters common to all rows.
+        pack (int): Rows per array element.
+        jobs (int): Rows run at the same time by every array element.
+        throttle (int): Array elements running at the same time.
+        workdir (str): Submission folder (default: <batch>.slurm).
+        sbatch_flags (str): Additional sbatch options.
+        dry_run (bool): Prepare the submission folder without submitting.
+    """
+    # Imported here since it is only needed to submit
+    from permedcoe.core.submit import submit_building_block
+
+    # Init logging
+    init_logging(debug, log_level)
+    submission = submit_building_block(
+        name, batch, parameters, pack, jobs, throttle, workdir, sbatch_flags, dry_run
+    )
+    print(SEPARATOR)
+    print(
+        f"Building Block {name}: {submission['rows']} rows in "
+        f"{submission['elements']} array elements"
+    )
+    for directive in submission["directives"]:
+        print(f"- {directive}")
+    if submission["job_id"]:
+        print(f"Submitted job: {submission['job_id']}")
+    else:
+        print(f"Not submitted (dry run): {' '.join(submission['command'])}")
+    print(f"Submission folder: {submission['workdir']}")
+    print(SEPARATOR)
+
+
+def submission_status(debug, log_level, workdir):
+    """Shows the state of the array elements of a submission.
+
+    Args:
+        debug (bool): Force debug mode.
+        log_level (str): Log level.
+        workdir (str): Submission folder.
+    """
+    # Imported here since it is only needed to submit
+    from permedcoe.core.submit import get_status
+
+    # Init logging
+    init_logging(debug, log_level)
+    submission, states = get_status(workdir)
+    elements = {}
+    for index, state in states.items():
+        elements.setdefault(state, []).append(index)
+    print(SEPARATOR)
+    print(
+        f"Building Block {submission['name']} (job {submission['job_id']}): "
+        f"{submission['elements']} array elements"
+    )
+    for state in sorted(elements):
+        indexes = ",".join(str(index) for index in elements[state])
+        print(f"- {state}: {len(elements[state])} ({indexes})")
+    print(SEPARATOR)
+
+
+def collect_submission(debug, log_level, workdir, summary_file=None):
+    """Merges the summaries of the array elements of a submission.
+
+    Args:
+        debug (bool): Force debug mode.
+        log_level (str): Log level.
+        workdir (str): Submission folder.
+        summary_file (str): Batch summary file (default:
+                            <batch>.summary.jsonl).
+    """
+    # Imported here since it is only needed to submit
+    from permedcoe.core.submit import collect_results
+
+    # Init logging
+    init_logging(debug, log_level)
+    submission, results = collect_results(workdir)
+    if not summary_file:
+        summary_file = os.path.splitext(submission["batch"])[0] + SUMMARY_SUFFIX
+    __report_batch__(summary_file, results)
 
 
 def __check_url__(url):
-    """Checks if the given url exists.
+    """Checks if the given url exists (without downloading its content).
 
     Args:
         url (str): Url to check.
@@ -370,19 +682,26 @@ def __check_url__(url):
     Return:
         Boolean: If the url exists.
     """
+    # Imported here since it is only needed to deploy
+    import urllib.request
+    from urllib.error import HTTPError
+
+    request = urllib.request.Request(url, method="HEAD")
     try:
-        status_code = urllib.request.urlopen(url).getcode()
+        with urllib.request.urlopen(request) as response:
+            status_code = response.getcode()
     except HTTPError:
         return False
     return status_code == 200
 
 
-def __install_workflow_building_blocks__(workflow_path):
+def __install_workflow_building_blocks__(workflow_path, jobs=1):
     """Runs the install script within the workflow path that downloads and installs
     its necessary building blocks.
 
     Args:
         workflow_path (str): Directory that contains a workflow.
+        jobs (int): Number of concurrent checks and downloads.
 
     Return:
         Boolean: True if success. False otherwise
@@ -393,11 +712,9 @@ def __install_workflow_building_blocks__(workflow_path):
         with open(wf_required_bbs) as fd:
             for line in fd:
                 l = line.strip()
-                if not l.startswith("#"):
+                if l and not l.startswith("#"):
                     required_bbs.append(l)
-        for bb in required_bbs:
-            __deploy_bb__(bb)
-        return True
+        return __deploy_bbs__(required_bbs, jobs)
     else:
         print("ERROR: Could not install the workflow building blocks.")
         print(
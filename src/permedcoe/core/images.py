@@ -0,0 +1,225 @@
+"""
+This file provides the node-local container image staging. It is enabled
+with the PERMEDCOE_IMAGE_CACHE environment variable (e.g. /tmp or /dev/shm).
+
+Each image is copied once per node into the image cache, so that the
+container executions read the local copy instead of the shared filesystem.
+The staging is safe among concurrent processes (file lock plus atomic
+rename) and the local copies are validated against the source size and
+modification time (and optionally against the digest recorded while
+copying, PERMEDCOE_IMAGE_VALIDATE=digest). The staged images can also be
+pre-read into the page cache (PERMEDCOE_IMAGE_WARM).
+"""
+
+import os
+import json
+import fcntl
+import shutil
+import hashlib
+import logging
+import threading
+
+from permedcoe.core.constants import PERMEDCOE_IMAGE_CACHE
+from permedcoe.core.constants import PERMEDCOE_IMAGE_VALIDATE
+from permedcoe.core.constants import PERMEDCOE_IMAGE_WARM
+
+META_SUFFIX = ".meta.json"
+LOCK_SUFFIX = ".lock"
+READ_SIZE = 8 * 1024 * 1024
+VALIDATE_STAT = "stat"
+VALIDATE_DIGEST = "digest"
+ENABLED_VALUES = ("1", "true", "yes")
+
+__STAGERS__ = {}
+__STAGERS_LOCK__ = threading.Lock()
+
+
+class ImageStager(object):
+    """Node-local container image cache."""
+
+    def __init__(self, path, validate=VALIDATE_STAT, warm=False):
+        """Constructor
+
+        Args:
+            path (str): Node-local image cache directory.
+            validate (str): Validation of the local copies (stat | digest).
+            warm (bool): Pre-read the staged images into the page cache.
+        """
+        self.path = os.path.abspath(path)
+        self.validate = validate
+        self.warm = warm
+        self.staged = {}  # (image, size, mtime): local image
+        os.makedirs(self.path, exist_ok=True)
+
+    def stage(self, image):
+        """Stage the given image into the node-local cache (if needed).
+
+        Args:
+            image (str): Container image path.
+        Returns:
+            str: Node-local image path.
+        """
+        image = os.path.abspath(image)
+        stat = os.stat(image)
+        identity = (image, stat.st_size, stat.st_mtime_ns)
+        if identity in self.staged:
+            # Already validated by this process
+            return self.staged[identity]
+        local = self.local_path(image)
+        meta_file = local + META_SUFFIX
+        if not self.__is_valid__(local, meta_file, stat):
+            with open(local + LOCK_SUFFIX, "a") as lock_fd:
+                fcntl.flock(lock_fd, fcntl.LOCK_EX)
+                try:
+                    # Another process may have staged it meanwhile
+                    if not self.__is_valid__(local, meta_file, stat):
+                        self.__copy__(image, local, meta_file, stat)
+                finally:
+                    fcntl.flock(lock_fd, fcntl.LOCK_UN)
+        if self.warm:
+            warm_up(local)
+        self.staged[identity] = local
+        return local
+
+    def local_path(self, image):
+        """Node-local path of the given image.
+
+        Args:
+            image (str): Absolute container image path.
+        Returns:
+            str: Node-local image path.
+        """
+        # Different folders may contain images with the same name
+        source_id = hashlib.sha1(os.path.dirname(image).encode()).hexdigest()[:12]
+        name, extension = os.path.splitext(os.path.basename(image))
+        return os.path.join(self.path, f"{name}-{source_id}{extension}")
+
+    def __is_valid__(self, local, meta_file, stat):
+        """Check if the local copy corresponds to the source image.
+
+        Args:
+            local (str): Node-local image path.
+            meta_file (str): Local image metadata file.
+            stat (os.stat_result): Source image stat.
+        Returns:
+            bool: True if the local copy is valid.
+        """
+        try:
+            with open(meta_file, "r") as meta_fd:
+                meta = json.load(meta_fd)
+            if (
+                meta["size"] != stat.st_size
+                or meta["mtime"] != stat.st_mtime_ns
+                or os.path.getsize(local) != stat.st_size
+            ):
+                return False
+            if self.validate == VALIDATE_DIGEST:
+                return meta.get("digest") == __digest__(local)
+        except (OSError, ValueError, KeyError):
+            return False
+        return True
+
+    def __copy__(self, image, local, meta_file, stat):
+        """Copy the source image into the node-local cache
+        (must be called with the image lock).
+
+        Args:
+            image (str): Source image path.
+            local (str): Node-local image path.
+            meta_file (str): Local image metadata file.
+            stat (os.stat_result): Source image stat.
+        """
+        logging.info("Staging container image %s into %s", image, local)
+        tmp_local = f"{local}.tmp-{os.getpid()}"
+        try:
+            hasher = hashlib.sha256()
+            with open(image, "rb") as source_fd, open(tmp_local, "wb") as local_fd:
+                for block in iter(lambda: source_fd.read(READ_SIZE), b""):
+                    hasher.update(block)
+                    local_fd.write(block)
+            shutil.copystat(image, tmp_local)
+            meta = {
+                "source": image,
+                "size": stat.st_size,
+                "mtime": stat.st_mtime_ns,
+                "digest": hasher.hexdigest(),
+            }
+            # The image is renamed before its metadata is updated, so a
+            # concurrent reader never validates a partial copy
+            if os.path.exists(meta_file):
+                os.remove(meta_file)
+            os.replace(tmp_local, local)
+            with open(meta_file + ".tmp", "w") as meta_fd:
+                json.dump(meta, meta_fd)
+            os.replace(meta_file + ".tmp", meta_file)
+        finally:
+            if os.path.exists(tmp_local):
+                os.remove(tmp_local)
+
+
+def warm_up(path):
+    """Pre-read the given file into the page cache.
+
+    Args:
+        path (str): File path.
+    """
+    with open(path, "rb") as file_fd:
+        if hasattr(os, "posix_fadvise"):
+            os.posix_fadvise(file_fd.fileno(), 0, 0, os.POSIX_FADV_WILLNEED)
+        buffer = bytearray(READ_SIZE)
+        while file_fd.readinto(buffer):
+            pass
+
+
+def __digest__(path):
+    """Content digest of a file.
+
+    Args:
+        path (str): File path.
+    Returns:
+        str: Hexadecimal digest.
+    """
+    hasher = hashlib.sha256()
+    with open(path, "rb") as file_fd:
+        for block in iter(lambda: file_fd.read(READ_SIZE), b""):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+
+def get_image_stager(path=None):
+    """Retrieve the image stager if enabled (PERMEDCOE_IMAGE_CACHE).
+
+    Args:
+        path (str, optional): Image cache directory (overrides the
+                              PERMEDCOE_IMAGE_CACHE environment variable).
+    Returns:
+        ImageStager: The image stager or None if it is not enabled.
+    """
+    path = path if path else os.environ.get(PERMEDCOE_IMAGE_CACHE)
+    if not path:
+        return None
+    with __STAGERS_LOCK__:
+        if path not in __STAGERS__:
+            validate = os.environ.get(PERMEDCOE_IMAGE_VALIDATE, VALIDATE_STAT).lower()
+            warm = os.environ.get(PERMEDCOE_IMAGE_WARM, "").lower() in ENABLED_VALUES
+            __STAGERS__[path] = ImageStager(path, validate, warm)
+        return __STAGERS__[path]
+
+
+def stage_image(image):
+    """Retrieve the node-local copy of the given image if the image cache
+    is enabled. Falls back to the given image if it can not be staged.
+
+    Args:
+        image (str): Container image path.
+    Returns:
+        str: Image path to use.
+    """
+    stager = get_image_stager()
+    if not stager:
+        return image
+    try:
+        return stager.stage(image)
+    except OSError as error:
+        logging.warning("Could not stage the image %s: %s", image, error)
+        return image
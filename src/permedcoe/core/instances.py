@@ -0,0 +1,101 @@
+"""
+This file provides the InstanceManager class which keeps persistent
+container instances (Singularity/Apptainer) alive so that consecutive
+executions with the same image, mount set and environment set do not
+pay the container setup cost.
+"""
+
+import os
+import logging
+import subprocess
+import threading
+
+from permedcoe.utils.exceptions import PerMedCoEException
+from permedcoe.utils.process_exit import register_process_exit
+
+INSTANCE_PREFIX = "permedcoe"
+INSTANCE_URI = "instance://"
+
+
+class InstanceManager(object):
+    """Container instances manager (one instance per image, mounts and envs)."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.instances = {}  # key: [name, references, engine]
+        self.counter = 0
+        self.pid = None
+
+    def acquire(self, key, engine, start_flags, image):
+        """Get the instance for the given key, starting it if necessary.
+
+        Args:
+            key (tuple): Instance identifier (image, mounts, envs).
+            engine (list[str]): Container engine base command.
+            start_flags (list[str]): Flags for the instance start action.
+            image (str): Container image path.
+        Returns:
+            str: Instance uri to be used instead of the image.
+        """
+        with self.lock:
+            if register_process_exit(self, self.stop_all):
+                # First use in this process (instances are not inherited)
+                self.instances = {}
+            if key not in self.instances:
+                self.counter += 1
+                name = f"{INSTANCE_PREFIX}_{os.getpid()}_{self.counter}"
+                cmd = engine + ["instance", "start"] + start_flags + [image, name]
+                logging.info("Starting container instance: %s", " ".join(cmd))
+                proc = subprocess.run(
+                    cmd,
+                    check=False,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.PIPE,
+                )
+                if proc.returncode != 0:
+                    raise PerMedCoEException(
+                        f"Could not start container instance {name}: "
+                        f"{proc.stderr.decode(errors='replace')}"
+                    )
+                self.instances[key] = [name, 0, engine]
+            self.instances[key][1] += 1
+            return INSTANCE_URI + self.instances[key][0]
+
+    def release(self, key):
+        """Release a reference to the instance of the given key.
+        The instance is kept alive to be reused until stop_all.
+
+        Args:
+            key (tuple): Instance identifier (image, mounts, envs).
+        """
+        with self.lock:
+            if key in self.instances and self.instances[key][1] > 0:
+                self.instances[key][1] -= 1
+
+    def stop_all(self):
+        """Stop all the started instances (called at interpreter exit)."""
+        with self.lock:
+            if self.pid != os.getpid():
+                # Started by the parent process
+                return
+            for key, (name, references, engine) in list(self.instances.items()):
+                if references > 0:
+                    logging.warning(
+                        "Stopping instance %s with %d references", name, references
+                    )
+                logging.info("Stopping container instance: %s", name)
+                subprocess.run(
+                    engine + ["instance", "stop", name],
+                    check=False,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL,
+                )
+                del self.instances[key]
+
+
+INSTANCES = InstanceManager()
+
+
+def stop_instances():
+    """Stop all the instances started by this process."""
+    INSTANCES.stop_all()
@@ -0,0 +1,158 @@
+"""
+This file provides the LaunchPlan class, which keeps the information of a
+@task function that does not change among invocations (computed once at
+decoration time), so that every invocation only has to substitute the
+parameter values into the binary arguments list.
+
+The static part of the command (engine base command, action and options,
+image, executable and environment options) is also precompiled once per
+task (CommandPrefix), so that every invocation only adds its mounts and
+binary arguments.
+"""
+
+import os
+
+# Maximum number of static command parts kept per task
+MAX_PREFIXES = 32
+
+
+class LaunchPlan(object):
+    """Precompiled launch information of a task function."""
+
+    def __init__(self, func, path_parameters):
+        """Constructor
+
+        Args:
+            func (function): Task function.
+            path_parameters (set[str]): Parameters that are files or directories
+                                        (their values are never split).
+        """
+        self.defaults = get_defaults(func)
+        self.path_parameters = frozenset(path_parameters)
+        self.prefixes = {}
+
+    def prefix(self, engine, image, exe, env_vars, stdin=False, hybrid=False):
+        """Retrieve the precompiled static part of the command (built on the
+        first invocation with the same engine, image, executable, environment
+        and working directory).
+
+        Args:
+            engine (Engine): Container engine backend.
+            image (str): Container image (None if not in container).
+            exe (tuple[str]): Executable arguments (with the MPI runner).
+            env_vars (tuple[str]): Environment variables (NAME=value).
+            stdin (bool, optional): The standard input is redirected.
+            hybrid (bool, optional): Every MPI rank runs in its own container.
+        Returns:
+            CommandPrefix: Static part of the command.
+        """
+        key = (engine, image, exe, env_vars, os.getcwd(), stdin, hybrid)
+        prefix = self.prefixes.get(key)
+        if prefix is None:
+            if len(self.prefixes) >= MAX_PREFIXES:
+                self.prefixes.clear()
+            prefix = CommandPrefix(engine, image, exe, env_vars, key[4], stdin, hybrid)
+            self.prefixes[key] = prefix
+        return prefix
+
+    def flags(self, kwargs):
+        """Merge the default parameters with the invocation parameters.
+
+        Args:
+            kwargs (dict): Invocation parameters.
+        Returns:
+            dict: Parameter name as key and its value (in signature order,
+                  followed by the parameters not in the signature).
+        """
+        flags = self.defaults.copy()
+        flags.update(kwargs)
+        return flags
+
+    def argv(self, flags):
+        """Convert the flags into the binary arguments list.
+
+        File and directory parameters are kept as a single argument (even if
+        they contain spaces). The rest of values are split by spaces, so that
+        a single parameter can provide multiple arguments.
+
+        Args:
+            flags (dict): Parameter name as key and its value.
+        Returns:
+            list[str]: Binary arguments.
+        """
+        argv = []
+        for name, value in flags.items():
+            values = value if isinstance(value, list) else (value,)
+            if name in self.path_parameters:
+                argv += [str(element) for element in values]
+            else:
+                for element in values:
+                    argv += [arg for arg in str(element).split(" ") if arg]
+        return argv
+
+
+class CommandPrefix(object):
+    """Static part of the command of a task (shared among invocations, so
+    its lists must not be modified)."""
+
+    def __init__(self, engine, image, exe, env_vars, workdir, stdin, hybrid):
+        """Constructor
+
+        Args:
+            engine (Engine): Container engine backend.
+            image (str): Container image (None if not in container).
+            exe (tuple[str]): Executable arguments (with the MPI runner).
+            env_vars (tuple[str]): Environment variables (NAME=value).
+            workdir (str): Working directory within the container.
+            stdin (bool): The standard input is redirected.
+            hybrid (bool): Every MPI rank runs in its own container.
+        """
+        self.base = engine.base()
+        self.action = []
+        self.action_flags = []
+        self.sif = []
+        if not engine.native:
+            self.action = engine.action()
+            if hybrid:
+                self.action_flags = engine.rank_exec_flags(workdir, stdin)
+            else:
+                self.action_flags = engine.exec_flags(workdir, stdin)
+            self.sif = [engine.image(image)]
+        self.exe = list(exe)
+        self.env_vars = list(env_vars)
+        self.envs = engine.env_flags(self.env_vars)
+
+
+def get_defaults(func):
+    """Retrieve the default parameters of the given function
+
+    Args:
+        func (function): Function to be inspected.
+
+    Returns:
+        dict: Contains the parameter name as key and its
+              default value as its value.
+    """
+    code = getattr(func, "__code__", None)
+    if code is None or hasattr(func, "__wrapped__"):
+        # Not a plain function
+        import inspect
+
+        signature = inspect.signature(func)
+        return {
+            k: v.default
+            for k, v in signature.parameters.items()
+            if v.default is not inspect.Parameter.empty
+        }
+    # Read the defaults directly from the function (in signature order)
+    defaults = func.__defaults__ or ()
+    positional = code.co_varnames[: code.co_argcount]
+    result = dict(zip(positional[len(positional) - len(defaults) :], defaults))
+    keyword_only = code.co_varnames[
+        code.co_argcount : code.co_argcount + code.co_kwonlyargcount
+    ]
+    kwdefaults = func.__kwdefaults__ or {}
+    for name in keyword_only:
+        if name in kwdefaults:
+            result[name] = kwdefaults[name]
+    return result
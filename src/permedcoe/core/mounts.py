@@ -0,0 +1,92 @@
+"""
+This file provides the mount planner, which builds a minimal and
+deterministic set of bind points from the paths required by a task.
+"""
+
+import os
+
+from permedcoe.core.constants import PERMEDCOE_MOUNT_MERGE_DEPTH
+
+# Siblings are merged into their parent only if it has at least this depth
+# (e.g. 2 allows /home/user but never /home or /)
+MOUNT_MERGE_DEPTH = 2
+
+
+def plan_mounts(requests, merge_depth=None):
+    """Build the minimal set of bind points for the given requests.
+
+    - Nested paths are covered by their ancestor (writable if any is).
+    - Sibling paths are merged into their parent if all of them have the same
+      access mode and the parent depth is at least merge_depth.
+    - Read-only binds are used when no request needs to write.
+
+    Args:
+        requests (list[tuple(str, bool)]): Path and if it requires writing.
+        merge_depth (int, optional): Minimum depth of a merged parent.
+                                     Defaults to PERMEDCOE_MOUNT_MERGE_DEPTH
+                                     or MOUNT_MERGE_DEPTH.
+    Returns:
+        list[tuple(str, bool)]: Sorted bind paths and if they are read-only.
+    """
+    if merge_depth is None:
+        merge_depth = int(
+            os.environ.get(PERMEDCOE_MOUNT_MERGE_DEPTH, MOUNT_MERGE_DEPTH)
+        )
+    binds = {}
+    for path, writable in requests:
+        if not path:
+            continue
+        path = os.path.normpath(os.path.abspath(path))
+        binds[path] = binds.get(path, False) or writable
+    binds = __remove_nested__(binds)
+    merged = True
+    while merged:
+        merged = False
+        groups = {}
+        for path in binds:
+            parent = os.path.dirname(path)
+            if parent != path and __depth__(parent) >= merge_depth:
+                groups.setdefault(parent, []).append(path)
+        for parent, children in sorted(groups.items()):
+            modes = {binds[child] for child in children}
+            if len(children) > 1 and len(modes) == 1:
+                # Only siblings with the same mode (keeps inputs read-only)
+                for child in children:
+                    del binds[child]
+                binds[parent] = modes.pop()
+                merged = True
+        if merged:
+            binds = __remove_nested__(binds)
+    return [(path, not binds[path]) for path in sorted(binds)]
+
+
+def __remove_nested__(binds):
+    """Remove the paths contained in other paths.
+
+    Args:
+        binds (dict{path: writable}): Bind paths.
+    Returns:
+        dict{path: writable}: Bind paths without nested paths.
+    """
+    result = {}
+    last = None
+    # Sorting by components places the nested paths right after their ancestor
+    for path in sorted(binds, key=lambda p: p.split(os.sep)):
+        if last is not None and (last == os.sep or path.startswith(last + os.sep)):
+            # Covered by the previous bind
+            result[last] = result[last] or binds[path]
+            continue
+        result[path] = binds[path]
+        last = path
+    return result
+
+
+def __depth__(path):
+    """Number of components of an absolute path.
+
+    Args:
+        path (str): Absolute path.
+    Returns:
+        int: Path depth ("/" is 0).
+    """
+    return len([component for component in path.split(os.sep) if component])
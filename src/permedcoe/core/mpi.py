@@ -0,0 +1,287 @@
+"""
+This file provides the MPI launch of the tasks (@mpi), which can span
+multiple nodes (computing_nodes):
+
+- Hosts: the nodes are taken from the SLURM allocation (SLURM_JOB_NODELIST,
+  expanded as node[01-04]) or from PERMEDCOE_MPI_HOSTS (comma separated
+  hosts or a hostfile), being the first computing_nodes nodes used.
+- Processes: the task computing_units (or SLURM_NTASKS if not defined),
+  spread among the nodes with PERMEDCOE_MPI_PPN processes per node (or
+  SLURM_NTASKS_PER_NODE, or evenly), and bound with PERMEDCOE_MPI_BIND
+  (e.g. core, socket or none).
+- Launcher: the runner options depend on its dialect (OpenMPI mpirun, MPICH
+  and Intel MPI mpiexec.hydra, or SLURM srun), extended with
+  PERMEDCOE_MPI_FLAGS.
+- Mode: by default the runner is launched within the container
+  (PERMEDCOE_MPI_MODE=container). The hybrid mode (PERMEDCOE_MPI_MODE=hybrid,
+  always used with srun and with multiple nodes, since the container has no
+  way to start the remote ranks) launches the runner in the host, which
+  starts one container per rank, so that the ranks use the host MPI and
+  interconnect.
+"""
+
+import os
+import re
+import math
+import shlex
+import logging
+
+from permedcoe.core.constants import PERMEDCOE_MPI_MODE
+from permedcoe.core.constants import PERMEDCOE_MPI_HOSTS
+from permedcoe.core.constants import PERMEDCOE_MPI_PPN
+from permedcoe.core.constants import PERMEDCOE_MPI_BIND
+from permedcoe.core.constants import PERMEDCOE_MPI_FLAGS
+from permedcoe.utils.exceptions import PerMedCoEException
+
+CONTAINER_MODE = "container"
+HYBRID_MODE = "hybrid"
+MPI_MODES = (CONTAINER_MODE, HYBRID_MODE)
+OPENMPI = "openmpi"
+HYDRA = "hydra"
+SRUN = "srun"
+# Runner executable name as key and its dialect as value (OpenMPI otherwise)
+DIALECTS = {"srun": SRUN, "mpiexec.hydra": HYDRA}
+SLURM_NODELIST = ("SLURM_JOB_NODELIST", "SLURM_NODELIST")
+SLURM_NTASKS = "SLURM_NTASKS"
+SLURM_NTASKS_PER_NODE = "SLURM_NTASKS_PER_NODE"
+RANGE_PATTERN = re.compile(r"^([^\[]*)\[([^\]]*)\](.*)$")
+
+
+class MpiLauncher(object):
+    """MPI launch of a task (runner arguments and mode)."""
+
+    def __init__(self, runner, computing_nodes=1, computing_units=1):
+        """Constructor
+
+        Args:
+            runner (str): MPI runner (e.g. mpirun or srun).
+            computing_nodes (int): Number of compute nodes needed.
+            computing_units (int): Number of MPI processes (cores).
+
+        Raises:
+            PerMedCoEException: If the MPI mode is unknown.
+        """
+        self.runner = str(runner)
+        self.dialect = DIALECTS.get(os.path.basename(self.runner), OPENMPI)
+        mode = os.environ.get(PERMEDCOE_MPI_MODE, CONTAINER_MODE).lower()
+        if mode not in MPI_MODES:
+            raise PerMedCoEException(
+                f"Unknown MPI mode {mode} (supported: {', '.join(MPI_MODES)})"
+            )
+        # srun is only available in the host
+        self.hybrid = mode == HYBRID_MODE or self.dialect == SRUN
+        self.hosts = []
+        nodes = resolve_int(computing_nodes, 1)
+        if nodes > 1:
+            self.hosts = get_hosts()
+            if not self.hosts:
+                logging.warning(
+                    "%d computing nodes requested, but there is no node list "
+                    "(%s or %s): running in the local node",
+                    nodes,
+                    SLURM_NODELIST[0],
+                    PERMEDCOE_MPI_HOSTS,
+                )
+            elif len(self.hosts) < nodes:
+                logging.warning(
+                    "%d computing nodes requested, but only %d available",
+                    nodes,
+                    len(self.hosts),
+                )
+            self.hosts = self.hosts[:nodes]
+        if len(self.hosts) > 1 and not self.hybrid:
+            # The remote ranks can only be started from the host
+            logging.info("Multiple nodes: launching the MPI runner in the host")
+            self.hybrid = True
+        self.ppn = __environ_int__(PERMEDCOE_MPI_PPN)
+        if self.ppn is None and self.hosts:
+            self.ppn = __environ_int__(SLURM_NTASKS_PER_NODE)
+        self.processes = resolve_int(computing_units, 1)
+        if self.processes <= 1 and self.hosts:
+            # Not defined: fill the allocation
+            if self.ppn:
+                self.processes = self.ppn * len(self.hosts)
+            else:
+                self.processes = __environ_int__(SLURM_NTASKS) or len(self.hosts)
+            logging.warning(
+                "%d computing nodes requested without computing units: "
+                "launching %d MPI processes (the whole allocation)",
+                nodes,
+                self.processes,
+            )
+        if self.ppn is None and self.hosts:
+            self.ppn = math.ceil(self.processes / len(self.hosts))
+        if self.ppn and self.hosts and self.processes > self.ppn * len(self.hosts):
+            logging.warning(
+                "%d MPI processes oversubscribe %d nodes with %d processes each",
+                self.processes,
+                len(self.hosts),
+                self.ppn,
+            )
+        self.binding = os.environ.get(PERMEDCOE_MPI_BIND)
+        self.flags = shlex.split(os.environ.get(PERMEDCOE_MPI_FLAGS, ""))
+
+    def argv(self):
+        """Build the runner arguments (to be followed by the executable).
+
+        Returns:
+            tuple[str]: Runner arguments.
+        """
+        if self.dialect == SRUN:
+            argv = [self.runner, f"--ntasks={self.processes}"]
+            if self.hosts:
+                argv += [f"--nodes={len(self.hosts)}"]
+                argv += [f"--nodelist={','.join(self.hosts)}"]
+            if self.ppn:
+                argv.append(f"--ntasks-per-node={self.ppn}")
+            if self.binding:
+                argv.append(f"--cpu-bind={self.binding}")
+        elif self.dialect == HYDRA:
+            argv = [self.runner, "-np", str(self.processes)]
+            if self.hosts:
+                argv += ["-hosts", ",".join(self.hosts)]
+            if self.ppn:
+                argv += ["-ppn", str(self.ppn)]
+            if self.binding:
+                argv += ["-bind-to", self.binding]
+        else:
+            argv = [self.runner, "-np", str(self.processes)]
+            if self.hosts:
+                slots = ",".join(f"{host}:{self.ppn}" for host in self.hosts)
+                argv += ["--host", slots]
+            if self.ppn:
+                argv += ["--map-by", f"ppr:{self.ppn}:node"]
+            if self.binding:
+                argv += ["--bind-to", self.binding]
+        return tuple(argv + self.flags)
+
+    def processes_per_node(self):
+        """Processes launched in every node (the local share of the task).
+
+        Returns:
+            int: Processes per node.
+        """
+        if self.ppn:
+            return min(self.ppn, self.processes)
+        return self.processes
+
+
+def get_hosts():
+    """Retrieve the hosts available for the MPI executions.
+
+    Returns:
+        list[str]: Host names (empty if not defined).
+    """
+    hosts = os.environ.get(PERMEDCOE_MPI_HOSTS)
+    if hosts:
+        if os.path.isfile(hosts):
+            return read_hostfile(hosts)
+        return [host for host in hosts.split(",") if host]
+    for variable in SLURM_NODELIST:
+        if os.environ.get(variable):
+            return expand_nodelist(os.environ[variable])
+    return []
+
+
+def read_hostfile(path):
+    """Read the hosts of a hostfile (first word of every line, without
+    comments nor repeated hosts).
+
+    Args:
+        path (str): Hostfile path.
+    Returns:
+        list[str]: Host names.
+    """
+    hosts = []
+    with open(path, "r") as hostfile:
+        for line in hostfile:
+            words = line.split("#", 1)[0].split()
+            if words and words[0] not in hosts:
+                hosts.append(words[0])
+    return hosts
+
+
+def expand_nodelist(nodelist):
+    """Expand a SLURM node list (e.g. "node[01-03,07],gpu1").
+
+    Args:
+        nodelist (str): Compressed node list.
+    Returns:
+        list[str]: Host names.
+    """
+    hosts = []
+    depth = 0
+    start = 0
+    # Split by the commas that are not within brackets
+    for index, character in enumerate(nodelist + ","):
+        if character == "[":
+            depth += 1
+        elif character == "]":
+            depth -= 1
+        elif character == "," and depth == 0:
+            if index > start:
+                hosts += __expand_host__(nodelist[start:index])
+            start = index + 1
+    return hosts
+
+
+def __expand_host__(host):
+    """Expand the ranges of a single host expression (e.g. "rack[1-2]-n[1,3]").
+
+    Args:
+        host (str): Host expression.
+    Returns:
+        list[str]: Host names.
+    """
+    match = RANGE_PATTERN.match(host)
+    if not match:
+        return [host]
+    prefix, ranges, suffix = match.groups()
+    hosts = []
+    for item in ranges.split(","):
+        first, _, last = item.partition("-")
+        if not last:
+            values = [first]
+        else:
+            # Keep the zero padding (e.g. 01-10)
+            width = len(first)
+            values = [
+                str(value).zfill(width) for value in range(int(first), int(last) + 1)
+            ]
+        for value in values:
+            hosts += __expand_host__(prefix + value + suffix)
+    return hosts
+
+
+def resolve_int(value, default):
+    """Resolve a numeric decorator parameter (which can be given with an
+    environment variable, e.g. "${COMPUTING_NODES}").
+
+    Args:
+        value: Parameter value.
+        default (int): Value if it is not defined.
+    Returns:
+        int: Resolved value.
+
+    Raises:
+        PerMedCoEException: If the value is not a number.
+    """
+    if value is None or value == "":
+        return default
+    try:
+        return int(os.path.expandvars(str(value)))
+    except ValueError:
+        raise PerMedCoEException(f"Not a number: {value}")
+
+
+def __environ_int__(name):
+    """Retrieve a number from the environment (e.g. SLURM_NTASKS_PER_NODE,
+    which can be given as "4(x2)").
+
+    Args:
+        name (str): Environment variable name.
+    Returns:
+        int: The number (None if not defined).
+    """
+    match = re.match(r"^\s*(\d+)", os.environ.get(name, ""))
+    return int(match.group(1)) if match else None
@@ -0,0 +1,455 @@
+"""
+This file provides the fused task pipelines: a chain of @task invocations
+that use the same container image is launched as a single container
+execution, where all the stages run concurrently. The FILE_OUT of a stage
+that is read as FILE_IN (or STDIN) by a single later stage becomes a named
+pipe (FIFO), so that the intermediate is never written to disk and the
+stages overlap their computation.
+
+The stages are driven by a generated shell script that runs within the
+container. If a stage fails, the rest are terminated and the failure is
+reported with the exit code and stderr of the stage that caused it.
+"""
+
+import os
+import sys
+import time
+import shutil
+import logging
+import tempfile
+
+from permedcoe.core.building_block import PerMedBB
+from permedcoe.core.building_block import executable_argv
+from permedcoe.core.decorators import capture_tasks
+from permedcoe.core.decorators import DEFAULT_BACKOFF
+from permedcoe.core.mounts import plan_mounts
+from permedcoe.core.images import stage_image
+from permedcoe.core.resources import get_resources
+from permedcoe.core.resources import Resources
+from permedcoe.core.runtime import get_local_runtime
+from permedcoe.core.trace import trace_span
+from permedcoe.core.constants import PERMEDCOE_TMPDIR
+from permedcoe.core.constants import SEPARATOR
+from permedcoe.utils.exceptions import PerMedCoEException
+from permedcoe.utils.exceptions import TaskExecutionException
+from permedcoe.utils.executor import DECODING_FORMAT
+from permedcoe.utils.executor import TAIL_SIZE
+
+DRIVER_NAME = "driver.sh"
+POLL_INTERVAL = 0.1  # seconds between the driver checks of the stages
+# Exit codes of the stages terminated because of another stage failure
+SECONDARY_EXIT_CODES = (141, 143)  # SIGPIPE and SIGTERM
+REDIRECTIONS = {"rb": "<", "wb": ">", "ab": ">>"}
+
+
+def pipeline(*stages, timeout=None, retries=None, backoff=None):
+    """Run the given task invocations fused into a single container execution.
+
+    The options that are not given are taken from the @task and @constraint
+    options of the stages (see FusedPipeline).
+
+    Args:
+        stages (tuple(function, dict)): Decorated @task functions and their
+                                        invocation parameters, in order.
+        timeout (float, optional): Seconds before killing the pipeline.
+        retries (int, optional): Attempts after a failure.
+        backoff (float, optional): Seconds before the first retry (doubled
+                                   after each one).
+    Returns:
+        Future: If the local runtime is enabled (None otherwise).
+
+    Raises:
+        TaskExecutionException: If a stage fails or the pipeline times out.
+    """
+    with capture_tasks() as prepared:
+        for function, kwargs in stages:
+            function(**dict(kwargs))
+    if len(prepared) != len(stages):
+        raise PerMedCoEException(
+            "The pipeline stages must be @task functions (without PyCOMPSs)"
+        )
+    fused = FusedPipeline(prepared, timeout, retries, backoff)
+    runtime = get_local_runtime()
+    if runtime:
+        # Asynchronous execution as a single task
+        return runtime.submit(fused.launch, (), fused.computing_units, fused.accesses)
+    fused.launch()
+    return None
+
+
+class FusedPipeline(object):
+    """Task invocations launched as a single container execution."""
+
+    kind = "pipeline"  # shown in the logs and trace
+    label = "Stage"  # of every invocation in the output
+
+    def __init__(self, stages, timeout=None, retries=None, backoff=None):
+        """Constructor
+
+        The options that are not given are taken from the stages options:
+        the timeout of the slowest stage (see __stages_timeout__), and the
+        maximum retries and backoff.
+
+        Args:
+            stages (list[PreparedTask]): Task invocations, in order.
+            timeout (float, optional): Seconds before killing the pipeline.
+            retries (int, optional): Attempts after a failure.
+            backoff (float, optional): Seconds before the first retry.
+        """
+        if len({(stage.run_in_container, stage.engine.name) for stage in stages}) > 1:
+            raise PerMedCoEException("Cannot fuse tasks of different engines")
+        if any(stage.computing_nodes > 1 for stage in stages):
+            raise PerMedCoEException("Cannot fuse multi-node MPI tasks")
+        images = {stage.image for stage in stages}
+        if len(images) > 1:
+            raise PerMedCoEException(
+                f"Cannot fuse tasks with different images: {sorted(images)}"
+            )
+        self.stages = stages
+        if timeout is None:
+            timeout = self.__stages_timeout__()
+        if retries is None:
+            retries = max(int(stage.options.get("retries", 0)) for stage in stages)
+        if backoff is None:
+            backoff = max(
+                float(stage.options.get("backoff", DEFAULT_BACKOFF)) for stage in stages
+            )
+        self.timeout = timeout
+        self.retries = int(retries)
+        self.backoff = float(backoff)
+        self.name = "+".join(stage.name for stage in stages)
+        self.computing_units = sum(stage.computing_units for stage in stages)
+        self.intermediates = self.__find_intermediates__()
+        # Only the external inputs and outputs are accessed
+        self.accesses = [
+            access
+            for stage in stages
+            for access in stage.accesses
+            if access[0] not in self.intermediates
+        ]
+
+    def __stages_timeout__(self):
+        """Timeout from the stages options: the stages run concurrently, so
+        the longest one (only if every stage has a timeout).
+
+        Returns:
+            float: Seconds before killing the pipeline (None if unbounded).
+        """
+        timeouts = [stage.options.get("timeout") for stage in self.stages]
+        if None in timeouts:
+            return None
+        return max(float(timeout) for timeout in timeouts)
+
+    def __find_intermediates__(self):
+        """Find the files written by a stage and read by a single later one.
+
+        Returns:
+            set[str]: Intermediate file paths.
+        """
+        writers = {}
+        readers = {}
+        for index, stage in enumerate(self.stages):
+            for path, read, write in stage.files:
+                if write and not read and path not in writers:
+                    writers[path] = index
+                elif read and not write:
+                    readers.setdefault(path, []).append(index)
+        return {
+            path
+            for path, index in writers.items()
+            if len(readers.get(path, [])) == 1 and readers[path][0] > index
+        }
+
+    def launch(self):
+        """Launch the pipeline (retrying it if it fails).
+
+        Raises:
+            TaskExecutionException: If the last attempt fails or times out.
+        """
+        delay = self.backoff
+        for attempt in range(self.retries + 1):
+            try:
+                with trace_span(f"{self.kind}:{self.name}"):
+                    self.__launch__()
+                return
+            except TaskExecutionException as error:
+                if attempt == self.retries:
+                    raise
+                logging.warning(
+                    "%s. Retrying the %s in %s seconds (%d/%d)",
+                    str(error),
+                    self.kind,
+                    str(delay),
+                    attempt + 1,
+                    self.retries,
+                )
+                time.sleep(delay)
+                delay *= 2
+
+    def __launch__(self):
+        """Create the FIFOs and the driver, and launch it."""
+        tmpdir = os.environ.get(PERMEDCOE_TMPDIR) or None
+        workdir = tempfile.mkdtemp(prefix=f"permedcoe_{self.kind}_", dir=tmpdir)
+        try:
+            fifos = {}
+            for index, path in enumerate(sorted(self.intermediates)):
+                fifos[path] = os.path.join(workdir, f"fifo_{index}")
+                os.mkfifo(fifos[path])
+            driver = os.path.join(workdir, DRIVER_NAME)
+            with open(driver, "w") as driver_fd:
+                driver_fd.write(self.__driver__(workdir, fifos))
+            BB = self.__building_block__(workdir, driver)
+            logging.info(
+                "Launching fused %s %s (%d invocations, %d FIFOs)",
+                self.kind,
+                self.name,
+                len(self.stages),
+                len(fifos),
+            )
+            failure = None
+            try:
+                BB.launch(
+                    run_in_container=self.stages[0].run_in_container,
+                    timeout=self.timeout,
+                )
+            except TaskExecutionException as error:
+                if error.timed_out:
+                    raise
+                failure = error
+            self.__report__(workdir, failure)
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    def __building_block__(self, workdir, driver):
+        """Build the building block that runs the driver.
+
+        Args:
+            workdir (str): Pipeline working directory.
+            driver (str): Driver script path.
+        Returns:
+            PerMedBB: The building block.
+        """
+        first = self.stages[0]
+        requests = [(workdir, True)]
+        env_vars = []
+        for stage in self.stages:
+            requests += [(path, not read_only) for path, read_only in stage.mount_paths]
+            for path, mode in stage.streams.values():
+                if path not in self.intermediates:
+                    # Redirected within the container by the driver
+                    requests.append((os.path.dirname(path), mode != "rb"))
+            env_vars += [var for var in stage.env_vars if var not in env_vars]
+        image = first.image
+        if first.run_in_container and first.engine.image_files:
+            with trace_span("stage_image"):
+                image = stage_image(image)
+        resources = None
+        if any(stage.resources for stage in self.stages):
+            resources = get_resources(self.computing_units)
+        return PerMedBB(
+            image,
+            None,
+            "sh",
+            1,
+            self.computing_units,
+            plan_mounts(requests),
+            first.user_mount_paths,
+            env_vars,
+            [driver],
+            {
+                "STDOUT": (os.path.join(workdir, "driver.out"), "wb"),
+                "STDERR": (os.path.join(workdir, "driver.err"), "wb"),
+            },
+            resources,
+            first.engine,
+        )
+
+    def __driver__(self, workdir, fifos):
+        """Generate the driver script.
+
+        Every stage runs in background with its intermediates replaced by
+        FIFOs and writes its exit code into status_<stage> when it finishes.
+        The driver polls them and terminates the running stages as soon as
+        one fails (otherwise they could block forever on a FIFO).
+
+        Args:
+            workdir (str): Pipeline working directory.
+            fifos (dict): Intermediate path as key and its FIFO as value.
+        Returns:
+            str: Driver script content.
+        """
+        lines = [
+            "#!/bin/sh",
+            "# Fused pipeline driver generated by permedcoe",
+            f"W={__quote__(workdir)}",
+        ]
+        indexes = " ".join(str(index) for index in range(len(self.stages)))
+        for index, stage in enumerate(self.stages):
+            command = self.__command__(index, stage, fifos)
+            lines += [
+                f"# {self.label} {index}: {stage.name}",
+                f"( {command} &",
+                f'  echo $! >"$W/pid_{index}"',
+                "  wait $!",
+                f'  echo $? >"$W/status_{index}.tmp"',
+                f'  mv "$W/status_{index}.tmp" "$W/status_{index}" ) &',
+            ]
+        lines += [
+            "failed=0",
+            "while :; do",
+            "    finished=1",
+            f"    for i in {indexes}; do",
+            '        if [ -f "$W/status_$i" ]; then',
+            '            [ "$(cat "$W/status_$i")" = 0 ] || failed=1',
+            "        else",
+            "            finished=0",
+            "        fi",
+            "    done",
+            "    [ $finished = 1 ] && break",
+            "    if [ $failed = 1 ]; then",
+            f"        for i in {indexes}; do",
+            '            if [ ! -f "$W/status_$i" ] && [ -f "$W/pid_$i" ]; then',
+            '                kill "$(cat "$W/pid_$i")" 2>/dev/null',
+            "            fi",
+            "        done",
+            "    fi",
+            f"    sleep {POLL_INTERVAL} 2>/dev/null || sleep 1",
+            "done",
+            "wait",
+            "exit $failed",
+        ]
+        return "\n".join(lines) + "\n"
+
+    def __command__(self, index, stage, fifos):
+        """Build the shell command of a stage (with its redirections).
+
+        The stdout and stderr that are not redirected by the task are written
+        into stage_<index>.out and stage_<index>.err.
+
+        Args:
+            index (int): Stage index.
+            stage (PreparedTask): Task invocation.
+            fifos (dict): Intermediate path as key and its FIFO as value.
+        Returns:
+            str: Shell command.
+        """
+        exe = executable_argv(stage.binary, stage.runner, stage.computing_units)
+        args = [fifos.get(arg, arg) for arg in stage.flags]
+        env = ""
+        if stage.resources:
+            # Threads of the stage cores (not of the whole execution)
+            threads = Resources(stage.computing_units).thread_env(stage.env_vars)
+            env = "".join(f"{k}={v} " for k, v in sorted(threads.items()))
+        redirections = {
+            "STDOUT": f'>"$W/stage_{index}.out"',
+            "STDERR": f'2>"$W/stage_{index}.err"',
+        }
+        for stream, (path, mode) in stage.streams.items():
+            target = __quote__(fifos.get(path, path))
+            prefix = "2" if stream == "STDERR" else ""
+            redirections[stream] = f"{prefix}{REDIRECTIONS[mode]}{target}"
+        command = " ".join(__quote__(arg) for arg in list(exe) + args)
+        command += " " + " ".join(redirections[s] for s in sorted(redirections))
+        return env + command
+
+    def __report__(self, workdir, failure):
+        """Show the output of every stage and raise the stage failure.
+
+        Args:
+            workdir (str): Pipeline working directory.
+            failure (TaskExecutionException): Driver failure (None if not).
+
+        Raises:
+            TaskExecutionException: Failure of the stage that caused it (with
+                                    the exit code of every stage in results).
+        """
+        failed = []
+        results = []
+        for index, stage in enumerate(self.stages):
+            status = __tail__(os.path.join(workdir, f"status_{index}"))
+            exit_code = int(status) if status.strip() else None
+            results.append(exit_code)
+            stdout = os.path.join(workdir, f"stage_{index}.out")
+            stderr = os.path.join(workdir, f"stage_{index}.err")
+            print(SEPARATOR, flush=True)
+            header = f"{self.label} {index} ({stage.name}) exit code: {exit_code}"
+            print(header, flush=True)
+            print("----------------- STDOUT -----------------", flush=True)
+            __show__(stdout, sys.stdout)
+            if os.path.exists(stderr) and os.path.getsize(stderr):
+                print(
+                    "----------------- STDERR -----------------",
+                    file=sys.stderr,
+                    flush=True,
+                )
+                __show__(stderr, sys.stderr)
+            if exit_code:
+                command = [stage.binary] + stage.flags
+                failed.append(
+                    TaskExecutionException(command, exit_code, __tail__(stderr))
+                )
+        driver_stderr = __tail__(os.path.join(workdir, "driver.err"))
+        if driver_stderr:
+            print(driver_stderr, file=sys.stderr, flush=True)
+        print(SEPARATOR, flush=True)
+        if failed:
+            failure = self.__cause__(failed)
+        if failure:
+            # The driver itself failed if no stage did
+            failure.results = results
+            raise failure
+
+    def __cause__(self, failed):
+        """Select the stage failure that caused the pipeline failure.
+
+        Args:
+            failed (list[TaskExecutionException]): Failures of the stages.
+        Returns:
+            TaskExecutionException: The first failure that was not caused by
+                                    the termination of the stage.
+        """
+        # The stages terminated by the driver are not the cause
+        causes = [
+            error for error in failed if error.exit_code not in SECONDARY_EXIT_CODES
+        ]
+        return (causes or failed)[0]
+
+
+def __quote__(value):
+    """Quote a value for the driver script.
+
+    Args:
+        value (str): Value.
+    Returns:
+        str: Single quoted value.
+    """
+    return "'" + str(value).replace("'", "'\"'\"'") + "'"
+
+
+def __show__(path, stream):
+    """Copy a stage output file into the given console stream.
+
+    Args:
+        path (str): File path (ignored if it does not exist).
+        stream (file): sys.stdout or sys.stderr.
+    """
+    if os.path.exists(path):
+        stream.flush()
+        with open(path, "rb") as file_fd:
+            shutil.copyfileobj(file_fd, getattr(stream, "buffer", stream))
+    print("", file=stream, flush=True)
+
+
+def __tail__(path):
+    """Read the tail of a stage file (empty if it does not exist).
+
+    Args:
+        path (str): File path.
+    Returns:
+        str: Content (up to TAIL_SIZE bytes if it is bigger).
+    """
+    if not os.path.exists(path):
+        return ""
+    with open(path, "rb") as file_fd:
+        file_fd.seek(max(0, os.path.getsize(path) - TAIL_SIZE))
+        return file_fd.read().decode(DECODING_FORMAT, errors="replace")
@@ -0,0 +1,274 @@
+"""
+This file provides the enforcement of the task resource requests
+(--processes, --memory and @constraint computing_units):
+
+- CPU affinity: the binary is pinned to as many cores as requested (with
+  taskset, or with the engine option if the container is not a child of
+  the engine command, e.g. docker). The cores are reserved with node-local
+  lock files, so that the tasks launched by different processes in the same
+  node do not share cores.
+- Threads: OMP_NUM_THREADS, OPENBLAS_NUM_THREADS and MKL_NUM_THREADS are
+  set to the cores per process (unless the task environment defines them).
+- Memory: the container is limited with the engine option (--memory, which
+  relies on cgroups, only used by apptainer and singularity if
+  PERMEDCOE_MEMORY_CGROUPS is enabled). Otherwise, the address space and
+  data of every process are limited with prlimit (split among the
+  processes), inherited by the processes of the container.
+
+The limits are applied through the command line (not in the child process
+before exec), since the executions are launched from multiple threads.
+
+The binding is disabled with PERMEDCOE_BIND=none, and it is reported into
+stderr or into a json lines file with PERMEDCOE_BINDING_REPORT.
+"""
+
+import os
+import sys
+import json
+import fcntl
+import logging
+import shutil
+import tempfile
+import threading
+
+from permedcoe.core.constants import PERMEDCOE_PROCESSES
+from permedcoe.core.constants import PERMEDCOE_MEMORY
+from permedcoe.core.constants import PERMEDCOE_BIND
+from permedcoe.core.constants import PERMEDCOE_BIND_DIR
+from permedcoe.core.constants import PERMEDCOE_BINDING_REPORT
+
+THREAD_VARIABLES = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS")
+BIND_AUTO = "auto"
+BIND_NONE = "none"
+LOCKS_FOLDER = "permedcoe-cpus"
+SHM_FOLDER = "/dev/shm"
+REPORT_STDERR = ("1", "true", "yes")
+MEMORY_UNITS = {"K": 1024, "M": 1024**2, "G": 1024**3, "T": 1024**4}
+DEFAULT_MEMORY_UNIT = "G"  # as the PyCOMPSs memory_size constraint
+TASKSET = "taskset"
+PRLIMIT = "prlimit"
+
+
+class Resources(object):
+    """Resources to enforce for a task execution."""
+
+    def __init__(self, cores=None, processes=1, memory=None):
+        """Constructor
+
+        Args:
+            cores (int): Number of cores to bind (None to not bind).
+            processes (int): Number of processes (e.g. MPI ranks) that share
+                             the cores.
+            memory (int): Memory limit in bytes (None to not limit).
+        """
+        self.cores = cores
+        self.processes = max(1, processes)
+        self.memory = memory
+        self.cpus = []
+        self.locks = []
+
+    def threads(self):
+        """Number of threads per process.
+
+        Returns:
+            int: Threads per process (None if cores are not requested).
+        """
+        if not self.cores:
+            return None
+        return max(1, self.cores // self.processes)
+
+    def thread_env(self, env_vars=()):
+        """Threading environment variables not defined in env_vars.
+
+        Args:
+            env_vars (list[str]): Task environment variables (NAME=value).
+        Returns:
+            dict: Environment variables to add.
+        """
+        threads = self.threads()
+        if threads is None:
+            return {}
+        defined = {str(var).split("=", 1)[0] for var in env_vars}
+        return {var: str(threads) for var in THREAD_VARIABLES if var not in defined}
+
+    def acquire(self):
+        """Reserve the cores for the execution."""
+        if self.cores and hasattr(os, "sched_setaffinity"):
+            self.cpus, self.locks = CPU_ALLOCATOR.acquire(self.cores)
+
+    def release(self):
+        """Release the reserved cores."""
+        CPU_ALLOCATOR.release(self.locks)
+        self.cpus, self.locks = [], []
+
+    def affinity_argv(self):
+        """Command prefix that binds the execution (and its children) to the
+        reserved cores.
+
+        Returns:
+            list[str]: Command prefix (empty if there are no cores to bind).
+        """
+        if not self.cpus:
+            return []
+        if shutil.which(TASKSET) is None:
+            logging.warning("%s not found: the cores are not bound", TASKSET)
+            return []
+        return [TASKSET, "-c", ",".join(str(cpu) for cpu in self.cpus)]
+
+    def memory_per_process(self):
+        """Memory limit of every process (the memory split among them).
+
+        Returns:
+            int: Memory limit in bytes (None to not limit).
+        """
+        if not self.memory:
+            return None
+        return max(1, self.memory // self.processes)
+
+    def limits_argv(self):
+        """Command prefix that limits the memory of every process of a
+        native execution (address space and data).
+
+        Returns:
+            list[str]: Command prefix (empty if there is no memory limit).
+        """
+        memory = self.memory_per_process()
+        if not memory:
+            return []
+        if shutil.which(PRLIMIT) is None:
+            logging.warning("%s not found: the memory is not limited", PRLIMIT)
+            return []
+        return [PRLIMIT, f"--as={memory}", f"--data={memory}", "--"]
+
+    def report(self):
+        """Report the effective binding (PERMEDCOE_BINDING_REPORT)."""
+        binding = {
+            "pid": os.getpid(),
+            "cpus": self.cpus,
+            "threads": self.threads(),
+            "memory": self.memory,
+        }
+        logging.info("Resource binding: %s", str(binding))
+        target = os.environ.get(PERMEDCOE_BINDING_REPORT, "")
+        if not target:
+            return
+        if target.lower() in REPORT_STDERR:
+            print(f"Resource binding: {json.dumps(binding)}", file=sys.stderr)
+        else:
+            with open(target, "a") as report_fd:
+                report_fd.write(json.dumps(binding) + "\n")
+
+
+class CpuAllocator(object):
+    """Node-wide cores reservation based on lock files (released
+    automatically if the process dies)."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.folder = None
+
+    def acquire(self, cores):
+        """Reserve up to the given number of cores of this process affinity.
+
+        The free cores are preferred. If there are not enough free cores,
+        the rest are shared with other executions.
+
+        Args:
+            cores (int): Number of cores.
+        Returns:
+            list[int]: Cores to bind.
+            list[file]: Held lock files.
+        """
+        allowed = sorted(os.sched_getaffinity(0))
+        cores = min(cores, len(allowed))
+        cpus = []
+        locks = []
+        with self.lock:
+            folder = self.__get_folder__()
+            for cpu in allowed:
+                if len(cpus) == cores:
+                    break
+                lock_fd = open(os.path.join(folder, f"cpu{cpu}.lock"), "a")
+                try:
+                    fcntl.flock(lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    lock_fd.close()
+                    continue
+                cpus.append(cpu)
+                locks.append(lock_fd)
+        if len(cpus) < cores:
+            logging.warning(
+                "Only %d of %d cores are free: sharing the rest", len(cpus), cores
+            )
+            cpus += [cpu for cpu in allowed if cpu not in cpus][: cores - len(cpus)]
+        return sorted(cpus), locks
+
+    def release(self, locks):
+        """Release the given lock files.
+
+        Args:
+            locks (list[file]): Held lock files.
+        """
+        for lock_fd in locks:
+            fcntl.flock(lock_fd, fcntl.LOCK_UN)
+            lock_fd.close()
+
+    def __get_folder__(self):
+        """Node-local folder for the lock files.
+
+        Returns:
+            str: Lock files folder.
+        """
+        if self.folder is None:
+            base = os.environ.get(PERMEDCOE_BIND_DIR)
+            if not base:
+                base = tempfile.gettempdir()
+                if os.path.isdir(SHM_FOLDER):
+                    base = SHM_FOLDER
+            self.folder = os.path.join(base, LOCKS_FOLDER)
+            os.makedirs(self.folder, exist_ok=True)
+        return self.folder
+
+
+def parse_memory(value):
+    """Convert a memory amount into bytes.
+
+    Args:
+        value (str): Amount with optional unit suffix (K, M, G or T).
+                     GB if no unit is given.
+    Returns:
+        int: Bytes.
+    """
+    value = str(value).strip().upper().rstrip("B")
+    unit = DEFAULT_MEMORY_UNIT
+    if value and value[-1] in MEMORY_UNITS:
+        value, unit = value[:-1], value[-1]
+    return int(float(value) * MEMORY_UNITS[unit])
+
+
+def get_resources(computing_units=None, processes=1):
+    """Retrieve the resources to enforce for a task execution.
+
+    The cores are taken from PERMEDCOE_PROCESSES (--processes) or from the
+    task computing units (@constraint), and the memory from PERMEDCOE_MEMORY
+    (--memory).
+
+    Args:
+        computing_units (int): Task computing units (None if not requested).
+        processes (int): Number of processes of the task (e.g. MPI ranks).
+    Returns:
+        Resources: Resources to enforce (None if nothing is requested or
+                   PERMEDCOE_BIND=none).
+    """
+    if os.environ.get(PERMEDCOE_BIND, BIND_AUTO).lower() == BIND_NONE:
+        return None
+    cores = os.environ.get(PERMEDCOE_PROCESSES)
+    cores = int(cores) if cores else computing_units
+    memory = os.environ.get(PERMEDCOE_MEMORY)
+    memory = parse_memory(memory) if memory else None
+    if not cores and not memory:
+        return None
+    return Resources(int(cores) if cores else None, processes, memory)
+
+
+CPU_ALLOCATOR = CpuAllocator()
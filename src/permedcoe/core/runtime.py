@@ -0,0 +1,359 @@
+"""
+This file provides a local runtime that mimics the PyCOMPSs task API when
+PyCOMPSs is not available. It is enabled with the PERMEDCOE_LOCAL_RUNTIME
+environment variable (true to use all cores or the number of cores to use).
+
+The @task invocations return futures and run asynchronously on a pool sized
+by the available cores, taking into account their computing units. The
+dependencies among tasks are inferred from the paths of their file and
+directory parameters, and compss_wait_on, compss_wait_on_file and
+compss_barrier provide the synchronization points (raising the first
+failure of the tasks they wait for). The pending tasks are waited at exit,
+and the process exits with status 1 if any task failed.
+"""
+
+import os
+import sys
+import atexit
+import logging
+import threading
+from concurrent.futures import Future
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import wait
+
+from permedcoe.core.constants import PERMEDCOE_LOCAL_RUNTIME
+from permedcoe.utils.exceptions import PerMedCoEException
+
+ENABLED_VALUES = ("1", "true", "yes")
+
+__RUNTIME__ = None
+__RUNTIME_LOCK__ = threading.Lock()
+
+
+class LocalTask(object):
+    """Node of the local runtime task graph."""
+
+    def __init__(self, function, args, units):
+        self.function = function
+        self.args = args
+        self.units = units
+        self.pending = 0
+        self.successors = []
+        self.order = 0
+        self.failed_dependency = False
+        self.done = False
+        self.future = Future()
+
+
+class LocalRuntime(object):
+    """Local runtime: asynchronous tasks with data dependencies."""
+
+    def __init__(self, cores):
+        self.cores = max(1, cores)
+        self.free = self.cores
+        self.lock = threading.Lock()
+        self.ready = []
+        self.tasks = []
+        self.submitted = 0
+        self.failed = 0
+        self.accesses = {}  # path: [last writer, readers since last write]
+        self.pool = ThreadPoolExecutor(max_workers=self.cores)
+
+    def submit(self, function, args, units, accesses):
+        """Submit a task.
+
+        Args:
+            function (function): Function to execute.
+            args (tuple): Function arguments.
+            units (int): Computing units (cores) required.
+            accesses (list): Tuples (path, read, write) accessed by the task.
+        Returns:
+            Future: The task future.
+        """
+        units = min(max(1, int(units)), self.cores)
+        task = LocalTask(function, args, units)
+        with self.lock:
+            task.order = self.submitted
+            self.submitted += 1
+            dependencies = self.__register_accesses__(task, accesses)
+            for dependency in dependencies:
+                dependency.successors.append(task)
+            task.pending = len(dependencies)
+            self.tasks.append(task)
+            if task.pending == 0:
+                self.ready.append(task)
+            self.__dispatch__()
+        return task.future
+
+    def wait_on_file(self, paths):
+        """Wait for the tasks that write the given paths.
+
+        Args:
+            paths (list[str]): File or directory paths.
+
+        Raises:
+            Exception: The failure of the first (submitted) writer that failed.
+        """
+        writers = []
+        with self.lock:
+            for path in paths:
+                path = os.path.abspath(str(path))
+                for other, (writer, _) in self.accesses.items():
+                    if writer and __overlap__(path, other):
+                        writers.append(writer)
+        writers.sort(key=lambda writer: writer.order)
+        __wait_futures__([writer.future for writer in writers])
+
+    def barrier(self, raise_errors=True):
+        """Wait for all the submitted tasks.
+
+        Args:
+            raise_errors (bool): Raise the first failure.
+
+        Raises:
+            Exception: The failure of the first (submitted) task that failed
+                       since the previous barrier.
+        """
+        with self.lock:
+            futures = [task.future for task in self.tasks]
+        try:
+            if raise_errors:
+                __wait_futures__(futures)
+            else:
+                wait(futures)
+        finally:
+            with self.lock:
+                self.tasks = [task for task in self.tasks if not task.done]
+
+    def __register_accesses__(self, task, accesses):
+        """Register the task accesses and find its dependencies
+        (read after write, write after read and write after write).
+        Must be called with the lock.
+
+        Args:
+            task (LocalTask): Task.
+            accesses (list): Tuples (path, read, write).
+        Returns:
+            set: Unfinished tasks on which the task depends.
+        """
+        dependencies = set()
+        for path, _, write in accesses:
+            for other, (writer, readers) in list(self.accesses.items()):
+                if not __overlap__(path, other):
+                    continue
+                if writer and not writer.done:
+                    dependencies.add(writer)
+                if write:
+                    dependencies.update(r for r in readers if not r.done)
+                if (writer is None or writer.done) and all(r.done for r in readers):
+                    # Nothing pending on this path
+                    del self.accesses[other]
+        for path, read, write in accesses:
+            if write:
+                self.accesses[path] = [task, []]
+            elif read:
+                entry = self.accesses.setdefault(path, [None, []])
+                entry[1].append(task)
+        dependencies.discard(task)
+        return dependencies
+
+    def __dispatch__(self):
+        """Launch the ready tasks (in order) that fit in the free cores, so
+        that a task requiring more cores does not hold back the smaller ones.
+        Must be called with the lock.
+        """
+        waiting = []
+        for task in self.ready:
+            if task.units <= self.free:
+                self.free -= task.units
+                self.pool.submit(self.__run__, task)
+            else:
+                waiting.append(task)
+        self.ready = waiting
+
+    def __run__(self, task):
+        """Run a task and release its successors.
+
+        Args:
+            task (LocalTask): Task to run.
+        """
+        result = None
+        error = None
+        try:
+            if task.failed_dependency:
+                raise PerMedCoEException("Task not executed: a dependency failed.")
+            result = task.function(*task.args)
+        except BaseException as exception:  # noqa: delivered through the future
+            error = exception
+            logging.error("Task failed: %s", str(exception))
+        with self.lock:
+            self.free += task.units
+            task.done = True
+            if error is not None:
+                self.failed += 1
+            for successor in task.successors:
+                if error is not None:
+                    successor.failed_dependency = True
+                successor.pending -= 1
+                if successor.pending == 0:
+                    self.ready.append(successor)
+            self.__dispatch__()
+        if error is not None:
+            task.future.set_exception(error)
+        else:
+            task.future.set_result(result)
+
+
+def __overlap__(path, other):
+    """Check if two absolute paths overlap (equal or nested).
+
+    Args:
+        path (str): Absolute path.
+        other (str): Absolute path.
+    Returns:
+        bool: True if they overlap.
+    """
+    if path == other:
+        return True
+    return path.startswith(other + os.sep) or other.startswith(path + os.sep)
+
+
+def __wait_futures__(futures):
+    """Wait for the given futures.
+
+    Args:
+        futures (list[Future]): Futures to wait for.
+
+    Raises:
+        Exception: The exception of the first failed future.
+    """
+    failure = None
+    for future in futures:
+        error = future.exception()
+        if failure is None:
+            failure = error
+    if failure is not None:
+        raise failure
+
+
+def wait_local_runtime():
+    """Wait for the pending tasks of the local runtime (if started).
+
+    Raises:
+        PerMedCoEException: If any task failed.
+    """
+    if __RUNTIME__ is not None:
+        __RUNTIME__.barrier(raise_errors=False)
+        if __RUNTIME__.failed:
+            raise PerMedCoEException(f"{__RUNTIME__.failed} task(s) failed.")
+
+
+def __exit_local_runtime__():
+    """Wait for the pending tasks at exit, exiting with status 1 if any task
+    failed (the status can not be changed by raising from an exit handler).
+    """
+    try:
+        wait_local_runtime()
+    except PerMedCoEException as error:
+        logging.error("ERROR: %s", str(error))
+        # Run the rest of exit handlers (e.g. traces) before leaving
+        atexit._run_exitfuncs()
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os._exit(1)
+
+
+def get_local_runtime():
+    """Retrieve the local runtime if enabled (PERMEDCOE_LOCAL_RUNTIME).
+
+    Returns:
+        LocalRuntime: The local runtime or None if it is not enabled.
+    """
+    global __RUNTIME__
+    if __RUNTIME__ is not None:
+        return __RUNTIME__
+    value = os.environ.get(PERMEDCOE_LOCAL_RUNTIME, "").lower()
+    if not value or value in ("0", "false", "no"):
+        return None
+    with __RUNTIME_LOCK__:
+        if __RUNTIME__ is None:
+            if value in ENABLED_VALUES:
+                cores = os.cpu_count() or 1
+            else:
+                cores = int(value)
+            logging.debug("Starting local runtime with %d cores", cores)
+            __RUNTIME__ = LocalRuntime(cores)
+            # Wait for the pending tasks at exit (before the pool shuts down)
+            register_atexit = getattr(threading, "_register_atexit", atexit.register)
+            register_atexit(__exit_local_runtime__)
+    return __RUNTIME__
+
+
+def compss_wait_on(*objs):
+    """Synchronize the given objects (PyCOMPSs compatible).
+
+    Args:
+        objs: Objects (futures or lists of futures) to synchronize.
+    Returns:
+        The synchronized objects (a list if more than one is given).
+    """
+    results = [__sync__(obj) for obj in objs]
+    return results[0] if len(results) == 1 else results
+
+
+def __sync__(obj):
+    """Synchronize a single object.
+
+    Args:
+        obj: Future, list, tuple or any other object.
+    Returns:
+        The synchronized object.
+    """
+    if isinstance(obj, Future):
+        return obj.result()
+    if isinstance(obj, list):
+        return [__sync__(element) for element in obj]
+    if isinstance(obj, tuple):
+        return tuple(__sync__(element) for element in obj)
+    return obj
+
+
+def compss_wait_on_file(*files):
+    """Wait until the given files are written (PyCOMPSs compatible).
+
+    Args:
+        files (str): File paths.
+
+    Raises:
+        Exception: The failure of the first task writing them that failed.
+    """
+    runtime = get_local_runtime()
+    if runtime:
+        runtime.wait_on_file(files)
+
+
+def compss_wait_on_directory(*directories):
+    """Wait until the given directories are written (PyCOMPSs compatible).
+
+    Args:
+        directories (str): Directory paths.
+
+    Raises:
+        Exception: The failure of the first task writing them that failed.
+    """
+    compss_wait_on_file(*directories)
+
+
+def compss_barrier(no_more_tasks=False):
+    """Wait for all the submitted tasks (PyCOMPSs compatible).
+
+    Args:
+        no_more_tasks (bool): Ignored (PyCOMPSs compatibility).
+
+    Raises:
+        Exception: The failure of the first task that failed since the
+                   previous barrier.
+    """
+    runtime = get_local_runtime()
+    if runtime:
+        runtime.barrier()
@@ -0,0 +1,686 @@
+"""
+This file provides the building block server (permedcoe serve): a long-lived
+process that keeps permedcoe imported and the building block definitions
+compiled, and executes the invocations received on a Unix socket (see
+permedcoe.client).
+
+Every invocation is executed by a worker process forked from the server, so
+that it gets its own working directory, environment, standard streams and
+execution flags (as a "permedcoe execute building_block" process would)
+without paying the interpreter start up, the permedcoe imports and the
+argument parser construction. The building block itself is imported by the
+worker once the environment of its client is applied, since its definitions
+(e.g. CONTAINER_PATH or COMPUTING_UNITS) are evaluated at import time. The
+number of concurrent workers is bounded (the rest of the invocations wait in
+a queue). The output of the workers is forwarded to the clients while it is
+produced, followed by their exit code, without blocking the server on a slow
+client: the output is buffered per client and the worker output is not read
+while the buffer of its client is full. A worker (and the containers it
+launched) is terminated if its client disconnects.
+"""
+
+import os
+import sys
+import json
+import time
+import signal
+import socket
+import logging
+
+# Preloaded for the workers: their command line is parsed with argparse,
+# which permedcoe.utils.arguments imports on first use (every worker would
+# import it again otherwise)
+import argparse  # noqa: F401
+import importlib.util
+import selectors
+import traceback
+from collections import deque
+
+import permedcoe
+from permedcoe.__main__ import main as __permedcoe_main__
+from permedcoe.client import default_socket
+from permedcoe.client import connect
+from permedcoe.client import encode_frame
+from permedcoe.client import decode_frame
+from permedcoe.client import REQUEST
+from permedcoe.client import STDOUT
+from permedcoe.client import STDERR
+from permedcoe.client import EXIT
+from permedcoe.utils.parser_cache import get_compiled_definition
+from permedcoe.utils.executor import terminate_sessions
+from permedcoe.utils.exceptions import PerMedCoEException
+
+EXECUTE_ACTIONS = ("execute", "x")
+BB_LABELS = ("building_block", "bb")
+# Options of "permedcoe execute building_block" that take a value
+BB_OPTIONS = ("--batch", "-j", "--jobs", "--summary")
+CHUNK_SIZE = 65536
+MAX_PENDING_OUTPUT = 1024 * 1024  # bytes buffered per client before pausing
+MAX_REQUEST_SIZE = 64 * 1024 * 1024
+POLL_INTERVAL = 0.5  # seconds between the stop and idle checks
+SOCKET_UMASK = 0o177  # socket created with 0600 permissions
+INVALID_REQUEST = 2
+# Exit hooks of the workers (module and function, run in this order if the
+# module was used), instead of the exit handlers inherited from the server
+WORKER_EXIT_HOOKS = (
+    ("permedcoe.core.runtime", "wait_local_runtime"),
+    ("permedcoe.core.instances", "stop_instances"),
+    ("permedcoe.core.trace", "flush_traces"),
+    ("permedcoe.core.accounting", "flush_usage_reports"),
+)
+
+
+class Invocation(object):
+    """Building block invocation received by the server."""
+
+    def __init__(self, connection):
+        """Constructor
+
+        Args:
+            connection (socket): Client connection.
+        """
+        self.connection = connection
+        self.buffer = b""
+        self.argv = None
+        self.cwd = None
+        self.env = None
+        self.pid = None
+        self.pipes = {}  # worker output read end: channel
+        self.start = None
+        self.output = bytearray()  # frames pending to send to the client
+        self.writing = False  # waiting for the connection to be writable
+        self.paused = False  # worker output not read (output buffer full)
+        self.closing = False  # closed once the output is sent
+        self.disconnected = False
+
+    def name(self):
+        """Building block to execute.
+
+        Returns:
+            str: Building block name (None if not found).
+        """
+        skip = False
+        for token in self.argv[2:]:
+            if skip:
+                skip = False
+            elif token.startswith("-"):
+                skip = token in BB_OPTIONS
+            else:
+                return token
+        return None
+
+
+class BBServer(object):
+    """Building block server listening on a Unix socket."""
+
+    def __init__(self, socket_path=None, jobs=None, idle_timeout=None):
+        """Constructor
+
+        Args:
+            socket_path (str, optional): Socket to listen on (default_socket
+                                         if not given).
+            jobs (int, optional): Maximum number of concurrent invocations
+                                  (the number of cores if not given).
+            idle_timeout (float, optional): Seconds without invocations
+                                            before stopping the server.
+        """
+        self.socket_path = socket_path or default_socket()
+        self.jobs = max(1, int(jobs or os.cpu_count() or 1))
+        self.idle_timeout = idle_timeout
+        self.selector = None
+        self.listener = None
+        self.invocations = set()  # connected clients
+        self.pending = deque()  # received and waiting for a worker
+        self.running = set()
+        self.stopping = False
+        self.warmed = set()  # building blocks with the definition compiled
+        self.last_activity = time.monotonic()
+
+    def preload(self, names):
+        """Compile the definitions of the given building blocks (they are
+        imported by every worker with the environment of its client).
+
+        Args:
+            names (list[str]): Building block names.
+        """
+        # Resolve the decorators backend once for all the workers
+        getattr(permedcoe, "task")
+        try:
+            # Only needed by the workers with a configuration file
+            import yaml  # noqa: F401
+        except ImportError:
+            pass
+        for name in names or []:
+            if not self.__warm_up__(name):
+                logging.warning("Could not preload the building block %s", name)
+
+    def serve_forever(self):
+        """Accept and execute invocations until stopped (SIGTERM or SIGINT)
+        or idle for idle_timeout seconds.
+
+        Raises:
+            PerMedCoEException: If there is another server listening on the
+                                socket.
+        """
+        self.__listen__()
+        handlers = {
+            signum: signal.signal(signum, self.__stop__)
+            for signum in (signal.SIGTERM, signal.SIGINT)
+        }
+        try:
+            while self.running or self.listener is not None or self.__sending__():
+                for key, events in self.selector.select(POLL_INTERVAL):
+                    for event, (callback, args) in key.data.items():
+                        if events & event:
+                            callback(*args)
+                if self.listener is not None and (self.stopping or self.__idle__()):
+                    self.__shutdown__()
+        finally:
+            for signum, handler in handlers.items():
+                signal.signal(signum, handler)
+            self.__close_listener__()
+            for invocation in list(self.invocations):
+                self.__close__(invocation)
+            self.selector.close()
+
+    def __listen__(self):
+        """Create the listening socket (replacing a stale one)."""
+        if os.path.exists(self.socket_path):
+            connection = connect(self.socket_path)
+            if connection is not None:
+                connection.close()
+                raise PerMedCoEException(
+                    f"There is already a server listening on {self.socket_path}"
+                )
+            os.unlink(self.socket_path)
+        self.listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        # Only the user can connect (from the socket creation)
+        umask = os.umask(SOCKET_UMASK)
+        try:
+            self.listener.bind(self.socket_path)
+        finally:
+            os.umask(umask)
+        self.listener.listen(self.jobs * 4)
+        self.selector = selectors.DefaultSelector()
+        self.__register__(self.listener, self.__accept__)
+        logging.info(
+            "Listening on %s (%d concurrent invocations)", self.socket_path, self.jobs
+        )
+
+    def __register__(self, fileobj, callback, *args):
+        """Register a file object in the selector.
+
+        Args:
+            fileobj (socket or int): Socket or file descriptor to read from.
+            callback (function): Function to call when it is readable.
+            *args: Callback arguments.
+        """
+        self.selector.register(
+            fileobj, selectors.EVENT_READ, {selectors.EVENT_READ: (callback, args)}
+        )
+
+    def __sending__(self):
+        """Check if there are replies still being sent to the clients.
+
+        Returns:
+            bool: True if any closing invocation has pending output.
+        """
+        return any(invocation.closing for invocation in self.invocations)
+
+    def __stop__(self, signum, frame):
+        """Signal handler: stop the server (after terminating the running
+        invocations)."""
+        self.stopping = True
+
+    def __idle__(self):
+        """Check if the server has been idle for idle_timeout seconds.
+
+        Returns:
+            bool: True if idle. False otherwise.
+        """
+        if not self.idle_timeout or self.invocations:
+            return False
+        return time.monotonic() - self.last_activity > self.idle_timeout
+
+    def __shutdown__(self):
+        """Stop accepting invocations and terminate the running ones."""
+        logging.info("Stopping the server")
+        self.__close_listener__()
+        while self.pending:
+            self.__reject__(self.pending.popleft(), "The server is stopping")
+        for invocation in self.running:
+            self.__kill__(invocation)
+
+    def __close_listener__(self):
+        """Close the listening socket and remove it."""
+        if self.listener is None:
+            return
+        self.selector.unregister(self.listener)
+        self.listener.close()
+        self.listener = None
+        try:
+            os.unlink(self.socket_path)
+        except FileNotFoundError:
+            pass
+
+    def __accept__(self):
+        """Accept a new client connection."""
+        connection, _ = self.listener.accept()
+        # The output is sent as the connection accepts it (see __flush__)
+        connection.setblocking(False)
+        invocation = Invocation(connection)
+        self.invocations.add(invocation)
+        self.last_activity = time.monotonic()
+        self.selector.register(
+            connection,
+            selectors.EVENT_READ,
+            {
+                selectors.EVENT_READ: (self.__receive__, (invocation,)),
+                selectors.EVENT_WRITE: (self.__flush__, (invocation,)),
+            },
+        )
+
+    def __receive__(self, invocation):
+        """Receive the request of a client (or its disconnection).
+
+        Args:
+            invocation (Invocation): Client invocation.
+        """
+        if invocation not in self.invocations:
+            return
+        try:
+            data = invocation.connection.recv(CHUNK_SIZE)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b""
+        if not data:
+            self.__disconnect__(invocation)
+            return
+        if invocation.argv is not None or invocation.closing:
+            # Nothing else is expected after the request
+            return
+        invocation.buffer += data
+        frame = decode_frame(invocation.buffer)
+        if frame is None:
+            if len(invocation.buffer) > MAX_REQUEST_SIZE:
+                self.__reject__(invocation, "Request too large")
+            return
+        channel, payload, _ = frame
+        invocation.buffer = b""
+        try:
+            request = json.loads(payload)
+            argv = [str(arg) for arg in request["argv"]]
+            invocation.cwd = str(request["cwd"])
+            invocation.env = {str(k): str(v) for k, v in request["env"].items()}
+        except (ValueError, KeyError, TypeError, AttributeError):
+            argv = None
+        if (
+            channel != REQUEST
+            or not argv
+            or len(argv) < 2
+            or argv[0] not in EXECUTE_ACTIONS
+            or argv[1] not in BB_LABELS
+        ):
+            self.__reject__(invocation, "Only building block executions are served")
+            return
+        if self.listener is None:
+            self.__reject__(invocation, "The server is stopping")
+            return
+        invocation.argv = argv
+        self.pending.append(invocation)
+        self.__schedule__()
+
+    def __reject__(self, invocation, message):
+        """Reply an error to an invocation that will not be executed.
+
+        Args:
+            invocation (Invocation): Client invocation.
+            message (str): Error message.
+        """
+        self.__send__(invocation, STDERR, f"ERROR: {message}\n".encode())
+        self.__end__(invocation, INVALID_REQUEST)
+
+    def __disconnect__(self, invocation):
+        """Handle the disconnection of a client: terminate its worker.
+
+        Args:
+            invocation (Invocation): Client invocation.
+        """
+        invocation.disconnected = True
+        invocation.output.clear()
+        if invocation.pid is None or invocation.closing:
+            if invocation in self.pending:
+                self.pending.remove(invocation)
+            self.__close__(invocation)
+        else:
+            # Its output is discarded from now on
+            self.__throttle__(invocation)
+            self.__kill__(invocation)
+
+    def __send__(self, invocation, channel, payload):
+        """Queue a frame to the client of an invocation and send as much as
+        the connection accepts.
+
+        Args:
+            invocation (Invocation): Client invocation.
+            channel (int): Frame channel (STDOUT, STDERR or EXIT).
+            payload (bytes): Frame payload.
+        """
+        if invocation.disconnected:
+            return
+        invocation.output += encode_frame(channel, payload)
+        self.__flush__(invocation)
+
+    def __end__(self, invocation, exit_code):
+        """Send the exit code to the client of an invocation and close the
+        connection once sent.
+
+        Args:
+            invocation (Invocation): Client invocation.
+            exit_code (int): Exit code.
+        """
+        invocation.closing = True
+        self.__send__(invocation, EXIT, str(exit_code).encode())
+        if invocation.disconnected:
+            self.__close__(invocation)
+
+    def __flush__(self, invocation):
+        """Send the pending output of an invocation (without blocking),
+        watching the connection until it is sent.
+
+        Args:
+            invocation (Invocation): Client invocation.
+        """
+        if invocation not in self.invocations:
+            return
+        try:
+            sent = invocation.connection.send(invocation.output)
+            del invocation.output[:sent]
+        except BlockingIOError:
+            pass
+        except OSError:
+            self.__disconnect__(invocation)
+            return
+        if not invocation.output and invocation.closing:
+            self.__close__(invocation)
+            return
+        writing = bool(invocation.output)
+        if writing != invocation.writing:
+            invocation.writing = writing
+            key = self.selector.get_key(invocation.connection)
+            events = selectors.EVENT_READ
+            if writing:
+                events |= selectors.EVENT_WRITE
+            self.selector.modify(invocation.connection, events, key.data)
+        self.__throttle__(invocation)
+
+    def __throttle__(self, invocation):
+        """Stop reading the output of a worker while its client has too much
+        pending output (the worker blocks writing it), and resume it
+        afterwards.
+
+        Args:
+            invocation (Invocation): Client invocation.
+        """
+        paused = len(invocation.output) > MAX_PENDING_OUTPUT
+        if paused == invocation.paused:
+            return
+        invocation.paused = paused
+        for pipe in invocation.pipes:
+            if paused:
+                self.selector.unregister(pipe)
+            else:
+                self.__register__(pipe, self.__forward__, invocation, pipe)
+
+    def __close__(self, invocation):
+        """Close the connection of an invocation.
+
+        Args:
+            invocation (Invocation): Client invocation.
+        """
+        if invocation not in self.invocations:
+            return
+        self.invocations.discard(invocation)
+        self.selector.unregister(invocation.connection)
+        invocation.connection.close()
+        self.last_activity = time.monotonic()
+
+    def __schedule__(self):
+        """Start the pending invocations while there are free workers."""
+        while self.pending and len(self.running) < self.jobs:
+            self.__start__(self.pending.popleft())
+
+    def __start__(self, invocation):
+        """Fork a worker for the given invocation.
+
+        Args:
+            invocation (Invocation): Client invocation.
+        """
+        self.__warm_up__(invocation.name())
+        out_read, out_write = os.pipe()
+        err_read, err_write = os.pipe()
+        # The pending output would be written by the worker too
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = os.fork()
+        if pid == 0:
+            os.close(out_read)
+            os.close(err_read)
+            self.__worker__(invocation, out_write, err_write)
+        try:
+            # Also set here: it may be terminated before the worker sets it
+            os.setpgid(pid, pid)
+        except OSError:
+            pass
+        os.close(out_write)
+        os.close(err_write)
+        invocation.pid = pid
+        invocation.start = time.time()
+        invocation.pipes = {out_read: STDOUT, err_read: STDERR}
+        for pipe in invocation.pipes:
+            self.__register__(pipe, self.__forward__, invocation, pipe)
+        self.running.add(invocation)
+        logging.info("Invocation %d started: %s", pid, " ".join(invocation.argv))
+
+    def __warm_up__(self, name):
+        """Compile the definition of the given building block (once) so that
+        the workers inherit it.
+
+        The building block is not imported here: its definitions are
+        evaluated at import time with the environment of the process, which
+        must be the one of the client (the worker imports it).
+
+        Args:
+            name (str): Building block name.
+        Returns:
+            bool: True if found. False otherwise (the worker will report
+                  the failure).
+        """
+        if not name or "." in name:
+            # Finding a submodule would import its parent package
+            return False
+        if name in self.warmed:
+            return True
+        try:
+            spec = importlib.util.find_spec(name)
+            if spec is None:
+                return False
+            for path in (spec.submodule_search_locations or [])[:1]:
+                definition = os.path.join(path, "definition.json")
+                if os.path.isfile(definition):
+                    get_compiled_definition(definition)
+        except Exception as error:  # noqa: reported by the worker
+            logging.debug("Could not find the building block %s: %s", name, error)
+            return False
+        self.warmed.add(name)
+        return True
+
+    def __forward__(self, invocation, pipe):
+        """Forward the output of a worker to its client.
+
+        Args:
+            invocation (Invocation): Running invocation.
+            pipe (int): Worker output read end.
+        """
+        if invocation.paused:
+            # Paused by a previous event of the same selection
+            return
+        data = os.read(pipe, CHUNK_SIZE)
+        if data:
+            self.__send__(invocation, invocation.pipes[pipe], data)
+            return
+        self.selector.unregister(pipe)
+        os.close(pipe)
+        del invocation.pipes[pipe]
+        if not invocation.pipes:
+            self.__finish__(invocation)
+
+    def __finish__(self, invocation):
+        """Collect the exit code of a worker and send it to its client.
+
+        Args:
+            invocation (Invocation): Finished invocation.
+        """
+        _, status = os.waitpid(invocation.pid, 0)
+        if os.WIFSIGNALED(status):
+            exit_code = 128 + os.WTERMSIG(status)
+        else:
+            exit_code = os.WEXITSTATUS(status)
+        logging.info(
+            "Invocation %d finished with exit code %d (%.3f s)",
+            invocation.pid,
+            exit_code,
+            time.time() - invocation.start,
+        )
+        self.running.discard(invocation)
+        self.__end__(invocation, exit_code)
+        self.__schedule__()
+
+    def __kill__(self, invocation):
+        """Terminate the worker of an invocation (and its children).
+
+        Args:
+            invocation (Invocation): Running invocation.
+        """
+        try:
+            os.killpg(invocation.pid, signal.SIGTERM)
+        except (ProcessLookupError, PermissionError):
+            pass
+
+    def __worker__(self, invocation, out_write, err_write):
+        """Execute an invocation in the forked worker (never returns).
+
+        Args:
+            invocation (Invocation): Invocation to execute.
+            out_write (int): Standard output write end.
+            err_write (int): Standard error write end.
+        """
+        exit_code = 1
+        try:
+            # Own process group: terminated with its children
+            os.setpgid(0, 0)
+            for signum in (signal.SIGTERM, signal.SIGINT):
+                signal.signal(signum, __terminate_worker__)
+            # Release the server sockets and the other workers output
+            self.selector.close()
+            if self.listener is not None:
+                self.listener.close()
+            for other in self.invocations:
+                other.connection.close()
+                for pipe in other.pipes:
+                    os.close(pipe)
+            stdin = os.open(os.devnull, os.O_RDONLY)
+            os.dup2(stdin, 0)
+            os.dup2(out_write, 1)
+            os.dup2(err_write, 2)
+            for fd in (stdin, out_write, err_write):
+                os.close(fd)
+            os.chdir(invocation.cwd)
+            os.environ.clear()
+            os.environ.update(invocation.env)
+            # Logging configured as in a new process
+            for handler in list(logging.root.handlers):
+                logging.root.removeHandler(handler)
+            logging.root.setLevel(logging.WARNING)
+            sys.argv = ["permedcoe"] + invocation.argv
+            exit_code = 0
+            __permedcoe_main__()
+        except SystemExit as exit_status:
+            exit_code = __exit_code__(exit_status.code)
+        except BaseException:  # noqa: reported to the client
+            traceback.print_exc()
+            exit_code = 1
+        finally:
+            __exit_worker__(exit_code)
+
+
+def __exit_code__(code):
+    """Exit code of a SystemExit (as the interpreter does).
+
+    Args:
+        code: SystemExit code.
+    Returns:
+        int: Exit code.
+    """
+    if code is None:
+        return 0
+    if isinstance(code, int):
+        return code
+    print(code, file=sys.stderr)
+    return 1
+
+
+def __terminate_worker__(signum, frame):
+    """Signal handler of the workers: terminate the worker and the commands
+    it launched in their own session (with timeout), which are not in the
+    worker process group.
+
+    Args:
+        signum (int): Received signal.
+        frame (frame): Current stack frame.
+    """
+    terminate_sessions(signum)
+    os._exit(128 + signum)
+
+
+def __exit_worker__(exit_code):
+    """Finish a worker running its exit hooks (WORKER_EXIT_HOOKS) and
+    flushing its streams, without returning to the server code nor running
+    the exit handlers inherited from the server.
+
+    Args:
+        exit_code (int): Worker exit code.
+    """
+    try:
+        for module_name, hook in WORKER_EXIT_HOOKS:
+            module = sys.modules.get(module_name)
+            if module is None:
+                continue
+            try:
+                getattr(module, hook)()
+            except Exception:  # noqa: reported, the rest of hooks must run
+                traceback.print_exc()
+                # e.g. failed tasks of the local runtime
+                exit_code = exit_code or 1
+        sys.stdout.flush()
+        sys.stderr.flush()
+    finally:
+        os._exit(exit_code & 0xFF)
+
+
+def serve(socket_path=None, jobs=None, idle_timeout=None, preload=None):
+    """Run a building block server until stopped.
+
+    Args:
+        socket_path (str, optional): Socket to listen on (PERMEDCOE_SERVER or
+                                     the default socket if not given).
+        jobs (int, optional): Maximum number of concurrent invocations.
+        idle_timeout (float, optional): Seconds without invocations before
+                                        stopping the server.
+        preload (list[str], optional): Building blocks whose definitions to
+                                       compile at start.
+    """
+    server = BBServer(socket_path, jobs, idle_timeout)
+    server.preload(preload)
+    server.serve_forever()
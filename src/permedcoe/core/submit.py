@@ -0,0 +1,387 @@
+"""
+This file provides the submission of building block batches (one
+invocation per row of a jsonl or csv file) to SLURM as a single job array,
+instead of one job per invocation:
+
+- The rows are packed into array elements (--pack rows per element), which
+  run them with "permedcoe execute bb --batch" (--jobs rows at the same
+  time), and the number of elements running at the same time can be
+  throttled (--throttle, the %N of the array).
+- The resources of every element are requested from the decorators of the
+  building block tasks (@constraint computing_units and memory_size, and
+  @mpi computing_nodes).
+- The submission folder (<batch>.slurm by default) keeps the job script,
+  the rows and summary of every element and the SLURM logs, so that the
+  status of the elements can be checked and their summaries collected.
+"""
+
+import os
+import re
+import sys
+import json
+import shlex
+import logging
+import importlib
+import subprocess
+
+from permedcoe.core.workflows import get_requirements
+from permedcoe.utils.batch import load_batch_rows
+from permedcoe.utils.exceptions import PerMedCoEException
+
+SBATCH = "sbatch"
+SQUEUE = "squeue"
+WORKDIR_SUFFIX = ".slurm"
+SUBMISSION_FILE = "submission.json"
+SCRIPT_FILE = "job.sh"
+ROWS_FOLDER = "rows"
+SUMMARIES_FOLDER = "summaries"
+LOGS_FOLDER = "logs"
+ELEMENT_FORMAT = "%06d"  # file name of every array element
+ELEMENT_PATTERN = re.compile(r"^(\d+)_(\d+|\[.*\])$")
+COMPLETED = "COMPLETED"
+FAILED = "FAILED"
+MISSING = "MISSING"  # not queued and without summary (e.g. cancelled)
+UNKNOWN = "UNKNOWN"  # without summary and squeue not available
+NOT_SUBMITTED = "NOT_SUBMITTED"
+
+
+def submit_building_block(
+    name,
+    batch,
+    parameters=None,
+    pack=1,
+    jobs=1,
+    throttle=None,
+    workdir=None,
+    sbatch_flags=None,
+    dry_run=False,
+):
+    """Submit a building block batch as a SLURM job array.
+
+    Args:
+        name (str): Building block name.
+        batch (str): Batch file (jsonl or csv).
+        parameters (list[str]): Building block parameters common to all rows.
+        pack (int): Rows per array element.
+        jobs (int): Rows run at the same time by every array element.
+        throttle (int): Array elements running at the same time (None for
+                        no limit).
+        workdir (str): Submission folder (default: <batch>.slurm).
+        sbatch_flags (str): Additional sbatch options.
+        dry_run (bool): Prepare the submission folder without submitting.
+    Returns:
+        dict: Submission information (also kept in the submission folder).
+
+    Raises:
+        PerMedCoEException: If the submission folder already exists or the
+                            job array can not be submitted.
+    """
+    rows = load_batch_rows(batch)
+    if not rows:
+        raise PerMedCoEException(f"ERROR: Batch file {batch} has no rows.")
+    pack = max(1, int(pack))
+    jobs = max(1, min(int(jobs), pack))
+    elements = (len(rows) + pack - 1) // pack
+    workdir = os.path.abspath(workdir or os.path.splitext(batch)[0] + WORKDIR_SUFFIX)
+    if os.path.exists(workdir):
+        raise PerMedCoEException(f"ERROR: Submission folder {workdir} already exists.")
+    directives = get_directives(name, jobs)
+    array = f"0-{elements - 1}" + (f"%{throttle}" if throttle else "")
+    directives = [
+        f"--job-name=permedcoe-{name}",
+        f"--array={array}",
+    ] + directives
+    # Prepare the submission folder
+    for folder in (ROWS_FOLDER, SUMMARIES_FOLDER, LOGS_FOLDER):
+        os.makedirs(os.path.join(workdir, folder))
+    for index in range(elements):
+        with open(__element_file__(workdir, ROWS_FOLDER, index), "w") as rows_fd:
+            for row in rows[index * pack : (index + 1) * pack]:
+                rows_fd.write(json.dumps(row) + "\n")
+    script = os.path.join(workdir, SCRIPT_FILE)
+    with open(script, "w") as script_fd:
+        script_fd.write(__job_script__(name, workdir, directives, jobs, parameters))
+    command = [SBATCH, "--parsable"] + shlex.split(sbatch_flags or "") + [script]
+    submission = {
+        "name": name,
+        "batch": os.path.abspath(batch),
+        "rows": len(rows),
+        "pack": pack,
+        "elements": elements,
+        "directives": directives,
+        "command": command,
+        "job_id": None,
+    }
+    if dry_run:
+        logging.info("Dry run: %s", " ".join(command))
+    else:
+        submission["job_id"] = __sbatch__(command)
+    __save_submission__(workdir, submission)
+    submission["workdir"] = workdir
+    return submission
+
+
+def get_directives(name, jobs=1):
+    """Retrieve the resources to request for every array element from the
+    building block tasks.
+
+    Args:
+        name (str): Building block name.
+        jobs (int): Rows run at the same time by every array element.
+    Returns:
+        list[str]: sbatch options.
+    """
+    importlib.import_module(name)
+    requirements = get_requirements(name)
+    if requirements is None:
+        logging.warning("No tasks found in %s: requesting one core", name)
+        return ["--nodes=1", "--ntasks=1", f"--cpus-per-task={jobs}"]
+    if requirements.nodes > 1:
+        if jobs > 1:
+            logging.warning("Multi-node building block: running one row at once")
+        jobs = 1
+    directives = [f"--nodes={requirements.nodes}"]
+    if requirements.mpi:
+        # One SLURM task per MPI process (the nodes share them evenly)
+        directives.append(f"--ntasks={requirements.cpus * jobs}")
+        if requirements.nodes > 1:
+            directives.append(f"--ntasks-per-node={requirements.cpus_per_node()}")
+    else:
+        directives += ["--ntasks=1", f"--cpus-per-task={requirements.cpus * jobs}"]
+    if requirements.memory is not None:
+        directives.append(f"--mem={requirements.memory_mb() * jobs}M")
+    return directives
+
+
+def get_status(workdir):
+    """Retrieve the state of every array element of a submission.
+
+    The queued elements take their state from squeue (e.g. PENDING or
+    RUNNING). The rest are COMPLETED or FAILED (if any of their rows failed)
+    if they wrote their summary, and MISSING otherwise (e.g. cancelled or
+    out of time).
+
+    Args:
+        workdir (str): Submission folder.
+    Returns:
+        tuple(dict, dict): Submission information and the state of every
+                           array element (index as key).
+    """
+    submission = load_submission(workdir)
+    queued = {}
+    if submission["job_id"]:
+        queued = __squeue__(submission["job_id"])
+    states = {}
+    for index in range(submission["elements"]):
+        results = __read_summary__(workdir, index)
+        if queued and index in queued:
+            states[index] = queued[index]
+        elif results is not None:
+            success = all(result["status"] == "success" for result in results)
+            states[index] = COMPLETED if success else FAILED
+        elif not submission["job_id"]:
+            states[index] = NOT_SUBMITTED
+        elif queued is None:
+            states[index] = UNKNOWN
+        else:
+            states[index] = MISSING
+    return submission, states
+
+
+def collect_results(workdir):
+    """Merge the summaries of the array elements into the results of the
+    whole batch (the rows of the elements without summary are "missing").
+
+    Args:
+        workdir (str): Submission folder.
+    Returns:
+        tuple(dict, list[dict]): Submission information and the per-row
+                                 results (as "permedcoe execute bb --batch").
+    """
+    submission = load_submission(workdir)
+    pack = submission["pack"]
+    results = []
+    for index in range(submission["elements"]):
+        first = index * pack
+        size = min(pack, submission["rows"] - first)
+        summary = {
+            result["row"]: result for result in __read_summary__(workdir, index) or []
+        }
+        for row in range(size):
+            result = summary.get(
+                row, {"status": "missing", "exit_code": None, "time": 0.0}
+            )
+            result = dict(result, row=first + row, element=index)
+            results.append(result)
+    return submission, results
+
+
+def load_submission(workdir):
+    """Load the information of a submission.
+
+    Args:
+        workdir (str): Submission folder.
+    Returns:
+        dict: Submission information.
+
+    Raises:
+        PerMedCoEException: If it is not a submission folder.
+    """
+    submission_file = os.path.join(workdir, SUBMISSION_FILE)
+    if not os.path.isfile(submission_file):
+        raise PerMedCoEException(f"ERROR: {workdir} is not a submission folder.")
+    with open(submission_file, "r") as submission_fd:
+        submission = json.load(submission_fd)
+    submission["workdir"] = os.path.abspath(workdir)
+    return submission
+
+
+def __save_submission__(workdir, submission):
+    """Keep the information of a submission in its folder.
+
+    Args:
+        workdir (str): Submission folder.
+        submission (dict): Submission information.
+    """
+    with open(os.path.join(workdir, SUBMISSION_FILE), "w") as submission_fd:
+        json.dump(submission, submission_fd, indent=2)
+
+
+def __element_file__(workdir, folder, index):
+    """Path of the file of an array element.
+
+    Args:
+        workdir (str): Submission folder.
+        folder (str): ROWS_FOLDER or SUMMARIES_FOLDER.
+        index (int): Array element index.
+    Returns:
+        str: File path.
+    """
+    return os.path.join(workdir, folder, ELEMENT_FORMAT % index + ".jsonl")
+
+
+def __read_summary__(workdir, index):
+    """Read the summary of an array element.
+
+    Args:
+        workdir (str): Submission folder.
+        index (int): Array element index.
+    Returns:
+        list[dict]: Per-row results (None if not written).
+    """
+    summary_file = __element_file__(workdir, SUMMARIES_FOLDER, index)
+    if not os.path.isfile(summary_file):
+        return None
+    with open(summary_file, "r") as summary_fd:
+        return [json.loads(line) for line in summary_fd if line.strip()]
+
+
+def __job_script__(name, workdir, directives, jobs, parameters):
+    """Build the job array script.
+
+    Args:
+        name (str): Building block name.
+        workdir (str): Submission folder.
+        directives (list[str]): sbatch options.
+        jobs (int): Rows run at the same time by every array element.
+        parameters (list[str]): Building block parameters common to all rows.
+    Returns:
+        str: Script content.
+    """
+    logs = os.path.join(workdir, LOGS_FOLDER)
+    directives = directives + [
+        f"--chdir={os.getcwd()}",
+        f"--output={logs}/%a.out",
+        f"--error={logs}/%a.err",
+    ]
+    command = [sys.executable, "-m", "permedcoe", "execute", "bb"]
+    command += ["-j", str(jobs)]
+    command = " ".join(shlex.quote(arg) for arg in command)
+    rows = shlex.quote(os.path.join(workdir, ROWS_FOLDER)) + '/"$ELEMENT".jsonl'
+    summary = shlex.quote(os.path.join(workdir, SUMMARIES_FOLDER))
+    summary += '/"$ELEMENT".jsonl'
+    arguments = " ".join(shlex.quote(arg) for arg in [name] + list(parameters or []))
+    lines = ["#!/bin/bash"]
+    lines += [f"#SBATCH {directive}" for directive in directives]
+    lines += [
+        "",
+        "# Generated by permedcoe submit: every array element runs its rows",
+        f'ELEMENT=$(printf "{ELEMENT_FORMAT}" "$SLURM_ARRAY_TASK_ID")',
+        f"exec {command} --batch {rows} --summary {summary} {arguments}",
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def __sbatch__(command):
+    """Submit the job array.
+
+    Args:
+        command (list[str]): sbatch command.
+    Returns:
+        str: Job identifier.
+
+    Raises:
+        PerMedCoEException: If the submission fails.
+    """
+    logging.info("Submitting: %s", " ".join(command))
+    try:
+        process = subprocess.run(
+            command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
+        )
+    except OSError as error:
+        raise PerMedCoEException(f"ERROR: Can not run {SBATCH}: {error}")
+    if process.returncode != 0:
+        raise PerMedCoEException(
+            f"ERROR: {SBATCH} failed ({process.returncode}): {process.stderr.strip()}"
+        )
+    # --parsable output: <job_id>[;<cluster>]
+    return process.stdout.strip().split(";")[0]
+
+
+def __squeue__(job_id):
+    """Retrieve the state of the queued array elements.
+
+    Args:
+        job_id (str): Job array identifier.
+    Returns:
+        dict: Array element index as key and its state as value (None if
+              squeue is not available).
+    """
+    command = [SQUEUE, "--noheader", "--array", f"--jobs={job_id}"]
+    command.append("--format=%i %T")
+    try:
+        process = subprocess.run(
+            command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
+        )
+    except OSError as error:
+        logging.warning("Can not run %s: %s", SQUEUE, str(error))
+        return None
+    if process.returncode != 0:
+        # The job is no longer known (e.g. finished long ago)
+        logging.debug("%s failed: %s", SQUEUE, process.stderr.strip())
+        return {}
+    states = {}
+    for line in process.stdout.splitlines():
+        words = line.split()
+        match = ELEMENT_PATTERN.match(words[0]) if len(words) == 2 else None
+        if not match or match.group(1) != str(job_id):
+            continue
+        for index in __expand_indexes__(match.group(2)):
+            states[index] = words[1]
+    return states
+
+
+def __expand_indexes__(indexes):
+    """Expand the array indexes shown by squeue (e.g. "7" or "[4-6,9%2]").
+
+    Args:
+        indexes (str): Array indexes.
+    Returns:
+        list[int]: Array element indexes.
+    """
+    indexes = indexes.strip("[]").split("%")[0]
+    expanded = []
+    for item in indexes.split(","):
+        first, _, last = item.partition("-")
+        expanded += range(int(first), int(last or first) + 1)
+    return expanded
@@ -0,0 +1,224 @@
+"""
+This file provides the phase timing tracer of the building blocks. It is
+enabled with the --trace FILE flag or the PERMEDCOE_TRACE environment
+variable, and records the duration of every phase of the @task invocations
+(argument parsing, preprocessing, mount resolution, image staging, container
+startup, binary execution, output printing...).
+
+The spans are written at exit in Chrome trace-event format (json), which can
+be opened with chrome://tracing or https://ui.perfetto.dev. All processes
+that share the trace file (e.g. the building blocks of a workflow) merge
+their spans into it, so that the whole workflow is shown in a single trace.
+"""
+
+import os
+import sys
+import json
+import time
+import fcntl
+import threading
+from contextlib import contextmanager
+from contextlib import nullcontext
+
+from permedcoe.core.constants import PERMEDCOE_TRACE
+from permedcoe.utils.process_exit import register_process_exit
+
+CATEGORY = "permedcoe"
+
+__TRACERS__ = {}
+__TRACERS_LOCK__ = threading.Lock()
+__NO_SPAN__ = nullcontext()
+
+
+class Tracer(object):
+    """Phase timing tracer (Chrome trace-event format)."""
+
+    def __init__(self, path):
+        """Constructor
+
+        Args:
+            path (str): Trace file.
+        """
+        self.path = path
+        self.lock = threading.Lock()
+        self.events = []
+        self.threads = set()
+        self.pid = None
+
+    @contextmanager
+    def span(self, name, **args):
+        """Record the duration of the enclosed code as a span.
+
+        Args:
+            name (str): Span name.
+            args: Extra information to show with the span.
+        """
+        start = time.time_ns()
+        try:
+            yield args
+        except BaseException as exception:
+            args["error"] = type(exception).__name__
+            raise
+        finally:
+            self.record(name, start, time.time_ns(), args)
+
+    def record(self, name, start, end, args=None):
+        """Record an already measured span.
+
+        Args:
+            name (str): Span name.
+            start (int): Start time (ns since the epoch).
+            end (int): End time (ns since the epoch).
+            args (dict, optional): Extra information to show with the span.
+        """
+        tid = __thread_id__()
+        event = {
+            "name": name,
+            "cat": CATEGORY,
+            "ph": "X",
+            "ts": start / 1000,
+            "dur": (end - start) / 1000,
+            "pid": os.getpid(),
+            "tid": tid,
+        }
+        if args:
+            event["args"] = {key: str(value) for key, value in args.items()}
+        with self.lock:
+            if register_process_exit(self, self.flush):
+                # First span in this process (events are not inherited)
+                self.events = [__metadata__("process_name", tid, __process_name__())]
+                self.threads = set()
+            if tid not in self.threads:
+                self.threads.add(tid)
+                name = threading.current_thread().name
+                self.events.append(__metadata__("thread_name", tid, name))
+            self.events.append(event)
+
+    def flush(self):
+        """Merge the recorded spans into the trace file."""
+        with self.lock:
+            if self.pid != os.getpid() or not self.events:
+                return
+            events, self.events = self.events, []
+        folder = os.path.dirname(self.path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        with open(self.path, "a+") as trace_fd:
+            # Other processes may be flushing into the same file
+            fcntl.flock(trace_fd, fcntl.LOCK_EX)
+            trace_fd.seek(0)
+            content = trace_fd.read()
+            trace = {"traceEvents": [], "displayTimeUnit": "ms"}
+            if content.strip():
+                try:
+                    trace["traceEvents"] = json.loads(content)["traceEvents"]
+                except (ValueError, KeyError, TypeError):
+                    print(
+                        f"WARNING: Overwriting unreadable trace file {self.path}",
+                        file=sys.stderr,
+                    )
+            trace["traceEvents"] += events
+            trace_fd.seek(0)
+            trace_fd.truncate()
+            json.dump(trace, trace_fd)
+
+
+def __thread_id__():
+    """Current thread identifier (native if available).
+
+    Returns:
+        int: Thread identifier.
+    """
+    if hasattr(threading, "get_native_id"):
+        return threading.get_native_id()
+    return threading.get_ident()
+
+
+def __process_name__():
+    """Name to show for the current process.
+
+    Returns:
+        str: Process name.
+    """
+    argv0 = os.path.basename(sys.argv[0]) if sys.argv and sys.argv[0] else "python"
+    return f"{argv0} ({os.getpid()})"
+
+
+def __metadata__(kind, tid, name):
+    """Build a metadata event (process or thread name).
+
+    Args:
+        kind (str): process_name or thread_name.
+        tid (int): Thread identifier.
+        name (str): Name to show.
+    Returns:
+        dict: Metadata event.
+    """
+    return {
+        "name": kind,
+        "ph": "M",
+        "pid": os.getpid(),
+        "tid": tid,
+        "args": {"name": name},
+    }
+
+
+def enable_trace(path):
+    """Enable the tracer for this process and its children.
+
+    Args:
+        path (str): Trace file.
+    """
+    os.environ[PERMEDCOE_TRACE] = os.path.abspath(path)
+
+
+def flush_traces():
+    """Merge the spans recorded by this process into their trace files."""
+    with __TRACERS_LOCK__:
+        tracers = list(__TRACERS__.values())
+    for tracer in tracers:
+        tracer.flush()
+
+
+def get_tracer():
+    """Retrieve the tracer if enabled (PERMEDCOE_TRACE).
+
+    Returns:
+        Tracer: The tracer or None if it is not enabled.
+    """
+    path = os.environ.get(PERMEDCOE_TRACE)
+    if not path:
+        return None
+    with __TRACERS_LOCK__:
+        if path not in __TRACERS__:
+            __TRACERS__[path] = Tracer(path)
+        return __TRACERS__[path]
+
+
+def trace_span(name, **args):
+    """Context manager that records a span if the tracer is enabled.
+
+    Args:
+        name (str): Span name.
+        args: Extra information to show with the span.
+    Returns:
+        Context manager (yields the span args dictionary or None).
+    """
+    tracer = get_tracer()
+    if tracer is None:
+        return __NO_SPAN__
+    return tracer.span(name, **args)
+
+
+def trace_record(name, start, end, **args):
+    """Record an already measured span if the tracer is enabled.
+
+    Args:
+        name (str): Span name.
+        start (int): Start time (ns since the epoch).
+        end (int): End time (ns since the epoch).
+        args: Extra information to show with the span.
+    """
+    tracer = get_tracer()
+    if tracer is not None:
+        tracer.record(name, start, end, args)
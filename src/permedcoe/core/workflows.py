@@ -0,0 +1,323 @@
+"""
+This file provides the generation of Nextflow and Snakemake workflows from
+an application: the building blocks used by the application are found, and
+the resources of their tasks (@constraint computing_units and memory_size,
+@mpi computing_nodes and @container image) become the resource directives
+of their process (Nextflow) or rule (Snakemake), so that the workflow
+manager can pack them densely and correctly into the nodes.
+
+Every building block becomes one process or rule (invoked with
+permedcoe-client), which requests the maximum of the resources of its
+tasks. The inputs and outputs of the processes and rules are left to be
+completed (TODO).
+"""
+
+import os
+import sys
+import math
+import logging
+import importlib.util
+
+from permedcoe.core.decorators import get_task_metadata
+from permedcoe.core.resources import parse_memory
+from permedcoe.utils.exceptions import PerMedCoEException
+
+APP_MODULE = "__permedcoe_app__"
+NEXTFLOW = "nextflow"
+SNAKEMAKE = "snakemake"
+MEGABYTE = 1024**2
+
+
+class BBRequirements(object):
+    """Resources requested by the tasks of a building block."""
+
+    def __init__(self, name, tasks):
+        """Constructor
+
+        Args:
+            name (str): Building block name.
+            tasks (list[dict]): Metadata of its tasks (see get_task_metadata).
+        """
+        self.name = name
+        self.tasks = sorted(task["name"] for task in tasks)
+        self.cpus = 1
+        self.nodes = 1
+        self.memory = None  # bytes
+        self.images = []
+        self.mpi = any("mpi" in task for task in tasks)
+        for task in tasks:
+            constraint = task.get("constraint", {})
+            units = __resolve__(constraint.get("computing_units", 1), 1)
+            nodes = __resolve__(task.get("mpi", {}).get("computing_nodes", 1), 1)
+            self.cpus = max(self.cpus, units)
+            self.nodes = max(self.nodes, nodes)
+            memory = constraint.get("memory_size")
+            if memory is not None:
+                memory = parse_memory(os.path.expandvars(str(memory)))
+                self.memory = max(self.memory or 0, memory)
+            image = task.get("container", {}).get("image")
+            if image and str(image) not in self.images:
+                self.images.append(str(image))
+
+    def cpus_per_node(self):
+        """Cores to request per node (MPI tasks spread among the nodes).
+
+        Returns:
+            int: Cores per node.
+        """
+        return math.ceil(self.cpus / self.nodes)
+
+    def memory_mb(self):
+        """Memory to request.
+
+        Returns:
+            int: Megabytes (None if not requested).
+        """
+        if self.memory is None:
+            return None
+        return math.ceil(self.memory / MEGABYTE)
+
+
+def __resolve__(value, default):
+    """Resolve a numeric decorator parameter (which can be given with an
+    environment variable, e.g. "${COMPUTING_UNITS}").
+
+    Args:
+        value: Parameter value.
+        default (int): Value if it can not be resolved.
+    Returns:
+        int: Resolved value.
+    """
+    try:
+        return int(os.path.expandvars(str(value)))
+    except ValueError:
+        logging.warning("Can not resolve %s: using %d", value, default)
+        return default
+
+
+def load_application(app_path):
+    """Import the given application (without running it).
+
+    Args:
+        app_path (str): Application python file.
+    Returns:
+        module: The application module.
+
+    Raises:
+        PerMedCoEException: If the application can not be imported.
+    """
+    app_path = os.path.abspath(app_path)
+    if not os.path.isfile(app_path):
+        raise PerMedCoEException(f"Application not found: {app_path}")
+    # The application may import modules from its folder
+    sys.path.insert(0, os.path.dirname(app_path))
+    spec = importlib.util.spec_from_file_location(APP_MODULE, app_path)
+    module = importlib.util.module_from_spec(spec)
+    try:
+        spec.loader.exec_module(module)
+    except Exception as error:
+        raise PerMedCoEException(
+            f"Can not import the application {app_path}: {error}"
+        ) from error
+    return module
+
+
+def find_building_blocks(module):
+    """Find the building blocks used by an application and their tasks.
+
+    The building blocks are the packages of the modules, functions and
+    classes imported by the application that define @task functions.
+
+    Args:
+        module (module): Application module.
+    Returns:
+        list[BBRequirements]: Building blocks (in import order).
+    """
+    packages = []
+    for value in vars(module).values():
+        metadata = get_task_metadata(value)
+        if metadata:
+            # Defined in the building block (wrapped by the decorators)
+            name = metadata["module"]
+        else:
+            # Modules have a name, functions and classes have a module
+            name = getattr(value, "__module__", None)
+            name = name or getattr(value, "__name__", None)
+        if not isinstance(name, str) or name == module.__name__:
+            continue
+        package = name.split(".")[0]
+        if package not in packages:
+            packages.append(package)
+    building_blocks = []
+    for package in packages:
+        requirements = get_requirements(package)
+        if requirements:
+            building_blocks.append(requirements)
+    return building_blocks
+
+
+def get_requirements(package):
+    """Retrieve the resources requested by the tasks of an (already
+    imported) building block.
+
+    Args:
+        package (str): Building block package name.
+    Returns:
+        BBRequirements: Its requirements (None if it has no tasks).
+    """
+    tasks = {}
+    for name, imported in list(sys.modules.items()):
+        if imported is None:
+            continue
+        if name != package and not name.startswith(package + "."):
+            continue
+        for value in list(vars(imported).values()):
+            metadata = get_task_metadata(value)
+            if metadata:
+                tasks[id(value)] = metadata
+    if not tasks:
+        return None
+    return BBRequirements(package, list(tasks.values()))
+
+
+def generate_workflow(app_path, workflow_manager):
+    """Generate the workflow of an application.
+
+    Args:
+        app_path (str): Application python file.
+        workflow_manager (str): Workflow manager (nextflow or snakemake).
+    Returns:
+        str: Workflow content (NextFlow.nf or Snakefile).
+
+    Raises:
+        PerMedCoEException: If the application does not use building blocks.
+    """
+    building_blocks = find_building_blocks(load_application(app_path))
+    if not building_blocks:
+        raise PerMedCoEException(f"No building block tasks found in {app_path}")
+    for requirements in building_blocks:
+        logging.info(
+            "%s: %d cpus, %d nodes, %s MB (tasks: %s)",
+            requirements.name,
+            requirements.cpus,
+            requirements.nodes,
+            requirements.memory_mb(),
+            ", ".join(requirements.tasks),
+        )
+    source = os.path.basename(app_path)
+    if workflow_manager == NEXTFLOW:
+        return __nextflow__(source, building_blocks)
+    if workflow_manager == SNAKEMAKE:
+        return __snakemake__(source, building_blocks)
+    raise PerMedCoEException(f"Unsupported workflow manager: {workflow_manager}")
+
+
+def __nextflow__(source, building_blocks):
+    """Generate a Nextflow (DSL2) workflow.
+
+    Args:
+        source (str): Application file name.
+        building_blocks (list[BBRequirements]): Building blocks.
+    Returns:
+        str: NextFlow.nf content.
+    """
+    lines = [
+        f"// Generated by permedcoe from {source}: the resources of every",
+        "// process are the ones requested by the tasks of its building block.",
+        "",
+        'params.input = "/path/to/dataset"',
+        'params.config = "/path/to/conf.yaml"',
+    ]
+    for bb in building_blocks:
+        lines += ["", f"process {bb.name} {{", f"    // Tasks: {', '.join(bb.tasks)}"]
+        if bb.nodes > 1:
+            lines += [
+                f"    // MPI: {bb.cpus} processes in {bb.nodes} nodes (SLURM)",
+                f"    clusterOptions '--nodes={bb.nodes}'",
+            ]
+        lines.append(f"    cpus {bb.cpus_per_node()}")
+        if bb.memory is not None:
+            lines.append(f"    memory '{bb.memory_mb()} MB'")
+        if bb.images:
+            images = ", ".join(f"'{image}'" for image in bb.images)
+            lines += [
+                "    // Container launched by permedcoe (not a container directive)",
+                f"    ext images: [{images}]",
+            ]
+        lines += [
+            "",
+            "    input:",
+            "    path dataset",
+            "    path conf",
+            "",
+            "    output:",
+            f'    path "{bb.name}_output"',
+            "",
+            "    script:",
+            f"    // TODO: Define the {bb.name} parameters.",
+            '    """',
+            f"    permedcoe-client {bb.name} $dataset {bb.name}_output $conf",
+            '    """',
+            "}",
+        ]
+    lines += [
+        "",
+        "workflow {",
+        "    input_ch = Channel.fromPath(params.input)",
+        "    conf_ch = Channel.fromPath(params.config)",
+        "    // TODO: Connect the building blocks.",
+    ]
+    for bb in building_blocks:
+        lines.append(f"    {bb.name}(input_ch, conf_ch)")
+    lines.append("}")
+    return "\n".join(lines) + "\n"
+
+
+def __snakemake__(source, building_blocks):
+    """Generate a Snakemake workflow.
+
+    Args:
+        source (str): Application file name.
+        building_blocks (list[BBRequirements]): Building blocks.
+    Returns:
+        str: Snakefile content.
+    """
+    outputs = ", ".join(f'"{bb.name}_output"' for bb in building_blocks)
+    lines = [
+        f"# Generated by permedcoe from {source}: the resources of every rule",
+        "# are the ones requested by the tasks of its building block.",
+        "",
+        "rule all:",
+        "    input:",
+        f"        {outputs}",
+    ]
+    for bb in building_blocks:
+        resources = []
+        if bb.memory is not None:
+            resources.append(f"mem_mb={bb.memory_mb()}")
+        if bb.nodes > 1:
+            resources.append(f"nodes={bb.nodes}")
+        lines += [
+            "",
+            f"# Tasks: {', '.join(bb.tasks)}",
+        ]
+        if bb.images:
+            lines.append(f"# Container launched by permedcoe: {', '.join(bb.images)}")
+        lines += [
+            f"rule {bb.name}:",
+            "    input:",
+            '        dataset="/path/to/dataset",',
+            '        config="/path/to/conf.yaml"',
+            "    output:",
+            f'        directory("{bb.name}_output")',
+            f"    threads: {bb.cpus_per_node()}",
+        ]
+        if resources:
+            lines += ["    resources:", "        " + ", ".join(resources)]
+        lines += [
+            "    shell:",
+            f"        # TODO: Define the {bb.name} parameters.",
+            f'        "permedcoe-client {bb.name} {{input.dataset}} {{output}} '
+            '{input.config}"',
+        ]
+    return "\n".join(lines) + "\n"
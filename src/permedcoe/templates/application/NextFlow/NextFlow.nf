@@ -17,7 +17,9 @@ process BUILDINGBLOCK {
 
 
     # TODO: Change bb to the building block name.
+    # permedcoe-client executes it in the building block server (permedcoe serve)
+    # if running, or as "permedcoe execute building_block" otherwise.
     """
-    permedcoe execute building_block bb $dataset output $conf
+    permedcoe-client bb $dataset output $conf
     """
 }
\ No newline at end of file
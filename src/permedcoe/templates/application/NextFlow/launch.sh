@@ -1,6 +1,13 @@
 #!/usr/bin/env bash
 
+# Keep the building blocks warm while the workflow runs (its tasks use
+# permedcoe-client). Add the building blocks to import them at start up.
+permedcoe serve &
+SERVER_PID=$!
+
 permedcoe execute application NextFlow.nf --workflow_manager nextflow
 
+kill ${SERVER_PID}
+
 # Using shortcuts:
 # permedcoe x app NextFlow.nf -w nextflow
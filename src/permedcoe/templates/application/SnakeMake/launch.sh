@@ -1,6 +1,13 @@
 #!/usr/bin/env bash
 
+# Keep the building blocks warm while the workflow runs (its tasks use
+# permedcoe-client). Add the building blocks to import them at start up.
+permedcoe serve &
+SERVER_PID=$!
+
 permedcoe execute application Snakefile --workflow_manager snakemake --flags "--cores 1"
 
+kill ${SERVER_PID}
+
 # Using shortcuts:
 # permedcoe x app Snakefile -w snakemake -f "--cores 1"
@@ -1,7 +1,7 @@
-import argparse
 import os
 import json
 import sys
+from functools import lru_cache
 
 from permedcoe.utils.user_arguments import Arguments
 from permedcoe.utils.exceptions import PerMedCoEException
@@ -15,6 +15,9 @@ def parse_sys_argv():
     Returns:
         All arguments as namespace.
     """
+    # Imported here since it is not needed by the compiled parsers
+    import argparse
+
     parser = argparse.ArgumentParser(
         formatter_class=argparse.ArgumentDefaultsHelpFormatter
     )
@@ -55,6 +58,23 @@ def parse_sys_argv():
         help="Execute a building block.",
         formatter_class=argparse.ArgumentDefaultsHelpFormatter,
     )
+    parser_execute_bb.add_argument(
+        "--batch",
+        type=str,
+        help="File (jsonl or csv) with one Building Block invocation per row",
+    )
+    parser_execute_bb.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of concurrent invocations in batch mode",
+    )
+    parser_execute_bb.add_argument(
+        "--summary",
+        type=str,
+        help="Batch summary file (default: <batch>.summary.jsonl)",
+    )
     parser_execute_bb.add_argument(
         dest="name", type=str, help="Building Block to execute"
     )
@@ -90,24 +110,92 @@ def parse_sys_argv():
     parser_execute_app.add_argument(
         "-f", "--flags", type=str, nargs="+", help="Workflow manager flags"
     )
-    # TODO: If provide support for application submission to Croupier
+
     # Submit sub-parser
-    # parser_submit = subparsers.add_parser('submit',
-    #                                       aliases=['s'],
-    #                                       help='Submit an application.',
-    #                                       parents=[parent_parser],
-    #                                       formatter_class=argparse.ArgumentDefaultsHelpFormatter)
-    # parser_submit.add_argument('-s', '--system',
-    #                            dest='system',
-    #                            type=str,
-    #                            help='System where to submit')
-    # parser_submit.add_argument(dest='name',
-    #                            type=str,
-    #                            help='Application name')
-    # parser_submit.add_argument(dest='parameter',
-    #                            type=str,
-    #                            nargs='+',
-    #                            help='Application parameter')
+    parser_submit = subparsers.add_parser(
+        "submit",
+        aliases=["s"],
+        help="Submit a building block batch to SLURM (job array).",
+        parents=[parent_parser],
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    subparsers_submit = parser_submit.add_subparsers(dest="submit")
+    parser_submit_bb = subparsers_submit.add_parser(
+        "building_block",
+        aliases=["bb"],
+        help="Submit a building block batch.",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser_submit_bb.add_argument(
+        "--batch",
+        type=str,
+        required=True,
+        help="File (jsonl or csv) with one Building Block invocation per row",
+    )
+    parser_submit_bb.add_argument(
+        "-p",
+        "--pack",
+        type=int,
+        default=1,
+        help="Number of rows per array element",
+    )
+    parser_submit_bb.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of concurrent rows per array element",
+    )
+    parser_submit_bb.add_argument(
+        "--throttle",
+        type=int,
+        help="Maximum number of array elements running at the same time",
+    )
+    parser_submit_bb.add_argument(
+        "--workdir",
+        type=str,
+        help="Submission folder (default: <batch>.slurm)",
+    )
+    parser_submit_bb.add_argument(
+        "--sbatch",
+        type=str,
+        help='Additional sbatch options (e.g. "--time=01:00:00 -p main")',
+    )
+    parser_submit_bb.add_argument(
+        "--dry_run",
+        action="store_true",
+        help="Prepare the submission folder without submitting",
+    )
+    parser_submit_bb.add_argument(
+        dest="name", type=str, help="Building Block to submit"
+    )
+    parser_submit_bb.add_argument(
+        dest="parameters",
+        type=str,
+        nargs=argparse.REMAINDER,
+        help="Building Block parameters common to all rows",
+    )
+    parser_submit_status = subparsers_submit.add_parser(
+        "status",
+        help="Show the state of the array elements.",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser_submit_status.add_argument(
+        dest="workdir", type=str, help="Submission folder"
+    )
+    parser_submit_collect = subparsers_submit.add_parser(
+        "collect",
+        help="Merge the summaries of the array elements.",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser_submit_collect.add_argument(
+        dest="workdir", type=str, help="Submission folder"
+    )
+    parser_submit_collect.add_argument(
+        "--summary",
+        type=str,
+        help="Batch summary file (default: <batch>.summary.jsonl)",
+    )
 
     # Templates
     parser_template = subparsers.add_parser(
@@ -143,6 +231,12 @@ def parse_sys_argv():
         type=str,
         help="Application type.",
     )
+    parser_template_app.add_argument(
+        "--from",
+        dest="from_app",
+        type=str,
+        help="Application (python) whose building blocks resources are used in the NextFlow and SnakeMake workflows",
+    )
 
     # Deploy
     parser_deploy = subparsers.add_parser(
@@ -161,6 +255,13 @@ def parse_sys_argv():
     parser_deploy_bb.add_argument(
         dest="name", type=str, help="Building Block to deploy."
     )
+    parser_deploy_bb.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of concurrent container downloads",
+    )
     parser_deploy_workflow = subparser_deploy.add_parser(
         "workflow",
         aliases=["wf"],
@@ -170,6 +271,82 @@ def parse_sys_argv():
     parser_deploy_workflow.add_argument(
         dest="name", type=str, help="Workflow to deploy."
     )
+    parser_deploy_workflow.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of concurrent container downloads",
+    )
+    parser_deploy_workflow.add_argument(
+        "--checksum",
+        type=str,
+        help="Expected sha256 digest of the workflow zip file",
+    )
+
+    # Images
+    parser_images = subparsers.add_parser(
+        "images",
+        aliases=["i"],
+        help="Manage the container images.",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    subparser_images = parser_images.add_subparsers(dest="images")
+    parser_images_stage = subparser_images.add_parser(
+        "stage",
+        help="Stage the container images into node-local storage.",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser_images_stage.add_argument(
+        dest="names",
+        type=str,
+        nargs="*",
+        help="Images to stage (all images in PERMEDCOE_IMAGES if none)",
+    )
+    parser_images_stage.add_argument(
+        "--cache",
+        type=str,
+        help="Node-local image cache folder (overrides PERMEDCOE_IMAGE_CACHE)",
+    )
+    parser_images_stage.add_argument(
+        "--digest",
+        action="store_true",
+        help="Validate the staged images with their digest",
+    )
+    parser_images_stage.add_argument(
+        "--warm",
+        action="store_true",
+        help="Pre-read the staged images into the page cache",
+    )
+
+    # Serve
+    parser_serve = subparsers.add_parser(
+        "serve",
+        help="Execute the building blocks received on a Unix socket.",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser_serve.add_argument(
+        dest="names",
+        type=str,
+        nargs="*",
+        help="Building Blocks whose definitions to compile at start up",
+    )
+    parser_serve.add_argument(
+        "--socket",
+        type=str,
+        help="Socket to listen on (PERMEDCOE_SERVER if not given)",
+    )
+    parser_serve.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        help="Number of concurrent invocations (all the cores if not given)",
+    )
+    parser_serve.add_argument(
+        "--idle_timeout",
+        type=float,
+        help="Seconds without invocations before stopping",
+    )
 
     # Check if the user does not include any argument
     if len(sys.argv) < 2:
@@ -180,7 +357,18 @@ def parse_sys_argv():
     arguments = parser.parse_args()
 
     # Check if the user does not include any argument after the action
-    if sys.argv[-1] in ["execute", "x", "template", "t", "deploy", "d"]:
+    if sys.argv[-1] in [
+        "execute",
+        "x",
+        "submit",
+        "s",
+        "template",
+        "t",
+        "deploy",
+        "d",
+        "images",
+        "i",
+    ]:
         #  Show the usage
         action = sys.argv[-1]
         try:
@@ -192,24 +380,58 @@ def parse_sys_argv():
     return arguments
 
 
-def single_bb_sysarg_parser(bb_arguments):
+def single_bb_sysarg_parser(bb_arguments, argv=None):
     """Parses the sys.argv.
 
     Args:
         bb_arguments: Building block arguments.
+        argv (list[str], optional): Arguments to parse instead of sys.argv.
     Returns:
         Parsed arguments
     """
+    parser = build_bb_parser(bb_arguments)
+    return parse_bb_arguments(parser, bb_arguments, argv)
+
+
+def build_bb_parser(bb_arguments, mode=None):
+    """Build the argument parser of a building block.
+
+    Args:
+        bb_arguments: Building block arguments.
+        mode (str, optional): Only build the arguments of this mode (the
+                              rest of the modes are only listed).
+    Returns:
+        The building block argument parser.
+    """
+    # Imported here since it is not needed by the compiled parsers
+    import argparse
+
+    # The common arguments are built once and shared by all the parsers
+    parents = [__bb_common_parser__()]
     if bb_arguments:
         # Building block detailed parser
-        parser = argparse.ArgumentParser(description=bb_arguments.get_description())
-        __bb_specific_arguments__(parser, bb_arguments)
+        parser = argparse.ArgumentParser(
+            description=bb_arguments.get_description(), parents=parents
+        )
+        __bb_specific_arguments__(parser, bb_arguments, mode)
     else:
         # Old-school argument parser
-        parser = argparse.ArgumentParser()
+        parser = argparse.ArgumentParser(parents=parents)
         __bb_execute_arguments__(parser)
-    __bb_common_arguments__(parser)
-    args = parser.parse_args()
+    return parser
+
+
+def parse_bb_arguments(parser, bb_arguments, argv=None):
+    """Parse and check the given arguments with a building block parser.
+
+    Args:
+        parser (parser): Building block parser (see build_bb_parser).
+        bb_arguments: Building block arguments.
+        argv (list[str], optional): Arguments to parse instead of sys.argv.
+    Returns:
+        Parsed arguments
+    """
+    args = parser.parse_args(argv)
 
     if hasattr(args, "mode") and args.mode is None:
         #  Show the usage
@@ -259,12 +481,14 @@ def __bb_arguments_checks__(args, bb_arguments):
         raise PerMedCoEException("ERROR: Wrong or missing argument/s.")
 
 
-def __bb_specific_arguments__(parser, bb_arguments):
+def __bb_specific_arguments__(parser, bb_arguments, mode=None):
     """BB specific arguments for Building block execute.
 
     Args:
         parser (parser): Parser to append arguments.
         bb_arguments (dict): BB arguments information.
+        mode (str, optional): Only add the arguments of this mode (all the
+                              modes if not given).
     """
     arguments = bb_arguments.get_arguments()
     if len(arguments) == 1:
@@ -286,6 +510,9 @@ def __bb_specific_arguments__(parser, bb_arguments):
         subparser = parser.add_subparsers(dest="mode")
         for key, value in arguments.items():
             parser_mode = subparser.add_parser(key)
+            if mode is not None and key != mode:
+                # Not selected: only listed
+                continue
             inputs = value.get_inputs()
             for param_name, param in inputs.items():
                 help_msg = __get_help_message__("INPUT", param)
@@ -340,12 +567,30 @@ def __bb_execute_arguments__(parser):
     )
 
 
+@lru_cache(maxsize=None)
+def __bb_common_parser__():
+    """Build (once) the parser with the common arguments.
+
+    Returns:
+        The common arguments parser (without help).
+    """
+    # Imported here since it is not needed by the compiled parsers
+    import argparse
+
+    parser = argparse.ArgumentParser(add_help=False)
+    __bb_common_arguments__(parser)
+    return parser
+
+
 def __bb_common_arguments__(parser):
     """Add common arguments for Building block execute.
 
     Args:
         parser (parser): Parser to append arguments
     """
+    # Imported here since it is not needed by the compiled parsers
+    import argparse
+
     parser.add_argument(
         "-c", "--config", help="(CONFIG) Configuration file path", type=str
     )
@@ -375,6 +620,16 @@ def __bb_common_arguments__(parser):
         help="Comma separated alias:folder to be mounted in the container",
         type=str,
     )
+    parser.add_argument(
+        "--reuse_instances",
+        help="Reuse persistent container instances among tasks with the same image",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--trace",
+        help="Write the timing of the execution phases into this file (json)",
+        type=str,
+    )
     # Hidden flag for advanced users
     parser.add_argument(
         "--disable_container", help=argparse.SUPPRESS, action="store_true"
@@ -391,6 +646,17 @@ def load_parameters_from_json(parameters_file):
     """
     with open(parameters_file, "r") as params_fd:
         raw_params = json.load(params_fd)
+    return parameters_from_definition(raw_params)
+
+
+def parameters_from_definition(raw_params):
+    """Build the parameters defined in a loaded json definition.
+
+    Args:
+        raw_params (dict): Building block definition (json content).
+    Returns:
+        Loaded arguments.
+    """
     # Now build the args object from raw_params
     short_description = raw_params["short_description"]
     long_description = raw_params["long_description"]
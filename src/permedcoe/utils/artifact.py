@@ -67,7 +67,9 @@ def __show_work__(file_path):
     position = 0
     for line in lines:
         if "TODO" in line:
-            _, message = line.split("#")
+            # Python and shell (#) or Nextflow (//) comments
+            separator = "#" if "#" in line else "//"
+            message = line.split(separator, 1)[-1]
             file_name = str(os.path.basename(file_path))
             stripped_message = str(message).strip()
             print(f"- {file_name}:({position}):\t{stripped_message}")
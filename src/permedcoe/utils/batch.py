@@ -0,0 +1,86 @@
+import csv
+import json
+import os
+
+from permedcoe.utils.exceptions import PerMedCoEException
+
+BATCH_MODE_KEY = "mode"
+SUMMARY_SUFFIX = ".summary.jsonl"
+
+
+def load_batch_rows(batch_file):
+    """Load the invocation rows from the given batch file.
+    Supported formats: jsonl (one json object per line) and csv (with header).
+
+    Args:
+        batch_file (str): Batch file path.
+    Returns:
+        list[dict]: One dictionary (parameter name: value) per row.
+    Raises:
+        PerMedCoEException: If the file does not exist or is not supported.
+    """
+    if not os.path.isfile(batch_file):
+        raise PerMedCoEException(f"ERROR: Batch file {batch_file} does not exist.")
+    rows = []
+    if batch_file.endswith(".csv"):
+        with open(batch_file, "r", newline="") as batch_fd:
+            for row in csv.DictReader(batch_fd):
+                rows.append(dict(row))
+    elif batch_file.endswith((".jsonl", ".json")):
+        with open(batch_file, "r") as batch_fd:
+            for line in batch_fd:
+                line = line.strip()
+                if line and not line.startswith("#"):
+                    rows.append(json.loads(line))
+    else:
+        raise PerMedCoEException(
+            f"ERROR: Unsupported batch file format: {batch_file} (supported jsonl | csv)"
+        )
+    return rows
+
+
+def row_to_argv(row, bb_arguments=None, shared_argv=None):
+    """Convert a batch row into the argument list of a building block.
+
+    The "mode" key selects the building block mode. Boolean values are
+    converted into flags and empty values are ignored.
+
+    Args:
+        row (dict): Parameter name: value.
+        bb_arguments (Arguments, optional): Building block arguments.
+        shared_argv (list[str], optional): Arguments common to all rows.
+    Returns:
+        list[str]: Arguments to be parsed by the building block parser.
+    """
+    mode = row.get(BATCH_MODE_KEY)
+    mode_parameters = set()
+    if mode and bb_arguments:
+        mode_arguments = bb_arguments.get_arguments()[mode]
+        mode_parameters.update(mode_arguments.get_inputs().keys())
+        mode_parameters.update(mode_arguments.get_outputs().keys())
+    common_argv = list(shared_argv) if shared_argv else []
+    specific_argv = []
+    for key, value in row.items():
+        if key == BATCH_MODE_KEY or value is None or value == "" or value is False:
+            continue
+        target = specific_argv if key in mode_parameters else common_argv
+        if value is True:
+            target.append(f"--{key}")
+        else:
+            target += [f"--{key}", str(value)]
+    if mode:
+        # Mode specific parameters must follow the mode
+        return common_argv + [str(mode)] + specific_argv
+    return common_argv + specific_argv
+
+
+def write_batch_summary(summary_file, results):
+    """Write the per-row batch results (one json object per line).
+
+    Args:
+        summary_file (str): Destination file.
+        results (list[dict]): Per-row results.
+    """
+    with open(summary_file, "w") as summary_fd:
+        for result in results:
+            summary_fd.write(json.dumps(result) + "\n")
@@ -0,0 +1,245 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import logging
+import zipfile
+import urllib.request
+from http.client import HTTPException
+from http.client import IncompleteRead
+from urllib.error import HTTPError
+from urllib.error import URLError
+
+from permedcoe.utils.exceptions import PerMedCoEException
+
+CHUNK_SIZE = 1024 * 1024  # bytes written to disk at once
+PARTIAL_SUFFIX = ".part"
+VALIDATOR_SUFFIX = ".validator"  # remote file identity of the partial file
+RETRIES = 5
+RETRY_DELAY = 2  # seconds (doubled after every failed attempt)
+TIMEOUT = 60  # seconds without receiving data
+
+
+def download_file(url, target_file, checksum=None, retries=RETRIES):
+    """Download the given url into target_file streaming it to disk.
+
+    The content is written in chunks into target_file.part, which is kept if
+    the download is interrupted, so that the next attempt (or a later call)
+    resumes from where it stopped using an HTTP range request. The remote
+    file identity (ETag or Last-Modified, and size) is kept next to it, and
+    the range request is conditional on it (If-Range), so that a partial file
+    of a different remote file is never appended to.
+
+    Args:
+        url (str): Url to download.
+        target_file (str): Destination file.
+        checksum (str, optional): Expected sha256 hexadecimal digest.
+        retries (int, optional): Attempts before giving up.
+
+    Raises:
+        HTTPError: If the url does not exist.
+        PerMedCoEException: If the download fails or the checksum mismatches.
+    """
+    partial_file = target_file + PARTIAL_SUFFIX
+    delay = RETRY_DELAY
+    for attempt in range(1, retries + 1):
+        try:
+            __download_chunks__(url, partial_file)
+            break
+        except HTTPError as error:
+            if error.code < 500:
+                raise
+            failure = error
+        except (URLError, HTTPException, OSError) as error:
+            failure = error
+        logging.debug(
+            "Download attempt %d of %s failed: %s", attempt, url, str(failure)
+        )
+        if attempt == retries:
+            raise PerMedCoEException(f"Could not download {url}: {failure}")
+        time.sleep(delay)
+        delay *= 2
+    if checksum:
+        digest = file_digest(partial_file)
+        if digest != checksum.lower():
+            os.remove(partial_file)
+            __remove_validator__(partial_file)
+            raise PerMedCoEException(
+                f"Checksum mismatch for {url}: {digest} != {checksum}"
+            )
+    os.replace(partial_file, target_file)
+    __remove_validator__(partial_file)
+
+
+def __download_chunks__(url, partial_file):
+    """Download (or resume downloading) the url into partial_file.
+
+    Args:
+        url (str): Url to download.
+        partial_file (str): Partial destination file.
+    """
+    offset = os.path.getsize(partial_file) if os.path.exists(partial_file) else 0
+    validator = __read_validator__(partial_file) if offset else None
+    if offset and not validator:
+        # Unknown remote file identity: the partial file can not be trusted
+        logging.debug("Discarding %s (unknown origin)", partial_file)
+        offset = 0
+    request = urllib.request.Request(url)
+    if offset:
+        request.add_header("Range", f"bytes={offset}-")
+        request.add_header("If-Range", validator["validator"])
+    try:
+        response = urllib.request.urlopen(request, timeout=TIMEOUT)
+    except HTTPError as error:
+        if error.code == 416 and offset:
+            # Range not satisfiable: the partial file is already complete
+            return
+        raise
+    with response:
+        if offset and response.status == 206:
+            if not __continues__(response.headers, offset, validator):
+                logging.debug("Discarding %s (range mismatch)", partial_file)
+                os.remove(partial_file)
+                __remove_validator__(partial_file)
+                response.close()
+                return __download_chunks__(url, partial_file)
+            logging.debug("Resuming download of %s from byte %d", url, offset)
+            mode = "ab"
+        else:
+            # The server does not support ranges or the remote file changed:
+            # start from the beginning
+            mode = "wb"
+            __write_validator__(partial_file, response.headers)
+        expected = response.headers.get("Content-Length")
+        received = 0
+        with open(partial_file, mode) as out_file:
+            for chunk in iter(lambda: response.read(CHUNK_SIZE), b""):
+                out_file.write(chunk)
+                received += len(chunk)
+        if expected is not None and received < int(expected):
+            # The connection was closed before the end
+            raise IncompleteRead(b"", int(expected) - received)
+
+
+def __continues__(headers, offset, validator):
+    """Check that a partial response continues the partial file (same start
+    and remote file size).
+
+    Args:
+        headers (Message): Partial response headers.
+        offset (int): Size of the partial file.
+        validator (dict): Remote file identity of the partial file.
+    Returns:
+        bool: True if the response continues the partial file.
+    """
+    # e.g. "bytes 100-999/1000"
+    content_range = headers.get("Content-Range", "")
+    interval, _, total = content_range.partition(" ")[2].partition("/")
+    if interval.partition("-")[0] != str(offset):
+        return False
+    return validator.get("length") is None or total == str(validator["length"])
+
+
+def __write_validator__(partial_file, headers):
+    """Keep the remote file identity of a new partial file (the strong ETag or
+    the Last-Modified date, and the size). It is removed if the server does
+    not provide any, so that the partial file is never resumed.
+
+    Args:
+        partial_file (str): Partial destination file.
+        headers (Message): Response headers.
+    """
+    validator = headers.get("ETag")
+    if not validator or validator.startswith("W/"):
+        # Weak ETags can not be used in If-Range
+        validator = headers.get("Last-Modified")
+    if not validator:
+        __remove_validator__(partial_file)
+        return
+    length = headers.get("Content-Length")
+    with open(partial_file + VALIDATOR_SUFFIX, "w") as validator_fd:
+        json.dump(
+            {"validator": validator, "length": int(length) if length else None},
+            validator_fd,
+        )
+
+
+def __read_validator__(partial_file):
+    """Read the remote file identity of a partial file.
+
+    Args:
+        partial_file (str): Partial destination file.
+    Returns:
+        dict: The validator and length (None if not available).
+    """
+    try:
+        with open(partial_file + VALIDATOR_SUFFIX, "r") as validator_fd:
+            validator = json.load(validator_fd)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(validator, dict) or not validator.get("validator"):
+        return None
+    return validator
+
+
+def __remove_validator__(partial_file):
+    """Remove the remote file identity of a partial file (if any).
+
+    Args:
+        partial_file (str): Partial destination file.
+    """
+    try:
+        os.remove(partial_file + VALIDATOR_SUFFIX)
+    except FileNotFoundError:
+        pass
+
+
+def file_digest(path):
+    """Compute the sha256 digest of a file.
+
+    Args:
+        path (str): File path.
+    Returns:
+        str: Hexadecimal digest.
+    """
+    hasher = hashlib.sha256()
+    with open(path, "rb") as file_fd:
+        for block in iter(lambda: file_fd.read(CHUNK_SIZE), b""):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+
+def extract_zip(zip_file, target_folder, strip_prefix=""):
+    """Extract the zip file straight into target_folder.
+
+    Args:
+        zip_file (str): Zip file path.
+        target_folder (str): Destination folder.
+        strip_prefix (str, optional): Leading folder to remove from the
+                                      member names (e.g. "name-main/").
+
+    Raises:
+        PerMedCoEException: If a member would be extracted outside the target.
+    """
+    target_folder = os.path.abspath(target_folder)
+    with zipfile.ZipFile(zip_file, "r") as zip_ref:
+        for member in zip_ref.infolist():
+            name = member.filename
+            if strip_prefix and name.startswith(strip_prefix):
+                name = name[len(strip_prefix) :]
+            if not name:
+                continue
+            destination = os.path.abspath(os.path.join(target_folder, name))
+            if not destination.startswith(target_folder + os.sep):
+                raise PerMedCoEException(f"Unsafe path in zip file: {member.filename}")
+            if member.is_dir():
+                os.makedirs(destination, exist_ok=True)
+                continue
+            os.makedirs(os.path.dirname(destination), exist_ok=True)
+            with zip_ref.open(member) as source, open(destination, "wb") as target:
+                shutil.copyfileobj(source, target, CHUNK_SIZE)
+            mode = member.external_attr >> 16
+            if mode & 0o777:
+                # Keep the permissions (e.g. executable scripts)
+                os.chmod(destination, mode & 0o777)
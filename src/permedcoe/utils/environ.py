@@ -31,11 +31,11 @@ def set_environment(
         else:
             raise PerMedCoEException(f"TMPDIR: {tmpdir} does not exist.")
     if processes:
-        os.environ[PERMEDCOE_PROCESSES] = processes
+        os.environ[PERMEDCOE_PROCESSES] = str(processes)
     if gpus:
-        os.environ[PERMEDCOE_GPUS] = gpus
+        os.environ[PERMEDCOE_GPUS] = str(gpus)
     if memory:
-        os.environ[PERMEDCOE_MEMORY] = memory
+        os.environ[PERMEDCOE_MEMORY] = str(memory)
     if mount_points:
         os.environ[PERMEDCOE_MOUNT_POINTS] = mount_points
 
@@ -14,3 +14,51 @@ class PerMedCoEException(Exception):
 
     def __init__(self, message):
         super().__init__(message)
+
+
+class TaskExecutionException(PerMedCoEException):
+    """
+    Task execution exception (the binary failed or timed out).
+
+    The failures of a batch or pipeline also provide the exit code of every
+    call or stage in results (in order, None if it did not finish).
+    """
+
+    def __init__(self, command, exit_code, stderr_tail="", timeout=None, results=None):
+        self.command = command
+        self.exit_code = exit_code
+        self.stderr_tail = stderr_tail
+        self.timeout = timeout
+        self.timed_out = timeout is not None
+        self.results = results
+        command_line = " ".join(str(arg) for arg in command)
+        if self.timed_out:
+            message = f"Command timed out after {timeout} seconds: {command_line}"
+        else:
+            message = f"Command failed with exit code {exit_code}: {command_line}"
+        super().__init__(message)
+
+    def __reduce__(self):
+        # Keep the attributes when sent to other processes
+        return (
+            self.__class__,
+            (
+                self.command,
+                self.exit_code,
+                self.stderr_tail,
+                self.timeout,
+                self.results,
+            ),
+        )
+
+    def exit_status(self):
+        """Process exit status that represents the failure.
+
+        Returns:
+            int: 124 if timed out, 128 + signal if killed, the exit code otherwise.
+        """
+        if self.timed_out:
+            return 124
+        if self.exit_code < 0:
+            return 128 - self.exit_code
+        return self.exit_code
@@ -1,36 +1,509 @@
+import os
 import sys
+import time
+import signal
 import logging
+import threading
 import subprocess
+from collections import deque
 from permedcoe.core.constants import SEPARATOR
+from permedcoe.core.constants import PERMEDCOE_STREAM_OUTPUT
+from permedcoe.core.constants import PERMEDCOE_LOG_DIR
+from permedcoe.core.constants import PERMEDCOE_LOG_MAX_BYTES
+from permedcoe.core.constants import PERMEDCOE_LOG_BACKUPS
+from permedcoe.core.trace import trace_span
+from permedcoe.utils.exceptions import TaskExecutionException
 
 DECODING_FORMAT = "utf-8"
+CHUNK_SIZE = 64 * 1024  # bytes read from the pipes at once
+TAIL_SIZE = 64 * 1024  # bytes kept in memory per stream for error reports
+LOG_MAX_BYTES = 100 * 1024 * 1024  # default log file size before rotation
+LOG_BACKUPS = 3  # default number of rotated log files kept
+STREAM_CONSOLE = ("1", "true", "yes", "console")
+STREAM_FILE = "file"
+KILL_GRACE = 5  # seconds between SIGTERM and SIGKILL when a command times out
+# Watchdogs of the running commands with their own session (see __start__)
+__SESSIONS__ = set()
 
 
-def command_runner(cmd):
+def command_runner(
+    cmd,
+    log_name=None,
+    stdin=None,
+    stdout=None,
+    stderr=None,
+    env=None,
+    usage=None,
+    timeout=None,
+):
     """Run the command defined in the cmd list.
 
+    If PERMEDCOE_STREAM_OUTPUT is defined, the output is streamed instead
+    of being kept in memory (see stream_command_runner).
+
     Args:
         cmd (list[str]): Command to execute as list.
+        log_name (str, optional): Name for the log files in streaming mode.
+        stdin (file, optional): Opened file to use as standard input.
+        stdout (file, optional): Opened file where to redirect the stdout.
+        stderr (file, optional): Opened file where to redirect the stderr.
+        env (dict, optional): Environment of the process.
+        usage (dict, optional): Filled with the resource usage of the process
+                                tree (see wait_usage).
+        timeout (float, optional): Seconds before killing the process group.
 
     Raises:
-        Exception: Exit code != 0
+        TaskExecutionException: Exit code != 0 or timeout.
     """
+    stream = os.environ.get(PERMEDCOE_STREAM_OUTPUT, "").lower()
+    if stream in STREAM_CONSOLE or stream == STREAM_FILE:
+        return stream_command_runner(
+            cmd,
+            console=stream != STREAM_FILE,
+            log_dir=os.environ.get(PERMEDCOE_LOG_DIR),
+            log_name=log_name,
+            stdin=stdin,
+            stdout=stdout,
+            stderr=stderr,
+            env=env,
+            usage=usage,
+            timeout=timeout,
+        )
     logging.debug("Executing: %s", str(cmd))
-    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    stdout, stderr = proc.communicate()  # blocks until cmd is done
-    stdout = stdout.decode(DECODING_FORMAT)
-    stderr = stderr.decode(DECODING_FORMAT)
-    return_code = proc.returncode
+    with trace_span("process", command=os.path.basename(str(cmd[0]))) as span:
+        proc = __start__(
+            cmd,
+            timeout,
+            stdin=stdin,
+            stdout=stdout if stdout else subprocess.PIPE,
+            stderr=stderr if stderr else subprocess.PIPE,
+            env=env,
+        )
+        try:
+            stdout, stderr = __read_all__(proc)  # blocks until cmd is done
+            return_code = wait_usage(proc, usage)
+        except BaseException:
+            # Cancelled (e.g. KeyboardInterrupt): do not leave it running
+            __cancel__(proc)
+            raise
+        if span is not None:
+            span["exit_code"] = return_code
     logging.debug("Exit code: %s", str(return_code))
 
-    print(SEPARATOR, flush=True)
-    print("----------------- STDOUT -----------------", flush=True)
-    print(stdout, flush=True)
-    if stderr:
-        print("----------------- STDERR -----------------", file=sys.stderr, flush=True)
-        print(stderr, file=sys.stderr, flush=True)
+    with trace_span("print_output"):
+        stdout = stdout.decode(DECODING_FORMAT) if stdout is not None else ""
+        stderr = stderr.decode(DECODING_FORMAT) if stderr is not None else ""
+        print(SEPARATOR, flush=True)
+        print("----------------- STDOUT -----------------", flush=True)
+        print(stdout, flush=True)
+        if stderr:
+            print(
+                "----------------- STDERR -----------------",
+                file=sys.stderr,
+                flush=True,
+            )
+            print(stderr, file=sys.stderr, flush=True)
+
+        print(SEPARATOR, flush=True)
+    if return_code != 0:
+        print(f"Exit code: {return_code} != 0", file=sys.stderr, flush=True)
+        raise TaskExecutionException(
+            cmd, return_code, stderr[-TAIL_SIZE:], __expired_timeout__(proc)
+        )
+
+
+def stream_command_runner(
+    cmd,
+    console=True,
+    log_dir=None,
+    log_name=None,
+    stdin=None,
+    stdout=None,
+    stderr=None,
+    env=None,
+    usage=None,
+    timeout=None,
+):
+    """Run the command defined in the cmd list streaming its output.
 
-    print(SEPARATOR, flush=True)
+    Both stdout and stderr are forwarded in fixed-size chunks as soon as they
+    are produced to the console and/or to per-command log files (rotated by
+    size). Only a bounded tail of each stream is kept in memory, so the memory
+    usage does not depend on the amount of output.
+
+    Args:
+        cmd (list[str]): Command to execute as list.
+        console (bool, optional): Forward the output to the console.
+        log_dir (str, optional): Directory where to write the log files.
+        log_name (str, optional): Log files name prefix.
+        stdin (file, optional): Opened file to use as standard input.
+        stdout (file, optional): Opened file where to redirect the stdout.
+        stderr (file, optional): Opened file where to redirect the stderr.
+        env (dict, optional): Environment of the process.
+        usage (dict, optional): Filled with the resource usage of the process
+                                tree (see wait_usage).
+        timeout (float, optional): Seconds before killing the process group.
+
+    Raises:
+        TaskExecutionException: Exit code != 0 or timeout.
+    """
+    logging.debug("Executing (streaming): %s", str(cmd))
+    sinks = {"out": [], "err": []}
+    if console:
+        sinks["out"].append(__console_writer__(sys.stdout))
+        sinks["err"].append(__console_writer__(sys.stderr))
+    log_files = []
+    try:
+        if log_dir:
+            os.makedirs(log_dir, exist_ok=True)
+            if not log_name:
+                log_name = os.path.basename(str(cmd[0]))
+            prefix = os.path.join(
+                log_dir, f"{log_name}_{time.strftime('%Y%m%d%H%M%S')}_{os.getpid()}"
+            )
+            max_bytes = int(os.environ.get(PERMEDCOE_LOG_MAX_BYTES, LOG_MAX_BYTES))
+            backups = int(os.environ.get(PERMEDCOE_LOG_BACKUPS, LOG_BACKUPS))
+            for stream in ("out", "err"):
+                log_file = RotatingLogFile(f"{prefix}.{stream}", max_bytes, backups)
+                log_files.append(log_file)
+                sinks[stream].append(log_file.write)
+            logging.debug("Logging output into: %s.[out|err]", prefix)
+        if console:
+            print(SEPARATOR, flush=True)
+        # The output is forwarded while the process runs (included in its span)
+        with trace_span("process", command=os.path.basename(str(cmd[0]))) as span:
+            proc = __start__(
+                cmd,
+                timeout,
+                stdin=stdin,
+                stdout=stdout if stdout else subprocess.PIPE,
+                stderr=stderr if stderr else subprocess.PIPE,
+                env=env,
+            )
+            tails = {"out": BoundedTail(TAIL_SIZE), "err": BoundedTail(TAIL_SIZE)}
+            pumps = []
+            try:
+                for stream, pipe in (("out", proc.stdout), ("err", proc.stderr)):
+                    if pipe is None:
+                        # Redirected to a file
+                        continue
+                    pump = threading.Thread(
+                        target=__pump__,
+                        args=(pipe, sinks[stream], tails[stream]),
+                        daemon=True,
+                    )
+                    pump.start()
+                    pumps.append(pump)
+                for pump in pumps:
+                    pump.join()
+                return_code = wait_usage(proc, usage)
+            except BaseException:
+                # Cancelled (e.g. KeyboardInterrupt): do not leave it running
+                __cancel__(proc)
+                raise
+            if span is not None:
+                span["exit_code"] = return_code
+    finally:
+        # Also if the command can not start, fails or times out
+        for log_file in log_files:
+            log_file.close()
+    logging.debug("Exit code: %s", str(return_code))
+    if console:
+        print(SEPARATOR, flush=True)
     if return_code != 0:
+        stderr_tail = tails["err"].get().decode(DECODING_FORMAT, errors="replace")
+        if not console and stderr_tail:
+            print("------------- STDERR (tail) --------------", file=sys.stderr)
+            print(stderr_tail, file=sys.stderr, flush=True)
         print(f"Exit code: {return_code} != 0", file=sys.stderr, flush=True)
-        sys.exit(return_code)
+        raise TaskExecutionException(
+            cmd, return_code, stderr_tail, __expired_timeout__(proc)
+        )
+
+
+def wait_usage(proc, usage=None):
+    """Wait for the process and collect the resource usage of its tree.
+
+    The usage comes from wait4, so it accounts the process and all its
+    descendants that have been waited for (e.g. the binary launched by the
+    container engine).
+
+    Args:
+        proc (Popen): Running process.
+        usage (dict, optional): Filled with the wall time (s), user and system
+                                CPU time (s), max RSS (KB), block inputs and
+                                outputs, and voluntary and involuntary
+                                context switches.
+    Returns:
+        int: Exit code (negative signal number if killed by a signal).
+    """
+    start = getattr(proc, "start_time", None)
+    try:
+        _, status, rusage = os.wait4(proc.pid, 0)
+    except ChildProcessError:
+        # Already waited (no usage available)
+        return proc.wait()
+    finally:
+        if getattr(proc, "watchdog", None):
+            proc.watchdog.cancel()
+    if os.WIFSIGNALED(status):
+        proc.returncode = -os.WTERMSIG(status)
+    else:
+        proc.returncode = os.WEXITSTATUS(status)
+    if usage is not None:
+        usage.update(
+            {
+                "wall": time.time() - start if start else None,
+                "utime": rusage.ru_utime,
+                "stime": rusage.ru_stime,
+                "maxrss": rusage.ru_maxrss,
+                "inblock": rusage.ru_inblock,
+                "oublock": rusage.ru_oublock,
+                "nvcsw": rusage.ru_nvcsw,
+                "nivcsw": rusage.ru_nivcsw,
+                "exit_code": proc.returncode,
+            }
+        )
+    return proc.returncode
+
+
+def __start__(cmd, timeout=None, **kwargs):
+    """Start the command keeping its start time (for wait_usage).
+
+    With timeout, the command runs in its own process group (session), which
+    is killed as a whole when the timeout expires.
+
+    Args:
+        cmd (list[str]): Command to execute as list.
+        timeout (float, optional): Seconds before killing the command.
+        kwargs: Popen arguments.
+    Returns:
+        Popen: Running process.
+    """
+    start = time.time()
+    proc = subprocess.Popen(cmd, start_new_session=bool(timeout), **kwargs)
+    proc.start_time = start
+    proc.watchdog = Watchdog(proc, timeout) if timeout else None
+    return proc
+
+
+def terminate_sessions(signum=signal.SIGTERM):
+    """Signal the running commands that have their own session (with
+    timeout), since they do not receive the signals sent to the process
+    group of this process. Safe to call from a signal handler.
+
+    Args:
+        signum (int, optional): Signal to send.
+    """
+    for watchdog in __SESSIONS__.copy():
+        __signal_group__(watchdog.proc, signum)
+
+
+def __signal_group__(proc, signum):
+    """Send a signal to the process group of the command.
+
+    Args:
+        proc (Popen): Process leading its own process group.
+        signum (int): Signal to send.
+    """
+    try:
+        os.killpg(proc.pid, signum)
+    except (ProcessLookupError, PermissionError):
+        # Already finished
+        pass
+
+
+def __cancel__(proc):
+    """Kill the command (and its process group if it has its own).
+
+    Args:
+        proc (Popen): Running process.
+    """
+    if getattr(proc, "watchdog", None):
+        proc.watchdog.cancel()
+        __signal_group__(proc, signal.SIGKILL)
+    else:
+        proc.kill()
+    proc.wait()
+
+
+def __expired_timeout__(proc):
+    """Timeout of the command if it was killed because of it.
+
+    Args:
+        proc (Popen): Finished process.
+    Returns:
+        float: The expired timeout (None if it did not expire).
+    """
+    watchdog = getattr(proc, "watchdog", None)
+    if watchdog and watchdog.expired:
+        return watchdog.timeout
+    return None
+
+
+class Watchdog(object):
+    """Kills the process group of a command when its timeout expires
+    (SIGTERM, and SIGKILL after KILL_GRACE seconds)."""
+
+    def __init__(self, proc, timeout):
+        self.proc = proc
+        self.timeout = timeout
+        self.expired = False
+        self.timers = [
+            threading.Timer(timeout, self.expire),
+            threading.Timer(timeout + KILL_GRACE, self.kill),
+        ]
+        for timer in self.timers:
+            timer.daemon = True
+            timer.start()
+        __SESSIONS__.add(self)
+
+    def expire(self):
+        """Terminate the process group."""
+        self.expired = True
+        logging.warning("Command timed out after %s seconds", str(self.timeout))
+        __signal_group__(self.proc, signal.SIGTERM)
+
+    def kill(self):
+        """Kill the process group (did not finish after SIGTERM)."""
+        __signal_group__(self.proc, signal.SIGKILL)
+
+    def cancel(self):
+        """Stop watching (the command has finished)."""
+        for timer in self.timers:
+            timer.cancel()
+        __SESSIONS__.discard(self)
+
+
+def __read_all__(proc):
+    """Read the process stdout and stderr pipes until they are closed.
+
+    Args:
+        proc (Popen): Running process.
+    Returns:
+        bytes: Stdout content (None if not piped).
+        bytes: Stderr content (None if not piped).
+    """
+    outputs = {}
+
+    def read(stream, pipe):
+        with pipe:
+            outputs[stream] = pipe.read()
+
+    readers = []
+    for stream, pipe in (("out", proc.stdout), ("err", proc.stderr)):
+        if pipe is not None:
+            reader = threading.Thread(target=read, args=(stream, pipe), daemon=True)
+            reader.start()
+            readers.append(reader)
+    for reader in readers:
+        reader.join()
+    return outputs.get("out"), outputs.get("err")
+
+
+def __pump__(pipe, sinks, tail):
+    """Forward the pipe content in chunks to the given sinks.
+
+    Args:
+        pipe (file): Pipe to read from.
+        sinks (list[function]): Functions that receive every chunk (bytes).
+        tail (BoundedTail): Bounded tail of the stream.
+    """
+    with pipe:
+        while True:
+            chunk = os.read(pipe.fileno(), CHUNK_SIZE)
+            if not chunk:
+                break
+            tail.append(chunk)
+            for sink in sinks:
+                sink(chunk)
+
+
+def __console_writer__(stream):
+    """Build a chunk writer for the given console stream.
+
+    Args:
+        stream (file): sys.stdout or sys.stderr.
+    Returns:
+        function: Writer that receives bytes.
+    """
+    lock = threading.Lock()
+    buffer = getattr(stream, "buffer", None)
+
+    def write(chunk):
+        with lock:
+            if buffer is not None:
+                buffer.write(chunk)
+                buffer.flush()
+            else:
+                stream.write(chunk.decode(DECODING_FORMAT, errors="replace"))
+                stream.flush()
+
+    return write
+
+
+class BoundedTail(object):
+    """Keeps the last bytes of a stream (up to a maximum size)."""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.chunks = deque()
+        self.size = 0
+
+    def append(self, chunk):
+        """Add a chunk discarding the oldest content if needed.
+
+        Args:
+            chunk (bytes): New content.
+        """
+        self.chunks.append(chunk)
+        self.size += len(chunk)
+        while self.size - len(self.chunks[0]) >= self.max_size:
+            self.size -= len(self.chunks.popleft())
+
+    def get(self):
+        """Retrieve the tail.
+
+        Returns:
+            bytes: Last max_size bytes of the stream.
+        """
+        return b"".join(self.chunks)[-self.max_size :]
+
+
+class RotatingLogFile(object):
+    """Binary log file rotated when it reaches max_bytes
+    (path -> path.1 -> ... -> path.<backups>)."""
+
+    def __init__(self, path, max_bytes=LOG_MAX_BYTES, backups=LOG_BACKUPS):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.size = 0
+        self.fd = open(path, "wb")
+
+    def write(self, chunk):
+        """Write the given chunk rotating the file if necessary.
+
+        Args:
+            chunk (bytes): Content to write.
+        """
+        if self.max_bytes > 0 and self.size + len(chunk) > self.max_bytes:
+            self.rotate()
+        self.fd.write(chunk)
+        self.size += len(chunk)
+
+    def rotate(self):
+        """Rotate the log files."""
+        self.fd.close()
+        if self.backups > 0:
+            for index in range(self.backups - 1, 0, -1):
+                source = f"{self.path}.{index}"
+                if os.path.exists(source):
+                    os.replace(source, f"{self.path}.{index + 1}")
+            os.replace(self.path, f"{self.path}.1")
+        self.fd = open(self.path, "wb")
+        self.size = 0
+
+    def close(self):
+        """Close the log file."""
+        self.fd.close()
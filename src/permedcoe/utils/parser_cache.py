@@ -0,0 +1,388 @@
+"""
+This file provides the compiled argument parsers of the building blocks
+defined with a definition.json file.
+
+The argparse parser of a building block is built once and compiled into a
+plain description of its options (flags, destination, type, choices and
+defaults), which is cached together with the definition in the user cache
+folder (PERMEDCOE_PARSER_CACHE, or ~/.cache/permedcoe/parsers by default;
+"none" disables it). The cache entries are keyed on the definition path,
+modification time and size.
+
+The compiled parser handles the usual invocations (--name value flags and
+the mode) without building (nor importing) argparse. Any other invocation
+(help, unknown or abbreviated flags, wrong values, missing arguments...) is
+given to argparse, building only the arguments of the selected mode, so
+that the messages and exit codes are the argparse ones.
+"""
+
+import os
+import sys
+import json
+import hashlib
+import logging
+import tempfile
+from types import SimpleNamespace
+
+from permedcoe.core.constants import PERMEDCOE_PARSER_CACHE
+from permedcoe.utils.arguments import parameters_from_definition
+from permedcoe.utils.arguments import build_bb_parser
+from permedcoe.utils.arguments import parse_bb_arguments
+from permedcoe.utils.arguments import __bb_arguments_checks__
+
+CACHE_FORMAT = 2
+CACHE_DISABLED = "none"
+CACHE_FOLDER = os.path.join("permedcoe", "parsers")
+TYPES = {"str": str, "int": int, "float": float, "bool": bool}
+STORE = "store"
+STORE_TRUE = "store_true"
+# The common arguments are defined there (part of the cache key)
+ARGUMENTS_SOURCE = os.path.join(os.path.dirname(__file__), "arguments.py")
+
+__COMPILED__ = {}  # definition path: CompiledDefinition
+
+
+class CompiledDefinition(object):
+    """Building block definition with its compiled argument parser."""
+
+    def __init__(self, key, definition, spec):
+        """Constructor
+
+        Args:
+            key (list): Cache key (see __cache_key__).
+            definition (dict): Building block definition (json content).
+            spec (dict): Compiled parser (see compile_parser). None if the
+                         parser can not be compiled (always uses argparse).
+        """
+        self.key = key
+        self.definition = definition
+        self.spec = spec
+        self.bb_arguments = None
+
+    def arguments(self):
+        """Building block arguments of the definition (built once).
+
+        Returns:
+            Arguments: Building block arguments.
+        """
+        if self.bb_arguments is None:
+            self.bb_arguments = parameters_from_definition(self.definition)
+        return self.bb_arguments
+
+    def parse_arguments(self, argv=None):
+        """Parse and check the given arguments.
+
+        Args:
+            argv (list[str], optional): Arguments to parse instead of sys.argv.
+        Returns:
+            Namespace: Parsed arguments.
+        """
+        argv = sys.argv[1:] if argv is None else list(argv)
+        bb_arguments = self.arguments()
+        args = self.parse(argv)
+        if args is None:
+            # Not a usual invocation: argparse reports it
+            parser = build_bb_parser(bb_arguments, self.find_mode(argv))
+            return parse_bb_arguments(parser, bb_arguments, argv)
+        __bb_arguments_checks__(args, bb_arguments)
+        return args
+
+    def parse(self, argv):
+        """Parse the given arguments with the compiled parser.
+
+        Args:
+            argv (list[str]): Arguments to parse.
+        Returns:
+            SimpleNamespace: Parsed arguments (None if argparse must parse
+                             them).
+        """
+        if self.spec is None:
+            return None
+        modes = self.spec["modes"]
+        options = self.spec["options"]
+        values = dict(self.spec["defaults"])
+        given = set()
+        mode = None
+        index = 0
+        while index < len(argv):
+            token = argv[index]
+            if token.startswith("-") and token not in ("-", "--"):
+                flag, equals, value = token, "", None
+                if token.startswith("--"):
+                    flag, equals, value = token.partition("=")
+                if flag not in options:
+                    # Unknown, abbreviated or combined flags
+                    return None
+                option = options[flag]
+                if option["kind"] == STORE_TRUE:
+                    if equals:
+                        return None
+                    values[option["dest"]] = True
+                else:
+                    if not equals:
+                        index += 1
+                        if index == len(argv) or argv[index].startswith("-"):
+                            return None
+                        value = argv[index]
+                    value = __convert__(option, value)
+                    if value is None:
+                        return None
+                    values[option["dest"]] = value
+                given.add(option["dest"])
+            elif modes and mode is None and token in modes:
+                # The rest of the arguments are of the mode
+                mode = token
+                values[self.spec["mode_dest"]] = mode
+                values.update(modes[mode]["defaults"])
+                options = modes[mode]["options"]
+            else:
+                return None
+            index += 1
+        if modes and mode is None:
+            return None
+        required = self.spec["required"]
+        if mode is not None:
+            required = required + modes[mode]["required"]
+        if not given.issuperset(required):
+            return None
+        return SimpleNamespace(**values)
+
+    def find_mode(self, argv):
+        """Find the mode given in the arguments.
+
+        Args:
+            argv (list[str]): Arguments to parse.
+        Returns:
+            str: Mode name (None if not found or single mode).
+        """
+        if self.spec is None or not self.spec["modes"]:
+            return None
+        options = self.spec["options"]
+        skip = False
+        for token in argv:
+            if skip:
+                skip = False
+            elif token.startswith("-"):
+                option = options.get(token)
+                skip = option is not None and option["kind"] == STORE
+            else:
+                return token if token in self.spec["modes"] else None
+        return None
+
+
+def compile_parser(parser):
+    """Compile an argparse building block parser.
+
+    Args:
+        parser (ArgumentParser): Building block parser (see build_bb_parser).
+    Returns:
+        dict: Compiled parser (None if it uses unsupported features).
+    """
+    spec = __compile_actions__(parser._actions)
+    if spec is None:
+        return None
+    spec["modes"] = {}
+    spec["mode_dest"] = None
+    for action in parser._actions:
+        if hasattr(action, "_name_parser_map"):
+            # Subparsers: one compiled parser per mode
+            spec["mode_dest"] = action.dest
+            for name, mode_parser in action.choices.items():
+                mode_spec = __compile_actions__(mode_parser._actions)
+                if mode_spec is None:
+                    return None
+                spec["modes"][name] = mode_spec
+    return spec
+
+
+def __compile_actions__(actions):
+    """Compile the options of a parser.
+
+    Args:
+        actions (list[Action]): Parser actions.
+    Returns:
+        dict: Options by flag, defaults and required destinations (None if
+              there are unsupported actions).
+    """
+    options = {}
+    defaults = []
+    required = []
+    for action in actions:
+        if hasattr(action, "_name_parser_map"):
+            defaults.append([action.dest, action.default])
+            continue
+        if not action.option_strings:
+            # Other positional arguments are not supported
+            return None
+        if action.dest == "help":
+            # Always given to argparse
+            continue
+        if action.nargs == 0 and action.const is True:
+            kind, type_name = STORE_TRUE, None
+        elif action.nargs is None and action.const is None:
+            kind = STORE
+            type_name = getattr(action.type, "__name__", None)
+            if action.type is not None and type_name not in TYPES:
+                return None
+        else:
+            return None
+        default = action.default
+        if not isinstance(default, (type(None), bool, int, float, str)):
+            return None
+        if kind == STORE and type_name is not None and isinstance(default, str):
+            # As argparse does with the string defaults
+            try:
+                default = TYPES[type_name](default)
+            except (TypeError, ValueError):
+                return None
+        option = {
+            "dest": action.dest,
+            "kind": kind,
+            "type": type_name,
+            "choices": list(action.choices) if action.choices else None,
+        }
+        for flag in action.option_strings:
+            options[flag] = option
+        defaults.append([action.dest, default])
+        if action.required:
+            required.append(action.dest)
+    return {"options": options, "defaults": defaults, "required": required}
+
+
+def __convert__(option, value):
+    """Convert a value as argparse would do.
+
+    Args:
+        option (dict): Compiled option.
+        value (str): Given value.
+    Returns:
+        The converted value (None if it is not valid).
+    """
+    if option["type"] is not None:
+        try:
+            value = TYPES[option["type"]](value)
+        except (TypeError, ValueError):
+            return None
+    if option["choices"] is not None and value not in option["choices"]:
+        return None
+    return value
+
+
+def get_compiled_definition(parameters_file):
+    """Retrieve the compiled definition of a building block (from memory,
+    from the parser cache or compiling it).
+
+    Args:
+        parameters_file (str): Building block definition (json).
+    Returns:
+        CompiledDefinition: The compiled definition.
+    """
+    path = os.path.abspath(parameters_file)
+    key = __cache_key__(path)
+    compiled = __COMPILED__.get(path)
+    if compiled is not None and compiled.key == key:
+        return compiled
+    folder = __cache_folder__()
+    cache_file = None
+    if folder:
+        name = hashlib.sha256(path.encode()).hexdigest()[:32] + ".json"
+        cache_file = os.path.join(folder, name)
+        compiled = __read_cache__(cache_file, key)
+    if compiled is None:
+        with open(path, "r") as params_fd:
+            definition = json.load(params_fd)
+        compiled = CompiledDefinition(key, definition, None)
+        compiled.spec = compile_parser(build_bb_parser(compiled.arguments()))
+        if cache_file:
+            __write_cache__(cache_file, compiled)
+    __COMPILED__[path] = compiled
+    return compiled
+
+
+def parse_definition_arguments(parameters_file, argv=None):
+    """Parse the arguments of a building block defined in a json file.
+
+    Args:
+        parameters_file (str): Building block definition (json).
+        argv (list[str], optional): Arguments to parse instead of sys.argv.
+    Returns:
+        Arguments: The building block arguments.
+        Namespace: Parsed arguments.
+    """
+    compiled = get_compiled_definition(parameters_file)
+    return compiled.arguments(), compiled.parse_arguments(argv)
+
+
+def __cache_key__(path):
+    """Build the cache key of a definition file.
+
+    Args:
+        path (str): Definition file absolute path.
+    Returns:
+        list: Cache key.
+    """
+    stat = os.stat(path)
+    source = os.stat(ARGUMENTS_SOURCE)
+    return [CACHE_FORMAT, path, stat.st_mtime_ns, stat.st_size, source.st_mtime_ns]
+
+
+def __cache_folder__():
+    """Parser cache folder (PERMEDCOE_PARSER_CACHE or the user cache).
+
+    Returns:
+        str: Cache folder (None if disabled).
+    """
+    folder = os.environ.get(PERMEDCOE_PARSER_CACHE)
+    if folder and folder.lower() == CACHE_DISABLED:
+        return None
+    if not folder:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+            os.path.expanduser("~"), ".cache"
+        )
+        folder = os.path.join(base, CACHE_FOLDER)
+    return folder
+
+
+def __read_cache__(cache_file, key):
+    """Read a compiled definition from the cache.
+
+    Args:
+        cache_file (str): Cache entry file.
+        key (list): Expected cache key.
+    Returns:
+        CompiledDefinition: The compiled definition (None if it is not
+                            cached or it is outdated).
+    """
+    try:
+        with open(cache_file, "r") as cache_fd:
+            entry = json.load(cache_fd)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(entry, dict) or entry.get("key") != key:
+        return None
+    return CompiledDefinition(key, entry["definition"], entry["spec"])
+
+
+def __write_cache__(cache_file, compiled):
+    """Write a compiled definition into the cache (ignoring failures, e.g.
+    read-only home).
+
+    Args:
+        cache_file (str): Cache entry file.
+        compiled (CompiledDefinition): Compiled definition.
+    """
+    entry = {
+        "key": compiled.key,
+        "definition": compiled.definition,
+        "spec": compiled.spec,
+    }
+    folder = os.path.dirname(cache_file)
+    try:
+        os.makedirs(folder, exist_ok=True)
+        # Atomic replace: other processes may be reading it
+        fd, temporary = tempfile.mkstemp(dir=folder, suffix=".tmp")
+        with os.fdopen(fd, "w") as cache_fd:
+            json.dump(entry, cache_fd)
+        os.replace(temporary, cache_file)
+    except OSError as error:
+        logging.debug("Could not write the parser cache %s: %s", cache_file, error)
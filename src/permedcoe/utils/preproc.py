@@ -1,4 +1,3 @@
-import yaml
 import logging
 
 from permedcoe.utils.log import init_logging
@@ -9,6 +8,8 @@ import permedcoe.core.environment as cmd_flags
 def preprocessing(arguments):
     # Parse configuration file
     if arguments.config:
+        import yaml  # only needed with a configuration file
+
         with open(arguments.config, "r") as config_fd:
             cfg = yaml.safe_load(config_fd)
     else:
@@ -18,6 +19,7 @@ def preprocessing(arguments):
     # Global environment flags from command line
     cmd_flags.DEBUG = arguments.debug
     cmd_flags.DISABLE_CONTAINER = arguments.disable_container
+    cmd_flags.REUSE_INSTANCES = arguments.reuse_instances
     # Export variables
     set_environment(
         arguments.tmpdir,
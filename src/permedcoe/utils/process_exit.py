@@ -0,0 +1,27 @@
+import os
+import atexit
+
+
+def register_process_exit(owner, callback):
+    """Register the callback to run at the exit of the current process the
+    first time that the owner is used in it (its state is not inherited
+    from the parent process, e.g. a forked worker).
+
+    Args:
+        owner (object): Object with a pid attribute (process that uses it,
+                        updated here).
+        callback (function): Function to run at exit.
+    Returns:
+        bool: True if it is the first use in this process (the owner must
+              then reset its state). False otherwise.
+    """
+    if owner.pid == os.getpid():
+        return False
+    owner.pid = os.getpid()
+    atexit.register(callback)
+    # Also run at the exit of multiprocessing children
+    # (imported here since it loads multiprocessing)
+    from multiprocessing.util import Finalize
+
+    Finalize(owner, callback, exitpriority=0)
+    return True
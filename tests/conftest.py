@@ -0,0 +1,27 @@
+import os
+import stat
+
+import pytest
+
+
+@pytest.fixture
+def stub_command(tmp_path, monkeypatch):
+    """Create stub executables (shell scripts) in a folder prepended to the
+    PATH. Every stub logs its arguments into <name>.log (one call per line)
+    before running its script.
+
+    Returns:
+        function: stub(name, script="") -> path of the log file.
+    """
+    folder = tmp_path / "stubs"
+    folder.mkdir()
+    monkeypatch.setenv("PATH", f"{folder}{os.pathsep}{os.environ['PATH']}")
+
+    def stub(name, script=""):
+        log = folder / f"{name}.log"
+        path = folder / name
+        path.write_text(f'#!/bin/sh\necho "$@" >> "{log}"\n{script}\n')
+        path.chmod(path.stat().st_mode | stat.S_IEXEC)
+        return log
+
+    return stub
@@ -0,0 +1,93 @@
+import csv
+import json
+import multiprocessing
+import os
+
+import pytest
+
+from permedcoe.core import accounting
+from permedcoe.core.accounting import flush_usage_reports
+from permedcoe.core.decorators import binary
+from permedcoe.core.decorators import task
+from permedcoe.core.decorators import FILE_IN
+from permedcoe.utils.executor import command_runner
+
+BUSY_LOOP = "i=0; while [ $i -lt 50000 ]; do i=$((i+1)); done"
+
+
+@binary(binary="sh")
+@task(script=FILE_IN)
+def busy(script="busy.sh"):
+    pass
+
+
+@pytest.fixture
+def report(tmp_path, monkeypatch):
+    monkeypatch.setattr(accounting, "__REPORTS__", {})
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "busy.sh").write_text(BUSY_LOOP + "\n")
+
+    def enable(name):
+        path = tmp_path / name
+        monkeypatch.setenv("PERMEDCOE_USAGE_REPORT", str(path))
+        return path
+
+    return enable
+
+
+def test_command_runner_usage():
+    usage = {}
+    command_runner(["sh", "-c", BUSY_LOOP], usage=usage)
+    assert usage["exit_code"] == 0
+    assert usage["utime"] + usage["stime"] > 0
+    assert usage["maxrss"] > 0
+    assert usage["wall"] > 0
+
+
+def test_json_report(report):
+    path = report("usage.json")
+    busy()
+    busy()
+    flush_usage_reports()
+    content = json.loads(path.read_text())
+    assert [record["task"] for record in content["tasks"]] == ["busy", "busy"]
+    for record in content["tasks"]:
+        assert record["pid"] == os.getpid()
+        assert record["exit_code"] == 0
+        assert record["utime"] + record["stime"] > 0
+        assert record["maxrss"] > 0
+    (aggregate,) = content["building_blocks"].values()
+    assert aggregate["tasks"] == 2
+    assert aggregate["failed"] == 0
+    assert aggregate["cpu_seconds"] > 0
+    assert aggregate["peak_rss_mb"] > 0
+    # The records are only written once
+    flush_usage_reports()
+    assert len(json.loads(path.read_text())["tasks"]) == 2
+
+
+def test_csv_report_is_merged(report):
+    path = report("usage.csv")
+    busy()
+    flush_usage_reports()
+    busy()
+    flush_usage_reports()
+    with open(path) as report_fd:
+        (row,) = list(csv.DictReader(report_fd))
+    assert row["tasks"] == "2"
+    assert float(row["cpu_seconds"]) > 0
+
+
+def test_records_written_at_child_exit(report):
+    path = report("usage.json")
+    busy()
+    context = multiprocessing.get_context("fork")
+    child = context.Process(target=busy)
+    child.start()
+    child.join()
+    # The child wrote its own record (not the inherited one) at exit
+    records = json.loads(path.read_text())["tasks"]
+    assert [record["pid"] for record in records] == [child.pid]
+    flush_usage_reports()
+    records = json.loads(path.read_text())["tasks"]
+    assert [record["pid"] for record in records] == [child.pid, os.getpid()]
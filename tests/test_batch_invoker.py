@@ -0,0 +1,77 @@
+import os
+import sys
+import json
+import time
+
+import pytest
+
+from permedcoe.base import batch_invoker
+
+DEFINITION = {
+    "short_description": "Batch test",
+    "long_description": "Batch test",
+    "use_description": "short",
+    "parameters": {
+        "default": [
+            {"type": "input", "name": "value", "format": "str", "description": "-"}
+        ]
+    },
+}
+
+
+def invoke(arguments, config):
+    """Building block that fails or crashes its process on request."""
+    if arguments.value == "crash":
+        with open(os.environ["CRASH_LOG"], "a") as crash_log:
+            crash_log.write("crash\n")
+        os._exit(3)
+    if arguments.value == "slow":
+        time.sleep(0.5)
+    if arguments.value == "exit":
+        sys.exit("exit message")
+    if arguments.value == "raise":
+        raise ValueError("wrong value")
+
+
+@pytest.fixture
+def definition(tmp_path):
+    path = tmp_path / "definition.json"
+    path.write_text(json.dumps(DEFINITION))
+    return str(path)
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_failed_row_does_not_abort_the_rest(definition, jobs):
+    rows = [{"value": "ok"}, {"value": "raise"}, {"value": "ok"}]
+    results = batch_invoker(invoke, rows, definition, jobs=jobs)
+    assert [result["status"] for result in results] == ["success", "failed", "success"]
+    assert results[1]["error"] == "wrong value"
+
+
+def test_crashed_worker_fails_the_rows_in_flight(definition, tmp_path, monkeypatch):
+    crash_log = tmp_path / "crash.log"
+    monkeypatch.setenv("CRASH_LOG", str(crash_log))
+    rows = [{"value": "slow"}, {"value": "crash"}, {"value": "ok"}, {"value": "ok"}]
+    results = batch_invoker(invoke, rows, definition, jobs=2)
+    statuses = [result["status"] for result in results]
+    # The slow row was running when the pool broke, the rest run on a new pool
+    assert statuses == ["failed", "failed", "success", "success"]
+    assert results[1]["error"] == "Worker process crashed"
+    # The row that crashed the pool is not run again
+    assert crash_log.read_text() == "crash\n"
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_exit_message_is_an_exit_code(definition, jobs):
+    results = batch_invoker(
+        invoke, [{"value": "exit"}, {"value": "ok"}], definition, jobs=jobs
+    )
+    assert results[0]["exit_code"] == 1
+    assert results[0]["error"] == "exit message"
+    assert results[1]["exit_code"] == 0
+
+
+def test_invalid_rows_are_not_invoked(definition):
+    results = batch_invoker(invoke, [{"value": "ok"}, {"other": "x"}], definition)
+    assert results[0]["status"] == "success"
+    assert results[1]["status"] == "invalid"
@@ -0,0 +1,114 @@
+import os
+
+import pytest
+
+from permedcoe.core.cache import TaskCache
+from permedcoe.core.cache import LINK_COPY
+from permedcoe.core.cache import LINK_HARDLINK
+
+
+@pytest.fixture
+def files(tmp_path):
+    source = tmp_path / "input.txt"
+    source.write_text("input")
+    output = tmp_path / "output.txt"
+    return str(source), str(output)
+
+
+def key(cache, inputs, env_vars=None, assets=None):
+    return cache.key(None, "tool", ["-x", "1"], inputs, env_vars, assets)
+
+
+def test_hit_and_miss(tmp_path, files):
+    source, output = files
+    cache = TaskCache(str(tmp_path / "cache"), link=LINK_COPY)
+    first = key(cache, [source])
+    assert not cache.restore(first, [output])
+    with open(output, "w") as output_fd:
+        output_fd.write("result")
+    cache.store(first, [output])
+    os.remove(output)
+    assert cache.restore(first, [output])
+    assert open(output).read() == "result"
+    # Different input contents
+    with open(source, "w") as source_fd:
+        source_fd.write("other input")
+    assert key(cache, [source]) != first
+    assert cache.stats() == {"hits": 1, "misses": 1, "evictions": 0}
+
+
+def test_key_components(tmp_path, files):
+    source, _ = files
+    cache = TaskCache(str(tmp_path / "cache"))
+    assets = tmp_path / "assets"
+    assets.mkdir()
+    script = assets / "script.sh"
+    script.write_text("echo 1")
+    base = key(cache, [source], ["A=1"], str(assets))
+    assert key(cache, [source], ["A=1"], str(assets)) == base
+    assert key(cache, [source], ["A=2"], str(assets)) != base
+    script.write_text("echo 2")
+    assert key(cache, [source], ["A=1"], str(assets)) != base
+
+
+def test_hardlink_restore_is_independent(tmp_path, files):
+    source, output = files
+    cache = TaskCache(str(tmp_path / "cache"), link=LINK_HARDLINK)
+    entry_key = key(cache, [source])
+    with open(output, "w") as output_fd:
+        output_fd.write("result")
+    cache.store(entry_key, [output])
+    os.remove(output)
+    assert cache.restore(entry_key, [output])
+    # Appending into the restored output does not modify the cache
+    with open(output, "a") as output_fd:
+        output_fd.write(" appended")
+    os.remove(output)
+    assert cache.restore(entry_key, [output])
+    assert open(output).read() == "result"
+
+
+def test_modified_hardlink_entry_is_discarded(tmp_path, files):
+    source, output = files
+    cache = TaskCache(str(tmp_path / "cache"), link=LINK_HARDLINK)
+    entry_key = key(cache, [source])
+    with open(output, "w") as output_fd:
+        output_fd.write("result")
+    cache.store(entry_key, [output])
+    # The stored output shares its data with the cache entry
+    with open(output, "a") as output_fd:
+        output_fd.write(" appended")
+    assert not cache.restore(entry_key, [output])
+    assert not os.path.exists(os.path.join(cache.objects, entry_key))
+
+
+def test_restore_replaces_directories(tmp_path, files):
+    source, _ = files
+    output = tmp_path / "results"
+    output.mkdir()
+    (output / "a.txt").write_text("a")
+    cache = TaskCache(str(tmp_path / "cache"), link=LINK_COPY)
+    entry_key = key(cache, [source])
+    cache.store(entry_key, [str(output)])
+    (output / "stale.txt").write_text("stale")
+    assert cache.restore(entry_key, [str(output)])
+    assert sorted(os.listdir(output)) == ["a.txt"]
+
+
+def test_eviction(tmp_path, files):
+    source, output = files
+    cache = TaskCache(str(tmp_path / "cache"), quota=150, link=LINK_COPY)
+    keys = []
+    for index in range(3):
+        with open(output, "w") as output_fd:
+            output_fd.write(str(index) * 100)
+        keys.append(key(cache, [source], [f"RUN={index}"]))
+        cache.store(keys[-1], [output])
+        # Distinct LRU times
+        meta = os.path.join(cache.objects, keys[-1], "meta.json")
+        os.utime(meta, (index, index))
+    assert sorted(os.listdir(cache.objects)) == [keys[2]]
+    assert cache.stats()["evictions"] == 2
+    assert cache.restore(keys[2], [output])
+    assert open(output).read() == "2" * 100
+    assert not cache.restore(keys[0], [output])
@@ -0,0 +1,31 @@
+import threading
+import time
+
+import permedcoe.core.functions as functions
+
+DEPLOY = getattr(functions, "__deploy_bbs__")
+
+
+def test_installations_are_serial_and_downloads_concurrent(tmp_path, monkeypatch):
+    lock = threading.Lock()
+    running = {"install": 0, "pull": 0}
+    peak = {"install": 0, "pull": 0}
+
+    def track(action):
+        with lock:
+            running[action] += 1
+            peak[action] = max(peak[action], running[action])
+        time.sleep(0.05)
+        with lock:
+            running[action] -= 1
+
+    monkeypatch.setattr(functions, "get_container_path", lambda: str(tmp_path))
+    monkeypatch.setattr(functions, "__check_url__", lambda url: True)
+    monkeypatch.setattr(functions, "__install_bb__", lambda name: track("install"))
+    monkeypatch.setattr(functions, "__get_containers__", lambda name: [name.lower()])
+    monkeypatch.setattr(
+        functions, "__download_container__", lambda name, folder: track("pull")
+    )
+    assert DEPLOY(["A", "B", "C", "D"], jobs=4)
+    assert peak["install"] == 1
+    assert peak["pull"] > 1
@@ -0,0 +1,104 @@
+import threading
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+from permedcoe.utils.download import download_file
+from permedcoe.utils.download import PARTIAL_SUFFIX
+from permedcoe.utils.download import VALIDATOR_SUFFIX
+
+
+class RemoteFile(BaseHTTPRequestHandler):
+    """Serve the server content with range and If-Range support."""
+
+    def do_GET(self):
+        content = self.server.content
+        etag = self.server.etag
+        self.server.requests.append(dict(self.headers))
+        offset = 0
+        requested = self.headers.get("Range")
+        if requested and self.headers.get("If-Range", etag) == etag:
+            offset = int(requested.split("=")[1].rstrip("-"))
+        self.send_response(206 if offset else 200)
+        if offset:
+            self.send_header(
+                "Content-Range", f"bytes {offset}-{len(content) - 1}/{len(content)}"
+            )
+        if etag:
+            self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(content) - offset))
+        self.end_headers()
+        self.wfile.write(content[offset:])
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), RemoteFile)
+    httpd.content = b"0123456789" * 1000
+    httpd.etag = '"v1"'
+    httpd.requests = []
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    httpd.url = f"http://127.0.0.1:{httpd.server_address[1]}/app.zip"
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_download(server, tmp_path):
+    target = str(tmp_path / "app.zip")
+    download_file(server.url, target)
+    with open(target, "rb") as target_fd:
+        assert target_fd.read() == server.content
+    assert not (tmp_path / ("app.zip" + PARTIAL_SUFFIX + VALIDATOR_SUFFIX)).exists()
+
+
+def test_resume_same_remote_file(server, tmp_path):
+    target = str(tmp_path / "app.zip")
+    partial = tmp_path / ("app.zip" + PARTIAL_SUFFIX)
+    partial.write_bytes(server.content[:2500])
+    (tmp_path / ("app.zip" + PARTIAL_SUFFIX + VALIDATOR_SUFFIX)).write_text(
+        '{"validator": "\\"v1\\"", "length": 10000}'
+    )
+    download_file(server.url, target)
+    with open(target, "rb") as target_fd:
+        assert target_fd.read() == server.content
+    assert server.requests[0]["Range"] == "bytes=2500-"
+    assert server.requests[0]["If-Range"] == '"v1"'
+
+
+def test_resume_changed_remote_file(server, tmp_path):
+    target = str(tmp_path / "app.zip")
+    partial = tmp_path / ("app.zip" + PARTIAL_SUFFIX)
+    partial.write_bytes(b"x" * 2500)
+    (tmp_path / ("app.zip" + PARTIAL_SUFFIX + VALIDATOR_SUFFIX)).write_text(
+        '{"validator": "\\"v0\\"", "length": 10000}'
+    )
+    download_file(server.url, target)
+    with open(target, "rb") as target_fd:
+        assert target_fd.read() == server.content
+
+
+def test_stale_partial_without_validator(server, tmp_path):
+    target = str(tmp_path / "app.zip")
+    (tmp_path / ("app.zip" + PARTIAL_SUFFIX)).write_bytes(b"x" * 2500)
+    download_file(server.url, target)
+    with open(target, "rb") as target_fd:
+        assert target_fd.read() == server.content
+    assert "Range" not in server.requests[0]
+
+
+def test_resume_different_size(server, tmp_path):
+    target = str(tmp_path / "app.zip")
+    (tmp_path / ("app.zip" + PARTIAL_SUFFIX)).write_bytes(b"x" * 2500)
+    (tmp_path / ("app.zip" + PARTIAL_SUFFIX + VALIDATOR_SUFFIX)).write_text(
+        '{"validator": "\\"v1\\"", "length": 20000}'
+    )
+    download_file(server.url, target)
+    with open(target, "rb") as target_fd:
+        assert target_fd.read() == server.content
+    assert len(server.requests) == 2
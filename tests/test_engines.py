@@ -0,0 +1,111 @@
+import pytest
+
+from permedcoe.core.building_block import PerMedBB
+from permedcoe.core.engines import get_engine
+from permedcoe.core.engines import ApptainerEngine
+from permedcoe.core.engines import DockerEngine
+from permedcoe.core.engines import Engine
+from permedcoe.core.engines import ENGINES
+from permedcoe.core.engines import PodmanEngine
+from permedcoe.core.engines import SingularityEngine
+from permedcoe.core.instances import INSTANCES
+from permedcoe.utils.exceptions import PerMedCoEException
+
+# Runs the command given after the image or instance
+SINGULARITY_STUB = """
+[ "$1" = "--silent" ] && shift
+[ "$1" = "instance" ] && exit 0
+while [ $# -gt 0 ]; do
+    case "$1" in *.sif|instance://*) shift; break;; *) shift;; esac
+done
+exec "$@"
+"""
+
+
+def test_singularity_flags():
+    engine = SingularityEngine()
+    assert engine.base() == ["singularity", "--silent"]
+    assert engine.exec_flags("/work") == ["--contain", "--cleanenv", "--pwd", "/work"]
+    assert engine.mount_flags(["/a:/a", "/b:/b:ro"]) == ["-B", "/a:/a,/b:/b:ro"]
+    assert engine.env_flags(["A=1", "B=2"]) == ["--env", "A=1,B=2"]
+    assert engine.env_flags([]) == []
+    assert engine.instance_exec_flags("/work") == ["--cleanenv", "--pwd", "/work"]
+
+
+def test_apptainer_fast_flags():
+    engine = ApptainerEngine()
+    assert "--sharens" in engine.exec_flags("/work")
+    assert "--sharens" in engine.instance_exec_flags("/work")
+    assert "--sharens" not in ApptainerEngine(flags=[]).exec_flags("/work")
+
+
+def test_podman_and_docker_flags(monkeypatch):
+    engine = PodmanEngine()
+    assert engine.exec_flags("/work", stdin=True) == [
+        "--rm",
+        "--network=none",
+        "-w",
+        "/work",
+        "-i",
+    ]
+    assert engine.mount_flags(["/a:/a"]) == ["-v", "/a:/a"]
+    assert engine.env_flags(["A=1", "B=2"]) == ["-e", "A=1", "-e", "B=2"]
+    assert engine.image("/images/MaBoSS.sif") == "maboss"
+    assert engine.image("maboss:2.5") == "maboss:2.5"
+    monkeypatch.setenv("PERMEDCOE_IMAGE_REGISTRY", "ghcr.io/permedcoe/")
+    assert engine.image("/images/MaBoSS.sif") == "ghcr.io/permedcoe/maboss"
+    assert "--user" in DockerEngine().exec_flags("/work")
+
+
+def test_get_engine(monkeypatch):
+    assert get_engine("SINGULARITY").name == "singularity"
+    monkeypatch.setenv("PERMEDCOE_ENGINE", "podman")
+    monkeypatch.setenv("PERMEDCOE_ENGINE_FLAGS", "--network=host --quiet")
+    engine = get_engine("SINGULARITY")
+    assert engine.name == "podman"
+    assert engine.flags == ["--network=host", "--quiet"]
+    monkeypatch.setenv("PERMEDCOE_ENGINE", "unknown")
+    with pytest.raises(PerMedCoEException):
+        get_engine()
+
+
+def test_instance_exec_keeps_environment(stub_command, tmp_path, monkeypatch):
+    log = stub_command("singularity", SINGULARITY_STUB)
+    monkeypatch.setenv("PERMEDCOE_REUSE_INSTANCES", "1")
+    monkeypatch.setenv("PERMEDCOE_ENGINE_FLAGS", "--nv")
+    image = tmp_path / "image.sif"
+    image.touch()
+    bb = PerMedBB(
+        str(image),
+        None,
+        "true",
+        1,
+        1,
+        [(str(tmp_path), False)],
+        None,
+        ["TASK_VARIABLE=1"],
+        [],
+        engine=get_engine("singularity"),
+    )
+    try:
+        bb.launch()
+    finally:
+        INSTANCES.stop_all()
+    start, execution = log.read_text().splitlines()[:2]
+    assert "instance start" in start
+    assert execution.startswith("--silent exec --cleanenv --nv --pwd")
+    assert "--env TASK_VARIABLE=1 instance://" in execution
+
+
+def test_incomplete_engine():
+    class IncompleteEngine(Engine):
+        name = "incomplete"
+        executable = "incomplete"
+
+        def action(self, shell=False):
+            return ["run"]
+
+    with pytest.raises(TypeError):
+        IncompleteEngine()
+    for engine in ENGINES.values():
+        assert engine().name == engine.name
@@ -0,0 +1,48 @@
+import pytest
+
+import permedcoe.utils.executor as executor
+from permedcoe.utils.exceptions import TaskExecutionException
+
+
+@pytest.fixture
+def log_files(monkeypatch):
+    """Keep the log files opened by the streaming runner."""
+    opened = []
+
+    class TrackedLogFile(executor.RotatingLogFile):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            opened.append(self)
+
+    monkeypatch.setattr(executor, "RotatingLogFile", TrackedLogFile)
+    return opened
+
+
+def test_stream_logs_output(tmp_path, log_files):
+    executor.stream_command_runner(
+        ["sh", "-c", "echo out; echo err >&2"],
+        console=False,
+        log_dir=str(tmp_path),
+        log_name="task",
+    )
+    assert len(log_files) == 2
+    assert all(log_file.fd.closed for log_file in log_files)
+    contents = sorted(path.read_text() for path in tmp_path.glob("task_*"))
+    assert contents == ["err\n", "out\n"]
+
+
+@pytest.mark.parametrize(
+    "cmd, timeout, error",
+    [
+        (["sh", "-c", "exit 3"], None, TaskExecutionException),
+        (["sleep", "10"], 0.2, TaskExecutionException),
+        (["permedcoe-missing-command"], None, FileNotFoundError),
+    ],
+)
+def test_stream_closes_logs_on_failure(tmp_path, log_files, cmd, timeout, error):
+    with pytest.raises(error):
+        executor.stream_command_runner(
+            cmd, console=False, log_dir=str(tmp_path), timeout=timeout
+        )
+    assert len(log_files) == 2
+    assert all(log_file.fd.closed for log_file in log_files)
@@ -0,0 +1,48 @@
+import os
+
+from permedcoe.core import images
+from permedcoe.core.images import stage_image
+from permedcoe.core.images import ImageStager
+from permedcoe.core.images import META_SUFFIX
+from permedcoe.core.images import VALIDATE_DIGEST
+
+
+def test_stage_copies_once(tmp_path, monkeypatch):
+    image = tmp_path / "tool.sif"
+    image.write_bytes(b"image content")
+    stager = ImageStager(str(tmp_path / "cache"), validate=VALIDATE_DIGEST)
+    copies = []
+    copy = ImageStager.__copy__
+
+    def counted_copy(self, *args):
+        copies.append(args[0])
+        copy(self, *args)
+
+    monkeypatch.setattr(ImageStager, "__copy__", counted_copy)
+    local = stager.stage(str(image))
+    assert local != str(image)
+    assert open(local, "rb").read() == b"image content"
+    assert os.path.isfile(local + META_SUFFIX)
+    assert stager.stage(str(image)) == local
+    # Another process validates the existing local copy instead of copying
+    assert ImageStager(str(tmp_path / "cache")).stage(str(image)) == local
+    assert copies == [str(image)]
+    # A modified source image is staged again
+    image.write_bytes(b"new image content")
+    assert open(stager.stage(str(image)), "rb").read() == b"new image content"
+    assert len(copies) == 2
+
+
+def test_stage_falls_back(tmp_path, monkeypatch):
+    monkeypatch.setenv("PERMEDCOE_IMAGE_CACHE", str(tmp_path / "cache"))
+    monkeypatch.setattr(images, "__STAGERS__", {})
+    image = tmp_path / "tool.sif"
+    image.write_bytes(b"image content")
+
+    def failing_copy(self, *args):
+        raise OSError("No space left on device")
+
+    monkeypatch.setattr(ImageStager, "__copy__", failing_copy)
+    assert stage_image(str(image)) == str(image)
+    missing = str(tmp_path / "missing.sif")
+    assert stage_image(missing) == missing
@@ -0,0 +1,63 @@
+from permedcoe.core.building_block import PerMedBB
+from permedcoe.core.engines import SingularityEngine
+from permedcoe.core.launch_plan import LaunchPlan
+
+
+def tool(model, result="out.txt"):
+    pass
+
+
+def build(plan, engine, mounts, flags):
+    return PerMedBB(
+        "/images/tool.sif",
+        None,
+        "tool --fast",
+        1,
+        1,
+        mounts,
+        "/data:/data",
+        ["A=1"],
+        flags,
+        {},
+        None,
+        engine,
+        plan,
+    )
+
+
+def test_plan_defaults():
+    plan = LaunchPlan(tool, {"model"})
+    assert plan.defaults == {"result": "out.txt"}
+    assert plan.path_parameters == {"model"}
+
+
+def test_prefix_shared_among_calls(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    engine = SingularityEngine()
+    plan = LaunchPlan(tool, {"model"})
+    first = build(plan, engine, [("/in", True)], ["--model", "/in/a"])
+    second = build(plan, engine, [("/out", False)], ["--model", "/out/b"])
+    assert len(plan.prefixes) == 1
+    assert first.sing_command_comp["base"] is second.sing_command_comp["base"]
+    assert first.sing_command_comp["exe"] == ["tool", "--fast"]
+    assert first.sing_command_comp["envs"] == ["--env", "A=1"]
+    assert first.sing_command_comp["sif"] == ["/images/tool.sif"]
+    assert first.sing_command_comp["mounts"] == ["-B", "/in:/in:ro,/data:/data"]
+    assert second.sing_command_comp["mounts"] == ["-B", "/out:/out,/data:/data"]
+    assert second.sing_command_comp["flags"] == ["--model", "/out/b"]
+    # Adding per call values does not modify the shared prefix
+    first.add_env("B=2")
+    first.add_bind("/tmp", "/tmp")
+    assert second.sing_command_comp["envs"] == ["--env", "A=1"]
+    assert plan.prefixes.popitem()[1].env_vars == ["A=1"]
+
+
+def test_prefix_per_working_directory(tmp_path, monkeypatch):
+    engine = SingularityEngine()
+    plan = LaunchPlan(tool, set())
+    for name in ("a", "b"):
+        (tmp_path / name).mkdir()
+        monkeypatch.chdir(tmp_path / name)
+        bb = build(plan, engine, [], [])
+        assert bb.sing_command_comp["action_flags"][-1] == str(tmp_path / name)
+    assert len(plan.prefixes) == 2
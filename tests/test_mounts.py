@@ -0,0 +1,49 @@
+from permedcoe.core.mounts import plan_mounts
+
+
+def test_nested_paths_covered_by_ancestor():
+    requests = [("/data/in/a.txt", False), ("/data/in", False), ("/data", True)]
+    assert plan_mounts(requests) == [("/data", False)]
+
+
+def test_writable_if_any_request_writes():
+    requests = [("/data/run", False), ("/data/run/out", True)]
+    assert plan_mounts(requests) == [("/data/run", False)]
+
+
+def test_siblings_merged_with_same_mode():
+    requests = [("/home/user/in1", False), ("/home/user/in2", False)]
+    assert plan_mounts(requests) == [("/home/user", True)]
+
+
+def test_siblings_kept_with_different_modes():
+    requests = [("/home/user/in", False), ("/home/user/out", True)]
+    assert plan_mounts(requests) == [
+        ("/home/user/in", True),
+        ("/home/user/out", False),
+    ]
+
+
+def test_merge_depth(monkeypatch):
+    requests = [("/home/a", False), ("/home/b", False)]
+    # Never merged into a shallow parent (e.g. /home)
+    assert plan_mounts(requests) == [("/home/a", True), ("/home/b", True)]
+    assert plan_mounts(requests, merge_depth=1) == [("/home", True)]
+    monkeypatch.setenv("PERMEDCOE_MOUNT_MERGE_DEPTH", "1")
+    assert plan_mounts(requests) == [("/home", True)]
+
+
+def test_relative_and_empty_paths(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    requests = [("out", True), ("", False), (None, False), ("./out/../out", True)]
+    assert plan_mounts(requests) == [(str(tmp_path / "out"), False)]
+
+
+def test_deterministic_order():
+    requests = [("/z/y/x", True), ("/a/b/c", False), ("/m/n/o", True)]
+    assert plan_mounts(requests) == plan_mounts(list(reversed(requests)))
+    assert [path for path, _ in plan_mounts(requests)] == [
+        "/a/b/c",
+        "/m/n/o",
+        "/z/y/x",
+    ]
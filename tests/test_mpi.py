@@ -0,0 +1,160 @@
+import logging
+
+import pytest
+
+from permedcoe.core.building_block import PerMedBB
+from permedcoe.core.engines import PodmanEngine
+from permedcoe.core.engines import SingularityEngine
+from permedcoe.core.mpi import expand_nodelist
+from permedcoe.core.mpi import get_hosts
+from permedcoe.core.mpi import MpiLauncher
+from permedcoe.core.mpi import resolve_int
+from permedcoe.utils.exceptions import PerMedCoEException
+
+VARIABLES = (
+    "PERMEDCOE_MPI_MODE",
+    "PERMEDCOE_MPI_HOSTS",
+    "PERMEDCOE_MPI_PPN",
+    "PERMEDCOE_MPI_BIND",
+    "PERMEDCOE_MPI_FLAGS",
+    "SLURM_JOB_NODELIST",
+    "SLURM_NODELIST",
+    "SLURM_NTASKS",
+    "SLURM_NTASKS_PER_NODE",
+)
+
+
+@pytest.fixture(autouse=True)
+def clean_environment(monkeypatch):
+    for variable in VARIABLES:
+        monkeypatch.delenv(variable, raising=False)
+
+
+def test_expand_nodelist():
+    assert expand_nodelist("node[01-03,07],gpu1") == [
+        "node01",
+        "node02",
+        "node03",
+        "node07",
+        "gpu1",
+    ]
+    assert expand_nodelist("rack[1-2]-n[1,3]") == [
+        "rack1-n1",
+        "rack1-n3",
+        "rack2-n1",
+        "rack2-n3",
+    ]
+
+
+def test_get_hosts(tmp_path, monkeypatch):
+    assert get_hosts() == []
+    monkeypatch.setenv("SLURM_JOB_NODELIST", "n[1-2]")
+    assert get_hosts() == ["n1", "n2"]
+    hostfile = tmp_path / "hosts"
+    hostfile.write_text("a slots=4\n# comment\nb\na\n")
+    monkeypatch.setenv("PERMEDCOE_MPI_HOSTS", str(hostfile))
+    assert get_hosts() == ["a", "b"]
+    monkeypatch.setenv("PERMEDCOE_MPI_HOSTS", "x,y")
+    assert get_hosts() == ["x", "y"]
+
+
+def test_single_node_argv(monkeypatch):
+    assert MpiLauncher("mpirun", 1, 4).argv() == ("mpirun", "-np", "4")
+    assert MpiLauncher("mpiexec.hydra", 1, 4).argv() == ("mpiexec.hydra", "-np", "4")
+    assert MpiLauncher("srun", 1, 4).argv() == ("srun", "--ntasks=4")
+    assert not MpiLauncher("mpirun", 1, 4).hybrid
+    assert MpiLauncher("srun", 1, 4).hybrid
+    monkeypatch.setenv("PERMEDCOE_MPI_BIND", "core")
+    monkeypatch.setenv("PERMEDCOE_MPI_FLAGS", "--oversubscribe")
+    assert MpiLauncher("mpirun", 1, 2).argv() == (
+        "mpirun",
+        "-np",
+        "2",
+        "--bind-to",
+        "core",
+        "--oversubscribe",
+    )
+
+
+def test_multiple_nodes_argv(monkeypatch):
+    monkeypatch.setenv("PERMEDCOE_MPI_HOSTS", "h1,h2,h3")
+    assert MpiLauncher("mpirun", 2, 8).argv() == (
+        "mpirun",
+        "-np",
+        "8",
+        "--host",
+        "h1:4,h2:4",
+        "--map-by",
+        "ppr:4:node",
+    )
+    assert MpiLauncher("mpiexec.hydra", 2, 8).argv() == (
+        "mpiexec.hydra",
+        "-np",
+        "8",
+        "-hosts",
+        "h1,h2",
+        "-ppn",
+        "4",
+    )
+    assert MpiLauncher("srun", 2, 8).argv() == (
+        "srun",
+        "--ntasks=8",
+        "--nodes=2",
+        "--nodelist=h1,h2",
+        "--ntasks-per-node=4",
+    )
+
+
+def test_multiple_nodes_run_in_host(monkeypatch):
+    monkeypatch.setenv("PERMEDCOE_MPI_HOSTS", "h1,h2")
+    assert MpiLauncher("mpirun", 2, 8).hybrid
+    assert not MpiLauncher("mpirun", 1, 8).hybrid
+    bb = PerMedBB(
+        "/images/tool.sif",
+        "mpirun",
+        "tool",
+        2,
+        8,
+        [],
+        None,
+        [],
+        [],
+        {},
+        None,
+        SingularityEngine(),
+    )
+    assert bb.sing_command_comp["launcher"][0] == "mpirun"
+    assert bb.sing_command_comp["exe"] == ["tool"]
+    # The engine must support the hybrid mode
+    with pytest.raises(PerMedCoEException):
+        PerMedBB(
+            "/images/tool.sif",
+            "mpirun",
+            "tool",
+            2,
+            8,
+            [],
+            None,
+            [],
+            [],
+            {},
+            None,
+            PodmanEngine(),
+        )
+
+
+def test_fill_allocation_warning(monkeypatch, caplog):
+    monkeypatch.setenv("PERMEDCOE_MPI_HOSTS", "h1,h2")
+    monkeypatch.setenv("SLURM_NTASKS_PER_NODE", "6")
+    with caplog.at_level(logging.WARNING):
+        launcher = MpiLauncher("mpirun", 2, 1)
+    assert launcher.processes == 12
+    assert "whole allocation" in caplog.text
+
+
+def test_resolve_int(monkeypatch):
+    monkeypatch.setenv("UNITS", "6")
+    assert resolve_int("$UNITS", 1) == 6
+    assert resolve_int(None, 2) == 2
+    with pytest.raises(PerMedCoEException):
+        resolve_int("many", 1)
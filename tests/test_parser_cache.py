@@ -0,0 +1,112 @@
+import argparse
+import json
+
+import pytest
+
+from permedcoe.utils.arguments import build_bb_parser
+from permedcoe.utils.parser_cache import compile_parser
+from permedcoe.utils.parser_cache import CompiledDefinition
+from permedcoe.utils.parser_cache import get_compiled_definition
+
+
+def parameter(kind, name, format):
+    return {"type": kind, "name": name, "format": format, "description": "-"}
+
+
+SINGLE_MODE = {
+    "short_description": "Single mode",
+    "long_description": "Single mode",
+    "use_description": "short",
+    "parameters": {
+        "default": [
+            parameter("input", "model", "str"),
+            parameter("input", "samples", "int"),
+            parameter("input", "rate", "float"),
+            parameter("output", "result", "str"),
+        ]
+    },
+}
+
+MULTIPLE_MODES = {
+    "short_description": "Multiple modes",
+    "long_description": "Multiple modes",
+    "use_description": "short",
+    "parameters": {
+        "simulate": [parameter("input", "steps", "int")],
+        "analyse": [parameter("input", "threshold", "float")],
+    },
+}
+
+COMMON = ["--processes", "4", "--debug", "--tmpdir=/scratch"]
+
+
+@pytest.fixture
+def compiled(tmp_path, monkeypatch):
+    monkeypatch.setenv("PERMEDCOE_PARSER_CACHE", str(tmp_path / "cache"))
+
+    def compile_definition(definition):
+        path = tmp_path / "definition.json"
+        path.write_text(json.dumps(definition))
+        # Compiled and then read from the cache
+        get_compiled_definition(str(path))
+        monkeypatch.setattr("permedcoe.utils.parser_cache.__COMPILED__", {})
+        return get_compiled_definition(str(path))
+
+    return compile_definition
+
+
+@pytest.mark.parametrize(
+    "argv",
+    [
+        ["--model", "m", "--samples", "10", "--rate", "0.5", "--result", "r"],
+        ["--samples=3", "--model", "m", "--rate", "1", "--result", "r"] + COMMON,
+    ],
+)
+def test_single_mode_equivalence(compiled, argv):
+    definition = compiled(SINGLE_MODE)
+    parser = build_bb_parser(definition.arguments())
+    assert vars(definition.parse(argv)) == vars(parser.parse_args(argv))
+
+
+@pytest.mark.parametrize(
+    "argv",
+    [
+        ["simulate", "--steps", "5"],
+        COMMON + ["analyse", "--threshold", "0.1"],
+    ],
+)
+def test_multiple_modes_equivalence(compiled, argv):
+    definition = compiled(MULTIPLE_MODES)
+    parser = build_bb_parser(definition.arguments())
+    assert vars(definition.parse(argv)) == vars(parser.parse_args(argv))
+
+
+@pytest.mark.parametrize(
+    "argv",
+    [
+        ["--model", "m"],  # missing arguments
+        ["--model", "m", "--samples", "x", "--rate", "1", "--result", "r"],
+        ["--mod", "m", "--samples", "1", "--rate", "1", "--result", "r"],
+        ["-h"],
+    ],
+)
+def test_unusual_invocations_given_to_argparse(compiled, argv):
+    assert compiled(SINGLE_MODE).parse(argv) is None
+
+
+def test_string_defaults_converted():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--samples", type=int, default="4")
+    parser.add_argument("--rate", type=float, default="0.5")
+    parser.add_argument("--name", type=str, default="x")
+    spec = json.loads(json.dumps(compile_parser(parser)))
+    args = CompiledDefinition(None, None, spec).parse([])
+    assert (
+        vars(args)
+        == vars(parser.parse_args([]))
+        == {
+            "samples": 4,
+            "rate": 0.5,
+            "name": "x",
+        }
+    )
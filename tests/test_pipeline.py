@@ -0,0 +1,133 @@
+import os
+import pickle
+
+import pytest
+
+from permedcoe.core.batch import batching
+from permedcoe.core.batch import TaskBatch
+from permedcoe.core.decorators import binary
+from permedcoe.core.decorators import capture_tasks
+from permedcoe.core.decorators import constraint
+from permedcoe.core.decorators import task
+from permedcoe.core.decorators import Type
+from permedcoe.core.decorators import StdIOStream
+from permedcoe.core.decorators import FILE_IN
+from permedcoe.core.decorators import FILE_OUT
+from permedcoe.core.decorators import STDIN
+from permedcoe.core.decorators import STDOUT
+from permedcoe.core.pipeline import FusedPipeline
+from permedcoe.core.pipeline import pipeline
+from permedcoe.utils.exceptions import TaskExecutionException
+
+
+@constraint(computing_units="$TEST_UNITS")
+@binary(binary="echo")
+@task()
+def env_units(value="a"):
+    pass
+
+
+@binary(binary="echo")
+@task()
+def default_units(value="a"):
+    pass
+
+
+def test_computing_units_resolved(monkeypatch):
+    monkeypatch.setenv("TEST_UNITS", "3")
+    with capture_tasks() as prepared:
+        env_units(value="a")
+        env_units(value="b")
+        default_units(value="c")
+    assert [call.computing_units for call in prepared] == [3, 3, 1]
+    assert FusedPipeline(prepared).computing_units == 7
+    assert TaskBatch(prepared[:2], parallel=2).computing_units == 6
+
+
+@binary(binary="sh")
+@task(script=FILE_IN)
+def run(script=None, value="0"):
+    pass
+
+
+@pytest.fixture
+def scripts(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    exit_script = tmp_path / "exit.sh"
+    exit_script.write_text("exit $1\n")
+    sleep_script = tmp_path / "sleep.sh"
+    sleep_script.write_text("sleep $1\n")
+    return str(exit_script), str(sleep_script)
+
+
+def test_pipeline_failure_cause(scripts):
+    exit_script, sleep_script = scripts
+    with pytest.raises(TaskExecutionException) as error:
+        pipeline(
+            (run, dict(script=sleep_script, value="10")),
+            (run, dict(script=exit_script, value="3")),
+        )
+    # The terminated stage is not the cause
+    assert error.value.exit_code == 3
+    assert error.value.results == [143, 3]
+
+
+def test_batch_failed_calls(scripts):
+    exit_script, _ = scripts
+    with pytest.raises(TaskExecutionException) as error:
+        with batching(parallel=2):
+            for value in ("0", "4", "0", "5"):
+                run(script=exit_script, value=value)
+    assert error.value.exit_code == 4
+    assert error.value.results == [0, 4, 0, 5]
+
+
+def test_results_kept_in_other_processes():
+    error = TaskExecutionException(["tool"], 2, "tail", results=[0, 2])
+    restored = pickle.loads(pickle.dumps(error))
+    assert restored.results == [0, 2]
+    assert restored.exit_code == 2
+
+
+@binary(binary="cat")
+@task(
+    source={Type: FILE_IN, StdIOStream: STDIN},
+    result={Type: FILE_OUT, StdIOStream: STDOUT},
+)
+def copy(source=None, result=None):
+    pass
+
+
+@binary(binary="wc")
+@task(
+    source={Type: FILE_IN, StdIOStream: STDIN},
+    result={Type: FILE_OUT, StdIOStream: STDOUT},
+)
+def count(mode="-c", source=None, result=None):
+    pass
+
+
+def test_pipeline_streams_the_intermediate(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    fifos = []
+    mkfifo = os.mkfifo
+
+    def record_fifo(path, *args):
+        fifos.append(path)
+        mkfifo(path, *args)
+
+    monkeypatch.setattr(os, "mkfifo", record_fifo)
+    source = tmp_path / "source.txt"
+    source.write_text("x" * 100000)
+    intermediate = tmp_path / "intermediate.txt"
+    result = tmp_path / "count.txt"
+    pipeline(
+        (copy, dict(source=str(source), result=str(intermediate))),
+        (count, dict(source=str(intermediate), result=str(result))),
+    )
+    assert result.read_text().strip() == "100000"
+    # The stages communicated through a FIFO: the intermediate is not written
+    assert len(fifos) == 1
+    assert not os.path.exists(intermediate)
+    # The pipeline working directory (and its FIFO) is removed
+    assert not os.path.exists(fifos[0])
@@ -0,0 +1,25 @@
+import pytest
+
+import permedcoe
+
+
+def test_lazy_names():
+    from permedcoe.utils.exceptions import TaskExecutionException
+
+    assert permedcoe.TaskExecutionException is TaskExecutionException
+    assert callable(permedcoe.task)
+
+
+def test_unknown_name():
+    assert not hasattr(permedcoe, "unknown")
+    assert getattr(permedcoe, "unknown", None) is None
+    with pytest.raises(AttributeError):
+        permedcoe.unknown
+
+
+def test_name_missing_in_backend(monkeypatch):
+    # e.g. PyCOMPSs without julia support
+    monkeypatch.delattr(permedcoe, "julia", raising=False)
+    monkeypatch.setattr(permedcoe, "__load_backend__", lambda: {})
+    assert not hasattr(permedcoe, "julia")
+    assert getattr(permedcoe, "julia", None) is None
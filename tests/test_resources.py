@@ -0,0 +1,88 @@
+from permedcoe.core.building_block import PerMedBB
+from permedcoe.core.engines import NativeEngine
+from permedcoe.core.engines import PodmanEngine
+from permedcoe.core.engines import SingularityEngine
+from permedcoe.core.resources import parse_memory
+from permedcoe.core.resources import Resources
+
+
+def building_block(engine, resources, runner=None):
+    return PerMedBB(
+        "/images/tool.sif",
+        runner,
+        "tool",
+        1,
+        4,
+        [],
+        None,
+        [],
+        [],
+        {},
+        resources,
+        engine,
+    )
+
+
+def bound(cores=2, processes=1, memory=None):
+    resources = Resources(cores, processes, memory)
+    resources.cpus = [2, 3][:cores]
+    return resources
+
+
+def test_parse_memory():
+    assert parse_memory("2") == 2 * 1024**3
+    assert parse_memory("512M") == 512 * 1024**2
+    assert parse_memory("1.5GB") == int(1.5 * 1024**3)
+
+
+def test_thread_env():
+    resources = Resources(8, processes=2)
+    assert resources.thread_env(["OMP_NUM_THREADS=1"]) == {
+        "OPENBLAS_NUM_THREADS": "4",
+        "MKL_NUM_THREADS": "4",
+    }
+    assert Resources(None, memory=1).thread_env() == {}
+
+
+def test_native_limits():
+    resources = bound(memory=4096, processes=4)
+    assert resources.affinity_argv() == ["taskset", "-c", "2,3"]
+    assert resources.limits_argv() == ["prlimit", "--as=1024", "--data=1024", "--"]
+    bb = building_block(NativeEngine(), resources)
+    prefix = bb.__resources_argv__(False)
+    assert prefix == resources.affinity_argv() + resources.limits_argv()
+
+
+def test_singularity_limits(monkeypatch):
+    # Without cgroups, the container processes inherit the command limits
+    resources = bound(memory=4096)
+    bb = building_block(SingularityEngine(), resources)
+    prefix = bb.__resources_argv__(True)
+    assert prefix == ["taskset", "-c", "2,3"] + resources.limits_argv()
+    assert bb.sing_command_comp["limits"] == []
+    # The memory is limited by the engine, the cores with the affinity
+    monkeypatch.setenv("PERMEDCOE_MEMORY_CGROUPS", "1")
+    assert bb.__resources_argv__(True) == ["taskset", "-c", "2,3"]
+    assert bb.sing_command_comp["limits"] == ["--memory", "4096"]
+
+
+def test_podman_limits():
+    # The container is not a child of the command: the engine binds the cores
+    bb = building_block(PodmanEngine(), bound(memory=4096))
+    assert bb.__resources_argv__(True) == []
+    assert bb.sing_command_comp["limits"] == [
+        "--cpuset-cpus",
+        "2,3",
+        "--memory",
+        "4096",
+    ]
+
+
+def test_launch_without_memory_limit(stub_command, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    log = stub_command("singularity")
+    bb = building_block(SingularityEngine(), Resources(1))
+    bb.launch()
+    call = log.read_text().split()
+    assert "--memory" not in call
+    assert call[-2:] == ["/images/tool.sif", "tool"]
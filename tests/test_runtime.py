@@ -0,0 +1,175 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+import permedcoe
+from permedcoe.core.runtime import compss_barrier
+from permedcoe.core.runtime import LocalRuntime
+from permedcoe.core.runtime import __overlap__
+from permedcoe.utils.exceptions import PerMedCoEException
+from permedcoe.utils.exceptions import TaskExecutionException
+
+READ = (True, False)
+WRITE = (False, True)
+
+
+class Recorder(object):
+    """Task functions that record their execution (optionally held by a gate)."""
+
+    def __init__(self):
+        self.gate = threading.Event()
+        self.lock = threading.Lock()
+        self.log = []
+        self.running = 0
+        self.max_running = 0
+
+    def __call__(self, name, hold=False, seconds=0):
+        with self.lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        if hold:
+            assert self.gate.wait(5)
+        time.sleep(seconds)
+        with self.lock:
+            self.running -= 1
+            self.log.append(name)
+        return name
+
+
+def test_overlap():
+    assert __overlap__("/data/a", "/data/a")
+    assert __overlap__("/data/a/b.txt", "/data/a")
+    assert __overlap__("/data/a", "/data/a/b.txt")
+    assert not __overlap__("/data/a", "/data/ab")
+    assert not __overlap__("/data/a", "/data/b")
+
+
+@pytest.mark.parametrize(
+    "first, second",
+    [
+        (WRITE, READ),  # read after write
+        (READ, WRITE),  # write after read
+        (WRITE, WRITE),  # write after write
+    ],
+)
+def test_dependencies(first, second):
+    runtime = LocalRuntime(4)
+    task = Recorder()
+    runtime.submit(task, ("first", True), 1, [("/data/out", *first)])
+    runtime.submit(task, ("second",), 1, [("/data/out/file.txt", *second)])
+    other = runtime.submit(task, ("other",), 1, [("/data/other", True, True)])
+    # The independent task runs meanwhile, the dependent one waits
+    assert other.result(5) == "other"
+    assert task.log == ["other"]
+    task.gate.set()
+    runtime.barrier()
+    assert task.log == ["other", "first", "second"]
+
+
+def test_readers_run_concurrently():
+    runtime = LocalRuntime(4)
+    task = Recorder()
+    runtime.submit(task, ("first", True), 1, [("/data/in", *READ)])
+    second = runtime.submit(task, ("second",), 1, [("/data/in", *READ)])
+    assert second.result(5) == "second"
+    task.gate.set()
+    runtime.barrier()
+
+
+def fail():
+    raise TaskExecutionException(["tool"], 3, "")
+
+
+def test_failed_dependency():
+    runtime = LocalRuntime(2)
+    task = Recorder()
+    failed = runtime.submit(fail, (), 1, [("/data/out", *WRITE)])
+    dependent = runtime.submit(task, ("dependent",), 1, [("/data/out", *READ)])
+    with pytest.raises(PerMedCoEException, match="a dependency failed"):
+        dependent.result(5)
+    assert isinstance(failed.exception(), TaskExecutionException)
+    assert task.log == []
+    assert runtime.failed == 2
+
+
+def test_computing_units_limit():
+    runtime = LocalRuntime(2)
+    task = Recorder()
+    for index in range(4):
+        runtime.submit(task, (index, False, 0.05), 1, [])
+    runtime.barrier()
+    assert task.max_running == 2
+    task.max_running = 0
+    for index in range(3):
+        # More units than cores: limited to all the cores
+        runtime.submit(task, (index, False, 0.05), 8, [])
+    runtime.barrier()
+    assert task.max_running == 1
+
+
+def test_large_task_does_not_block_smaller_ones():
+    runtime = LocalRuntime(2)
+    task = Recorder()
+    runtime.submit(task, ("held", True), 1, [])
+    large = runtime.submit(task, ("large",), 2, [])
+    small = runtime.submit(task, ("small",), 1, [])
+    assert small.result(5) == "small"
+    assert not large.done()
+    task.gate.set()
+    assert large.result(5) == "large"
+
+
+def test_barrier_raises_first_failure():
+    runtime = LocalRuntime(2)
+    task = Recorder()
+    runtime.submit(task, ("ok",), 1, [])
+    runtime.submit(fail, (), 1, [("/data/out", *WRITE)])
+    runtime.submit(fail, (), 1, [("/data/other", *WRITE)])
+    with pytest.raises(TaskExecutionException) as error:
+        runtime.wait_on_file(["/data/out/"])
+    assert error.value.exit_code == 3
+    with pytest.raises(TaskExecutionException):
+        runtime.barrier()
+    # Reported once
+    runtime.barrier()
+    assert runtime.failed == 2
+
+
+def test_compss_barrier(monkeypatch):
+    monkeypatch.setattr("permedcoe.core.runtime.__RUNTIME__", LocalRuntime(1))
+    from permedcoe.core.runtime import get_local_runtime
+
+    get_local_runtime().submit(fail, (), 1, [])
+    with pytest.raises(TaskExecutionException):
+        compss_barrier()
+
+
+EXIT_SCRIPT = """
+import atexit
+from permedcoe.core.runtime import get_local_runtime
+
+
+def fail():
+    raise RuntimeError("task failure")
+
+
+atexit.register(print, "exit handler")
+get_local_runtime().submit(fail, (), 1, [])
+"""
+
+
+def test_exit_status_with_failed_tasks(monkeypatch):
+    monkeypatch.setenv("PERMEDCOE_LOCAL_RUNTIME", "2")
+    monkeypatch.setenv(
+        "PYTHONPATH", os.path.dirname(os.path.dirname(permedcoe.__file__))
+    )
+    process = subprocess.run(
+        [sys.executable, "-c", EXIT_SCRIPT], capture_output=True, text=True
+    )
+    assert process.returncode == 1
+    assert "1 task(s) failed" in process.stderr
+    assert process.stdout == "exit handler\n"
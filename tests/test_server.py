@@ -0,0 +1,184 @@
+import atexit
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+import permedcoe
+from permedcoe.client import connect
+from permedcoe.client import receive_frame
+from permedcoe.client import send_frame
+from permedcoe.client import EXIT
+from permedcoe.client import REQUEST
+from permedcoe.client import STDOUT
+from permedcoe.core.server import __exit_worker__ as exit_worker
+from permedcoe.core.trace import get_tracer
+from permedcoe.utils.exceptions import TaskExecutionException
+from permedcoe.utils.executor import command_runner
+from permedcoe.utils.executor import terminate_sessions
+
+DEFINITION = {
+    "short_description": "Server test",
+    "long_description": "Server test",
+    "use_description": "short",
+    "parameters": {
+        "default": [
+            {"type": "input", "name": "value", "format": "str", "description": "-"}
+        ]
+    },
+}
+DEFINITIONS_SOURCE = """
+import os
+
+ASSETS_PATH = os.path.dirname(os.path.abspath(__file__))
+# Evaluated at import time (as the container and constraint definitions)
+COMPUTING_UNITS = os.environ.get("COMPUTING_UNITS", "1")
+"""
+MAIN_SOURCE = """
+import os
+import sys
+
+from server_bb import definitions
+
+BIG_OUTPUT = 4 * 1024 * 1024
+
+
+def invoke(arguments, config):
+    if arguments.value == "big":
+        sys.stdout.write("x" * BIG_OUTPUT)
+        return
+    print("parent", os.getppid())
+    print("cwd", os.getcwd())
+    print("env", os.environ.get("SERVER_TEST_VALUE"))
+    print("units", definitions.COMPUTING_UNITS)
+    sys.exit(int(arguments.value))
+"""
+BIG_OUTPUT = 4 * 1024 * 1024
+
+
+def test_exit_worker_hooks(tmp_path, monkeypatch):
+    trace = tmp_path / "trace.json"
+    inherited = tmp_path / "inherited"
+    monkeypatch.setenv("PERMEDCOE_TRACE", str(trace))
+    pid = os.fork()
+    if pid == 0:
+        # As an exit handler inherited from the server
+        atexit.register(inherited.write_text, "run")
+        get_tracer().record("span", time.time_ns(), time.time_ns())
+        exit_worker(3)
+    _, status = os.waitpid(pid, 0)
+    assert os.WEXITSTATUS(status) == 3
+    assert not inherited.exists()
+    events = json.loads(trace.read_text())["traceEvents"]
+    assert "span" in [event["name"] for event in events]
+
+
+def test_terminate_sessions(tmp_path):
+    errors = []
+
+    def run():
+        try:
+            command_runner(["sleep", "30"], timeout=60)
+        except TaskExecutionException as error:
+            errors.append(error)
+
+    runner = threading.Thread(target=run)
+    start = time.time()
+    runner.start()
+    time.sleep(0.5)
+    terminate_sessions()
+    runner.join(10)
+    assert not runner.is_alive()
+    assert time.time() - start < 10
+    assert errors and errors[0].exit_code != 0
+
+
+@pytest.fixture
+def server(tmp_path):
+    """Building block server (2 workers) started in its own folder and
+    environment, with a building block package (server_bb) in its path."""
+    package = tmp_path / "lib" / "server_bb"
+    package.mkdir(parents=True)
+    (package / "__init__.py").write_text(
+        "from server_bb import definitions\nfrom server_bb.main import invoke\n"
+    )
+    (package / "definitions.py").write_text(DEFINITIONS_SOURCE)
+    (package / "main.py").write_text(MAIN_SOURCE)
+    (package / "definition.json").write_text(json.dumps(DEFINITION))
+    server_dir = tmp_path / "server"
+    server_dir.mkdir()
+    socket_path = str(tmp_path / "server.sock")
+    source = os.path.dirname(os.path.dirname(permedcoe.__file__))
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join([source, str(package.parent)])
+    env["SERVER_TEST_VALUE"] = "server"
+    env["COMPUTING_UNITS"] = "1"
+    process = subprocess.Popen(
+        [sys.executable, "-m", "permedcoe", "serve", "--socket", socket_path]
+        + ["-j", "2", "server_bb"],
+        cwd=server_dir,
+        env=env,
+    )
+    deadline = time.time() + 30
+    while not os.path.exists(socket_path) and time.time() < deadline:
+        assert process.poll() is None
+        time.sleep(0.05)
+    env["PERMEDCOE_SERVER"] = socket_path
+    yield process, env
+    process.terminate()
+    process.wait(30)
+
+
+def run_client(env, cwd, value):
+    return subprocess.run(
+        [sys.executable, "-m", "permedcoe.client", "server_bb", "--value", value],
+        cwd=cwd,
+        env=env,
+        capture_output=True,
+        timeout=60,
+    )
+
+
+def test_client_invocation(server, tmp_path):
+    process, env = server
+    client_dir = tmp_path / "client"
+    client_dir.mkdir()
+    env = dict(env, SERVER_TEST_VALUE="client", COMPUTING_UNITS="4")
+    result = run_client(env, client_dir, "3")
+    assert result.returncode == 3, result.stderr
+    # After the parameters shown by the invoker
+    assert result.stdout.decode().splitlines()[-4:] == [
+        f"parent {process.pid}",  # executed by a server worker
+        f"cwd {client_dir}",
+        "env client",
+        "units 4",
+    ]
+
+
+def test_slow_client_does_not_block_the_rest(server, tmp_path):
+    _, env = server
+    request = {
+        "argv": ["execute", "building_block", "server_bb", "--value", "big"],
+        "cwd": str(tmp_path),
+        "env": env,
+    }
+    slow = connect(env["PERMEDCOE_SERVER"])
+    with slow:
+        # Its output is not read until the other invocation finishes
+        send_frame(slow, REQUEST, json.dumps(request).encode())
+        time.sleep(1)
+        result = run_client(env, tmp_path, "0")
+        assert result.returncode == 0, result.stderr
+        output = b""
+        while True:
+            channel, payload = receive_frame(slow)
+            if channel == EXIT:
+                break
+            if channel == STDOUT:
+                output += payload
+    assert int(payload) == 0
+    assert output.endswith(b"x" * BIG_OUTPUT)
@@ -0,0 +1,61 @@
+import pytest
+
+from permedcoe.core.decorators import binary
+from permedcoe.core.decorators import task
+from permedcoe.core.decorators import Type
+from permedcoe.core.decorators import StdIOStream
+from permedcoe.core.decorators import FILE_IN
+from permedcoe.core.decorators import FILE_OUT
+from permedcoe.core.decorators import FILE_INOUT
+from permedcoe.core.decorators import STDIN
+from permedcoe.core.decorators import STDOUT
+from permedcoe.core.decorators import STDERR
+from permedcoe.utils.exceptions import PerMedCoEException
+
+
+@binary(binary="sh")
+@task(
+    script=FILE_IN,
+    source={Type: FILE_IN, StdIOStream: STDIN},
+    result={Type: FILE_OUT, StdIOStream: STDOUT},
+    log={Type: FILE_INOUT, StdIOStream: STDERR},
+)
+def upper(script=None, source=None, result=None, log=None):
+    pass
+
+
+@binary(binary="sh")
+@task(
+    script=FILE_IN,
+    result={Type: FILE_OUT, StdIOStream: STDOUT},
+    copy={Type: FILE_OUT, StdIOStream: STDOUT},
+)
+def duplicated(script=None, result=None, copy=None):
+    pass
+
+
+@pytest.fixture
+def script(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    script = tmp_path / "upper.sh"
+    script.write_text("tr a-z A-Z\necho converted >&2\n")
+    return str(script)
+
+
+def test_redirected_streams(tmp_path, script):
+    source = tmp_path / "source.txt"
+    result = tmp_path / "result.txt"
+    log = tmp_path / "log.txt"
+    log.write_text("previous\n")
+    source.write_text("first\n")
+    upper(script=script, source=str(source), result=str(result), log=str(log))
+    source.write_text("second\n")
+    upper(script=script, source=str(source), result=str(result), log=str(log))
+    # STDOUT (FILE_OUT) is overwritten and STDERR (FILE_INOUT) appended
+    assert result.read_text() == "SECOND\n"
+    assert log.read_text() == "previous\nconverted\nconverted\n"
+
+
+def test_duplicated_stream(tmp_path, script):
+    with pytest.raises(PerMedCoEException, match="Duplicated STDOUT"):
+        duplicated(script=script, result="a.txt", copy="b.txt")
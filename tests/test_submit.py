@@ -0,0 +1,121 @@
+import json
+import sys
+
+import pytest
+
+from permedcoe.core.submit import collect_results
+from permedcoe.core.submit import get_status
+from permedcoe.core.submit import submit_building_block
+from permedcoe.core.submit import COMPLETED
+from permedcoe.core.submit import FAILED
+from permedcoe.core.submit import MISSING
+from permedcoe.core.submit import NOT_SUBMITTED
+from permedcoe.core.submit import UNKNOWN
+from permedcoe.utils.exceptions import PerMedCoEException
+
+BB_SOURCE = """
+from permedcoe import binary, constraint, task
+
+
+@constraint(computing_units="2", memory_size="1G")
+@binary(binary="echo")
+@task()
+def submit_task(value="a"):
+    pass
+"""
+
+
+@pytest.fixture
+def batch(tmp_path, monkeypatch):
+    """Building block package (2 cores and 1G per row) and a 5 rows batch."""
+    package = tmp_path / "submit_bb"
+    package.mkdir()
+    (package / "__init__.py").write_text(BB_SOURCE)
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.chdir(tmp_path)
+    batch = tmp_path / "rows.jsonl"
+    batch.write_text("".join(json.dumps({"value": str(i)}) + "\n" for i in range(5)))
+    yield str(batch)
+    sys.modules.pop("submit_bb", None)
+
+
+def write_summary(submission, index, statuses):
+    summary = submission["workdir"] + "/summaries/%06d.jsonl" % index
+    with open(summary, "w") as summary_fd:
+        for row, status in enumerate(statuses):
+            result = {"row": row, "status": status, "exit_code": 0, "time": 1.0}
+            summary_fd.write(json.dumps(result) + "\n")
+
+
+def test_submit_job_array(batch, stub_command):
+    sbatch = stub_command("sbatch", 'echo "1234;cluster"')
+    submission = submit_building_block(
+        "submit_bb", batch, ["--flag"], pack=2, jobs=2, throttle=3, sbatch_flags="-A x"
+    )
+    assert submission["job_id"] == "1234"
+    assert submission["elements"] == 3
+    assert submission["directives"] == [
+        "--job-name=permedcoe-submit_bb",
+        "--array=0-2%3",
+        "--nodes=1",
+        "--ntasks=1",
+        "--cpus-per-task=4",
+        "--mem=2048M",
+    ]
+    script = submission["workdir"] + "/job.sh"
+    assert sbatch.read_text() == f"--parsable -A x {script}\n"
+    content = open(script).read()
+    assert "#SBATCH --array=0-2%3\n" in content
+    assert "-j 2 --batch" in content
+    assert content.rstrip().endswith("submit_bb --flag")
+    with open(submission["workdir"] + "/rows/000002.jsonl") as rows_fd:
+        assert [json.loads(line) for line in rows_fd] == [{"value": "4"}]
+    with pytest.raises(PerMedCoEException):
+        submit_building_block("submit_bb", batch)
+
+
+def test_submit_failure(batch, stub_command):
+    stub_command("sbatch", 'echo "invalid account" >&2; exit 1')
+    with pytest.raises(PerMedCoEException, match="invalid account"):
+        submit_building_block("submit_bb", batch)
+
+
+def test_dry_run(batch, stub_command):
+    sbatch = stub_command("sbatch")
+    submission = submit_building_block("submit_bb", batch, dry_run=True)
+    assert submission["job_id"] is None
+    assert not sbatch.exists()
+    _, states = get_status(submission["workdir"])
+    assert set(states.values()) == {NOT_SUBMITTED}
+
+
+def test_status_and_collect(batch, stub_command):
+    stub_command("sbatch", 'echo "77"')
+    submission = submit_building_block("submit_bb", batch, pack=2)
+    workdir = submission["workdir"]
+    write_summary(submission, 0, ["success", "failed"])
+    # Element 1 is still queued, element 2 is gone without summary
+    squeue = stub_command("squeue", 'echo "77_[1%2] RUNNING"; echo "78_2 PENDING"')
+    _, states = get_status(workdir)
+    assert states == {0: FAILED, 1: "RUNNING", 2: MISSING}
+    assert "--jobs=77" in squeue.read_text()
+    write_summary(submission, 1, ["success", "success"])
+    stub_command("squeue", "exit 1")
+    _, states = get_status(workdir)
+    assert states == {0: FAILED, 1: COMPLETED, 2: MISSING}
+    _, results = collect_results(workdir)
+    assert [(r["row"], r["element"], r["status"]) for r in results] == [
+        (0, 0, "success"),
+        (1, 0, "failed"),
+        (2, 1, "success"),
+        (3, 1, "success"),
+        (4, 2, "missing"),
+    ]
+
+
+def test_status_without_squeue(batch, stub_command, monkeypatch):
+    stub_command("sbatch", 'echo "77"')
+    submission = submit_building_block("submit_bb", batch, pack=5)
+    monkeypatch.setattr("permedcoe.core.submit.SQUEUE", "/nonexistent/squeue")
+    _, states = get_status(submission["workdir"])
+    assert states == {0: UNKNOWN}
@@ -0,0 +1,97 @@
+import time
+
+import pytest
+
+from permedcoe.core import decorators
+from permedcoe.core.batch import TaskBatch
+from permedcoe.core.decorators import binary
+from permedcoe.core.decorators import capture_tasks
+from permedcoe.core.decorators import constraint
+from permedcoe.core.decorators import task
+from permedcoe.core.decorators import FILE_IN
+from permedcoe.core.pipeline import FusedPipeline
+from permedcoe.utils.exceptions import TaskExecutionException
+
+
+@constraint(timeout=0.5)
+@binary(binary="sleep")
+@task()
+def slow(seconds="10"):
+    pass
+
+
+@constraint(retries=3, backoff=2)
+@binary(binary="sh")
+@task(script=FILE_IN)
+def flaky(script=None, failures="0"):
+    pass
+
+
+@constraint(timeout=10, retries=1, backoff=3)
+@binary(binary="true")
+@task()
+def bounded(value="a"):
+    pass
+
+
+@binary(binary="true")
+@task(retries=2)
+def unbounded(value="a"):
+    pass
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    delays = []
+    monkeypatch.setattr(decorators.time, "sleep", delays.append)
+    return delays
+
+
+@pytest.fixture
+def script(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    script = tmp_path / "flaky.sh"
+    # Fails the first $1 attempts (counted in attempts.txt)
+    script.write_text(
+        'echo attempt >>attempts.txt\n[ "$(wc -l <attempts.txt)" -gt "$1" ]\n'
+    )
+    return str(script)
+
+
+def test_timeout():
+    start = time.time()
+    with pytest.raises(TaskExecutionException) as error:
+        slow()
+    assert error.value.timed_out
+    assert time.time() - start < 5
+
+
+def test_retries_with_backoff(tmp_path, script, sleeps):
+    flaky(script=script, failures="2")
+    assert (tmp_path / "attempts.txt").read_text().count("attempt") == 3
+    assert sleeps == [2.0, 4.0]
+
+
+def test_retries_exhausted(tmp_path, script, sleeps):
+    with pytest.raises(TaskExecutionException) as error:
+        flaky(script=script, failures="10")
+    assert error.value.exit_code == 1
+    assert (tmp_path / "attempts.txt").read_text().count("attempt") == 4
+    assert sleeps == [2.0, 4.0, 8.0]
+
+
+def test_fused_options_from_the_calls():
+    with capture_tasks() as prepared:
+        for value in "abcde":
+            bounded(value=value)
+    # The stages run concurrently and the batch lanes back to back
+    fused = FusedPipeline(prepared)
+    assert (fused.timeout, fused.retries, fused.backoff) == (10.0, 1, 3.0)
+    assert TaskBatch(prepared, parallel=2).timeout == 30.0
+    assert TaskBatch(prepared, parallel=2, timeout=5, retries=0).timeout == 5
+    with capture_tasks() as prepared:
+        bounded(value="a")
+        unbounded(value="b")
+    # A call without timeout is unbounded
+    fused = FusedPipeline(prepared)
+    assert (fused.timeout, fused.retries) == (None, 2)
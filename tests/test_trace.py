@@ -0,0 +1,90 @@
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+
+import pytest
+
+import permedcoe
+from permedcoe.core import trace
+from permedcoe.core.decorators import binary
+from permedcoe.core.decorators import task
+from permedcoe.core.trace import enable_trace
+from permedcoe.core.trace import flush_traces
+
+
+@binary(binary="true")
+@task()
+def stub():
+    pass
+
+
+@pytest.fixture
+def trace_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(trace, "__TRACERS__", {})
+    monkeypatch.delenv("PERMEDCOE_TRACE", raising=False)
+    monkeypatch.chdir(tmp_path)
+    path = tmp_path / "trace.json"
+    enable_trace(str(path))
+    return path
+
+
+def load_events(path):
+    content = json.loads(path.read_text())
+    assert content["displayTimeUnit"] == "ms"
+    return content["traceEvents"]
+
+
+def test_task_spans(trace_file):
+    stub()
+    flush_traces()
+    events = load_events(trace_file)
+    spans = [event for event in events if event["ph"] == "X"]
+    names = [span["name"] for span in spans]
+    assert "task:stub" in names
+    assert "mounts" in names
+    for span in spans:
+        assert span["pid"] == os.getpid()
+        assert isinstance(span["tid"], int)
+        assert span["ts"] > 0
+        assert span["dur"] >= 0
+    # The task span encloses its phases
+    (task_span,) = [span for span in spans if span["name"] == "task:stub"]
+    for span in spans:
+        assert span["ts"] >= task_span["ts"]
+        assert span["ts"] + span["dur"] <= task_span["ts"] + task_span["dur"] + 1
+    metadata = {event["name"] for event in events if event["ph"] == "M"}
+    assert metadata == {"process_name", "thread_name"}
+
+
+def test_failed_span(trace_file):
+    with pytest.raises(ValueError):
+        with trace.trace_span("phase", step=1):
+            raise ValueError("failure")
+    flush_traces()
+    (span,) = [event for event in load_events(trace_file) if event["ph"] == "X"]
+    assert span["args"] == {"step": "1", "error": "ValueError"}
+
+
+def test_processes_merge_their_spans(trace_file):
+    stub()
+    context = multiprocessing.get_context("fork")
+    child = context.Process(target=stub)
+    child.start()
+    child.join()
+    flush_traces()
+    # Well-formed after every process flushed at its exit
+    events = load_events(trace_file)
+    pids = {event["pid"] for event in events if event["name"] == "task:stub"}
+    assert pids == {os.getpid(), child.pid}
+
+
+def test_written_at_exit(trace_file, monkeypatch):
+    monkeypatch.setenv(
+        "PYTHONPATH", os.path.dirname(os.path.dirname(permedcoe.__file__))
+    )
+    script = "from permedcoe.core.trace import trace_record; trace_record('run', 1, 2)"
+    subprocess.run([sys.executable, "-c", script], check=True)
+    (span,) = [event for event in load_events(trace_file) if event["ph"] == "X"]
+    assert (span["name"], span["ts"], span["dur"]) == ("run", 0.001, 0.001)
@@ -0,0 +1,84 @@
+import sys
+
+import pytest
+
+from permedcoe.core.workflows import get_requirements
+
+MAIN_SOURCE = """
+from permedcoe import binary, constraint, container, mpi, task
+
+
+@constraint(computing_units="4", memory_size="2G")
+@container(engine="SINGULARITY", image="/images/tool.sif")
+@binary(binary="tool")
+@task()
+def serial(value="a"):
+    pass
+
+
+@constraint(computing_units="${REQ_UNITS}", memory_size="512M")
+@container(engine="SINGULARITY", image="/images/solver.sif")
+@mpi(runner="mpirun", binary="solver", computing_nodes="${REQ_NODES}")
+@task()
+def parallel(value="a"):
+    pass
+"""
+
+EXTRA_SOURCE = """
+from permedcoe import binary, task
+
+from req_bb.main import serial
+
+
+@binary(binary="tool")
+@task()
+def helper(value="a"):
+    pass
+"""
+
+
+@pytest.fixture
+def packages(tmp_path, monkeypatch):
+    """Building block with tasks in two modules and a package without tasks."""
+    package = tmp_path / "req_bb"
+    package.mkdir()
+    (package / "__init__.py").write_text("")
+    (package / "main.py").write_text(MAIN_SOURCE)
+    (package / "extra.py").write_text(EXTRA_SOURCE)
+    empty = tmp_path / "req_empty"
+    empty.mkdir()
+    (empty / "__init__.py").write_text("VALUE = 1\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.setenv("REQ_UNITS", "16")
+    monkeypatch.setenv("REQ_NODES", "2")
+    import req_bb.extra  # noqa: F401
+    import req_empty  # noqa: F401
+
+    yield
+    for name in ("req_bb", "req_bb.main", "req_bb.extra", "req_empty"):
+        sys.modules.pop(name, None)
+
+
+def test_aggregated_requirements(packages):
+    requirements = get_requirements("req_bb")
+    # serial is imported by both modules, but counted once
+    assert requirements.tasks == ["helper", "parallel", "serial"]
+    assert requirements.cpus == 16
+    assert requirements.nodes == 2
+    assert requirements.cpus_per_node() == 8
+    assert requirements.mpi
+    assert requirements.memory == 2 * 1024**3
+    assert requirements.memory_mb() == 2048
+    assert requirements.images == ["/images/tool.sif", "/images/solver.sif"]
+
+
+def test_unresolved_values(packages, monkeypatch):
+    monkeypatch.setenv("REQ_UNITS", "many")
+    monkeypatch.delenv("REQ_NODES")
+    requirements = get_requirements("req_bb")
+    assert (requirements.cpus, requirements.nodes) == (4, 1)
+
+
+def test_without_tasks(packages):
+    assert get_requirements("req_empty") is None
+    assert get_requirements("req_missing") is None